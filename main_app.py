@@ -2,6 +2,7 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import threading
+import multiprocessing
 import os
 import logging
 import webbrowser
@@ -11,6 +12,26 @@ from typing import Optional, List, Dict, Any, Callable
 # Importy z naszych modułów
 from modules.config_manager import save_config, load_config
 from modules.audio_recorder import AudioRecorder
+from modules.benchmark import find_reference_clip, get_benchmark_result
+from modules.decoding_presets import (CUSTOM_PRESET, DEFAULT_PRESET, PRESET_LABELS, REFERENCE_PRESET, benchmark_key,
+                                      describe_settings, get_preset_settings, normalize_settings, preset_choices)
+from modules.weight_cache import get_load_times
+from modules.stt_engines import get_registered_engines
+from modules.transcript_view import VirtualTranscriptView
+from modules.progress import format_duration
+from modules.jobs import CancellationToken, JobCancelledError, JobTimeoutError
+from modules.segment_repair import find_suspect_segments
+from modules.inference_worker import get_inference_worker, shutdown_inference_worker
+from modules.stall_watchdog import StallWatchdog
+from modules.rate_limiter import get_usage
+from modules.auto_engine import run_measured
+from modules.vocabulary import VOCABULARY_FILE_PATH, Vocabulary, get_vocabulary, load_vocabulary_text, save_vocabulary_text
+from modules.incremental_transcription import load_record, remember_transcript, transcribe_incremental
+from modules.multitrack_recorder import MultiTrackRecorder, format_speaker_transcript, list_input_devices, transcribe_tracks
+from modules.resource_governor import PRIORITY_INTERACTIVE, ResourceGovernor
+from modules.text_translation import language_code
+from modules.feature_cache import FeatureCache, set_feature_cache_enabled
+from modules.cpu_tuning import AUTO_THREADS, candidate_thread_counts, get_tuned_threads
 
 # Konfiguracja logowania
 logging.basicConfig(
@@ -25,7 +46,7 @@ try:
     import whisper
     WHISPER_AVAILABLE = True
     try:
-        from modules.local_stt import transcribe_audio_local, AVAILABLE_WHISPER_MODELS, get_available_models
+        from modules.local_stt import AVAILABLE_WHISPER_MODELS, get_available_models
         LOCAL_STT_MODULE_AVAILABLE = True
         actual_models = get_available_models()
         if actual_models:
@@ -38,12 +59,6 @@ except ImportError:
     LOCAL_STT_MODULE_AVAILABLE = False
     AVAILABLE_WHISPER_MODELS = ["tiny", "base", "small", "medium", "large", "turbo"]
 
-try:
-    from modules.openai_whisper_client import OpenAIWhisperClient
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
 from PIL import Image
 
 # Globalne ustawienia wyglądu
@@ -71,6 +86,43 @@ PREFERRED_MODEL_CONFIG = 'preferred_model'
 PREFERRED_LANGUAGE_HINT_CONFIG = 'preferred_language_hint'
 PREFERRED_OUTPUT_FORMAT_CONFIG = 'preferred_output_format'
 APPEARANCE_MODE_CONFIG = 'appearance_mode'
+LOCAL_PRECISION_CONFIG = 'local_precision'
+INTRA_OP_THREADS_CONFIG = 'intra_op_threads'
+INTER_OP_THREADS_CONFIG = 'inter_op_threads'
+CPU_AFFINITY_CONFIG = 'cpu_affinity'
+TWO_PASS_CONFIG = 'two_pass_draft'
+JOB_TIMEOUT_CONFIG = 'job_timeout_minutes'
+HEDGE_PERCENTILE_CONFIG = 'hedge_percentile'
+ADDITIONAL_OUTPUTS_CONFIG = 'additional_output_formats'
+MULTITRACK_ENABLED_CONFIG = 'multitrack_enabled'
+MULTITRACK_TRACKS_CONFIG = 'multitrack_tracks'
+DECODING_PRESET_CONFIG = 'decoding_preset'
+CUSTOM_DECODING_CONFIG = 'custom_decoding'
+VOCABULARY_ENABLED_CONFIG = 'vocabulary_enabled'
+INCREMENTAL_CONFIG = 'incremental_transcription'
+RESOURCE_GOVERNOR_CONFIG = 'resource_governor'
+FEATURE_CACHE_CONFIG = 'feature_cache'
+
+# Strumieniowanie segmentów do okna transkrypcji: co ile ms wątek GUI pobiera nowe segmenty,
+# ile najwyżej wstawia za jednym razem i od ilu segmentów przechodzi na widok wirtualny
+SEGMENT_FLUSH_INTERVAL_MS = 150
+MAX_SEGMENTS_PER_FLUSH = 200
+VIRTUAL_VIEW_SEGMENT_THRESHOLD = 1500
+
+# Po ilu ms od startu lub końca zadania odświeżany jest status transkrypcji w tle (wstrzymanie/wznowienie)
+BATCH_STATUS_REFRESH_MS = 500
+
+# Limit czasu pojedynczego zadania transkrypcji (etykieta -> minuty, 0 = bez limitu)
+JOB_TIMEOUT_OPTIONS = {"Bez limitu": 0, "5 min": 5, "15 min": 15, "30 min": 30, "60 min": 60}
+
+# Tryb wyścigu: lokalny przebieg startuje, gdy API nie odpowie w tym percentylu swoich czasów odpowiedzi
+HEDGE_PERCENTILE_OPTIONS = {"p50": 50, "p75": 75, "p90": 90, "p95": 95, "p99": 99}
+
+# Modele używane do szybkiego szkicu w trybie dwuprzebiegowym (w kolejności preferencji)
+DRAFT_MODELS = ["tiny", "base"]
+
+# Tryby precyzji transkrypcji lokalnej (etykieta w interfejsie -> wartość dla local_stt)
+PRECISION_OPTIONS = {"Pełna (fp32)": "fp32", "Kwantyzowana (int8)": "int8"}
 
 for directory in [ASSETS_DIR, RECORDINGS_DIR]:
     os.makedirs(directory, exist_ok=True)
@@ -95,14 +147,43 @@ class DictAItorApp:
         self.openai_key_value = self.config.get(OPENAI_KEY_CONFIG, '')
         self.recorder = AudioRecorder()
         
-        if OPENAI_AVAILABLE:
-            self.openai_client = OpenAIWhisperClient(api_key=self.openai_key_value)
-            self.openai_client.debug_mode = True
+        # Silniki transkrypcji z rejestru (nowe silniki pojawiają się tu automatycznie)
+        self.engines = {engine_cls.name: engine_cls() for engine_cls in get_registered_engines()}
+        for engine in self.engines.values():
+            engine.configure(api_key=self.openai_key_value, hedge_percentile=self.config.get(HEDGE_PERCENTILE_CONFIG, 90))
         
         self.is_recording_app_state = False
         self.selected_whisper_model = ctk.StringVar()
         self.selected_language_hint = ctk.StringVar(value=self.config.get(PREFERRED_LANGUAGE_HINT_CONFIG, ''))
         self.selected_output_format = ctk.StringVar(value=self.config.get(PREFERRED_OUTPUT_FORMAT_CONFIG, "Oryginalny (Transkrypcja)"))
+        self.selected_precision = self.config.get(LOCAL_PRECISION_CONFIG, "fp32")
+        self.two_pass_enabled = ctk.BooleanVar(value=self.config.get(TWO_PASS_CONFIG, False))
+        # Preset dekodowania (szybkość kontra dokładność) i własne ustawienia dla presetu "custom"
+        self.selected_decoding_preset = self.config.get(DECODING_PRESET_CONFIG, DEFAULT_PRESET)
+        self.custom_decoding: Dict[str, Any] = self.config.get(CUSTOM_DECODING_CONFIG, {})
+        # Słownik poprawek: zamiany terminów w wyniku i podpowiedź dla modelu
+        self.vocabulary_enabled = ctk.BooleanVar(value=self.config.get(VOCABULARY_ENABLED_CONFIG, True))
+        # Po dopisaniu lub obcięciu nagrania dekodowane są tylko zmienione fragmenty
+        self.incremental_enabled = ctk.BooleanVar(value=self.config.get(INCREMENTAL_CONFIG, True))
+        # Transkrypcja plików w tle ustępuje dyktowaniu (niższy priorytet, mniej wątków, pauza)
+        self.resource_governor_enabled = ctk.BooleanVar(value=self.config.get(RESOURCE_GOVERNOR_CONFIG, True))
+        self.resource_governor = ResourceGovernor(enabled=self.resource_governor_enabled.get())
+        # Zdekodowane audio i spektrogramy zapisywane na dysku dla ponownych transkrypcji tego samego pliku
+        self.feature_cache_enabled = ctk.BooleanVar(value=self.config.get(FEATURE_CACHE_CONFIG, True))
+        set_feature_cache_enabled(self.feature_cache_enabled.get())
+        # Kolejka plików transkrybowanych w tle i token bieżącego z nich
+        self._batch_files: List[str] = []
+        self._batch_lock = threading.Lock()
+        self._batch_running = False
+        self._batch_token: Optional[CancellationToken] = None
+        self._batch_progress: Dict[str, Any] = {}
+        # Formaty liczone razem z głównym (np. transkrypcja + tłumaczenie) - jeden przebieg kodera
+        self.additional_output_formats: List[str] = self.config.get(ADDITIONAL_OUTPUTS_CONFIG, [])
+        # Nagrywanie rozmowy: osobna ścieżka (urządzenie lub kanał) na mówcę
+        self.multitrack_enabled = ctk.BooleanVar(value=self.config.get(MULTITRACK_ENABLED_CONFIG, False))
+        self.multitrack_tracks: List[Dict[str, Any]] = self.config.get(MULTITRACK_TRACKS_CONFIG, [])
+        self.multitrack_recorder: Optional[MultiTrackRecorder] = None
+        self.last_track_files: Optional[Dict[str, str]] = None
         
         preferred_model = self.config.get(PREFERRED_MODEL_CONFIG, '')
         if preferred_model and preferred_model in AVAILABLE_WHISPER_MODELS:
@@ -113,17 +194,27 @@ class DictAItorApp:
             self.selected_whisper_model.set(AVAILABLE_WHISPER_MODELS[1] if len(AVAILABLE_WHISPER_MODELS) > 1 else AVAILABLE_WHISPER_MODELS[0])
 
         preferred_mode = self.config.get(PREFERRED_MODE_CONFIG, '')
-        if preferred_mode == 'local' and WHISPER_AVAILABLE:
-            self.transcription_mode = ctk.StringVar(value="local")
-        elif preferred_mode == 'openai' and OPENAI_AVAILABLE:
-            self.transcription_mode = ctk.StringVar(value="openai")
+        available_engines = [name for name, engine in self.engines.items() if engine.is_available()]
+        if preferred_mode in available_engines:
+            self.transcription_mode = ctk.StringVar(value=preferred_mode)
         else:
-            self.transcription_mode = ctk.StringVar(value="local" if WHISPER_AVAILABLE else "openai")
+            self.transcription_mode = ctk.StringVar(value=available_engines[0] if available_engines else "local")
         
         self.last_recorded_file = None
         self.pulse_animation_id = None
         self.logo_image = None
 
+        # Segmenty dekodowane w wątku roboczym czekają tu na wstawienie przez wątek GUI
+        self._pending_segments: List[Dict[str, Any]] = []
+        self._pending_segments_lock = threading.Lock()
+        self._streamed_segment_count = 0
+        self._segment_flush_id = None
+        self._progress_determinate = False
+        # Token anulowania bieżącego zadania transkrypcji (None, gdy nic nie jest transkrybowane)
+        self._current_job: Optional[CancellationToken] = None
+        # Ostatni wynik z segmentami (plik, język, zadanie) - do selektywnej poprawy podejrzanych fragmentów
+        self._last_result: Optional[Dict[str, Any]] = None
+
         self._create_widgets()
         self._load_initial_config()
         
@@ -132,17 +223,23 @@ class DictAItorApp:
         
         # ### KLUCZOWA POPRAWKA: Wywołanie aktualizacji po stworzeniu widgetów ###
         self.root.after(50, self._update_transcription_mode)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # Pomiar opóźnień pętli zdarzeń - raport w zakładce Ustawienia
+        self.stall_watchdog = StallWatchdog(self.root)
+        self.stall_watchdog.start()
 
     def _setup_output_formats(self):
         self.output_formats = {
             "Oryginalny (Transkrypcja)": {'task': 'transcribe', 'language': None},
             "Angielski (Tłumaczenie)": {'task': 'translate', 'language': None},
-            "Polski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'pl'},
-            "Niemiecki (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'de'},
-            "Francuski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'fr'},
-            "Hiszpański (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'es'},
-            "Włoski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'it'},
-            "Rosyjski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': 'ru'}
+            # Transkrypcja w języku nagrania, a tekst w innym języku tłumaczy lokalny model (text_translation)
+            "Polski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'pl'},
+            "Niemiecki (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'de'},
+            "Francuski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'fr'},
+            "Hiszpański (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'es'},
+            "Włoski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'it'},
+            "Rosyjski (Tłumaczenie/Transkrypcja)": {'task': 'transcribe', 'language': None, 'translate_to': 'ru'}
         }
 
     def _load_initial_config(self) -> None:
@@ -161,7 +258,7 @@ class DictAItorApp:
         tab_transcription.grid_columnconfigure(0, weight=1)
         tab_transcription.grid_rowconfigure(5, weight=1)
         tab_settings.grid_columnconfigure(0, weight=1)
-        tab_settings.grid_rowconfigure(2, weight=1)
+        tab_settings.grid_rowconfigure(4, weight=1)
 
         self._create_transcription_tab_widgets(tab_transcription)
         self._create_settings_tab_widgets(tab_settings)
@@ -177,7 +274,9 @@ class DictAItorApp:
     def _create_settings_tab_widgets(self, parent_tab: ctk.CTkFrame):
         self._create_api_section(parent_tab, row=0)
         self._create_appearance_section(parent_tab, row=1)
-        self._create_footer_section(parent_tab, row=2)
+        self._create_performance_section(parent_tab, row=2)
+        self._create_diagnostics_section(parent_tab, row=3)
+        self._create_footer_section(parent_tab, row=4)
 
     def _create_header(self, parent: ctk.CTkFrame, row: int):
         header_frame = ctk.CTkFrame(parent, fg_color="transparent")
@@ -214,6 +313,11 @@ class DictAItorApp:
         ctk.CTkLabel(self.whisper_models_container, text="Model Whisper:").pack(side="left")
         self.whisper_model_combobox = ctk.CTkComboBox(self.whisper_models_container, variable=self.selected_whisper_model, values=AVAILABLE_WHISPER_MODELS, state="readonly")
         self.whisper_model_combobox.pack(side="left", padx=10, fill="x", expand=True)
+        ctk.CTkLabel(self.whisper_models_container, text="Dekodowanie:").pack(side="left")
+        self.decoding_preset_combobox = ctk.CTkComboBox(self.whisper_models_container, state="readonly", width=190, command=self._on_decoding_preset_selected)
+        self.decoding_preset_combobox.pack(side="left", padx=(10, 0))
+        self._refresh_decoding_presets()
+        self.selected_whisper_model.trace_add("write", lambda *args: self._refresh_decoding_presets())
 
         ctk.CTkLabel(model_frame_container, text="Język wejściowy (wskazówka):").grid(row=2, column=0, padx=(15, 5), pady=5, sticky="w")
         self.language_hint_combobox = ctk.CTkComboBox(model_frame_container, state="readonly", command=self._on_language_hint_selected)
@@ -231,6 +335,25 @@ class DictAItorApp:
         self.output_format_combobox = ctk.CTkComboBox(model_frame_container, variable=self.selected_output_format, values=list(self.output_formats.keys()), state="readonly", command=self._on_output_format_selected)
         self.output_format_combobox.grid(row=3, column=1, sticky="ew", padx=5, pady=5)
 
+        self.two_pass_checkbox = ctk.CTkCheckBox(model_frame_container, text="Szybki szkic (wstępny wynik z małego modelu, potem dokładny)", variable=self.two_pass_enabled, command=lambda: self._save_settings({TWO_PASS_CONFIG: self.two_pass_enabled.get()}))
+        self.two_pass_checkbox.grid(row=5, column=0, columnspan=2, padx=15, pady=(5, 0), sticky="w")
+
+        multitrack_frame = ctk.CTkFrame(model_frame_container, fg_color="transparent")
+        multitrack_frame.grid(row=6, column=0, columnspan=2, padx=15, pady=(5, 5), sticky="ew")
+        self.multitrack_checkbox = ctk.CTkCheckBox(multitrack_frame, text=self._multitrack_summary(), variable=self.multitrack_enabled, command=lambda: self._save_settings({MULTITRACK_ENABLED_CONFIG: self.multitrack_enabled.get()}))
+        self.multitrack_checkbox.pack(side="left")
+        ctk.CTkButton(multitrack_frame, text="Ścieżki...", width=80, corner_radius=100, command=self._choose_multitrack_tracks).pack(side="left", padx=10)
+
+        vocabulary_frame = ctk.CTkFrame(model_frame_container, fg_color="transparent")
+        vocabulary_frame.grid(row=7, column=0, columnspan=2, padx=15, pady=(0, 10), sticky="ew")
+        self.vocabulary_checkbox = ctk.CTkCheckBox(vocabulary_frame, text=self._vocabulary_summary(), variable=self.vocabulary_enabled, command=lambda: self._save_settings({VOCABULARY_ENABLED_CONFIG: self.vocabulary_enabled.get()}))
+        self.vocabulary_checkbox.pack(side="left")
+        ctk.CTkButton(vocabulary_frame, text="Edytuj...", width=80, corner_radius=100, command=self._edit_vocabulary).pack(side="left", padx=10)
+
+        ctk.CTkLabel(model_frame_container, text="Dodatkowe wyjścia:").grid(row=4, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.additional_outputs_button = ctk.CTkButton(model_frame_container, text=self._additional_outputs_summary(), fg_color="transparent", border_width=1, text_color=("gray10", "gray90"), anchor="w", command=self._choose_additional_outputs)
+        self.additional_outputs_button.grid(row=4, column=1, sticky="ew", padx=5, pady=5)
+
     def _create_api_section(self, parent, row):
         api_frame_container = ctk.CTkFrame(parent)
         api_frame_container.grid(row=row, column=0, sticky="ew", pady=10, padx=10)
@@ -241,6 +364,16 @@ class DictAItorApp:
         self.openai_api_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
         save_key_button = ctk.CTkButton(api_frame_container, text="Zapisz Klucz", command=self.save_openai_key_action, corner_radius=100)
         save_key_button.grid(row=1, column=2, padx=(5, 15), pady=5)
+        self.api_usage_label = ctk.CTkLabel(api_frame_container, text="", justify="left", anchor="w", font=ctk.CTkFont(size=11))
+        self.api_usage_label.grid(row=2, column=0, columnspan=3, padx=15, pady=(0, 10), sticky="w")
+        self._update_api_usage_label()
+
+    def _update_api_usage_label(self):
+        if not self.openai_key_value:
+            self.api_usage_label.configure(text="")
+            return
+        usage = get_usage(self.openai_key_value)
+        self.api_usage_label.configure(text=f"Wysłano dziś: {usage['minutes']:.1f} min audio w {usage['requests']} żądaniach")
 
     def _create_appearance_section(self, parent, row):
         appearance_frame = ctk.CTkFrame(parent)
@@ -253,6 +386,136 @@ class DictAItorApp:
         self.theme_switch.pack(side="left", padx=10)
         if ctk.get_appearance_mode().lower() == "dark": self.theme_switch.select()
 
+    def _create_performance_section(self, parent, row):
+        performance_frame = ctk.CTkFrame(parent)
+        performance_frame.grid(row=row, column=0, sticky="ew", pady=10, padx=10)
+        performance_frame.grid_columnconfigure(1, weight=1)
+        self.performance_frame = performance_frame
+        ctk.CTkLabel(performance_frame, text="Wydajność Transkrypcji Lokalnej", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, columnspan=3, padx=10, pady=(5,0), sticky="w")
+        ctk.CTkLabel(performance_frame, text="Precyzja obliczeń:").grid(row=1, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.precision_combobox = ctk.CTkComboBox(performance_frame, values=list(PRECISION_OPTIONS.keys()), state="readonly", command=self._on_precision_selected)
+        self.precision_combobox.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        precision_display = {value: name for name, value in PRECISION_OPTIONS.items()}
+        self.precision_combobox.set(precision_display.get(self.selected_precision, "Pełna (fp32)"))
+        self.benchmark_button = ctk.CTkButton(performance_frame, text="Zmierz", command=self.run_precision_benchmark_action, width=100, corner_radius=100)
+        self.benchmark_button.grid(row=1, column=2, padx=(5, 15), pady=5)
+        self.benchmark_result_label = ctk.CTkLabel(performance_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=11))
+        self.benchmark_result_label.grid(row=2, column=0, columnspan=3, padx=15, pady=(0, 10), sticky="w")
+
+        thread_choices = [AUTO_THREADS] + [str(count) for count in candidate_thread_counts()]
+        ctk.CTkLabel(performance_frame, text="Wątki obliczeń (intra-op):").grid(row=3, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.intra_threads_combobox = ctk.CTkComboBox(performance_frame, values=thread_choices, state="readonly", command=lambda choice: self._save_settings({INTRA_OP_THREADS_CONFIG: choice}))
+        self.intra_threads_combobox.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+        self.intra_threads_combobox.set(str(self.config.get(INTRA_OP_THREADS_CONFIG, AUTO_THREADS)))
+        self.autotune_button = ctk.CTkButton(performance_frame, text="Dostrój", command=self.run_thread_autotune_action, width=100, corner_radius=100)
+        self.autotune_button.grid(row=3, column=2, padx=(5, 15), pady=5)
+        ctk.CTkLabel(performance_frame, text="Pula inter-op:").grid(row=4, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.inter_threads_combobox = ctk.CTkComboBox(performance_frame, values=[AUTO_THREADS, "1", "2", "4"], state="readonly", command=self._on_inter_op_threads_selected)
+        self.inter_threads_combobox.grid(row=4, column=1, padx=5, pady=5, sticky="ew")
+        self.inter_threads_combobox.set(str(self.config.get(INTER_OP_THREADS_CONFIG, AUTO_THREADS)))
+        ctk.CTkLabel(performance_frame, text="Rdzenie CPU (np. 0-3,6):").grid(row=5, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.cpu_affinity_entry = ctk.CTkEntry(performance_frame, placeholder_text="wszystkie")
+        self.cpu_affinity_entry.grid(row=5, column=1, padx=5, pady=5, sticky="ew")
+        if self.config.get(CPU_AFFINITY_CONFIG):
+            self.cpu_affinity_entry.insert(0, self.config[CPU_AFFINITY_CONFIG])
+        self.cpu_affinity_entry.bind("<Return>", self._on_cpu_affinity_changed)
+        self.cpu_affinity_entry.bind("<FocusOut>", self._on_cpu_affinity_changed)
+        self.thread_tuning_label = ctk.CTkLabel(performance_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=11))
+        self.thread_tuning_label.grid(row=6, column=0, columnspan=3, padx=15, pady=(0, 10), sticky="w")
+        ctk.CTkLabel(performance_frame, text="Limit czasu zadania:").grid(row=7, column=0, padx=(15, 5), pady=(5, 10), sticky="w")
+        self.job_timeout_combobox = ctk.CTkComboBox(performance_frame, values=list(JOB_TIMEOUT_OPTIONS.keys()), state="readonly", command=lambda choice: self._save_settings({JOB_TIMEOUT_CONFIG: JOB_TIMEOUT_OPTIONS[choice]}))
+        self.job_timeout_combobox.grid(row=7, column=1, padx=5, pady=(5, 10), sticky="ew")
+        timeout_display = {minutes: name for name, minutes in JOB_TIMEOUT_OPTIONS.items()}
+        self.job_timeout_combobox.set(timeout_display.get(self.config.get(JOB_TIMEOUT_CONFIG, 0), "Bez limitu"))
+        hedged_engine = self.engines.get("hedged")
+        if hedged_engine is not None:
+            ctk.CTkLabel(performance_frame, text="Wyścig API/lokalny od:").grid(row=8, column=0, padx=(15, 5), pady=(0, 10), sticky="w")
+            self.hedge_percentile_combobox = ctk.CTkComboBox(performance_frame, values=list(HEDGE_PERCENTILE_OPTIONS.keys()), state="readonly", command=self._on_hedge_percentile_selected)
+            self.hedge_percentile_combobox.grid(row=8, column=1, padx=5, pady=(0, 10), sticky="ew")
+            self.hedge_percentile_combobox.set(f"p{self.config.get(HEDGE_PERCENTILE_CONFIG, 90)}")
+            ctk.CTkButton(performance_frame, text="Statystyki", width=100, corner_radius=100,
+                          command=lambda: self._show_report_window("wyścig API/lokalny", hedged_engine.describe_stats())).grid(row=8, column=2, padx=(5, 15), pady=(0, 10))
+
+        ctk.CTkLabel(performance_frame, text="Presety dekodowania:").grid(row=9, column=0, padx=(15, 5), pady=5, sticky="w")
+        self.decoding_benchmark_button = ctk.CTkButton(performance_frame, text="Zmierz", command=self.run_decoding_benchmark_action, width=100, corner_radius=100)
+        self.decoding_benchmark_button.grid(row=9, column=2, padx=(5, 15), pady=5)
+        self.decoding_benchmark_label = ctk.CTkLabel(performance_frame, text="", justify="left", anchor="w", font=ctk.CTkFont(size=11))
+        self.decoding_benchmark_label.grid(row=10, column=0, columnspan=3, padx=15, pady=(0, 10), sticky="w")
+        ctk.CTkCheckBox(performance_frame, text="Po dopisaniu lub obcięciu nagrania transkrybuj tylko zmienione fragmenty",
+                        variable=self.incremental_enabled, command=lambda: self._save_settings({INCREMENTAL_CONFIG: self.incremental_enabled.get()})
+                        ).grid(row=11, column=0, columnspan=3, padx=15, pady=(0, 10), sticky="w")
+        ctk.CTkCheckBox(performance_frame, text="Transkrypcja w tle ustępuje dyktowaniu",
+                        variable=self.resource_governor_enabled, command=self._on_resource_governor_toggled
+                        ).grid(row=12, column=0, columnspan=2, padx=15, pady=(0, 10), sticky="w")
+        ctk.CTkButton(performance_frame, text="Opóźnienia", width=100, corner_radius=100,
+                      command=lambda: self._show_report_window("zadania w tle", self.resource_governor.get_report())
+                      ).grid(row=12, column=2, padx=(5, 15), pady=(0, 10))
+        ctk.CTkCheckBox(performance_frame, text="Zapamiętuj zdekodowane audio do ponownych transkrypcji",
+                        variable=self.feature_cache_enabled, command=self._on_feature_cache_toggled
+                        ).grid(row=13, column=0, columnspan=2, padx=15, pady=(0, 10), sticky="w")
+        self.clear_feature_cache_button = ctk.CTkButton(performance_frame, text="Wyczyść", width=100, corner_radius=100,
+                                                        command=self.clear_feature_cache_action)
+        self.clear_feature_cache_button.grid(row=13, column=2, padx=(5, 15), pady=(0, 10))
+
+        if not LOCAL_STT_MODULE_AVAILABLE:
+            self.precision_combobox.configure(state="disabled")
+            self.benchmark_button.configure(state="disabled")
+            self.autotune_button.configure(state="disabled")
+            self.decoding_benchmark_button.configure(state="disabled")
+        self._show_precision_benchmark()
+        self.selected_whisper_model.trace_add("write", lambda *args: self._show_precision_benchmark())
+
+    def _create_diagnostics_section(self, parent, row):
+        diagnostics_frame = ctk.CTkFrame(parent)
+        diagnostics_frame.grid(row=row, column=0, sticky="ew", pady=10, padx=10)
+        diagnostics_frame.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(diagnostics_frame, text="Diagnostyka", font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, columnspan=3, padx=10, pady=(5,0), sticky="w")
+        ctk.CTkLabel(diagnostics_frame, text="Zacięcia interfejsu:").grid(row=1, column=0, padx=(15, 5), pady=(5, 10), sticky="w")
+        ctk.CTkButton(diagnostics_frame, text="Pokaż raport", command=self.show_stall_report_action, width=100, corner_radius=100).grid(row=1, column=2, padx=(5, 15), pady=(5, 10))
+        routing_engine = self.engines.get("auto")
+        if routing_engine is not None:
+            ctk.CTkLabel(diagnostics_frame, text="Tryb automatyczny:").grid(row=2, column=0, padx=(15, 5), pady=(0, 10), sticky="w")
+            ctk.CTkButton(diagnostics_frame, text="Pokaż zasady", width=100, corner_radius=100,
+                          command=lambda: self._show_report_window("tryb automatyczny", routing_engine.describe_policy())).grid(row=2, column=2, padx=(5, 15), pady=(0, 10))
+
+    def show_stall_report_action(self):
+        self._show_report_window("zacięcia interfejsu", self.stall_watchdog.get_report())
+
+    def _show_report_window(self, title: str, text: str):
+        report_window = ctk.CTkToplevel(self.root)
+        report_window.title(f"{APP_NAME} - {title}")
+        report_window.geometry("640x420")
+        report_window.transient(self.root)
+        report_text = ctk.CTkTextbox(report_window, wrap="none", font=ctk.CTkFont(family="Consolas", size=12))
+        report_text.pack(fill="both", expand=True, padx=10, pady=10)
+        report_text.insert("1.0", text)
+        report_text.configure(state="disabled")
+
+    def _on_resource_governor_toggled(self):
+        self._save_settings({RESOURCE_GOVERNOR_CONFIG: self.resource_governor_enabled.get()})
+        # Dotyczy nowych plików w tle; bieżący plik jest od razu wznawiany lub wstrzymywany
+        self.resource_governor.set_enabled(self.resource_governor_enabled.get())
+
+    def _on_feature_cache_toggled(self):
+        self._save_settings({FEATURE_CACHE_CONFIG: self.feature_cache_enabled.get()})
+        set_feature_cache_enabled(self.feature_cache_enabled.get())
+
+    def clear_feature_cache_action(self):
+        # Czyszczenie działa także przy wyłączonej pamięci podręcznej - usuwa to, co zostało zapisane wcześniej
+        self.clear_feature_cache_button.configure(state="disabled")
+        def clear_thread():
+            freed = FeatureCache().clear()
+            def finish():
+                self.clear_feature_cache_button.configure(state="normal")
+                self._update_status(f"Wyczyszczono pamięć podręczną cech (zwolniono {freed / (1024 * 1024):.0f} MB)")
+            self._update_gui(finish)
+        self._run_in_thread(clear_thread)
+
+    def _on_hedge_percentile_selected(self, choice: str):
+        self._save_settings({HEDGE_PERCENTILE_CONFIG: HEDGE_PERCENTILE_OPTIONS[choice]})
+        for engine in self.engines.values():
+            engine.configure(hedge_percentile=HEDGE_PERCENTILE_OPTIONS[choice])
+
     def _create_footer_section(self, parent, row):
         footer_frame = ctk.CTkFrame(parent, fg_color="transparent")
         footer_frame.grid(row=row, column=0, sticky="sew", pady=(10, 5), padx=10)
@@ -268,13 +531,10 @@ class DictAItorApp:
         ctk.CTkLabel(mode_frame_container, text="Tryb Transkrypcji", font=ctk.CTkFont(weight="bold")).pack(anchor="w", padx=10, pady=(5,0))
         mode_frame = ctk.CTkFrame(mode_frame_container, fg_color="transparent")
         mode_frame.pack(fill="x", padx=10, pady=(0,10))
-        whisper_radio = ctk.CTkRadioButton(mode_frame, text="Lokalna (Whisper)", variable=self.transcription_mode, value="local", command=self._update_transcription_mode)
-        whisper_radio.pack(side="left", padx=(0, 20))
-        if not WHISPER_AVAILABLE: whisper_radio.configure(state="disabled")
-        if OPENAI_AVAILABLE:
-            openai_radio = ctk.CTkRadioButton(mode_frame, text="Online (OpenAI API)", variable=self.transcription_mode, value="openai", command=self._update_transcription_mode)
-            openai_radio.pack(side="left", padx=(0, 10))
-            if not OPENAI_AVAILABLE: openai_radio.configure(state="disabled")
+        for name, engine in self.engines.items():
+            engine_radio = ctk.CTkRadioButton(mode_frame, text=engine.display_name, variable=self.transcription_mode, value=name, command=self._update_transcription_mode)
+            engine_radio.pack(side="left", padx=(0, 20))
+            if not engine.is_available(): engine_radio.configure(state="disabled")
 
     def _create_action_section(self, parent, row):
         action_frame_container = ctk.CTkFrame(parent)
@@ -286,6 +546,10 @@ class DictAItorApp:
         self.record_button.pack(side="left", padx=5, pady=5)
         self.transcribe_button = ctk.CTkButton(action_frame, text="Transkrybuj", command=self.transcribe_action, state="disabled", corner_radius=100)
         self.transcribe_button.pack(side="left", padx=5, pady=5)
+        # Przycisk anulowania jest widoczny tylko w trakcie transkrypcji
+        self.cancel_button = ctk.CTkButton(action_frame, text="Anuluj", command=self.cancel_transcription_action, width=80, fg_color="#a04040", hover_color="#c05050", corner_radius=100)
+        # Widoczny tylko, gdy ostatnia transkrypcja ma podejrzane segmenty
+        self.repair_button = ctk.CTkButton(action_frame, text="Popraw wątpliwe", command=self.repair_segments_action, width=120, corner_radius=100)
         self.status_frame = ctk.CTkFrame(action_frame, fg_color="transparent", border_width=0)
         self.status_frame.pack(side="left", padx=10, pady=0, fill="x", expand=True)
         self.recording_indicator_label = ctk.CTkLabel(self.status_frame, text="", width=10)
@@ -307,6 +571,14 @@ class DictAItorApp:
         browse_button.pack(side="right", padx=(5,0))
         folder_button = ctk.CTkButton(file_frame, text="Pokaż folder", command=self.open_recordings_folder, width=120, corner_radius=100)
         folder_button.pack(side="right", padx=5)
+        batch_button = ctk.CTkButton(file_frame, text="Pliki w tle...", command=self.transcribe_batch_action, width=110, corner_radius=100)
+        batch_button.pack(side="right", padx=5)
+        # Widoczny tylko, gdy w tle transkrybowane są pliki
+        self.batch_frame = ctk.CTkFrame(file_frame_container, fg_color="transparent")
+        self.batch_status_label = ctk.CTkLabel(self.batch_frame, text="", font=ctk.CTkFont(size=11), anchor="w")
+        self.batch_status_label.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        ctk.CTkButton(self.batch_frame, text="Zatrzymaj", command=self.stop_batch_action, width=80,
+                      fg_color="#a04040", hover_color="#c05050", corner_radius=100).pack(side="right")
 
     def _create_transcription_section(self, parent, row):
         result_frame_container = ctk.CTkFrame(parent)
@@ -317,6 +589,8 @@ class DictAItorApp:
         self.transcription_text = ctk.CTkTextbox(result_frame_container, wrap="word", font=("Arial", 12), state="disabled")
         self.transcription_text.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0,10))
         self.copy_confirm_label = ctk.CTkLabel(self.transcription_text, text="✓ Skopiowano do schowka", corner_radius=10, fg_color=("#DDDDDD", "#333333"))
+        # Widok dla bardzo długich transkrypcji - pokazywany zamiast pola tekstowego
+        self.virtual_transcript_view = VirtualTranscriptView(result_frame_container, font=("Arial", 12))
 
     # ### Metody Logiki Biznesowej (Poprawione i Kompletne) ###
 
@@ -327,35 +601,719 @@ class DictAItorApp:
         
     def _on_output_format_selected(self, choice: str): 
         self._save_settings({PREFERRED_OUTPUT_FORMAT_CONFIG: choice})
+        self.additional_outputs_button.configure(text=self._additional_outputs_summary())
 
-    def _transcribe_local_thread(self):
-        format_key = self.selected_output_format.get()
+    def _get_additional_output_formats(self) -> List[str]:
+        primary = self.selected_output_format.get()
+        return [key for key in self.additional_output_formats if key in self.output_formats and key != primary]
+
+    def _additional_outputs_summary(self) -> str:
+        formats = self._get_additional_output_formats()
+        if not formats:
+            return "Brak"
+        return formats[0] if len(formats) == 1 else f"{len(formats)} dodatkowe formaty"
+
+    def _choose_additional_outputs(self):
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title(f"{APP_NAME} - dodatkowe wyjścia")
+        dialog.transient(self.root)
+        ctk.CTkLabel(dialog, text="Formaty liczone razem z głównym (lokalnie: jeden przebieg kodera, koszt tylko dekodera):",
+                     wraplength=380, justify="left").pack(padx=15, pady=(10, 5), anchor="w")
+        selected = set(self._get_additional_output_formats())
+        variables = {}
+        for key in self.output_formats:
+            if key == self.selected_output_format.get():
+                continue
+            variables[key] = ctk.BooleanVar(value=key in selected)
+            ctk.CTkCheckBox(dialog, text=key, variable=variables[key]).pack(padx=15, pady=2, anchor="w")
+
+        def save():
+            self.additional_output_formats = [key for key, variable in variables.items() if variable.get()]
+            self._save_settings({ADDITIONAL_OUTPUTS_CONFIG: self.additional_output_formats})
+            self.additional_outputs_button.configure(text=self._additional_outputs_summary())
+            dialog.destroy()
+        ctk.CTkButton(dialog, text="Zapisz", command=save).pack(padx=15, pady=10)
+
+    def _refresh_decoding_presets(self):
+        """Etykiety presetów z RTF zmierzonym dla wybranego modelu i precyzji na tym komputerze."""
+        measured = get_benchmark_result("decoding_presets", benchmark_key(self.selected_whisper_model.get(), self.selected_precision))
+        choices = preset_choices(measured, self.custom_decoding)
+        self._decoding_preset_choices = dict(choices)
+        self.decoding_preset_combobox.configure(values=[label for label, _ in choices])
+        preset_labels = {preset: label for label, preset in choices}
+        self.decoding_preset_combobox.set(preset_labels.get(self.selected_decoding_preset, preset_labels[DEFAULT_PRESET]))
+
+    def _on_decoding_preset_selected(self, choice: str):
+        preset = self._decoding_preset_choices.get(choice, DEFAULT_PRESET)
+        if preset == CUSTOM_PRESET:
+            self._edit_custom_decoding()
+            return
+        self.selected_decoding_preset = preset
+        self._save_settings({DECODING_PRESET_CONFIG: preset})
+
+    def _edit_custom_decoding(self):
+        settings = normalize_settings(self.custom_decoding)
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title(f"{APP_NAME} - własne ustawienia dekodowania")
+        dialog.transient(self.root)
+        ctk.CTkLabel(dialog, text="Większa wiązka i liczba próbek to zwykle lepsza dokładność kosztem czasu (puste lub 1 = dekodowanie zachłanne):",
+                     wraplength=380, justify="left").grid(row=0, column=0, columnspan=2, padx=15, pady=(10, 5), sticky="w")
+        entries = {}
+        for row, (key, label) in enumerate((("beam_size", "Szerokość wiązki (beam_size):"), ("best_of", "Liczba próbek (best_of):"),
+                                            ("no_speech_threshold", "Próg ciszy (0-1):")), start=1):
+            ctk.CTkLabel(dialog, text=label).grid(row=row, column=0, padx=(15, 5), pady=2, sticky="w")
+            entries[key] = ctk.CTkEntry(dialog, width=80)
+            entries[key].grid(row=row, column=1, padx=(5, 15), pady=2, sticky="w")
+            if settings[key] is not None:
+                entries[key].insert(0, str(settings[key]))
+        temperature_fallback = ctk.BooleanVar(value=settings["temperature_fallback"])
+        ctk.CTkCheckBox(dialog, text="Ponowne dekodowanie z wyższą temperaturą (pętle, niska pewność)",
+                        variable=temperature_fallback).grid(row=4, column=0, columnspan=2, padx=15, pady=2, sticky="w")
+        condition_on_previous_text = ctk.BooleanVar(value=settings["condition_on_previous_text"])
+        ctk.CTkCheckBox(dialog, text="Poprzedni tekst jako kontekst kolejnego okna",
+                        variable=condition_on_previous_text).grid(row=5, column=0, columnspan=2, padx=15, pady=2, sticky="w")
+
+        def save():
+            self.custom_decoding = normalize_settings({
+                **{key: entry.get().strip() or None for key, entry in entries.items()},
+                "temperature_fallback": temperature_fallback.get(),
+                "condition_on_previous_text": condition_on_previous_text.get(),
+            })
+            self.selected_decoding_preset = CUSTOM_PRESET
+            self._save_settings({CUSTOM_DECODING_CONFIG: self.custom_decoding, DECODING_PRESET_CONFIG: CUSTOM_PRESET})
+            self._update_status(f"Własne dekodowanie: {describe_settings(self.custom_decoding)}")
+            dialog.destroy()
+        ctk.CTkButton(dialog, text="Zapisz", command=save).grid(row=6, column=0, columnspan=2, padx=15, pady=10)
+        # Zamknięcie okna bez zapisu zostawia na liście poprzedni preset
+        dialog.bind("<Destroy>", lambda event: self._refresh_decoding_presets() if event.widget is dialog else None)
+
+    def _get_decoding_settings(self) -> Dict[str, Any]:
+        return get_preset_settings(self.selected_decoding_preset, self.custom_decoding)
+
+    def _vocabulary_summary(self) -> str:
+        rule_count = len(get_vocabulary())
+        return f"Słownik poprawek ({rule_count} reguł)" if rule_count else "Słownik poprawek (pusty)"
+
+    def _edit_vocabulary(self):
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title(f"{APP_NAME} - słownik poprawek")
+        dialog.geometry("560x480")
+        dialog.transient(self.root)
+        dialog.grid_columnconfigure(0, weight=1)
+        dialog.grid_rowconfigure(1, weight=1)
+        ctk.CTkLabel(dialog, text=f"Reguły stosowane do każdego wyniku (plik {VOCABULARY_FILE_PATH}):",
+                     wraplength=520, justify="left").grid(row=0, column=0, padx=15, pady=(10, 5), sticky="w")
+        textbox = ctk.CTkTextbox(dialog, wrap="none", font=ctk.CTkFont(family="Consolas", size=12))
+        textbox.grid(row=1, column=0, padx=15, pady=5, sticky="nsew")
+        textbox.insert("1.0", load_vocabulary_text())
+
+        def save():
+            saved, warnings = save_vocabulary_text(textbox.get("1.0", "end-1c"))
+            if not saved:
+                self._show_message("error", "Błąd Zapisu", f"Nie udało się zapisać słownika do {VOCABULARY_FILE_PATH}.")
+                return
+            self.vocabulary_checkbox.configure(text=self._vocabulary_summary())
+            if warnings:
+                self._show_message("warning", "Słownik Poprawek", "Pominięte lub zdublowane reguły:\n" + "\n".join(warnings[:20]))
+            dialog.destroy()
+        ctk.CTkButton(dialog, text="Zapisz", command=save).grid(row=2, column=0, padx=15, pady=10)
+
+    def _get_vocabulary(self) -> Optional[Vocabulary]:
+        """Słownik poprawek dla bieżącego zadania (None, jeśli wyłączony albo pusty)."""
+        if not self.vocabulary_enabled.get():
+            return None
+        vocabulary = get_vocabulary()
+        return vocabulary if len(vocabulary) else None
+
+    def _multitrack_summary(self) -> str:
+        text = "Nagrywanie rozmowy (osobny mikrofon na mówcę)"
+        return f"{text}: {len(self.multitrack_tracks)} ścieżek" if self.multitrack_tracks else text
+
+    def _choose_multitrack_tracks(self):
+        devices = list_input_devices()
+        if not devices:
+            self._show_message("warning", "Brak Urządzeń", "Nie znaleziono urządzeń wejściowych audio.")
+            return
+        dialog = ctk.CTkToplevel(self.root)
+        dialog.title(f"{APP_NAME} - ścieżki rozmowy")
+        dialog.transient(self.root)
+        ctk.CTkLabel(dialog, text="Zaznacz wejścia (urządzenie / kanał) i podaj nazwę mówcy dla każdej ścieżki:",
+                     wraplength=420, justify="left").grid(row=0, column=0, columnspan=2, padx=15, pady=(10, 5), sticky="w")
+        current = {(track['device'], track['channel']): track['label'] for track in self.multitrack_tracks}
+        rows = []
+        for device in devices:
+            # Więcej niż dwa kanały to zwykle interfejs studyjny - pokazujemy pierwsze cztery
+            for channel in range(min(device['channels'], 4)):
+                key = (device['index'], channel)
+                name = device['name'] if device['channels'] == 1 else f"{device['name']} (kanał {channel + 1})"
+                enabled = ctk.BooleanVar(value=key in current)
+                ctk.CTkCheckBox(dialog, text=name, variable=enabled).grid(row=len(rows) + 1, column=0, padx=15, pady=2, sticky="w")
+                label_entry = ctk.CTkEntry(dialog, placeholder_text=f"Mówca {len(rows) + 1}", width=140)
+                label_entry.grid(row=len(rows) + 1, column=1, padx=(5, 15), pady=2)
+                if key in current:
+                    label_entry.insert(0, current[key])
+                rows.append((key, enabled, label_entry))
+
+        def save():
+            tracks = []
+            for (device, channel), enabled, label_entry in rows:
+                if enabled.get():
+                    tracks.append({'label': label_entry.get().strip() or f"Mówca {len(tracks) + 1}", 'device': device, 'channel': channel})
+            if len({track['label'] for track in tracks}) != len(tracks):
+                self._show_message("warning", "Powtórzone Nazwy", "Każda ścieżka musi mieć inną nazwę mówcy.")
+                return
+            self.multitrack_tracks = tracks
+            self._save_settings({MULTITRACK_TRACKS_CONFIG: tracks})
+            self.multitrack_checkbox.configure(text=self._multitrack_summary())
+            dialog.destroy()
+        ctk.CTkButton(dialog, text="Zapisz", command=save).grid(row=len(rows) + 1, column=0, columnspan=2, padx=15, pady=10)
+
+    def _resolve_output_format(self, format_key: str) -> Dict[str, Optional[str]]:
+        """
+        Zadanie, język i język tłumaczenia tekstu dla formatu wyjściowego (wskazówka języka dotyczy
+        tylko transkrypcji w języku nagrania).
+        """
         format_logic = self.output_formats.get(format_key, {'task': 'transcribe', 'language': None})
-        
         task = format_logic['task']
-        language_target = format_logic['language']
-        
-        language_hint = self.selected_language_hint.get() if task == 'transcribe' and language_target is None else None
+        language_hint = self.selected_language_hint.get() if task == 'transcribe' and format_logic['language'] is None else None
+        return {'task': task, 'language': format_logic['language'] or language_hint or None,
+                'translate_to': format_logic.get('translate_to')}
+
+    def _on_precision_selected(self, choice: str):
+        self.selected_precision = PRECISION_OPTIONS.get(choice, "fp32")
+        self._save_settings({LOCAL_PRECISION_CONFIG: self.selected_precision})
+        self._show_thread_tuning()
+        self._show_decoding_benchmark()
+        self._refresh_decoding_presets()
+
+    def _show_precision_benchmark(self):
+        self._show_thread_tuning()
+        self._show_decoding_benchmark()
+        model_name = self.selected_whisper_model.get()
+        result = get_benchmark_result("precision", model_name)
+        if result:
+            lines = [f"Model '{model_name}', klip {result['clip']} ({result['clip_duration']:.0f} s), {result['date']}:"]
+            for precision, stats in result["modes"].items():
+                speedup = f", {stats['speedup']:.1f}x" if stats.get("speedup") else ""
+                lines.append(f"  {precision}: RTF {stats['rtf']:.2f}{speedup}, WER względem fp32 {stats['wer'] * 100:.1f}%")
+        else:
+            lines = [f"Brak pomiarów dla modelu '{model_name}'. Kliknij \"Zmierz\", aby porównać tryby."]
+        load_times = get_load_times(model_name)
+        if load_times:
+            load_parts = [f"{method} {seconds:.2f} s" for method, seconds in (("pickle", load_times.get("pickle")), ("mmap", load_times.get("mmap"))) if seconds is not None]
+            lines.append("Ładowanie modelu: " + " → ".join(load_parts))
+        self.benchmark_result_label.configure(text="\n".join(lines))
+
+    def _get_thread_settings(self) -> Dict[str, Any]:
+        return {
+            INTRA_OP_THREADS_CONFIG: self.config.get(INTRA_OP_THREADS_CONFIG, AUTO_THREADS),
+            INTER_OP_THREADS_CONFIG: self.config.get(INTER_OP_THREADS_CONFIG, AUTO_THREADS),
+            CPU_AFFINITY_CONFIG: self.config.get(CPU_AFFINITY_CONFIG, ''),
+        }
+
+    def _on_inter_op_threads_selected(self, choice: str):
+        self._save_settings({INTER_OP_THREADS_CONFIG: choice})
+        self._show_message("info", "Pula inter-op", "Zmiana rozmiaru puli inter-op zadziała po ponownym uruchomieniu aplikacji.")
+
+    def _on_cpu_affinity_changed(self, event=None):
+        cpu_affinity = self.cpu_affinity_entry.get().strip()
+        if cpu_affinity != self.config.get(CPU_AFFINITY_CONFIG, ''):
+            self._save_settings({CPU_AFFINITY_CONFIG: cpu_affinity})
+
+    def _show_thread_tuning(self):
+        model_name = self.selected_whisper_model.get()
+        tuned = get_tuned_threads(model_name, self.selected_precision)
+        if tuned:
+            self.thread_tuning_label.configure(text=f"Najlepsza liczba wątków dla '{model_name}' ({self.selected_precision}) na tym komputerze: {tuned}")
+        else:
+            self.thread_tuning_label.configure(text=f"Brak strojenia dla '{model_name}' ({self.selected_precision}). \"auto\" użyje domyślnej liczby wątków PyTorch.")
+
+    def run_thread_autotune_action(self):
+        clip = find_reference_clip(self.last_recorded_file)
+        if not clip:
+            self._show_message("warning", "Brak Klipu", "Nagraj lub wskaż plik audio, który posłuży jako klip referencyjny.")
+            return
+        self.autotune_button.configure(state="disabled")
+        self.thread_tuning_label.configure(text=f"Trwa strojenie liczby wątków na klipie {os.path.basename(clip)}...")
+        model_name = self.selected_whisper_model.get()
+        precision = self.selected_precision
+        language = self.selected_language_hint.get() or None
 
-        transcript, error_msg = transcribe_audio_local(self.last_recorded_file, 
-                                                       model_name=self.selected_whisper_model.get(), 
-                                                       language=language_target or language_hint, 
-                                                       task=task)
-        self._update_gui(lambda: self._handle_transcription_result(transcript, error_msg))
+        thread_settings = self._get_thread_settings()
 
-    def _transcribe_openai_thread(self):
+        def autotune_thread():
+            # Pomiar w procesie roboczym - to on użyje wyniku, z własnym obciążeniem i powinowactwem CPU
+            _, error_msg = get_inference_worker().run("autotune", reference_clip=clip, model_name=model_name, precision=precision,
+                                                      language=language, thread_settings=thread_settings)
+            def finish():
+                self.autotune_button.configure(state="normal")
+                self._show_thread_tuning()
+                if error_msg:
+                    self._show_message("error", "Błąd Strojenia", error_msg)
+            self._update_gui(finish)
+        self._run_in_thread(autotune_thread)
+
+    def run_precision_benchmark_action(self):
+        clip = find_reference_clip(self.last_recorded_file)
+        if not clip:
+            self._show_message("warning", "Brak Klipu", "Nagraj lub wskaż plik audio, który posłuży jako klip referencyjny.")
+            return
+        self.benchmark_button.configure(state="disabled")
+        self.benchmark_result_label.configure(text=f"Trwa pomiar na klipie {os.path.basename(clip)}...")
+        model_name = self.selected_whisper_model.get()
+        language = self.selected_language_hint.get() or None
+
+        def benchmark_thread():
+            _, error_msg = get_inference_worker().run("benchmark_precision", reference_clip=clip, model_name=model_name, language=language)
+            def finish():
+                self.benchmark_button.configure(state="normal")
+                if error_msg:
+                    self.benchmark_result_label.configure(text="")
+                    self._show_message("error", "Błąd Pomiaru", error_msg)
+                else:
+                    self._show_precision_benchmark()
+            self._update_gui(finish)
+        self._run_in_thread(benchmark_thread)
+
+    def _show_decoding_benchmark(self):
+        model_name, precision = self.selected_whisper_model.get(), self.selected_precision
+        result = get_benchmark_result("decoding_presets", benchmark_key(model_name, precision))
+        if not result:
+            self.decoding_benchmark_label.configure(text=f"Brak pomiarów presetów dla '{model_name}' ({precision}). Kliknij \"Zmierz\", aby poznać ich RTF na tym komputerze.")
+            return
+        lines = [f"Model '{model_name}' ({precision}), klip {result['clip']} ({result['clip_duration']:.0f} s), {result['date']}:"]
+        for preset, stats in result["presets"].items():
+            wer = "wzorzec" if preset == REFERENCE_PRESET else f"WER względem dokładnego {stats['wer'] * 100:.1f}%"
+            lines.append(f"  {PRESET_LABELS.get(preset, preset)}: RTF {stats['rtf']:.2f}, {wer}")
+        self.decoding_benchmark_label.configure(text="\n".join(lines))
+
+    def run_decoding_benchmark_action(self):
+        clip = find_reference_clip(self.last_recorded_file)
+        if not clip:
+            self._show_message("warning", "Brak Klipu", "Nagraj lub wskaż plik audio, który posłuży jako klip referencyjny.")
+            return
+        self.decoding_benchmark_button.configure(state="disabled")
+        self.decoding_benchmark_label.configure(text=f"Trwa pomiar presetów na klipie {os.path.basename(clip)}...")
+        model_name = self.selected_whisper_model.get()
+        precision = self.selected_precision
+        language = self.selected_language_hint.get() or None
+        custom = self.custom_decoding or None
+
+        def benchmark_thread():
+            _, error_msg = get_inference_worker().run("benchmark_decoding", reference_clip=clip, model_name=model_name,
+                                                      precision=precision, language=language, custom=custom)
+            def finish():
+                self.decoding_benchmark_button.configure(state="normal")
+                self._show_decoding_benchmark()
+                self._refresh_decoding_presets()
+                if error_msg:
+                    self._show_message("error", "Błąd Pomiaru", error_msg)
+            self._update_gui(finish)
+        self._run_in_thread(benchmark_thread)
+
+    def _get_draft_model(self, engine) -> Optional[str]:
+        """Zwraca mały model do szkicu lub None, jeśli szkic nie ma sensu (silnik bez modeli lub wybrany model już jest mały)."""
+        if not self.two_pass_enabled.get() or not engine.supports_models or engine.routes_jobs:
+            return None
+        if self.selected_whisper_model.get() in DRAFT_MODELS:
+            return None
+        models = engine.get_models()
+        return next((model for model in DRAFT_MODELS if model in models), None)
+
+    def _transcribe_thread(self, job: CancellationToken):
+        engine = self.engines[self.transcription_mode.get()]
         format_key = self.selected_output_format.get()
-        format_logic = self.output_formats.get(format_key, {'task': 'transcribe', 'language': None})
-        
-        language_hint = self.selected_language_hint.get() if format_logic['task'] == 'transcribe' and format_logic['language'] is None else None
+        output = self._resolve_output_format(format_key)
+        task, language = output['task'], output['language']
+        additional_formats = self._get_additional_output_formats()
+        additional_outputs = [self._resolve_output_format(key) for key in additional_formats]
+        decoded_outputs = self._decoded_outputs(output, additional_outputs)
+
+        options = {'model_name': self.selected_whisper_model.get(), 'precision': self.selected_precision,
+                   'thread_settings': self._get_thread_settings(), 'decoding': self._get_decoding_settings(),
+                   'progress_callback': partial(self._on_progress, job, "Transkrypcja"),
+                   'cancel_token': job}
+        if engine.routes_jobs:
+            options['routing_callback'] = partial(self._on_routing_decision, job)
+        vocabulary = self._get_vocabulary()
+        if vocabulary:
+            options['initial_prompt'] = vocabulary.prompt()
+
+        # Od ustawień zależy treść wyniku - zapisana transkrypcja z innymi ustawieniami nie jest używana ponownie
+        incremental_settings = {'engine': engine.name, 'model': options['model_name'] if engine.supports_models else None,
+                                'task': task, 'language': None if task == 'translate' else language,
+                                'decoding': options['decoding'] if engine.supports_models else None,
+                                'initial_prompt': options.get('initial_prompt')}
+        try:
+            with self.resource_governor.interactive() as measurement:
+                result, error_msg = None, None
+                if self.incremental_enabled.get() and not additional_outputs:
+                    # Po dopisaniu lub obcięciu nagrania dekodowane są tylko zmienione fragmenty
+                    result, error_msg = self._transcribe_incremental(engine, task, options, incremental_settings)
+                if result is not None or error_msg:
+                    if result and vocabulary:
+                        result = vocabulary.apply_to_result(result)
+                else:
+                    result, error_msg = self._transcribe_full(job, engine, task, language, options, decoded_outputs, vocabulary)
+                measurement['audio_seconds'] = self._result_duration(result)
+                # Zapamiętywana (transkrypcja przyrostowa) jest transkrypcja w języku nagrania, pokazywane - tłumaczenie
+                shown = result
+                if result and not error_msg:
+                    shown, error_msg = self._translate_outputs(job, result, output, additional_outputs, decoded_outputs,
+                                                               partial(self._on_progress, job, "Tłumaczenie"))
+        except JobCancelledError as e:
+            self._update_gui(lambda: self._handle_job_cancelled(job, e))
+            return
+        transcript = shown['text'].strip() if shown else None
+        if transcript is not None and shown.get('additional_outputs'):
+            # Wyniki dodatkowych formatów pod głównym - razem trafiają do okna i do schowka
+            for format_key, extra in zip(additional_formats, shown['additional_outputs']):
+                transcript += f"\n\n--- {format_key} ---\n{extra['text'].strip()}"
+        segments = shown.get('segments') if shown else None
+        incremental = (shown or {}).get('incremental')
+        translation = (shown or {}).get('translation')
+        translation_error = self._translation_error(shown)
+        # Poprawki dekodują audio w języku nagrania - po tłumaczeniu tekstu przycisk poprawek jest ukryty,
+        # bo wstawiałby nieprzetłumaczone zdania do przetłumaczonego zapisu
+        source = None if translation else {'file': self.last_recorded_file, 'language': (result or {}).get('language') or language,
+                                           'task': task}
+        def finish():
+            self._handle_transcription_result(transcript, error_msg, segments, source)
+            if incremental:
+                self._update_status(f"Transkrypcja zakończona - zdekodowano tylko {format_duration(incremental['decoded_seconds'])} "
+                                    f"z {format_duration(incremental['total_seconds'])} nagrania")
+            if translation:
+                self._update_status(f"Przetłumaczono {translation['source']} → {translation['target']}: {translation['sentences']} zdań "
+                                    f"({translation['cached']} bez ponownego tłumaczenia) w {translation['seconds']:.1f} s")
+            if translation_error:
+                self._show_translation_warning(translation_error)
+        self._update_job_gui(job, finish)
+        if result and not error_msg and self.incremental_enabled.get():
+            # Odciski audio liczone już po pokazaniu wyniku - nie opóźniają go
+            remember_transcript(self.last_recorded_file, result,
+                                {**incremental_settings, 'routed': self._routed_engine(engine, result, options)})
+
+    def _transcribe_incremental(self, engine, task: str, options: Dict[str, Any], settings: Dict[str, Any]):
+        """
+        Transkrypcja przyrostowa (transcribe_incremental). Przy trybie automatycznym i wyścigu zmienione
+        fragmenty dekoduje ten sam silnik i model, który dał zapisaną transkrypcję - tekst nie jest sklejany
+        z wyników różnych silników.
+        """
+        settings = {**settings, 'routed': None}
+        if engine.routes_jobs:
+            routed = ((load_record(self.last_recorded_file) or {}).get('settings') or {}).get('routed')
+            if not routed or routed.get('engine') not in self.engines:
+                return None, None
+            settings['routed'] = routed
+            engine = self.engines[routed['engine']]
+            options = {key: value for key, value in options.items() if key != 'routing_callback'}
+            if routed.get('model'):
+                options['model_name'] = routed['model']
+        result, error_msg = transcribe_incremental(engine, self.last_recorded_file, settings['language'], task, options, settings)
+        if result is not None and settings['routed']:
+            result = {**result, **settings['routed']}
+        return result, error_msg
+
+    @staticmethod
+    def _routed_engine(engine, result: Dict[str, Any], options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Silnik i model, których faktycznie użył tryb automatyczny lub wyścig (None dla pozostałych silników)."""
+        if not engine.routes_jobs or not result.get('engine'):
+            return None
+        return {'engine': result['engine'],
+                'model': result.get('model', options['model_name'] if result['engine'] == 'local' else None)}
+
+    @staticmethod
+    def _decoded_outputs(output: Dict[str, Optional[str]], additional_outputs: List[Dict[str, Optional[str]]]) -> List[Dict[str, Optional[str]]]:
+        """
+        Dodatkowe wyjścia do zdekodowania przez silnik. Formaty różniące się od głównego (lub od siebie)
+        tylko językiem tłumaczenia tekstu korzystają z tej samej transkrypcji.
+        """
+        decoded = []
+        for extra in additional_outputs:
+            key = {'task': extra['task'], 'language': extra['language']}
+            if (extra['task'], extra['language']) != (output['task'], output['language']) and key not in decoded:
+                decoded.append(key)
+        return decoded
+
+    def _translate_outputs(self, job: CancellationToken, result: Dict[str, Any], output: Dict[str, Optional[str]],
+                           additional_outputs: List[Dict[str, Optional[str]]], decoded_outputs: List[Dict[str, Optional[str]]],
+                           progress_callback: Optional[Callable] = None, priority: str = PRIORITY_INTERACTIVE):
+        """Przypisuje zdekodowane wyniki formatom wyjściowym i tłumaczy tekst formatów w innym języku niż nagranie."""
+        decoded = {(key['task'], key['language']): extra for key, extra in zip(decoded_outputs, result.get('additional_outputs') or [])}
+        primary = {key: value for key, value in result.items() if key != 'additional_outputs'}
+        shown, error_msg = self._translate(job, primary, output, progress_callback, priority)
+        if error_msg or not additional_outputs:
+            return shown, error_msg
+        extras = []
+        for extra_output in additional_outputs:
+            key = (extra_output['task'], extra_output['language'])
+            source = primary if key == (output['task'], output['language']) else {**decoded[key], 'language': decoded[key].get('language') or result.get('language')}
+            extra, error_msg = self._translate(job, source, extra_output, progress_callback, priority)
+            if error_msg:
+                return None, error_msg
+            extras.append(extra)
+        return {**shown, 'additional_outputs': extras}, None
 
-        if format_logic['task'] == 'translate':
-            transcript, error_msg = self.openai_client.translate_audio_to_english(self.last_recorded_file)
+    def _translate(self, job: CancellationToken, result: Dict[str, Any], output: Dict[str, Optional[str]],
+                   progress_callback: Optional[Callable] = None, priority: str = PRIORITY_INTERACTIVE):
+        """
+        Tłumaczenie tekstu w procesie roboczym - model zostaje tam załadowany na kolejne zadania.
+        Gdy tłumaczenie się nie uda, zwracana jest transkrypcja w języku nagrania z kluczem 'translation_error'.
+        """
+        if not output.get('translate_to') or language_code(result.get('language') or output['language']) == output['translate_to']:
+            return result, None
+        translated, error_msg = get_inference_worker(priority).run("translate", result=result, target_language=output['translate_to'],
+                                                                   source_language=result.get('language') or output['language'],
+                                                                   progress_callback=progress_callback, cancel_token=job)
+        if error_msg:
+            # Transkrypcja się udała - nie tracimy jej z powodu brakującego modelu tłumaczenia
+            logger.warning(f"Tłumaczenie na '{output['translate_to']}' nie powiodło się: {error_msg}")
+            return {**result, 'translation_error': error_msg}, None
+        return translated, None
+
+    @staticmethod
+    def _translation_error(result: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Błąd tłumaczenia wyniku lub któregoś z dodatkowych formatów (None, jeśli tłumaczenie się udało)."""
+        if not result:
+            return None
+        errors = [entry['translation_error'] for entry in [result] + list(result.get('additional_outputs') or [])
+                  if entry.get('translation_error')]
+        return errors[0] if errors else None
+
+    def _show_translation_warning(self, error_msg: str):
+        self._update_status("⚠️ Transkrypcja bez tłumaczenia")
+        self._show_message("warning", "Tłumaczenie Niedostępne",
+                           f"Pokazano transkrypcję w języku nagrania, bo nie udało się jej przetłumaczyć:\n\n{error_msg}")
+
+    def _transcribe_full(self, job: CancellationToken, engine, task: str, language: Optional[str], options: Dict[str, Any],
+                         additional_outputs: List[Dict[str, Optional[str]]], vocabulary: Optional[Vocabulary]):
+        """Pełna transkrypcja nagrania (z opcjonalnym szkicem z małego modelu)."""
+        # Tryb dwuprzebiegowy: najpierw szkic z małego modelu, potem docelowy model
+        draft_shown = False
+        draft_model = self._get_draft_model(engine)
+        if draft_model:
+            # Szkic ma być szybki - zawsze preset "fast", niezależnie od wybranego dla wyniku docelowego
+            draft_result, draft_error = self._run_engine(engine, task, language, {**options, 'model_name': draft_model,
+                                                                                   'decoding': get_preset_settings("fast"),
+                                                                                   'progress_callback': partial(self._on_progress, job, "Szkic")},
+                                                         vocabulary=vocabulary)
+            if draft_error:
+                logger.warning(f"Szkic modelem '{draft_model}' nie powiódł się: {draft_error}")
+            elif draft_result and draft_result['text']:
+                draft_shown = True
+                draft = draft_result['text'].strip()
+                self._update_job_gui(job, lambda: self._show_draft_result(draft, draft_model, options['model_name']))
+
+        # Segmenty pokazujemy na bieżąco; szkic zostaje na ekranie aż do gotowego wyniku docelowego modelu
+        if not draft_shown:
+            options['segment_callback'] = partial(self._on_segment_decoded, job, vocabulary=vocabulary)
+            self._update_job_gui(job, self._start_segment_stream)
+
+        return self._run_engine(engine, task, language, options, additional_outputs, vocabulary=vocabulary)
+
+    def _transcribe_tracks_thread(self, job: CancellationToken, track_files: Dict[str, str]):
+        """Ścieżki rozmowy transkrybowane równolegle i złożone w jeden zapis z nazwami mówców."""
+        engine = self.engines[self.transcription_mode.get()]
+        output = self._resolve_output_format(self.selected_output_format.get())
+        language = None if output['task'] == 'translate' else output['language']
+        options = {'model_name': self.selected_whisper_model.get(), 'precision': self.selected_precision,
+                   'thread_settings': self._get_thread_settings(), 'decoding': self._get_decoding_settings(),
+                   'progress_callback': partial(self._on_progress, job, f"Rozmowa ({len(track_files)} ścieżek)"),
+                   'cancel_token': job}
+        if engine.routes_jobs:
+            options['routing_callback'] = partial(self._on_routing_decision, job)
+        vocabulary = self._get_vocabulary()
+        if vocabulary:
+            options['initial_prompt'] = vocabulary.prompt()
+        try:
+            with self.resource_governor.interactive() as measurement:
+                result, error_msg = transcribe_tracks(engine, track_files, language=language, task=output['task'], options=options)
+                measurement['audio_seconds'] = self._result_duration(result)
+                if result and vocabulary:
+                    result = vocabulary.apply_to_result(result)
+                if result and not error_msg and output.get('translate_to'):
+                    result, error_msg = self._translate(job, result, output, partial(self._on_progress, job, "Tłumaczenie"))
+                    if result and result.get('translation'):
+                        # Zapis rozmowy składany od nowa z przetłumaczonych zdań mówców
+                        result = {**result, 'text': format_speaker_transcript(result['segments'])}
+        except JobCancelledError as e:
+            self._update_gui(lambda: self._handle_job_cancelled(job, e))
+            return
+        transcript = result['text'] if result else None
+        translation_error = self._translation_error(result)
+        def finish():
+            self._handle_transcription_result(transcript, error_msg)
+            if translation_error:
+                self._show_translation_warning(translation_error)
+        self._update_job_gui(job, finish)
+
+    def repair_segments_action(self):
+        if not self._last_result or not LOCAL_STT_MODULE_AVAILABLE:
+            return
+        job = self._start_job()
+        self._run_in_thread(partial(self._repair_thread, job, self._last_result))
+
+    def _repair_thread(self, job: CancellationToken, source: Dict[str, Any]):
+        # Poprawki liczy zawsze lokalny Whisper - wybrany model może być mocniejszy niż w pierwszym przebiegu
+        try:
+            with self.resource_governor.interactive():
+                result, error_msg = get_inference_worker().run("repair", audio_file_path=source['file'], segments=source['segments'],
+                                                               model_name=self.selected_whisper_model.get(),
+                                                               language=source['language'], task=source['task'],
+                                                               precision=self.selected_precision,
+                                                               thread_settings=self._get_thread_settings(),
+                                                               progress_callback=partial(self._on_progress, job, "Poprawianie"),
+                                                               cancel_token=job)
+        except JobCancelledError as e:
+            self._update_gui(lambda: self._handle_job_cancelled(job, e))
+            return
+        if error_msg:
+            self._update_job_gui(job, lambda: self._handle_transcription_result(None, error_msg))
+            return
+        vocabulary = self._get_vocabulary()
+        if vocabulary:
+            # Ponownie zdekodowane fragmenty też przechodzą przez słownik
+            result = {**result, **vocabulary.apply_to_result(result)}
+        def finish():
+            self._handle_transcription_result(result['text'], None, result['segments'], source)
+            self._update_status(f"Poprawiono {result['repaired']} z {result['suspect_spans']} podejrzanych fragmentów")
+        self._update_job_gui(job, finish)
+
+    def _run_engine(self, engine, task: str, language: Optional[str], options: Dict[str, Any],
+                    additional_outputs: Optional[List[Dict[str, Optional[str]]]] = None,
+                    vocabulary: Optional[Vocabulary] = None):
+        if task == 'translate':
+            language = None
+        if additional_outputs:
+            # Zadanie z kilkoma wyjściami nie jest miarą RTF silnika - nie trafia do pomiarów trybu automatycznego
+            outputs = [{'task': task, 'language': language}]
+            outputs += [{**output, 'language': None} if output['task'] == 'translate' else output for output in additional_outputs]
+            result, error_msg = engine.transcribe_multi(self.last_recorded_file, outputs, **options)
         else:
-            language_target = format_logic['language']
-            transcript, error_msg = self.openai_client.transcribe_audio(self.last_recorded_file, language=language_target or language_hint)
-            
-        self._update_gui(lambda: self._handle_transcription_result(transcript, error_msg))
+            # Każde zadanie aktualizuje zmierzony RTF silnika, z którego korzysta tryb automatyczny
+            result, error_msg = run_measured(engine, self.last_recorded_file, language, task, options)
+        if result and vocabulary:
+            # Poprawki ze słownika w wątku roboczym - długi zapis nie blokuje okna
+            result = vocabulary.apply_to_result(result)
+        return result, error_msg
+
+    def _on_routing_decision(self, job: CancellationToken, decision: Dict[str, Any]):
+        target = self.engines[decision['engine']].display_name
+        if decision['model']:
+            target += f" · {decision['model']}"
+        self._update_job_gui(job, lambda: self._update_status(f"Tryb automatyczny → {target} ({decision['reason']})"))
+
+    def _update_job_gui(self, job: CancellationToken, func: Callable):
+        """Jak _update_gui, ale pomija aktualizacje od zadania, które zostało już anulowane lub zastąpione."""
+        self._update_gui(lambda: func() if job is self._current_job else None)
+
+    def _on_progress(self, job: CancellationToken, stage: str, info: Dict[str, Any]):
+        """Wywoływana w wątku roboczym (już zdławiona przez ProgressReporter) - przekazuje postęp do GUI."""
+        self._update_job_gui(job, lambda: self._show_progress(stage, info))
+
+    def _show_progress(self, stage: str, info: Dict[str, Any]):
+        if info.get('fraction') is None:
+            return
+        if not self._progress_determinate:
+            # Pierwszy konkretny pomiar zamienia animację oczekiwania na prawdziwy pasek postępu
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate")
+            self._progress_determinate = True
+        self.progress_bar.set(info['fraction'])
+        if info.get('upload_rate') is not None:
+            # Etap wysyłania do API - zamiast RTF pokazujemy przepustowość łącza
+            parts = [f"Wysyłanie: {info['fraction'] * 100:.0f}%", f"{info['upload_rate'] / (1024 * 1024):.1f} MB/s"]
+        else:
+            parts = [f"{stage}: {info['fraction'] * 100:.0f}%"]
+        if info.get('rtf') is not None:
+            parts.append(f"RTF {info['rtf']:.2f}")
+        if info.get('eta') is not None and info['fraction'] < 1:
+            parts.append(f"pozostało ~{format_duration(info['eta'])}")
+        self._update_status(" · ".join(parts))
+
+    def _on_segment_decoded(self, job: CancellationToken, segment: Dict[str, Any], vocabulary: Optional[Vocabulary] = None):
+        """Wywoływana w wątku roboczym - tylko odkłada segment, GUI odczyta go w _flush_segments."""
+        if job.cancelled:
+            return
+        if vocabulary:
+            segment = {**segment, "text": vocabulary.replace(segment.get("text", ""))[0]}
+        with self._pending_segments_lock:
+            self._pending_segments.append(segment)
+
+    def _start_segment_stream(self):
+        self._clear_transcript()
+        self._segment_flush_id = self.root.after(SEGMENT_FLUSH_INTERVAL_MS, self._flush_segments)
+
+    def _stop_segment_stream(self):
+        if self._segment_flush_id:
+            self.root.after_cancel(self._segment_flush_id)
+            self._segment_flush_id = None
+        with self._pending_segments_lock:
+            self._pending_segments.clear()
+
+    def _flush_segments(self):
+        # Porcja jest ograniczona, żeby jedno wstawienie nigdy nie blokowało pętli zdarzeń na długo
+        with self._pending_segments_lock:
+            batch = self._pending_segments[:MAX_SEGMENTS_PER_FLUSH]
+            del self._pending_segments[:MAX_SEGMENTS_PER_FLUSH]
+        if batch:
+            self._append_segments(batch)
+        self._segment_flush_id = self.root.after(SEGMENT_FLUSH_INTERVAL_MS, self._flush_segments)
+
+    def _append_segments(self, segments: List[Dict[str, Any]]):
+        self._streamed_segment_count += len(segments)
+        if self.virtual_transcript_view.winfo_ismapped():
+            self.virtual_transcript_view.append_lines([self._format_segment(segment) for segment in segments])
+            return
+        if self._streamed_segment_count > VIRTUAL_VIEW_SEGMENT_THRESHOLD:
+            # Przejście na widok wirtualny: pole tekstowe przestaje rosnąć
+            self._show_virtual_view()
+            self.virtual_transcript_view.append_lines([self._format_segment(segment) for segment in segments])
+            return
+        text = "".join(segment['text'] for segment in segments)
+        if self._streamed_segment_count == len(segments):
+            text = text.lstrip()  # segmenty Whisper zaczynają się od spacji
+        self.transcription_text.configure(state="normal")
+        self.transcription_text.insert("end", text)
+        self.transcription_text.see("end")
+        self.transcription_text.configure(state="disabled")
+
+    @staticmethod
+    def _format_segment(segment: Dict[str, Any]) -> str:
+        seconds = int(segment.get('start', 0))
+        return f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}] {segment['text'].strip()}"
+
+    def _show_virtual_view(self):
+        if self.virtual_transcript_view.winfo_ismapped():
+            return
+        self.transcription_text.grid_remove()
+        self.virtual_transcript_view.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0,10))
+
+    def _show_text_view(self):
+        if not self.virtual_transcript_view.winfo_ismapped():
+            return
+        self.virtual_transcript_view.grid_remove()
+        self.virtual_transcript_view.clear()
+        self.transcription_text.grid()
+
+    def _clear_transcript(self):
+        self._streamed_segment_count = 0
+        self._show_text_view()
+        self.transcription_text.configure(state="normal")
+        self.transcription_text.delete("1.0", "end")
+        self.transcription_text.configure(state="disabled")
+
+    def _show_draft_result(self, draft: str, draft_model: str, final_model: str):
+        self._clear_transcript()
+        self.transcription_text.configure(state="normal")
+        self.transcription_text.insert("end", f"⏳ WERSJA ROBOCZA (model {draft_model}) – trwa dopracowywanie modelem {final_model}...\n\n", "draft_header")
+        self.transcription_text.insert("end", draft, "draft")
+        self.transcription_text.tag_config("draft_header", foreground="#E0A030")
+        self.transcription_text.tag_config("draft", foreground="gray")
+        self.transcription_text.configure(state="disabled")
+        self.root.clipboard_clear()
+        self.root.clipboard_append(draft)
+        self._update_status(f"Szkic skopiowany do schowka – dopracowywanie ({final_model})...")
 
     def _open_linkedin(self):
         webbrowser.open_new_tab("https://www.linkedin.com/in/walczuk-maciej/")
@@ -378,7 +1336,14 @@ class DictAItorApp:
                 self.pulse_animation_id = None
 
     def _start_recording(self):
-        if not self.recorder.start_recording():
+        self.multitrack_recorder = None
+        if self.multitrack_enabled.get() and self.multitrack_tracks:
+            self.multitrack_recorder = MultiTrackRecorder(self.multitrack_tracks)
+            started = self.multitrack_recorder.start_recording()
+        else:
+            started = self.recorder.start_recording()
+        if not started:
+            self.multitrack_recorder = None
             self._show_message("error", "Błąd Nagrywania", "Nie można rozpocząć nagrywania.")
             return
             
@@ -388,11 +1353,11 @@ class DictAItorApp:
         self.status_frame.configure(border_width=2, border_color=("#d00000", "#ff4d4d"))
         
         self.transcribe_button.configure(state="disabled")
-        self.transcription_text.configure(state="normal")
-        self.transcription_text.delete("1.0", "end")
-        self.transcription_text.configure(state="disabled")
+        self._clear_transcript()
+        self._update_repair_button(None, None)
         
         self.last_recorded_file = None
+        self.last_track_files = None
         self.file_path_label.configure(text="Brak wybranego pliku", text_color="gray")
         self._pulse_recording_indicator()
 
@@ -404,12 +1369,20 @@ class DictAItorApp:
         self._run_in_thread(self._stop_recording_thread)
     
     def _stop_recording_thread(self):
-        filepath = self.recorder.stop_recording()
+        track_files = None
+        if self.multitrack_recorder is not None:
+            track_files = self.multitrack_recorder.stop_recording()
+            # Pierwsza ścieżka służy funkcjom działającym na jednym pliku (pomiary, poprawianie)
+            filepath = next(iter(track_files.values())) if track_files else None
+        else:
+            filepath = self.recorder.stop_recording()
         def finish_recording():
             self.record_button.configure(text="Rejestruj Mowę")
             if filepath:
                 self.last_recorded_file = filepath
-                self.file_path_label.configure(text=f"Nagranie: {os.path.basename(filepath)}", text_color=("black", "white"))
+                self.last_track_files = track_files
+                label = f"Nagranie rozmowy: {len(track_files)} ścieżek ({', '.join(track_files)})" if track_files else f"Nagranie: {os.path.basename(filepath)}"
+                self.file_path_label.configure(text=label, text_color=("black", "white"))
                 self._update_status("Zapisano nagranie")
                 self.transcribe_button.configure(state="normal")
             else:
@@ -429,41 +1402,112 @@ class DictAItorApp:
             self._show_message("warning", "Brak Nagrania", "Najpierw nagraj lub wskaż plik audio.")
             return
             
+        job = self._start_job()
+        if self.last_track_files:
+            self._run_in_thread(partial(self._transcribe_tracks_thread, job, self.last_track_files))
+        else:
+            self._run_in_thread(partial(self._transcribe_thread, job))
+
+    def _start_job(self) -> CancellationToken:
+        """Przełącza interfejs w tryb pracy i tworzy token anulowania nowego zadania."""
+        # Do pierwszego pomiaru postępu (np. ładowanie modelu) pasek pokazuje tylko animację oczekiwania -
+        # także po zadaniu, które skończyło się z paskiem w trybie określonym
+        self._progress_determinate = False
+        self.progress_bar.configure(mode="indeterminate")
         self.progress_bar.pack(fill="x", padx=10, pady=(0, 10))
         self.progress_bar.start()
         self.record_button.configure(state="disabled")
         self.transcribe_button.configure(state="disabled")
+        self.repair_button.pack_forget()
+        self.cancel_button.configure(state="normal")
+        self.cancel_button.pack(side="left", padx=5, pady=5, after=self.transcribe_button)
         
-        if self.transcription_mode.get() == "local":
-            self._run_in_thread(self._transcribe_local_thread)
-        else:
-            self._run_in_thread(self._transcribe_openai_thread)
+        timeout_minutes = self.config.get(JOB_TIMEOUT_CONFIG, 0)
+        job = CancellationToken(timeout=timeout_minutes * 60 if timeout_minutes else None)
+        self._current_job = job
+        # Zadanie w tle zostanie wstrzymane, gdy wątek zadania ruszy - odświeżamy jego status
+        self.root.after(BATCH_STATUS_REFRESH_MS, self._show_batch_status)
+        return job
+
+    def cancel_transcription_action(self):
+        job = self._current_job
+        if job is None:
+            return
+        job.cancel()
+        # Interfejs zwalniamy od razu; wątek roboczy zakończy się na najbliższej granicy segmentu
+        self._finish_job()
+        self._update_status("⏹ Transkrypcja anulowana")
 
-    def _handle_transcription_result(self, transcript: Optional[str], error_msg: Optional[str]):
+    def _finish_job(self):
+        self._current_job = None
+        self.root.after(BATCH_STATUS_REFRESH_MS, self._show_batch_status)
+        self._stop_segment_stream()
         self.progress_bar.stop()
         self.progress_bar.pack_forget()
+        self.cancel_button.pack_forget()
         self.record_button.configure(state="normal")
         self.transcribe_button.configure(state="normal" if self.last_recorded_file else "disabled")
 
+    def _handle_job_cancelled(self, job: CancellationToken, error: JobCancelledError):
+        logger.info(f"Zadanie transkrypcji zakończone po anulowaniu: {error}")
+        if job is not self._current_job:
+            return  # anulowane przez użytkownika - interfejs został już zwolniony
+        self._finish_job()
+        if isinstance(error, JobTimeoutError):
+            self._update_status("⏱ Przekroczono limit czasu")
+            self._show_message("warning", "Limit Czasu", f"{error} Zwiększ limit w ustawieniach lub wybierz szybszy model.")
+        else:
+            self._update_status("⏹ Transkrypcja anulowana")
+
+    def _on_close(self):
+        if self._current_job is not None:
+            self._current_job.cancel("Zamykanie aplikacji.")
+        self._stop_batch("Zamykanie aplikacji.")
+        self.stall_watchdog.stop()
+        shutdown_inference_worker()
+        self.root.destroy()
+
+    def _handle_transcription_result(self, transcript: Optional[str], error_msg: Optional[str],
+                                     segments: Optional[List[Dict[str, Any]]] = None,
+                                     source: Optional[Dict[str, Any]] = None):
+        self._finish_job()
+        self._update_repair_button(segments, source)
+        self._update_api_usage_label()
+
         if error_msg:
             self._update_status("❌ Błąd transkrypcji")
             self._show_message("error", "Błąd Transkrypcji", error_msg)
+            self._clear_transcript()
             self.transcription_text.configure(state="normal")
-            self.transcription_text.delete("1.0", "end")
             self.transcription_text.insert("end", f"--- BŁĄD ---\n{error_msg}\n")
             self.transcription_text.configure(state="disabled")
         elif transcript is not None:
             self._update_status("Transkrypcja zakończona.")
-            self.transcription_text.configure(state="normal")
-            self.transcription_text.delete("1.0", "end")
-            self.transcription_text.insert("end", transcript)
-            self.transcription_text.configure(state="disabled")
+            self._clear_transcript()
+            if segments and len(segments) > VIRTUAL_VIEW_SEGMENT_THRESHOLD:
+                # Tysiące segmentów w jednym polu tekstowym zamroziłyby okno - pokazujemy tylko widoczny fragment
+                self._show_virtual_view()
+                self.virtual_transcript_view.set_lines([self._format_segment(segment) for segment in segments])
+            else:
+                self.transcription_text.configure(state="normal")
+                self.transcription_text.insert("end", transcript)
+                self.transcription_text.configure(state="disabled")
             self.root.clipboard_clear()
             self.root.clipboard_append(transcript)
             self._show_copy_confirmation()
         else:
             self._handle_transcription_result(None, "Wystąpił nieznany błąd.")
 
+    def _update_repair_button(self, segments: Optional[List[Dict[str, Any]]], source: Optional[Dict[str, Any]]):
+        suspect_count = len(find_suspect_segments(segments)) if segments and source else 0
+        if suspect_count and LOCAL_STT_MODULE_AVAILABLE:
+            self._last_result = {**source, 'segments': segments}
+            self.repair_button.configure(text=f"Popraw wątpliwe ({suspect_count})")
+            self.repair_button.pack(side="left", padx=5, pady=5, after=self.transcribe_button)
+        else:
+            self._last_result = None
+            self.repair_button.pack_forget()
+
     def _show_copy_confirmation(self):
         self.copy_confirm_label.place(relx=0.5, rely=0.5, anchor="center")
         self._update_status("Transkrypcja skopiowana do schowka ✓")
@@ -473,10 +1517,126 @@ class DictAItorApp:
         file_path = filedialog.askopenfilename(title="Wybierz plik audio", filetypes=[("Pliki Audio", "*.wav *.mp3 *.ogg *.flac"), ("Wszystkie pliki", "*.*")], initialdir=RECORDINGS_DIR)
         if file_path:
             self.last_recorded_file = file_path
+            self.last_track_files = None
             self.file_path_label.configure(text=f"Wybrany plik: {os.path.basename(file_path)}", text_color=("black", "white"))
             self.transcribe_button.configure(state="normal")
+            self._update_repair_button(None, None)
             self._update_status("Wybrano plik")
 
+    @staticmethod
+    def _result_duration(result: Optional[Dict[str, Any]]) -> Optional[float]:
+        """Długość transkrybowanego audio z wyniku (do RTF w statystykach opóźnień)."""
+        if not result:
+            return None
+        segments = result.get('segments')
+        return result.get('duration') or (segments[-1]['end'] if segments else None)
+
+    def transcribe_batch_action(self):
+        file_paths = filedialog.askopenfilenames(title="Wybierz pliki do transkrypcji w tle", filetypes=[("Pliki Audio", "*.wav *.mp3 *.ogg *.flac"), ("Wszystkie pliki", "*.*")], initialdir=RECORDINGS_DIR)
+        if not file_paths:
+            return
+        with self._batch_lock:
+            self._batch_files.extend(file_paths)
+            start_thread = not self._batch_running
+            self._batch_running = True
+        self.batch_frame.pack(fill="x", padx=10, pady=(0, 10))
+        self._show_batch_status()
+        if start_thread:
+            self._run_in_thread(self._batch_thread)
+
+    def stop_batch_action(self):
+        self._stop_batch("Zatrzymano transkrypcję w tle.")
+        self.batch_status_label.configure(text="Zatrzymywanie transkrypcji w tle...")
+
+    def _stop_batch(self, reason: str):
+        with self._batch_lock:
+            self._batch_files.clear()
+            token = self._batch_token
+        if token is not None:
+            token.cancel(reason)
+
+    def _batch_thread(self):
+        """Pliki z kolejki po kolei; wynik każdego trafia do pliku .txt obok nagrania."""
+        engine = self.engines[self.transcription_mode.get()]
+        output = self._resolve_output_format(self.selected_output_format.get())
+        task = output['task']
+        language = None if task == 'translate' else output['language']
+        vocabulary = self._get_vocabulary()
+        priority = self.resource_governor.background_priority
+        done, failed = 0, 0
+        while True:
+            with self._batch_lock:
+                if not self._batch_files:
+                    self._batch_running, self._batch_token = False, None
+                    break
+                file_path = self._batch_files.pop(0)
+                token = self._batch_token = CancellationToken()
+            options = {'model_name': self.selected_whisper_model.get(), 'precision': self.selected_precision,
+                       'thread_settings': self._get_thread_settings(), 'decoding': self._get_decoding_settings(),
+                       'progress_callback': partial(self._on_batch_progress, file_path), 'cancel_token': token}
+            if vocabulary:
+                options['initial_prompt'] = vocabulary.prompt()
+            try:
+                with self.resource_governor.background(token):
+                    result, error_msg = engine.transcribe_segments(file_path, language=language, task=task,
+                                                                   **self.resource_governor.background_options(options))
+                    if result and vocabulary:
+                        result = vocabulary.apply_to_result(result)
+                    if result and not error_msg:
+                        result, error_msg = self._translate(token, result, output, options['progress_callback'], priority)
+            except JobCancelledError as e:
+                logger.info(f"Transkrypcja w tle przerwana ({os.path.basename(file_path)}): {e}")
+                continue
+            if result and not error_msg:
+                error_msg = self._save_batch_transcript(file_path, result['text'])
+            if error_msg:
+                failed += 1
+                logger.error(f"Transkrypcja w tle nie powiodła się ({os.path.basename(file_path)}): {error_msg}")
+            else:
+                done += 1
+        self._update_gui(lambda: self._finish_batch(done, failed))
+
+    @staticmethod
+    def _save_batch_transcript(file_path: str, text: str) -> Optional[str]:
+        transcript_path = os.path.splitext(file_path)[0] + ".txt"
+        try:
+            with open(transcript_path, "w", encoding="utf-8") as f:
+                f.write(text.strip() + "\n")
+        except OSError as e:
+            return f"Nie można zapisać transkrypcji do {transcript_path}: {e}"
+        logger.info(f"Zapisano transkrypcję w tle: {transcript_path}")
+        return None
+
+    def _on_batch_progress(self, file_path: str, info: Dict[str, Any]):
+        self._batch_progress = {'file': file_path, 'fraction': info.get('fraction')}
+        self._update_gui(self._show_batch_status)
+
+    def _show_batch_status(self):
+        with self._batch_lock:
+            if not self._batch_running:
+                return
+            queued = len(self._batch_files)
+            token = self._batch_token
+        progress = self._batch_progress
+        parts = [f"W tle: {os.path.basename(progress['file'])}" if progress.get('file') else "W tle: przygotowanie"]
+        if progress.get('fraction') is not None:
+            parts.append(f"{progress['fraction'] * 100:.0f}%")
+        if token is not None and token.paused:
+            parts.append("wstrzymane na czas dyktowania")
+        if queued:
+            parts.append(f"w kolejce: {queued}")
+        self.batch_status_label.configure(text=" · ".join(parts))
+
+    def _finish_batch(self, done: int, failed: int):
+        self._batch_progress = {}
+        if self._batch_running:
+            return  # w międzyczasie dodano nowe pliki - ruszył kolejny wątek
+        self.batch_frame.pack_forget()
+        summary = f"Transkrypcja w tle zakończona: {done} plików"
+        if failed:
+            summary += f", błędy: {failed} (szczegóły w logu)"
+        self._update_status(summary)
+
     def open_recordings_folder(self):
         try:
             if os.path.exists(RECORDINGS_DIR):
@@ -489,10 +1649,16 @@ class DictAItorApp:
     # ### KLUCZOWA POPRAWKA: Przebudowana metoda aktualizacji widoku ###
     def _update_transcription_mode(self, event=None):
         mode = self.transcription_mode.get()
-        is_local_mode = (mode == "local" and WHISPER_AVAILABLE)
+        engine = self.engines.get(mode)
+        if engine is None:
+            return
         
         # Spójne zarządzanie widocznością za pomocą grid/grid_forget
-        if is_local_mode:
+        if engine.supports_models and engine.is_available():
+            models = engine.get_models()
+            self.whisper_model_combobox.configure(values=models)
+            if models and self.selected_whisper_model.get() not in models:
+                self.selected_whisper_model.set(engine.default_model if engine.default_model in models else models[0])
             # Pokaż kontener w określonym miejscu siatki
             self.whisper_models_container.grid(row=1, column=0, columnspan=2, sticky="ew", padx=(15, 5), pady=0)
         else:
@@ -500,12 +1666,7 @@ class DictAItorApp:
             self.whisper_models_container.grid_forget()
 
         self._save_settings({PREFERRED_MODE_CONFIG: mode})
-        
-        # Aktualizacja tekstu przycisku (opcjonalne)
-        if is_local_mode:
-            self.transcribe_button.configure(text="Transkrybuj Lokalnie")
-        elif mode == "openai" and OPENAI_AVAILABLE:
-            self.transcribe_button.configure(text="Transkrybuj przez OpenAI")
+        self.transcribe_button.configure(text=engine.action_label)
 
     def _save_settings(self, settings: Dict[str, Any]):
         self.config.update(settings)
@@ -523,14 +1684,14 @@ class DictAItorApp:
         self._save_settings({OPENAI_KEY_CONFIG: key})
         self.openai_key_value = key
         
-        if OPENAI_AVAILABLE and hasattr(self, 'openai_client'):
-            self.openai_client.update_api_key(key)
+        for engine in self.engines.values():
+            engine.configure(api_key=key)
+        self._update_api_usage_label()
             
         self._show_message("info", "Sukces", "Klucz API OpenAI został zapisany.")
 
     def _update_status(self, message: str):
         self.status_label.configure(text=f"Status: {message}")
-        self.root.update_idletasks()
 
     def _show_message(self, msg_type: str, title: str, message: str):
         if msg_type == "info": messagebox.showinfo(title, message)
@@ -544,6 +1705,8 @@ class DictAItorApp:
         self.root.after(0, func)
 
 if __name__ == "__main__":
+    # Wymagane dla procesu roboczego transkrypcji w wersji spakowanej (PyInstaller, Windows)
+    multiprocessing.freeze_support()
     root = ctk.CTk()
     app = DictAItorApp(root)
     root.mainloop()
\ No newline at end of file
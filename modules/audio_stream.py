@@ -0,0 +1,187 @@
+# X:\Aplikacje\dictaitor\modules\audio_stream.py
+import os
+import json
+import wave
+import struct
+import logging
+import tempfile
+import subprocess
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_INSTALLED = True
+except ImportError:
+    NUMPY_INSTALLED = False
+
+try:
+    import torch
+    from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, log_mel_spectrogram
+    STREAMING_AVAILABLE = NUMPY_INSTALLED
+except ImportError:
+    STREAMING_AVAILABLE = False
+
+SAMPLE_RATE = 16000
+# Pliki dłuższe niż ten próg są w trybie automatycznym dekodowane strumieniowo
+STREAMING_THRESHOLD_SECONDS = 20 * 60
+# Gdy długości nie da się ustalić, o trybie decyduje rozmiar pliku
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+
+
+def find_wav_data_chunk(path: str) -> Optional[Tuple[int, int]]:
+    """Zwraca (przesunięcie, rozmiar) bloku 'data' w pliku WAV lub None, jeśli plik nie jest poprawnym RIFF/WAVE."""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"data":
+                # Rozmiar bywa niepoprawny w nagraniach przerwanych w trakcie zapisu - ograniczamy go do pliku
+                offset = f.tell()
+                return offset, min(chunk_size, os.path.getsize(path) - offset)
+            # Bloki RIFF są wyrównane do parzystej liczby bajtów
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def is_native_wav(path: str) -> bool:
+    """Czy plik to WAV 16 kHz, mono, 16 bit PCM - format, który można mapować bez konwersji."""
+    if not path.lower().endswith(".wav"):
+        return False
+    try:
+        with wave.open(path, "rb") as wf:
+            return (wf.getnchannels(), wf.getsampwidth(), wf.getframerate(), wf.getcomptype()) == (1, 2, SAMPLE_RATE, "NONE")
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Ustala długość nagrania bez dekodowania go do pamięci (nagłówek WAV lub ffprobe)."""
+    try:
+        if path.lower().endswith(".wav"):
+            with wave.open(path, "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+    except (wave.Error, EOFError, OSError):
+        pass
+    try:
+        output = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+                                capture_output=True, check=True, timeout=30).stdout
+        return float(json.loads(output)["format"]["duration"])
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError) as e:
+        logger.info(f"Nie można ustalić długości pliku przez ffprobe: {e}")
+        return None
+
+
+def should_stream(path: str) -> bool:
+    """Decyzja trybu automatycznego: długie nagrania dekodujemy strumieniowo."""
+    duration = probe_duration(path)
+    if duration is not None:
+        return duration > STREAMING_THRESHOLD_SECONDS
+    return os.path.getsize(path) > STREAMING_THRESHOLD_BYTES
+
+
+class AudioStream:
+    """
+    Nagranie 16 kHz mono dostępne fragmentami przez mapowanie pliku w pamięci.
+
+    Pliki WAV w natywnym formacie aplikacji są mapowane bezpośrednio. Pozostałe formaty FFmpeg
+    dekoduje jednorazowo do tymczasowego pliku PCM (int16, ok. 115 MB na godzinę na dysku),
+    który jest następnie mapowany - w RAM są tylko aktualnie czytane strony.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._temp_path: Optional[str] = None
+        data_chunk = find_wav_data_chunk(path) if is_native_wav(path) else None
+        if data_chunk is None:
+            self._temp_path = self._decode_to_pcm(path)
+            offset, size = 0, os.path.getsize(self._temp_path)
+            source_path = self._temp_path
+        else:
+            offset, size = data_chunk
+            source_path = path
+        self.num_samples = size // 2
+        self._samples = np.memmap(source_path, dtype="<i2", mode="r", offset=offset, shape=(self.num_samples,)) if self.num_samples else None
+
+    @staticmethod
+    def _decode_to_pcm(path: str) -> str:
+        """Dekoduje plik przez FFmpeg prosto do pliku tymczasowego (bez przechodzenia przez pamięć procesu)."""
+        handle, temp_path = tempfile.mkstemp(prefix="dictaitor_stream_", suffix=".pcm")
+        os.close(handle)
+        command = ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", path,
+                   "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), temp_path]
+        try:
+            subprocess.run(command, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            os.remove(temp_path)
+            stderr = e.stderr.decode(errors="replace") if getattr(e, "stderr", None) else str(e)
+            raise RuntimeError(f"FFmpeg nie mógł zdekodować pliku {path}: {stderr}") from e
+        logger.info(f"Plik zdekodowany do tymczasowego PCM: {temp_path}")
+        return temp_path
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / SAMPLE_RATE
+
+    def read(self, start_sample: int, count: int):
+        """Zwraca fragment jako float32 w zakresie [-1, 1] (krótszy na końcu nagrania)."""
+        start_sample = max(0, start_sample)
+        end_sample = min(self.num_samples, start_sample + count)
+        if self._samples is None or end_sample <= start_sample:
+            return np.zeros(0, dtype=np.float32)
+        return np.asarray(self._samples[start_sample:end_sample], dtype=np.float32) / 32768.0
+
+    def read_seconds(self, start: float, end: float):
+        return self.read(int(start * SAMPLE_RATE), int((end - start) * SAMPLE_RATE))
+
+    def read_pcm(self, start_sample: int = 0, count: Optional[int] = None):
+        """Zwraca surowe próbki int16 (widok na mapowany plik, bez kopiowania); count=None - do końca nagrania."""
+        start_sample = max(0, start_sample)
+        end_sample = self.num_samples if count is None else min(self.num_samples, start_sample + count)
+        if self._samples is None or end_sample <= start_sample:
+            return np.zeros(0, dtype="<i2")
+        return self._samples[start_sample:end_sample]
+
+    def close(self) -> None:
+        # Mapowanie musi zostać zwolnione przed usunięciem pliku (Windows blokuje otwarte pliki)
+        self._samples = None
+        if self._temp_path and os.path.exists(self._temp_path):
+            try:
+                os.remove(self._temp_path)
+            except OSError as e:
+                logger.warning(f"Nie można usunąć pliku tymczasowego {self._temp_path}: {e}")
+        self._temp_path = None
+
+    def __enter__(self) -> "AudioStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class StreamingFeatureSource:
+    """
+    Źródło cech dla pętli dekodowania, liczące spektrogram osobno dla każdego okna 30 s.
+
+    Zużycie pamięci nie zależy od długości nagrania: w pamięci jest tylko jedno okno audio
+    i jego spektrogram. Normalizacja log-mel jest liczona w obrębie okna (whisper.transcribe
+    robi to dla całego pliku), co minimalnie zmienia wartości cech w cichych fragmentach.
+    """
+
+    def __init__(self, stream: AudioStream, n_mels: int) -> None:
+        self.stream = stream
+        self.n_mels = n_mels
+        self.total_frames = stream.num_samples // HOP_LENGTH
+
+    def mel_window(self, seek: int):
+        """Zwraca spektrogram okna 30 s zaczynającego się od ramki `seek` (n_mels x N_FRAMES)."""
+        audio = self.stream.read(seek * HOP_LENGTH, N_SAMPLES)
+        if len(audio) < N_SAMPLES:
+            audio = np.pad(audio, (0, N_SAMPLES - len(audio)))
+        mel = log_mel_spectrogram(torch.from_numpy(audio), self.n_mels)
+        return mel[:, :N_FRAMES]
@@ -0,0 +1,287 @@
+# X:\Aplikacje\dictaitor\modules\auto_engine.py
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.stt_engines import STTEngine, create_engine, register_engine
+from modules.audio_stream import probe_duration
+from modules.benchmark import get_benchmark_result, save_benchmark_result
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTING_LOG_PATH = os.path.join(APP_DIR, "logs", "routing.log")
+
+# Nagrania do tej długości (s) mogą trafić do małego modelu lokalnego zamiast do wybranego
+SHORT_CLIP_SECONDS = 90
+# Małe modele dla krótkich notatek, w kolejności preferencji (model już załadowany ma pierwszeństwo)
+FAST_LOCAL_MODELS = ["small", "base", "tiny"]
+# Szacunkowe RTF na CPU (fp32), używane do czasu pierwszego pomiaru na tym komputerze
+DEFAULT_LOCAL_RTF = {"tiny": 0.08, "base": 0.15, "small": 0.4, "medium": 1.0, "turbo": 0.6,
+                     "large": 2.0, "large-v2": 2.0, "large-v3": 2.0}
+DEFAULT_API_RTF = 0.1
+# Stały narzut jednego żądania do API (połączenie, kolejka po stronie serwera) w sekundach
+API_REQUEST_OVERHEAD = 3.0
+DEFAULT_LOAD_SECONDS = 10.0
+# API jest płatne i wysyła nagranie poza komputer - wybieramy je tylko, gdy jest wyraźnie szybsze
+API_COST_FACTOR = 1.25
+# Waga nowego pomiaru w średniej kroczącej RTF
+RTF_SMOOTHING = 0.3
+RECENT_DECISIONS = 20
+
+
+def _rtf_key(engine_name: str, model_name: Optional[str] = None, precision: Optional[str] = None) -> str:
+    return ":".join(part for part in (engine_name, model_name, precision) if part)
+
+
+def get_measured_rtf(engine_name: str, model_name: Optional[str] = None, precision: Optional[str] = None) -> Optional[float]:
+    """Zmierzony na tym komputerze RTF silnika/modelu (średnia krocząca z zadań lub wynik benchmarku precyzji)."""
+    measured = get_benchmark_result("engine_rtf", _rtf_key(engine_name, model_name, precision))
+    if measured:
+        return measured["rtf"]
+    if engine_name == "local" and model_name:
+        precision_result = get_benchmark_result("precision", model_name) or {}
+        mode = precision_result.get("modes", {}).get(precision or "fp32")
+        if mode and mode.get("rtf") is not None:
+            return mode["rtf"]
+    return None
+
+
+def record_engine_rtf(engine_name: str, model_name: Optional[str], precision: Optional[str],
+                      audio_seconds: float, elapsed: float) -> None:
+    """Dopisuje pomiar zadania do średniej kroczącej RTF w benchmarks.json (sekcja "engine_rtf")."""
+    if not audio_seconds or audio_seconds <= 0:
+        return
+    if engine_name == "openai":
+        # Narzut żądania nie zależy od długości nagrania - liczymy go osobno
+        elapsed = max(0.0, elapsed - API_REQUEST_OVERHEAD)
+        model_name = precision = None
+    rtf = elapsed / audio_seconds
+    key = _rtf_key(engine_name, model_name, precision)
+    previous = get_benchmark_result("engine_rtf", key)
+    if previous:
+        rtf = previous["rtf"] * (1 - RTF_SMOOTHING) + rtf * RTF_SMOOTHING
+    save_benchmark_result("engine_rtf", key, {"rtf": rtf, "samples": (previous or {}).get("samples", 0) + 1,
+                                              "date": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+
+def run_measured(engine: STTEngine, audio_file_path: str, language: Optional[str], task: str,
+                 options: Dict[str, Any], audio_seconds: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Uruchamia silnik i zapisuje jego RTF na potrzeby trybu automatycznego.
+
+    Czas lokalnego zadania liczy się tylko wtedy, gdy model był już załadowany - inaczej pomiar
+    zawierałby jednorazowe ładowanie wag. Dla zadań procesu roboczego liczony jest czas zmierzony
+    w procesie roboczym, bez czekania w kolejce za innymi zadaniami (np. plikami w tle).
+    """
+    if engine.routes_jobs:
+        return engine.transcribe_segments(audio_file_path, language=language, task=task, **options)
+    model_name = options.get("model_name") if engine.supports_models else None
+    precision = (options.get("precision") or "fp32") if engine.name == "local" else None
+    measurable = True
+    if engine.name == "local":
+        from modules.inference_worker import get_inference_worker
+        measurable = get_inference_worker().is_resident(model_name or engine.default_model, precision)
+    start = time.perf_counter()
+    result, error_msg = engine.transcribe_segments(audio_file_path, language=language, task=task, **options)
+    elapsed = time.perf_counter() - start
+    if measurable and not error_msg and result:
+        elapsed = result.get("worker_seconds", elapsed)
+        audio_seconds = audio_seconds or result.get("duration") or probe_duration(audio_file_path)
+        record_engine_rtf(engine.name, model_name or engine.default_model, precision, audio_seconds, elapsed)
+    return result, error_msg
+
+
+class RoutingPolicy:
+    """
+    Wybór silnika i modelu dla zadania w trybie automatycznym.
+
+    Dla każdego kandydata (wybrany model lokalny, mały model lokalny dla krótkich nagrań, API)
+    szacowany jest czas do wyniku: oczekiwanie w kolejce + ładowanie modelu + długość nagrania
+    razy zmierzony RTF. Wygrywa najkrótszy czas, przy czym czas API jest mnożony przez
+    API_COST_FACTOR. Decyzja zawiera wszystkie oszacowania, żeby można było sprawdzić, dlaczego
+    zadanie trafiło tam, gdzie trafiło.
+    """
+
+    def __init__(self, local_engine: Optional[STTEngine], api_engine: Optional[STTEngine]) -> None:
+        self.local_engine = local_engine
+        self.api_engine = api_engine
+        self.api_key_set = False
+
+    def _local_candidate(self, model_name: str, precision: str, duration: float, role: str) -> Dict[str, Any]:
+        from modules.inference_worker import get_inference_worker
+        worker = get_inference_worker()
+        rtf = get_measured_rtf("local", model_name, precision)
+        measured = rtf is not None
+        rtf = rtf if measured else DEFAULT_LOCAL_RTF.get(model_name, 1.0)
+        if worker.is_resident(model_name, precision):
+            load = 0.0
+        else:
+            from modules.weight_cache import get_load_times
+            load_times = [seconds for seconds in (get_load_times(model_name) or {}).values() if seconds]
+            load = min(load_times) if load_times else DEFAULT_LOAD_SECONDS
+        run_time = load + duration * rtf
+        # Zadania w procesie roboczym wykonują się po kolei - zakładamy, że poprzednie są podobne
+        wait = worker.queue_depth * run_time
+        return {"engine": "local", "model": model_name, "role": role, "rtf": rtf, "measured": measured,
+                "load": load, "wait": wait, "estimate": wait + run_time, "score": wait + run_time}
+
+    def _api_candidate(self, duration: float) -> Dict[str, Any]:
+        from modules.rate_limiter import get_rate_limiter
+        from modules.openai_whisper_client import OpenAIWhisperClient
+        status = get_rate_limiter().status()
+        rtf = get_measured_rtf("openai")
+        measured = rtf is not None
+        rtf = rtf if measured else DEFAULT_API_RTF
+        requests_needed = max(1, int(duration // OpenAIWhisperClient.CHUNK_SECONDS) + 1)
+        # Oczekiwanie na żetony harmonogramu: żądania w kolejce przed nami plus ewentualna przerwa po 429
+        wait = (status["waiting"] + status["active_uploads"]) * 60.0 / max(status["rate_rpm"], 1.0)
+        wait += max(0.0, status["paused_for"])
+        estimate = wait + requests_needed * API_REQUEST_OVERHEAD + duration * rtf
+        return {"engine": "openai", "model": None, "role": "API", "rtf": rtf, "measured": measured,
+                "load": 0.0, "wait": wait, "estimate": estimate, "score": estimate * API_COST_FACTOR}
+
+    def decide(self, audio_file_path: str, model_name: str, precision: str) -> Dict[str, Any]:
+        """
+        Wybiera silnik i model dla nagrania.
+
+        Returns:
+            Dict[str, Any]: Decyzja z kluczami 'engine', 'model', 'duration', 'candidates', 'excluded' i 'reason'
+        """
+        duration = probe_duration(audio_file_path) or 0.0
+        candidates: List[Dict[str, Any]] = []
+        excluded: List[str] = []
+
+        if self.local_engine is not None and self.local_engine.is_available():
+            from modules.inference_worker import get_inference_worker
+            candidates.append(self._local_candidate(model_name, precision, duration, "wybrany model"))
+            if duration <= SHORT_CLIP_SECONDS:
+                models = self.local_engine.get_models()
+                fast_models = [model for model in FAST_LOCAL_MODELS if model in models and model != model_name]
+                resident = [model for model in fast_models if get_inference_worker().is_resident(model, precision)]
+                if resident or fast_models:
+                    candidates.append(self._local_candidate((resident or fast_models)[0], precision, duration, "krótka notatka"))
+            else:
+                excluded.append(f"mały model lokalny: nagranie dłuższe niż {SHORT_CLIP_SECONDS} s")
+        else:
+            excluded.append("lokalny Whisper: niedostępny")
+
+        if self.api_engine is None or not self.api_engine.is_available():
+            excluded.append("API: brak klienta OpenAI")
+        elif not self.api_key_set:
+            excluded.append("API: brak klucza")
+        else:
+            candidates.append(self._api_candidate(duration))
+
+        decision = {"duration": duration, "candidates": candidates, "excluded": excluded,
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"), "file": os.path.basename(audio_file_path)}
+        if not candidates:
+            decision.update(engine=None, model=None, reason="brak dostępnego silnika")
+            return decision
+        best = min(candidates, key=lambda candidate: candidate["score"])
+        decision.update(engine=best["engine"], model=best["model"],
+                        reason=f"{best['role']}, szacowany czas {best['estimate']:.0f} s")
+        return decision
+
+
+def format_decision(decision: Dict[str, Any]) -> str:
+    """Opis decyzji do dziennika i okna diagnostyki: wybór oraz oszacowania wszystkich kandydatów."""
+    chosen = f"{decision['engine']}/{decision['model']}" if decision.get("model") else str(decision["engine"])
+    lines = [f"{decision['time']} {decision['file']} ({decision['duration']:.0f} s) -> {chosen}: {decision['reason']}"]
+    for candidate in decision["candidates"]:
+        name = f"{candidate['engine']}/{candidate['model']}" if candidate["model"] else candidate["engine"]
+        source = "zmierzony" if candidate["measured"] else "domyślny"
+        lines.append(f"    {name} ({candidate['role']}): {candidate['estimate']:.1f} s "
+                     f"[RTF {candidate['rtf']:.2f} {source}, ładowanie {candidate['load']:.0f} s, kolejka {candidate['wait']:.0f} s]")
+    for reason in decision["excluded"]:
+        lines.append(f"    pominięto {reason}")
+    return "\n".join(lines)
+
+
+def _create_routing_logger() -> logging.Logger:
+    routing_logger = logging.getLogger("DictAItorRouting")
+    if not routing_logger.handlers:
+        try:
+            os.makedirs(os.path.dirname(ROUTING_LOG_PATH), exist_ok=True)
+            handler = logging.FileHandler(ROUTING_LOG_PATH, encoding="utf-8")
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            routing_logger.addHandler(handler)
+        except OSError as e:
+            logger.warning(f"Nie można otworzyć dziennika decyzji {ROUTING_LOG_PATH}: {e}")
+    routing_logger.setLevel(logging.INFO)
+    return routing_logger
+
+
+@register_engine
+class AutoEngine(STTEngine):
+    """Tryb automatyczny: każde zadanie trafia do silnika i modelu wybranego przez RoutingPolicy."""
+
+    name = "auto"
+    display_name = "Automatycznie"
+    action_label = "Transkrybuj"
+    # Wybrany model jest docelowym modelem lokalnym; krótkie notatki mogą trafić do mniejszego
+    supports_models = True
+    default_model = "turbo"
+    order = 90
+    routes_jobs = True
+
+    def __init__(self) -> None:
+        self.engines = {name: create_engine(name) for name in ("local", "openai")}
+        self.policy = RoutingPolicy(self.engines["local"], self.engines["openai"])
+        self.recent_decisions = deque(maxlen=RECENT_DECISIONS)
+        self._routing_logger = _create_routing_logger()
+
+    def is_available(self) -> bool:
+        return any(engine is not None and engine.is_available() for engine in self.engines.values())
+
+    def configure(self, **settings: Any) -> None:
+        for engine in self.engines.values():
+            if engine is not None:
+                engine.configure(**settings)
+        if "api_key" in settings:
+            self.policy.api_key_set = bool(settings["api_key"])
+
+    def get_models(self) -> List[str]:
+        local_engine = self.engines["local"]
+        return local_engine.get_models() if local_engine is not None and local_engine.is_available() else []
+
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Jak STTEngine.transcribe_segments. Dodatkowa opcja routing_callback otrzymuje decyzję
+        (słownik z RoutingPolicy.decide) przed rozpoczęciem transkrypcji.
+        """
+        model_name = options.get("model_name") or self.default_model
+        decision = self.policy.decide(audio_file_path, model_name, options.get("precision") or "fp32")
+        self.recent_decisions.append(decision)
+        self._routing_logger.info(format_decision(decision))
+        logger.info(f"Tryb automatyczny: {decision['engine']} ({decision['reason']})")
+        if decision["engine"] is None:
+            return None, "Tryb automatyczny: żaden silnik transkrypcji nie jest dostępny."
+
+        routing_callback: Optional[Callable[[Dict[str, Any]], None]] = options.pop("routing_callback", None)
+        if routing_callback is not None:
+            routing_callback(decision)
+        engine = self.engines[decision["engine"]]
+        if decision["model"]:
+            options["model_name"] = decision["model"]
+        result, error_msg = run_measured(engine, audio_file_path, language, task, options, audio_seconds=decision["duration"])
+        if result is not None:
+            result = {**result, "engine": decision["engine"], "model": decision["model"]}
+        return result, error_msg
+
+    def describe_policy(self) -> str:
+        """Zasady wyboru i ostatnie decyzje - do podglądu w ustawieniach."""
+        lines = ["Tryb automatyczny wybiera silnik o najkrótszym szacowanym czasie do wyniku:",
+                 "  kolejka + ładowanie modelu + długość nagrania x RTF zmierzony na tym komputerze.",
+                 f"  Nagrania do {SHORT_CLIP_SECONDS} s mogą trafić do małego modelu ({', '.join(FAST_LOCAL_MODELS)}),",
+                 "  dłuższe - do wybranego modelu lokalnego albo do API (dzielone na fragmenty).",
+                 f"  Czas API jest mnożony przez {API_COST_FACTOR} (koszt i wysyłka nagrania poza komputer).", "",
+                 "Ostatnie decyzje:"]
+        if not self.recent_decisions:
+            lines.append("  brak")
+        lines.extend(format_decision(decision) for decision in reversed(self.recent_decisions))
+        lines += ["", f"Pełny dziennik: {ROUTING_LOG_PATH}"]
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+# X:\Aplikacje\dictaitor\modules\benchmark.py
+import json
+import os
+import time
+import wave
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.config_manager import CONFIG_DIR, ensure_config_dir_exists
+
+logger = logging.getLogger(__name__)
+
+# Wyniki pomiarów trzymamy w osobnym pliku, żeby nie mieszać ich z ustawieniami użytkownika
+BENCHMARKS_FILE_PATH = os.path.join(CONFIG_DIR, "benchmarks.json")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDINGS_DIR = os.path.join(APP_DIR, "recordings")
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac", ".m4a")
+SAMPLE_RATE = 16000
+
+
+def get_audio_duration(audio_file_path: str) -> Optional[float]:
+    """
+    Zwraca długość pliku audio w sekundach.
+
+    Dla plików WAV odczytuje nagłówek, dla pozostałych formatów dekoduje plik przez Whisper (FFmpeg).
+
+    Args:
+        audio_file_path: Ścieżka do pliku audio
+
+    Returns:
+        Optional[float]: Długość w sekundach lub None, jeśli nie da się jej ustalić
+    """
+    try:
+        if audio_file_path.lower().endswith(".wav"):
+            with wave.open(audio_file_path, "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+    except Exception as e:
+        logger.warning(f"Nie można odczytać nagłówka WAV {audio_file_path}: {e}")
+
+    try:
+        import whisper
+        audio = whisper.load_audio(audio_file_path)
+        return len(audio) / float(SAMPLE_RATE)
+    except Exception as e:
+        logger.warning(f"Nie można ustalić długości pliku {audio_file_path}: {e}")
+        return None
+
+
+def find_reference_clip(preferred_path: Optional[str] = None) -> Optional[str]:
+    """
+    Wybiera klip referencyjny do benchmarków.
+
+    Args:
+        preferred_path: Ścieżka wskazana przez użytkownika (np. aktualnie wybrany plik)
+
+    Returns:
+        Optional[str]: Ścieżka do klipu lub None, jeśli nie ma żadnego nagrania
+    """
+    if preferred_path and os.path.exists(preferred_path):
+        return preferred_path
+    if not os.path.isdir(RECORDINGS_DIR):
+        return None
+    candidates = [os.path.join(RECORDINGS_DIR, name) for name in os.listdir(RECORDINGS_DIR)
+                  if name.lower().endswith(AUDIO_EXTENSIONS)]
+    if not candidates:
+        return None
+    # Najnowsze nagranie najlepiej odpowiada typowemu użyciu aplikacji
+    return max(candidates, key=os.path.getmtime)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Oblicza WER (Word Error Rate) hipotezy względem tekstu referencyjnego.
+
+    Args:
+        reference: Tekst wzorcowy
+        hypothesis: Tekst porównywany
+
+    Returns:
+        float: Odsetek błędów słów (0.0 = identyczne)
+    """
+    ref_words = reference.lower().split()
+    hyp_words = hypothesis.lower().split()
+    if not ref_words:
+        return 0.0 if not hyp_words else 1.0
+
+    # Klasyczna odległość Levenshteina na poziomie słów, liczona w dwóch wierszach
+    previous = list(range(len(hyp_words) + 1))
+    for i, ref_word in enumerate(ref_words, start=1):
+        current = [i] + [0] * len(hyp_words)
+        for j, hyp_word in enumerate(hyp_words, start=1):
+            cost = 0 if ref_word == hyp_word else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        previous = current
+    return previous[-1] / float(len(ref_words))
+
+
+def measure_transcription(transcribe_fn: Callable[[], Tuple[Optional[str], Optional[str]]],
+                          duration: float) -> Dict[str, Any]:
+    """
+    Mierzy czas wykonania funkcji transkrybującej i wylicza współczynnik czasu rzeczywistego (RTF).
+
+    Args:
+        transcribe_fn: Funkcja bez argumentów zwracająca (tekst, błąd)
+        duration: Długość klipu w sekundach
+
+    Returns:
+        Dict[str, Any]: Słownik z kluczami 'elapsed', 'rtf', 'text' i 'error'
+    """
+    start = time.perf_counter()
+    text, error = transcribe_fn()
+    elapsed = time.perf_counter() - start
+    rtf = elapsed / duration if duration else None
+    return {"elapsed": elapsed, "rtf": rtf, "text": text or "", "error": error}
+
+
+def load_benchmarks() -> Dict[str, Any]:
+    """Wczytuje zapisane wyniki benchmarków (pusty słownik, jeśli ich nie ma)."""
+    if not os.path.exists(BENCHMARKS_FILE_PATH):
+        return {}
+    try:
+        with open(BENCHMARKS_FILE_PATH, "r") as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        logger.error(f"Błąd podczas wczytywania wyników benchmarków z {BENCHMARKS_FILE_PATH}: {e}")
+        return {}
+
+
+def save_benchmark_result(section: str, key: str, result: Dict[str, Any]) -> bool:
+    """
+    Zapisuje wynik benchmarku w pliku benchmarks.json.
+
+    Args:
+        section: Rodzaj benchmarku (np. "precision")
+        key: Klucz wyniku w ramach sekcji (np. nazwa modelu)
+        result: Dane do zapisania
+
+    Returns:
+        bool: True jeśli zapisano pomyślnie
+    """
+    ensure_config_dir_exists()
+    benchmarks = load_benchmarks()
+    benchmarks.setdefault(section, {})[key] = result
+    try:
+        with open(BENCHMARKS_FILE_PATH, "w") as f:
+            json.dump(benchmarks, f, indent=4)
+        return True
+    except IOError as e:
+        logger.error(f"Błąd podczas zapisywania wyników benchmarków do {BENCHMARKS_FILE_PATH}: {e}")
+        return False
+
+
+def get_benchmark_result(section: str, key: str) -> Optional[Dict[str, Any]]:
+    """Zwraca zapisany wynik benchmarku lub None."""
+    return load_benchmarks().get(section, {}).get(key)
@@ -0,0 +1,244 @@
+# X:\Aplikacje\dictaitor\modules\cpu_tuning.py
+import os
+import hashlib
+import platform
+import logging
+from typing import Any, Dict, List, Optional
+
+from modules.benchmark import get_benchmark_result, save_benchmark_result
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    PSUTIL_INSTALLED = True
+except ImportError:
+    PSUTIL_INSTALLED = False
+
+# Wartość oznaczająca "dobierz automatycznie" w ustawieniach liczby wątków
+AUTO_THREADS = "auto"
+
+# Pulę inter-op PyTorch można ustawić tylko raz, zanim ruszą pierwsze obliczenia równoległe
+_interop_threads_applied: Optional[int] = None
+
+
+def get_machine_id() -> str:
+    """Zwraca krótki identyfikator maszyny, pod którym zapisywane są wyniki strojenia."""
+    description = f"{platform.node()}|{platform.processor()}|{os.cpu_count()}"
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()[:12]
+
+
+def get_physical_core_count() -> int:
+    """Zwraca liczbę fizycznych rdzeni (bez hyperthreadingu), jeśli da się ją ustalić."""
+    if PSUTIL_INSTALLED:
+        physical = psutil.cpu_count(logical=False)
+        if physical:
+            return physical
+    # Bez psutil zakładamy 2 wątki logiczne na rdzeń - typowy układ na stacjach roboczych
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def candidate_thread_counts() -> List[int]:
+    """Liczby wątków intra-op sprawdzane podczas strojenia: potęgi dwójki, liczba rdzeni fizycznych i logicznych."""
+    logical = os.cpu_count() or 1
+    physical = get_physical_core_count()
+    candidates = {physical, logical}
+    count = 1
+    while count < logical:
+        candidates.add(count)
+        count *= 2
+    return sorted(candidates)
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """
+    Zamienia zapis listy procesorów (np. "0-3,6") na listę numerów.
+
+    Raises:
+        ValueError: Jeśli zapis jest niepoprawny.
+    """
+    cpus = set()
+    for part in cpu_list.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def set_cpu_affinity(cpus: List[int]) -> bool:
+    """
+    Przypina bieżący proces do wskazanych procesorów logicznych.
+
+    Returns:
+        bool: True jeśli ustawiono powinowactwo
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        elif PSUTIL_INSTALLED:
+            # Windows i macOS - tylko przez psutil
+            psutil.Process().cpu_affinity(cpus)
+        else:
+            logger.warning("Ustawienie powinowactwa CPU wymaga biblioteki psutil na tym systemie.")
+            return False
+        logger.info(f"Ustawiono powinowactwo procesu do CPU: {cpus}")
+        return True
+    except (OSError, ValueError) as e:
+        logger.error(f"Nie można ustawić powinowactwa CPU {cpus}: {e}")
+        return False
+
+
+def apply_thread_settings(intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                          cpu_affinity: Optional[str] = None) -> None:
+    """
+    Stosuje ustawienia wątków PyTorch i powinowactwa CPU dla bieżącego procesu.
+
+    Args:
+        intra_op_threads: Liczba wątków wewnątrz operacji (torch.set_num_threads); None = bez zmian
+        inter_op_threads: Rozmiar puli inter-op (torch.set_num_interop_threads); None = bez zmian
+        cpu_affinity: Lista procesorów w zapisie "0-3,6"; pusty lub None = bez zmian
+    """
+    global _interop_threads_applied
+    if cpu_affinity:
+        try:
+            set_cpu_affinity(parse_cpu_list(cpu_affinity))
+        except ValueError:
+            logger.error(f"Niepoprawna lista procesorów: '{cpu_affinity}' (oczekiwany format np. 0-3,6)")
+
+    if not intra_op_threads and not inter_op_threads:
+        return
+    try:
+        import torch
+    except ImportError:
+        logger.warning("PyTorch nie jest zainstalowany - pomijam ustawienia wątków.")
+        return
+
+    if intra_op_threads and torch.get_num_threads() != intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+        logger.info(f"Liczba wątków intra-op PyTorch: {intra_op_threads}")
+
+    if inter_op_threads and inter_op_threads != _interop_threads_applied:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+            _interop_threads_applied = inter_op_threads
+            logger.info(f"Rozmiar puli inter-op PyTorch: {inter_op_threads}")
+        except RuntimeError as e:
+            # PyTorch pozwala na to tylko przed pierwszymi obliczeniami równoległymi
+            logger.warning(f"Nie można zmienić puli inter-op w trakcie działania ({e}). Zmiana zadziała po ponownym uruchomieniu.")
+
+
+def _tuning_key(model_name: str, precision: str) -> str:
+    return f"{get_machine_id()}/{model_name}/{precision}"
+
+
+def get_tuned_threads(model_name: str, precision: str) -> Optional[int]:
+    """Zwraca najlepszą zmierzoną liczbę wątków intra-op dla tej maszyny i modelu (lub None)."""
+    result = get_benchmark_result("threads", _tuning_key(model_name, precision))
+    return result.get("best_threads") if result else None
+
+
+def resolve_thread_settings(thread_settings: Optional[Dict[str, Any]], model_name: str, precision: str) -> Dict[str, Any]:
+    """
+    Zamienia ustawienia z konfiguracji (mogące zawierać "auto") na konkretne wartości.
+
+    Args:
+        thread_settings: Słownik z kluczami 'intra_op_threads', 'inter_op_threads', 'cpu_affinity'
+        model_name: Nazwa modelu, dla którego szukamy wyniku strojenia
+        precision: Tryb precyzji modelu
+
+    Returns:
+        Dict[str, Any]: Argumenty dla apply_thread_settings
+    """
+    thread_settings = thread_settings or {}
+    intra = thread_settings.get("intra_op_threads", AUTO_THREADS)
+    if intra in (None, "", AUTO_THREADS):
+        intra = get_tuned_threads(model_name, precision)
+    inter = thread_settings.get("inter_op_threads", AUTO_THREADS)
+    if inter in (None, "", AUTO_THREADS):
+        inter = None
+    return {
+        "intra_op_threads": int(intra) if intra else None,
+        "inter_op_threads": int(inter) if inter else None,
+        "cpu_affinity": thread_settings.get("cpu_affinity") or None,
+    }
+
+
+def _allowed_cpu_count() -> int:
+    """Liczba procesorów logicznych, na których może działać bieżący proces (z uwzględnieniem powinowactwa)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    if PSUTIL_INSTALLED:
+        try:
+            return len(psutil.Process().cpu_affinity())
+        except (AttributeError, OSError):
+            pass
+    return os.cpu_count() or 1
+
+
+def autotune_threads(reference_clip: str, model_name: str = "turbo", precision: str = "fp32",
+                     language: Optional[str] = None,
+                     thread_settings: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Mierzy RTF lokalnego Whispera dla różnych liczb wątków intra-op i zapisuje najlepszą.
+
+    Wywoływać w procesie, który potem transkrybuje (proces roboczy): liczy się jego obciążenie i powinowactwo CPU.
+
+    Args:
+        reference_clip: Ścieżka do klipu referencyjnego
+        model_name: Nazwa modelu Whisper
+        precision: Tryb precyzji ("fp32" lub "int8")
+        language: Opcjonalny kod języka nagrania
+        thread_settings: Ustawienia użytkownika - pula inter-op i powinowactwo CPU obowiązują też podczas pomiaru
+
+    Returns:
+        Optional[Dict[str, Any]]: Wynik strojenia (najlepsza liczba wątków i RTF dla każdej) lub None przy błędzie
+    """
+    import torch
+    from modules.benchmark import get_audio_duration, measure_transcription
+    from modules.local_stt import transcribe_audio_local
+
+    duration = get_audio_duration(reference_clip)
+    if not duration:
+        logger.error(f"Nie można ustalić długości klipu referencyjnego: {reference_clip}")
+        return None
+
+    # Strojona jest tylko liczba wątków intra-op; reszta ustawień jak przy zwykłej transkrypcji
+    resolved = resolve_thread_settings(thread_settings, model_name, precision)
+    apply_thread_settings(inter_op_threads=resolved["inter_op_threads"], cpu_affinity=resolved["cpu_affinity"])
+    allowed_cpus = _allowed_cpu_count()
+    candidates = [count for count in candidate_thread_counts() if count <= allowed_cpus] or [allowed_cpus]
+
+    original_threads = torch.get_num_threads()
+    transcribe = lambda: transcribe_audio_local(reference_clip, model_name=model_name, language=language, precision=precision)
+    try:
+        # Przebieg rozgrzewkowy: ładowanie modelu i pierwsze alokacje nie mogą zaburzyć pomiarów
+        _, error_msg = transcribe()
+        if error_msg:
+            logger.error(f"Strojenie wątków przerwane: {error_msg}")
+            return None
+
+        timings = {}
+        for threads in candidates:
+            torch.set_num_threads(threads)
+            measurement = measure_transcription(transcribe, duration)
+            if measurement["error"]:
+                logger.error(f"Strojenie wątków przerwane: {measurement['error']}")
+                return None
+            timings[threads] = measurement["rtf"]
+            logger.info(f"Strojenie {model_name}/{precision}: {threads} wątków -> RTF {measurement['rtf']:.3f}")
+    finally:
+        torch.set_num_threads(original_threads)
+
+    best_threads = min(timings, key=timings.get)
+    result = {
+        "best_threads": best_threads,
+        "rtf": {str(threads): rtf for threads, rtf in timings.items()},
+        "clip": os.path.basename(reference_clip),
+    }
+    save_benchmark_result("threads", _tuning_key(model_name, precision), result)
+    logger.info(f"Najlepsza liczba wątków dla {model_name}/{precision}: {best_threads} (RTF {timings[best_threads]:.3f})")
+    return result
@@ -0,0 +1,138 @@
+# X:\Aplikacje\dictaitor\modules\decoding_presets.py
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.whisper_decoding import (DEFAULT_COMPRESSION_RATIO_THRESHOLD, DEFAULT_LOGPROB_THRESHOLD,
+                                      DEFAULT_NO_SPEECH_THRESHOLD, DEFAULT_TEMPERATURES)
+
+logger = logging.getLogger(__name__)
+
+# Ustawienia dekodowania Whisper, które najbardziej wpływają na koszt:
+#   beam_size - szerokość wiązki (None = dekodowanie zachłanne, najtańsze),
+#   best_of - liczba próbek przy ponownym dekodowaniu z temperaturą > 0,
+#   temperature_fallback - czy okna wyglądające na pętlę lub śmieci są dekodowane ponownie z wyższą temperaturą,
+#   condition_on_previous_text - poprzedni tekst jako podpowiedź (spójniejszy tekst, ale ryzyko powtórzeń),
+#   no_speech_threshold - próg prawdopodobieństwa ciszy, powyżej którego okno jest pomijane
+DECODING_PRESETS: Dict[str, Dict[str, Any]] = {
+    "fast": {"beam_size": None, "best_of": None, "temperature_fallback": False,
+             "condition_on_previous_text": False, "no_speech_threshold": DEFAULT_NO_SPEECH_THRESHOLD},
+    # Ustawienia domyślne whisper.transcribe - dotychczasowe zachowanie aplikacji
+    "balanced": {"beam_size": None, "best_of": 5, "temperature_fallback": True,
+                 "condition_on_previous_text": True, "no_speech_threshold": DEFAULT_NO_SPEECH_THRESHOLD},
+    "accurate": {"beam_size": 5, "best_of": 5, "temperature_fallback": True,
+                 "condition_on_previous_text": True, "no_speech_threshold": DEFAULT_NO_SPEECH_THRESHOLD},
+}
+CUSTOM_PRESET = "custom"
+DEFAULT_PRESET = "balanced"
+# Wzorzec dokładności przy pomiarze presetów - WER pozostałych liczony względem jego tekstu
+REFERENCE_PRESET = "accurate"
+
+PRESET_LABELS = {"fast": "Szybki", "balanced": "Zrównoważony", "accurate": "Dokładny", CUSTOM_PRESET: "Własny"}
+# Domyślna wiązka WhisperModel.transcribe z faster-whisper - preset domyślny zachowuje ją dla tego silnika,
+# tak jak dla whisper.transcribe zachowuje dekodowanie zachłanne
+FASTER_WHISPER_DEFAULT_BEAM_SIZE = 5
+
+
+def normalize_settings(custom: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Uzupełnia ustawienia (np. własne użytkownika) brakującymi wartościami presetu domyślnego i sprowadza je do poprawnych typów."""
+    settings = dict(DECODING_PRESETS[DEFAULT_PRESET])
+    for key, value in (custom or {}).items():
+        if key not in settings:
+            logger.warning(f"Nieznane ustawienie dekodowania '{key}' - pomijam.")
+            continue
+        settings[key] = value
+    for key in ("beam_size", "best_of"):
+        try:
+            settings[key] = int(settings[key]) if settings[key] else None
+        except (TypeError, ValueError):
+            logger.warning(f"Niepoprawna wartość {key}: {settings[key]!r} - używam domyślnej.")
+            settings[key] = DECODING_PRESETS[DEFAULT_PRESET][key]
+        if settings[key] is not None and settings[key] < 2:
+            settings[key] = None  # wiązka/próbka o rozmiarze 1 to po prostu dekodowanie zachłanne
+    try:
+        settings["no_speech_threshold"] = min(1.0, max(0.0, float(settings["no_speech_threshold"])))
+    except (TypeError, ValueError):
+        settings["no_speech_threshold"] = DEFAULT_NO_SPEECH_THRESHOLD
+    settings["temperature_fallback"] = bool(settings["temperature_fallback"])
+    settings["condition_on_previous_text"] = bool(settings["condition_on_previous_text"])
+    return settings
+
+
+def get_preset_settings(preset: Optional[str], custom: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Zwraca ustawienia presetu (dla "custom" - własne ustawienia użytkownika)."""
+    if preset == CUSTOM_PRESET:
+        return normalize_settings(custom)
+    if preset not in DECODING_PRESETS:
+        if preset:
+            logger.warning(f"Nieznany preset dekodowania '{preset}' - używam '{DEFAULT_PRESET}'.")
+        preset = DEFAULT_PRESET
+    return dict(DECODING_PRESETS[preset])
+
+
+def whisper_decoding_arguments(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Zamienia ustawienia presetu na argumenty whisper_decoding.decode_features(_multi)."""
+    decode_options = {key: settings[key] for key in ("beam_size", "best_of") if settings.get(key)}
+    return {
+        "temperatures": DEFAULT_TEMPERATURES if settings["temperature_fallback"] else (0.0,),
+        "compression_ratio_threshold": DEFAULT_COMPRESSION_RATIO_THRESHOLD,
+        "logprob_threshold": DEFAULT_LOGPROB_THRESHOLD,
+        "no_speech_threshold": settings["no_speech_threshold"],
+        "condition_on_previous_text": settings["condition_on_previous_text"],
+        "decode_options": decode_options,
+    }
+
+
+def faster_whisper_arguments(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Zamienia ustawienia presetu na argumenty WhisperModel.transcribe z faster-whisper."""
+    beam_size = settings.get("beam_size")
+    if not beam_size and settings == normalize_settings(DECODING_PRESETS[DEFAULT_PRESET]):
+        # Dotychczasowe zachowanie silnika faster-whisper to jego własne ustawienia domyślne (wiązka 5)
+        beam_size = FASTER_WHISPER_DEFAULT_BEAM_SIZE
+    return {
+        # faster-whisper nie ma trybu bez wiązki - wiązka o szerokości 1 to dekodowanie zachłanne
+        "beam_size": beam_size or 1,
+        "best_of": settings.get("best_of") or 1,
+        "temperature": list(DEFAULT_TEMPERATURES) if settings["temperature_fallback"] else 0.0,
+        "condition_on_previous_text": settings["condition_on_previous_text"],
+        "no_speech_threshold": settings["no_speech_threshold"],
+    }
+
+
+def describe_settings(settings: Dict[str, Any]) -> str:
+    """Krótki opis ustawień do logu i interfejsu, np. 'wiązka 5, best_of 5, z podnoszeniem temperatury'."""
+    parts = [f"wiązka {settings['beam_size']}" if settings.get("beam_size") else "zachłanne"]
+    if settings["temperature_fallback"]:
+        parts.append(f"best_of {settings['best_of']}, z podnoszeniem temperatury" if settings.get("best_of")
+                     else "z podnoszeniem temperatury")
+    else:
+        parts.append("bez podnoszenia temperatury")
+    parts.append("z kontekstem" if settings["condition_on_previous_text"] else "bez kontekstu")
+    parts.append(f"próg ciszy {settings['no_speech_threshold']:.2f}")
+    return ", ".join(parts)
+
+
+def benchmark_key(model_name: str, precision: str) -> str:
+    """Klucz wyników w sekcji "decoding_presets" pliku benchmarks.json."""
+    return f"{model_name}/{precision}"
+
+
+def preset_choices(measured: Optional[Dict[str, Any]] = None,
+                   custom: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str]]:
+    """
+    Pozycje listy presetów: (etykieta, nazwa_presetu), z RTF zmierzonym na tym komputerze.
+
+    Args:
+        measured: Wynik z benchmarks.json (sekcja "decoding_presets") dla wybranego modelu i precyzji
+        custom: Bieżące własne ustawienia - pomiar zrobiony dla innych ustawień nie jest pokazywany
+    """
+    presets = (measured or {}).get("presets", {})
+    choices = []
+    for preset in list(DECODING_PRESETS) + [CUSTOM_PRESET]:
+        label = PRESET_LABELS[preset]
+        stats = presets.get(preset)
+        if preset == CUSTOM_PRESET and stats and stats.get("settings") != normalize_settings(custom):
+            stats = None
+        if stats and stats.get("rtf") is not None:
+            label += f" · RTF {stats['rtf']:.2f}"
+        choices.append((label, preset))
+    return choices
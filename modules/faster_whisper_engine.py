@@ -0,0 +1,206 @@
+# X:\Aplikacje\dictaitor\modules\faster_whisper_engine.py
+import os
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.cpu_tuning import apply_thread_settings, resolve_thread_settings
+from modules.decoding_presets import describe_settings, faster_whisper_arguments, normalize_settings
+from modules.jobs import JobCancelledError
+from modules.progress import ProgressReporter
+from modules.stt_engines import STTEngine, register_engine
+
+logger = logging.getLogger(__name__)
+
+# Modele obsługiwane przez faster-whisper (CTranslate2); lista jest zawężana do tego, co zna zainstalowana wersja
+FASTER_WHISPER_MODELS = ["tiny", "base", "small", "medium", "large-v2", "large-v3", "turbo"]
+
+# int8 na CPU: kilkukrotnie szybciej niż PyTorch fp32 przy ułamku zużycia pamięci
+DEFAULT_COMPUTE_TYPE = "int8"
+
+_loaded_model = None
+_current_model_key = None
+
+try:
+    from faster_whisper import WhisperModel
+    try:
+        from faster_whisper import available_models
+        FASTER_WHISPER_MODELS = [model for model in FASTER_WHISPER_MODELS if model in available_models()]
+    except ImportError:
+        pass
+    FASTER_WHISPER_INSTALLED = True
+    logger.info("Biblioteka faster-whisper jest dostępna. Dostępne modele: " + ", ".join(FASTER_WHISPER_MODELS))
+except ImportError as e:
+    FASTER_WHISPER_INSTALLED = False
+    logger.info(f"Biblioteka faster-whisper nie jest zainstalowana. Silnik CTranslate2 nie będzie dostępny. Błąd: {str(e)}")
+
+
+def load_faster_whisper_model(model_name: str = "base", compute_type: str = DEFAULT_COMPUTE_TYPE, cpu_threads: int = 0):
+    """
+    Ładuje model faster-whisper na CPU.
+    Ponowne wywołanie z tymi samymi parametrami nie będzie go ładować ponownie.
+
+    Args:
+        model_name (str): Nazwa modelu (np. "base", "turbo").
+        compute_type (str): Typ obliczeń CTranslate2 ("int8", "int8_float32", "float32").
+        cpu_threads (int): Liczba wątków (0 = wartość domyślna CTranslate2).
+    """
+    global _loaded_model, _current_model_key
+
+    if not FASTER_WHISPER_INSTALLED:
+        logger.error("Próba załadowania modelu faster-whisper, ale biblioteka nie jest zainstalowana")
+        return None
+
+    model_key = (model_name, compute_type, cpu_threads)
+    if _loaded_model is not None and _current_model_key == model_key:
+        logger.info(f"Model faster-whisper '{model_name}' ({compute_type}) jest już załadowany.")
+        return _loaded_model
+
+    try:
+        logger.info(f"Ładowanie modelu faster-whisper: '{model_name}' ({compute_type})... Przy pierwszym użyciu model zostanie pobrany.")
+        _loaded_model = None
+        _loaded_model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+        _current_model_key = model_key
+        logger.info(f"Model faster-whisper '{model_name}' załadowany pomyślnie.")
+        return _loaded_model
+    except Exception as e:
+        logger.error(f"Nie udało się załadować modelu faster-whisper '{model_name}': {e}")
+        _loaded_model = None
+        _current_model_key = None
+        return None
+
+
+def transcribe_audio_faster_whisper(audio_file_path: str, model_name: str = "turbo", language: Optional[str] = None,
+                                    task: str = "transcribe", compute_type: str = DEFAULT_COMPUTE_TYPE,
+                                    cpu_threads: int = 0,
+                                    segment_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                    cancel_token=None,
+                                    decoding: Optional[Dict[str, Any]] = None,
+                                    initial_prompt: Optional[str] = None,
+                                    thread_settings: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Przeprowadza transkrypcję lub tłumaczenie pliku audio przy użyciu faster-whisper.
+
+    Args:
+        audio_file_path (str): Ścieżka do pliku audio.
+        model_name (str): Nazwa modelu.
+        language (Optional[str]): Kod języka lub None (automatyczne wykrywanie).
+        task (str): "transcribe" lub "translate".
+        compute_type (str): Typ obliczeń CTranslate2.
+        cpu_threads (int): Liczba wątków CTranslate2 (0 = wartość domyślna).
+        segment_callback (Optional[Callable]): Wywoływana z każdym segmentem zaraz po jego zdekodowaniu.
+        progress_callback (Optional[Callable]): Otrzymuje postęp liczony z końca ostatniego segmentu (patrz progress.ProgressReporter).
+        cancel_token (Optional[CancellationToken]): Token anulowania sprawdzany po każdym segmencie.
+        decoding (Optional[Dict[str, Any]]): Ustawienia dekodowania (patrz decoding_presets; None = preset domyślny).
+        initial_prompt (Optional[str]): Podpowiedź dla modelu, np. terminy ze słownika poprawek.
+        thread_settings (Optional[Dict[str, Any]]): Ustawienia wątków i powinowactwa CPU (patrz cpu_tuning);
+            jawna liczba wątków zastępuje cpu_threads, powinowactwo dotyczy bieżącego procesu.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik z kluczami 'text', 'segments', 'language', błąd_wiadomość)
+    """
+    if not FASTER_WHISPER_INSTALLED:
+        return None, "Biblioteka faster-whisper nie jest zainstalowana. Zainstaluj używając: pip install faster-whisper"
+
+    if not os.path.exists(audio_file_path):
+        error_msg = f"Nie można znaleźć pliku audio: {audio_file_path}"
+        logger.error(error_msg)
+        return None, error_msg
+
+    if thread_settings is not None:
+        # Jawnie ustawiona liczba wątków i powinowactwo CPU obowiązują także dla CTranslate2
+        resolved = resolve_thread_settings(thread_settings, model_name, "ct2")
+        if resolved["cpu_affinity"]:
+            apply_thread_settings(cpu_affinity=resolved["cpu_affinity"])
+        cpu_threads = resolved["intra_op_threads"] or cpu_threads
+
+    model = load_faster_whisper_model(model_name, compute_type=compute_type, cpu_threads=cpu_threads)
+    if model is None:
+        return None, f"Nie udało się załadować modelu faster-whisper '{model_name}'."
+
+    try:
+        logger.info(f"Rozpoczynanie transkrypcji faster-whisper: {audio_file_path} (model: {model_name}, {compute_type}, język: {language or 'auto'}, zadanie: {task})")
+        decoding_settings = normalize_settings(decoding)
+        logger.info(f"Dekodowanie: {describe_settings(decoding_settings)}")
+        segments_iter, info = model.transcribe(audio_file_path, language=language if task == "transcribe" else None, task=task,
+                                               initial_prompt=initial_prompt, **faster_whisper_arguments(decoding_settings))
+        # Segmenty są generowane leniwie - dekodowanie odbywa się podczas iteracji
+        reporter = ProgressReporter(progress_callback, total_seconds=info.duration) if progress_callback is not None else None
+        segments = []
+        for segment in segments_iter:
+            if cancel_token is not None:
+                # Przerwanie iteracji zatrzymuje dekodowanie - kolejne okna nie są już liczone
+                cancel_token.raise_if_cancelled()
+            segments.append({
+                "id": len(segments),
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+            })
+            if segment_callback is not None:
+                segment_callback(segments[-1])
+            if reporter:
+                reporter.update(segment.end)
+        if reporter:
+            reporter.finish()
+        text = "".join(segment["text"] for segment in segments).strip()
+        logger.info(f"Transkrypcja faster-whisper zakończona. Wykryty język: {info.language}.")
+        return {"text": text, "segments": segments, "language": info.language}, None
+    except JobCancelledError as e:
+        logger.info(f"Transkrypcja faster-whisper przerwana: {e}")
+        raise
+    except Exception as e:
+        error_msg = f"Błąd podczas transkrypcji faster-whisper pliku {audio_file_path}: {e}"
+        logger.error(error_msg)
+        return None, error_msg
+
+
+@register_engine
+class FasterWhisperEngine(STTEngine):
+    """Lokalny Whisper na CTranslate2 (faster-whisper) z obliczeniami int8 na CPU."""
+
+    name = "faster_whisper"
+    display_name = "Lokalna (faster-whisper)"
+    action_label = "Transkrybuj Lokalnie (CT2)"
+    supports_models = True
+    default_model = "turbo"
+    order = 20
+    # Jak LocalWhisperEngine: inferencja w procesie roboczym, in_process=True wymusza bieżący proces
+    out_of_process = True
+
+    def is_available(self) -> bool:
+        return FASTER_WHISPER_INSTALLED
+
+    def get_models(self) -> List[str]:
+        return FASTER_WHISPER_MODELS
+
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        model_name = options.get("model_name") or self.default_model
+        if model_name not in FASTER_WHISPER_MODELS:
+            logger.warning(f"Model '{model_name}' nie jest obsługiwany przez faster-whisper. Używam '{self.default_model}'.")
+            model_name = self.default_model
+        arguments = {
+            "audio_file_path": audio_file_path,
+            "model_name": model_name,
+            "language": language,
+            "task": task,
+            "compute_type": options.get("compute_type", DEFAULT_COMPUTE_TYPE),
+            "thread_settings": options.get("thread_settings") or {},
+            "decoding": options.get("decoding"),
+            "initial_prompt": options.get("initial_prompt"),
+        }
+        callbacks = {
+            "segment_callback": options.get("segment_callback"),
+            "progress_callback": options.get("progress_callback"),
+            "cancel_token": options.get("cancel_token"),
+        }
+        if options.get("in_process", not self.out_of_process):
+            return transcribe_audio_faster_whisper(**arguments, **callbacks)
+        # Ładowanie modelu, obliczenia CTranslate2 i powinowactwo CPU dotyczą procesu roboczego, nie okna
+        from modules.inference_worker import get_inference_worker
+        from modules.resource_governor import PRIORITY_INTERACTIVE
+        return get_inference_worker(options.get("priority", PRIORITY_INTERACTIVE)).run("transcribe_faster", **callbacks, **arguments)
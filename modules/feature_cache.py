@@ -0,0 +1,327 @@
+# X:\Aplikacje\dictaitor\modules\feature_cache.py
+import os
+import json
+import time
+import wave
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from modules.audio_stream import SAMPLE_RATE, find_wav_data_chunk
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    FEATURE_CACHE_AVAILABLE = True
+except ImportError:
+    FEATURE_CACHE_AVAILABLE = False
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FEATURE_CACHE_DIR = os.path.join(APP_DIR, "models_cache", "features")
+INDEX_FILE_NAME = "index.json"
+LOCK_FILE_NAME = "index.lock"
+LOCK_RETRY_INTERVAL = 0.05
+AUDIO_FILE_NAME = "audio.wav"
+# Łączny limit rozmiaru pamięci podręcznej; po przekroczeniu usuwane są najdawniej używane wpisy
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Ustawienie użytkownika; proces roboczy dostaje je razem z każdym zadaniem (inference_worker)
+_cache_enabled = True
+
+
+def set_feature_cache_enabled(enabled: bool) -> None:
+    global _cache_enabled
+    _cache_enabled = bool(enabled)
+
+
+def is_feature_cache_enabled() -> bool:
+    return _cache_enabled
+
+
+def file_hash(path: str) -> str:
+    """Skrót zawartości pliku (BLAKE2b) - ten sam plik pod inną nazwą lub w innym folderze trafia w ten sam wpis."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Pamięć podręczna zdekodowanego audio i spektrogramów log-mel, kluczowana skrótem pliku.
+
+    Każdy wpis to katalog z audio.wav (16 kHz mono int16, mapowany w pamięci przez AudioStream)
+    i plikami mel_<n_mels>.npy (float16, wczytywane przez np.load z mmap_mode). Ponowna
+    transkrypcja tego samego pliku z innym zadaniem, językiem lub modelem o tej samej liczbie
+    pasm mel pomija więc i dekodowanie FFmpeg, i liczenie spektrogramu.
+    """
+
+    def __init__(self, cache_dir: str = FEATURE_CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (ścieżka, rozmiar, czas modyfikacji) -> klucz, żeby w jednym procesie haszować plik tylko raz
+        self._known_keys: Dict[tuple, str] = {}
+
+    # ### Indeks ###
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """
+        Wyłączny dostęp do indeksu. index.json zmieniają i proces GUI, i proces roboczy - sama blokada
+        wątków nie wystarcza, więc dodatkowo blokowany jest plik index.lock (msvcrt na Windows, flock na POSIX).
+        """
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, LOCK_FILE_NAME), "a+b") as lock_file:
+                if os.name == "nt":
+                    lock_file.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                            break
+                        except OSError:
+                            time.sleep(LOCK_RETRY_INTERVAL)
+                else:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if os.name == "nt":
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    else:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILE_NAME)
+
+    def _load_index(self) -> Dict[str, Any]:
+        try:
+            with open(self._index_path(), "r") as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self._index_path() + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(index, f, indent=4)
+            os.replace(temp_path, self._index_path())
+        except OSError as e:
+            logger.warning(f"Nie można zapisać indeksu pamięci podręcznej cech: {e}")
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _dir_size(entry_dir: str) -> int:
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+        except OSError:
+            return 0
+
+    def _reconcile(self, index: Dict[str, Any]) -> None:
+        """
+        Uzgadnia indeks z katalogami na dysku: wpisy bez katalogu są usuwane, a katalogi bez wpisu
+        (np. po przerwanym zapisie) dopisywane z czasem modyfikacji - limit rozmiaru obejmuje wtedy wszystko.
+        """
+        try:
+            entry_dirs = {entry.name: entry for entry in os.scandir(self.cache_dir) if entry.is_dir()}
+        except OSError:
+            return
+        for key in [key for key in index if key not in entry_dirs]:
+            del index[key]
+        for key, entry in entry_dirs.items():
+            if key not in index:
+                index[key] = {"last_used": entry.stat().st_mtime, "bytes": self._dir_size(entry.path)}
+
+    def key_for(self, path: str) -> str:
+        """
+        Klucz wpisu dla pliku. Plik o tej samej ścieżce, rozmiarze i czasie modyfikacji co przy
+        ostatnim użyciu nie jest ponownie haszowany.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        identity = (path, stat.st_size, stat.st_mtime_ns)
+        if identity in self._known_keys:
+            return self._known_keys[identity]
+        key = next((key for key, entry in self._load_index().items()
+                    if (entry.get("source"), entry.get("file_size"), entry.get("mtime_ns")) == identity), None)
+        self._known_keys[identity] = key or file_hash(path)
+        return self._known_keys[identity]
+
+    def _touch(self, key: str, path: str) -> None:
+        """Zapisuje użycie wpisu (kolejność LRU) i aktualny rozmiar jego plików."""
+        entry_dir = self._entry_dir(key)
+        with self._index_lock():
+            index = self._load_index()
+            self._reconcile(index)
+            stat = os.stat(path)
+            index[key] = {"source": os.path.abspath(path), "file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                          "last_used": time.time(), "bytes": self._dir_size(entry_dir)}
+            self._evict(index, keep=key)
+            self._save_index(index)
+
+    def _remove_entry(self, index: Dict[str, Any], key: str) -> bool:
+        """Usuwa katalog wpisu, a wiersz indeksu dopiero po udanym usunięciu (plik mapowany na Windows może być zajęty)."""
+        try:
+            shutil.rmtree(self._entry_dir(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Nie można usunąć wpisu {key} z pamięci podręcznej cech (spróbuję później): {e}")
+            return False
+        del index[key]
+        return True
+
+    def _evict(self, index: Dict[str, Any], keep: str) -> None:
+        total = sum(entry["bytes"] for entry in index.values())
+        for key in sorted(index, key=lambda item: index[item]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry_bytes = index[key]["bytes"]
+            if self._remove_entry(index, key):
+                total -= entry_bytes
+                logger.info(f"Usunięto z pamięci podręcznej cech wpis {key} (limit {self.max_bytes // (1024 * 1024)} MB)")
+
+    def get_size(self) -> int:
+        """Łączny rozmiar wpisów w bajtach."""
+        with self._index_lock():
+            index = self._load_index()
+            self._reconcile(index)
+            return sum(entry["bytes"] for entry in index.values())
+
+    # ### Audio ###
+
+    def audio_path(self, path: str) -> Optional[str]:
+        """Ścieżka zdekodowanego audio (natywny WAV) z pamięci podręcznej lub None."""
+        if not FEATURE_CACHE_AVAILABLE:
+            return None
+        key = self.key_for(path)
+        cached_path = os.path.join(self._entry_dir(key), AUDIO_FILE_NAME)
+        if not os.path.exists(cached_path):
+            return None
+        self._touch(key, path)
+        return cached_path
+
+    def get_audio(self, path: str):
+        """Zdekodowane audio (float32, 16 kHz mono) z pamięci podręcznej lub None."""
+        cached_path = self.audio_path(path)
+        if cached_path is None:
+            return None
+        data_chunk = find_wav_data_chunk(cached_path)
+        if data_chunk is None:
+            return None
+        offset, size = data_chunk
+        samples = np.memmap(cached_path, dtype="<i2", mode="r", offset=offset, shape=(size // 2,))
+        logger.info(f"Audio z pamięci podręcznej cech: {os.path.basename(path)}")
+        return samples.astype(np.float32) / 32768.0
+
+    def put_audio(self, path: str, audio) -> None:
+        """Zapisuje zdekodowane audio (float32 w zakresie [-1, 1]) jako natywny WAV."""
+        if not FEATURE_CACHE_AVAILABLE:
+            return
+        key = self.key_for(path)
+        entry_dir = self._entry_dir(key)
+        cached_path = os.path.join(entry_dir, AUDIO_FILE_NAME)
+        if os.path.exists(cached_path):
+            return
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            samples = (np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2")
+            temp_path = cached_path + ".tmp"
+            with wave.open(temp_path, "wb") as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(SAMPLE_RATE)
+                wf.writeframes(samples.tobytes())
+            os.replace(temp_path, cached_path)
+        except OSError as e:
+            logger.warning(f"Nie można zapisać audio w pamięci podręcznej cech: {e}")
+            return
+        self._touch(key, path)
+
+    # ### Spektrogramy ###
+
+    def get_mel(self, path: str, n_mels: int):
+        """Spektrogram log-mel (n_mels x ramki, float16, mapowany w pamięci) lub None."""
+        if not FEATURE_CACHE_AVAILABLE:
+            return None
+        key = self.key_for(path)
+        mel_path = os.path.join(self._entry_dir(key), f"mel_{n_mels}.npy")
+        if not os.path.exists(mel_path):
+            return None
+        try:
+            mel = np.load(mel_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Uszkodzony spektrogram w pamięci podręcznej ({e}) - zostanie policzony od nowa.")
+            return None
+        self._touch(key, path)
+        logger.info(f"Spektrogram z pamięci podręcznej cech: {os.path.basename(path)} ({n_mels} pasm mel)")
+        return mel
+
+    def put_mel(self, path: str, n_mels: int, mel):
+        """
+        Zapisuje spektrogram jako float16 i zwraca jego wersję mapowaną z dysku (lub None przy błędzie).
+
+        Dekodowanie korzysta potem z zapisanej wersji - wynik pierwszego i kolejnych przebiegów jest identyczny.
+        """
+        if not FEATURE_CACHE_AVAILABLE:
+            return None
+        key = self.key_for(path)
+        entry_dir = self._entry_dir(key)
+        mel_path = os.path.join(entry_dir, f"mel_{n_mels}.npy")
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            mel_array = mel.cpu().numpy() if hasattr(mel, "cpu") else np.asarray(mel)
+            temp_path = mel_path + ".tmp.npy"
+            np.save(temp_path, mel_array.astype(np.float16))
+            os.replace(temp_path, mel_path)
+        except OSError as e:
+            logger.warning(f"Nie można zapisać spektrogramu w pamięci podręcznej cech: {e}")
+            return None
+        self._touch(key, path)
+        return np.load(mel_path, mmap_mode="r")
+
+    def clear(self) -> int:
+        """Usuwa wszystkie wpisy (zajęte zostają do następnej próby) i zwraca liczbę zwolnionych bajtów."""
+        freed = 0
+        with self._index_lock():
+            index = self._load_index()
+            self._reconcile(index)
+            for key in list(index):
+                entry_bytes = index[key]["bytes"]
+                if self._remove_entry(index, key):
+                    freed += entry_bytes
+            self._save_index(index)
+        self._known_keys.clear()
+        return freed
+
+
+_feature_cache: Optional[FeatureCache] = None
+
+
+def get_feature_cache() -> Optional[FeatureCache]:
+    """Zwraca wspólną pamięć podręczną cech (None, jeśli brak numpy lub wyłączono ją w ustawieniach)."""
+    global _feature_cache
+    if not FEATURE_CACHE_AVAILABLE or not _cache_enabled:
+        return None
+    if _feature_cache is None:
+        _feature_cache = FeatureCache()
+    return _feature_cache
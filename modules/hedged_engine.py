@@ -0,0 +1,232 @@
+# X:\Aplikacje\dictaitor\modules\hedged_engine.py
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.stt_engines import STTEngine, create_engine, register_engine
+from modules.audio_stream import probe_duration
+from modules.benchmark import get_benchmark_result, save_benchmark_result
+from modules.jobs import CancellationToken, JobCancelledError
+from modules.auto_engine import run_measured
+
+logger = logging.getLogger(__name__)
+
+# Lokalny przebieg startuje, gdy API nie odpowiedziało w tym percentylu swoich ostatnich czasów odpowiedzi
+DEFAULT_HEDGE_PERCENTILE = 90
+# Poniżej tylu pomiarów API opóźnienie startu lokalnego przebiegu jest liczone z wartości domyślnych
+MIN_LATENCY_SAMPLES = 5
+MAX_LATENCY_SAMPLES = 200
+# Czasy odpowiedzi są normalizowane do długości nagrania; krótsze nagrania liczymy jak tyle sekund (narzut żądania)
+MIN_NORMALIZED_SECONDS = 10.0
+DEFAULT_HEDGE_DELAY_RATIO = 0.5
+MIN_HEDGE_DELAY = 2.0
+POLL_INTERVAL = 0.2
+# Jak długo czekamy w tle na odpowiedź API, która przegrała wyścig (tylko do pomiaru czasu)
+DISCARDED_API_WAIT = 300
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentyl z interpolacją liniową (None dla pustej listy)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def load_hedging_stats() -> Dict[str, Any]:
+    stats = get_benchmark_result("hedging", "openai") or {}
+    for key in ("latency_ratios", "outcomes"):
+        stats.setdefault(key, [])
+    for key in ("jobs", "hedged", "local_wins", "api_wins"):
+        stats.setdefault(key, 0)
+    return stats
+
+
+def format_hedging_stats(stats: Dict[str, Any]) -> str:
+    """
+    Raport skuteczności wyścigu: jak często startował lokalny przebieg i ile zyskał p99 czasu oczekiwania.
+
+    Gdy API przegrało, a jego odpowiedź nie nadeszła (przerwane wysyłanie fragmentów), przyjmujemy
+    czas do przerwania - oszczędność jest wtedy oszacowaniem z dołu.
+    """
+    lines = [f"Zadań w trybie wyścigu: {stats['jobs']}",
+             f"Lokalny przebieg uruchomiony: {stats['hedged']} razy "
+             f"({stats['hedged'] / stats['jobs'] * 100 if stats['jobs'] else 0:.0f}%)",
+             f"Wygrane: API {stats['api_wins']}, lokalnie {stats['local_wins']}"]
+    outcomes = stats["outcomes"]
+    if outcomes:
+        api_only = percentile([api_latency for api_latency, _ in outcomes], 99)
+        hedged = percentile([actual for _, actual in outcomes], 99)
+        lines.append(f"p99 czasu do wyniku: {hedged:.1f} s (samo API: co najmniej {api_only:.1f} s, "
+                     f"oszczędność co najmniej {max(0.0, api_only - hedged):.1f} s)")
+    ratios = stats["latency_ratios"]
+    if ratios:
+        lines.append(f"Czas odpowiedzi API na sekundę nagrania: p50 {percentile(ratios, 50):.2f}, "
+                     f"p90 {percentile(ratios, 90):.2f}, p99 {percentile(ratios, 99):.2f} ({len(ratios)} pomiarów)")
+    return "\n".join(lines)
+
+
+@register_engine
+class HedgedEngine(STTEngine):
+    """
+    Wyścig API z lokalnym Whisperem, skracający długi ogon czasów odpowiedzi API.
+
+    Zadanie idzie najpierw do API. Jeśli odpowiedź nie przyjdzie w czasie wyznaczonym przez
+    wybrany percentyl ostatnich czasów odpowiedzi (albo API zwróci błąd), równolegle startuje
+    lokalna transkrypcja wybranym modelem. Pierwszy poprawny wynik wygrywa, a przegrany przebieg
+    jest anulowany; wysłanego już żądania API nie da się wycofać, więc jego wynik jest tylko odrzucany.
+    """
+
+    name = "hedged"
+    display_name = "API + lokalnie (wyścig)"
+    action_label = "Transkrybuj"
+    supports_models = True
+    default_model = "turbo"
+    order = 95
+    routes_jobs = True
+
+    def __init__(self) -> None:
+        self.api_engine = create_engine("openai")
+        self.local_engine = create_engine("local")
+        self.hedge_percentile = DEFAULT_HEDGE_PERCENTILE
+        self._stats_lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return all(engine is not None and engine.is_available() for engine in (self.api_engine, self.local_engine))
+
+    def configure(self, **settings: Any) -> None:
+        for engine in (self.api_engine, self.local_engine):
+            if engine is not None:
+                engine.configure(**settings)
+        if settings.get("hedge_percentile"):
+            self.hedge_percentile = settings["hedge_percentile"]
+
+    def get_models(self) -> List[str]:
+        return self.local_engine.get_models() if self.local_engine is not None and self.local_engine.is_available() else []
+
+    def hedge_delay(self, duration: float) -> float:
+        """Po ilu sekundach oczekiwania na API startuje lokalny przebieg."""
+        normalized = max(duration, MIN_NORMALIZED_SECONDS)
+        ratios = load_hedging_stats()["latency_ratios"]
+        ratio = percentile(ratios, self.hedge_percentile) if len(ratios) >= MIN_LATENCY_SAMPLES else DEFAULT_HEDGE_DELAY_RATIO
+        return max(MIN_HEDGE_DELAY, ratio * normalized)
+
+    def _run_leg(self, source: str, engine: STTEngine, token: CancellationToken, results: "queue.Queue",
+                 audio_file_path: str, language: Optional[str], task: str, options: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        try:
+            result, error_msg = run_measured(engine, audio_file_path, language, task, {**options, "cancel_token": token})
+        except JobCancelledError:
+            result, error_msg = None, None
+        except Exception as e:
+            logger.exception(f"Nieobsłużony błąd przebiegu {source}")
+            result, error_msg = None, str(e)
+        results.put((source, result, error_msg, time.perf_counter() - start))
+
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        job_token: Optional[CancellationToken] = options.pop("cancel_token", None)
+        segment_callback = options.pop("segment_callback", None)
+        progress_callback = options.pop("progress_callback", None)
+        options.pop("routing_callback", None)
+        duration = probe_duration(audio_file_path) or 0.0
+        delay = self.hedge_delay(duration)
+
+        # Każdy przebieg ma własny token - przegrany jest anulowany, a anulowanie zadania przerywa oba;
+        # wstrzymanie zadania (resource_governor) też dotyczy obu przebiegów
+        tokens = {"api": CancellationToken(), "local": CancellationToken()}
+        cancel_legs = lambda: [token.cancel(job_token.reason) for token in tokens.values()]
+        pause_legs = lambda paused: [token.pause() if paused else token.resume() for token in tokens.values()]
+        if job_token is not None:
+            job_token.add_callback(cancel_legs)
+            job_token.add_pause_callback(pause_legs)
+        results: "queue.Queue" = queue.Queue()
+        start = time.perf_counter()
+        threading.Thread(target=self._run_leg, args=("api", self.api_engine, tokens["api"], results, audio_file_path,
+                                                     language, task, options), daemon=True, name="HedgeApi").start()
+        running, hedged, errors = {"api"}, False, {}
+        try:
+            while True:
+                if job_token is not None:
+                    job_token.raise_if_cancelled()
+                if not hedged and time.perf_counter() - start >= delay:
+                    hedged = True
+                    running.add("local")
+                    logger.info(f"API nie odpowiedziało w {delay:.1f} s (p{self.hedge_percentile}) - start lokalnego przebiegu")
+                    local_options = {**options, "segment_callback": segment_callback, "progress_callback": progress_callback}
+                    threading.Thread(target=self._run_leg, args=("local", self.local_engine, tokens["local"], results,
+                                                                 audio_file_path, language, task, local_options),
+                                     daemon=True, name="HedgeLocal").start()
+                try:
+                    source, result, error_msg, elapsed = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                running.discard(source)
+                if result is not None and not error_msg:
+                    break
+                errors[source] = error_msg or "przebieg przerwany"
+                logger.warning(f"Przebieg {source} w wyścigu nie powiódł się: {errors[source]}")
+                if not hedged:
+                    # Błąd API - nie ma na co czekać, lokalny przebieg startuje od razu
+                    delay = 0.0
+                elif not running:
+                    return None, errors.get("api") or errors.get("local")
+        finally:
+            if job_token is not None:
+                job_token.remove_callback(cancel_legs)
+                job_token.remove_pause_callback(pause_legs)
+                pause_legs(False)  # przebieg, który jeszcze trwa, nie może zostać wstrzymany na zawsze
+
+        winner_elapsed = time.perf_counter() - start
+        if source == "api":
+            if "local" in running:
+                tokens["local"].cancel("Wyścig wygrał przebieg API.")
+            self._record_outcome(source, hedged, duration, winner_elapsed, api_elapsed=elapsed)
+        elif "api" in running and self._is_single_request(audio_file_path):
+            # Wysłanego żądania nie da się wycofać (i tak zostanie rozliczone) - jego wynik odrzucamy,
+            # ale czekamy na odpowiedź w tle, żeby zmierzyć prawdziwy czas API
+            threading.Thread(target=self._await_discarded_api, args=(results, hedged, duration, winner_elapsed),
+                             daemon=True, name="HedgeApiDiscarded").start()
+        elif "api" in running:
+            # Wysyłanie kolejnych fragmentów przerywamy - czas API znamy tylko z dołu
+            tokens["api"].cancel("Wyścig wygrał przebieg lokalny.")
+            self._record_outcome(source, hedged, duration, winner_elapsed, api_elapsed=winner_elapsed)
+        else:
+            # API zwróciło błąd - to nie jest pomiar czasu odpowiedzi
+            self._record_outcome(source, hedged, duration, winner_elapsed, api_elapsed=None)
+        logger.info(f"Wyścig wygrał przebieg {source} po {winner_elapsed:.1f} s" + (" (z lokalnym przebiegiem)" if hedged else ""))
+        return {**result, "engine": "openai" if source == "api" else "local"}, None
+
+    def _is_single_request(self, audio_file_path: str) -> bool:
+        client = getattr(self.api_engine, "client", None)
+        return client is not None and os.path.getsize(audio_file_path) <= client.MAX_UPLOAD_BYTES
+
+    def _await_discarded_api(self, results: "queue.Queue", hedged: bool, duration: float, actual: float) -> None:
+        try:
+            _, result, error_msg, api_elapsed = results.get(timeout=DISCARDED_API_WAIT)
+        except queue.Empty:
+            api_elapsed = DISCARDED_API_WAIT
+        self._record_outcome("local", hedged, duration, actual, api_elapsed=max(api_elapsed, actual))
+
+    def _record_outcome(self, winner: str, hedged: bool, duration: float, actual: float, api_elapsed: Optional[float]) -> None:
+        with self._stats_lock:
+            stats = load_hedging_stats()
+            stats["jobs"] += 1
+            stats["hedged"] += int(hedged)
+            stats["api_wins" if winner == "api" else "local_wins"] += 1
+            if api_elapsed is not None:
+                stats["latency_ratios"].append(api_elapsed / max(duration, MIN_NORMALIZED_SECONDS))
+                stats["outcomes"].append([api_elapsed, actual])
+            for key in ("latency_ratios", "outcomes"):
+                del stats[key][:-MAX_LATENCY_SAMPLES]
+            save_benchmark_result("hedging", "openai", stats)
+
+    def describe_stats(self) -> str:
+        return (f"Lokalny przebieg startuje po p{self.hedge_percentile} czasu odpowiedzi API.\n\n"
+                + format_hedging_stats(load_hedging_stats()))
@@ -0,0 +1,291 @@
+# X:\Aplikacje\dictaitor\modules\incremental_transcription.py
+import os
+import json
+import time
+import wave
+import base64
+import hashlib
+import logging
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+from modules.audio_stream import SAMPLE_RATE, AudioStream, NUMPY_INSTALLED
+from modules.feature_cache import get_feature_cache
+
+logger = logging.getLogger(__name__)
+
+if NUMPY_INSTALLED:
+    import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSCRIPT_INDEX_DIR = os.path.join(APP_DIR, "models_cache", "transcripts")
+# Najwięcej tylu zapisanych transkrypcji - starsze są usuwane
+MAX_RECORDS = 200
+
+# Audio jest dzielone na bloki 1 s; każdy blok ma skrót treści i krótką "sondę" (pierwsze próbki),
+# po której można go odnaleźć w nagraniu z obciętym początkiem
+BLOCK_SAMPLES = SAMPLE_RATE
+PROBE_SAMPLES = 32
+# Szukamy przesunięcia dla obcięcia do 30 min; sonda jest szukana w oknie kilku bloków od początku nowego nagrania
+MAX_TRIM_SEARCH_BLOCKS = 30 * 60
+PROBE_SEARCH_BLOCKS = 8
+MAX_PROBE_CANDIDATES = 64
+# Odcisk jest liczony porcjami po tyle bloków - naraz w pamięci jest najwyżej minuta próbek, nie całe nagranie
+FINGERPRINT_READ_BLOCKS = 60
+# Segment kończący się bliżej niż tyle od granicy zmienionego audio mógł zostać ucięty - dekodujemy go ponownie
+SPLICE_MARGIN_SECONDS = 1.0
+# Krótszych fragmentów na brzegach nie warto dekodować (to zwykle sam oddech lub cisza)
+MIN_REGION_SECONDS = 0.3
+# Gdy zachować można mniej niż taka część nagrania, pełna transkrypcja jest prostsza i lepsza
+MIN_REUSED_FRACTION = 0.3
+CONTEXT_PROMPT_CHARS = 200
+
+
+def _record_path(audio_file_path: str) -> str:
+    key = hashlib.blake2b(os.path.abspath(audio_file_path).lower().encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(TRANSCRIPT_INDEX_DIR, f"{key}.json")
+
+
+def _block_hash(samples) -> str:
+    return hashlib.blake2b(np.ascontiguousarray(samples).tobytes(), digest_size=12).hexdigest()
+
+
+def _open_audio(audio_file_path: str) -> AudioStream:
+    """Nagranie jako PCM 16 kHz; audio zdekodowane wcześniej (pamięć podręczna cech) nie przechodzi ponownie przez FFmpeg."""
+    feature_cache = get_feature_cache()
+    cached_path = feature_cache.audio_path(audio_file_path) if feature_cache else None
+    return AudioStream(cached_path or audio_file_path)
+
+
+def fingerprint_audio(stream: AudioStream) -> Dict[str, Any]:
+    """Skróty bloków 1 s, sondy do wyszukiwania przesunięcia i skrót niepełnego bloku końcowego."""
+    full_blocks = stream.num_samples // BLOCK_SAMPLES
+    hashes, probes = [], []
+    for first_block in range(0, full_blocks, FINGERPRINT_READ_BLOCKS):
+        count = min(FINGERPRINT_READ_BLOCKS, full_blocks - first_block)
+        # Kopia porcji, nie widok na mapowany plik - po przejściu dalej pamięć porcji jest zwalniana
+        chunk = np.array(stream.read_pcm(first_block * BLOCK_SAMPLES, count * BLOCK_SAMPLES))
+        for index in range(count):
+            block = chunk[index * BLOCK_SAMPLES:(index + 1) * BLOCK_SAMPLES]
+            hashes.append(_block_hash(block))
+            probes.append(base64.b64encode(block[:PROBE_SAMPLES].tobytes()).decode("ascii"))
+    return {
+        "num_samples": stream.num_samples,
+        "block_hashes": hashes,
+        "probes": probes,
+        "tail_hash": _block_hash(stream.read_pcm(full_blocks * BLOCK_SAMPLES)),
+    }
+
+
+def load_record(audio_file_path: str) -> Optional[Dict[str, Any]]:
+    """Zapisana transkrypcja pliku (segmenty i odciski audio) lub None."""
+    try:
+        with open(_record_path(audio_file_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return None
+
+
+def remember_transcript(audio_file_path: str, result: Dict[str, Any], settings: Dict[str, Any]) -> bool:
+    """
+    Zapisuje segmenty wyniku razem z odciskami audio, żeby kolejny przebieg po dopisaniu lub
+    obcięciu nagrania mógł zdekodować tylko zmienione fragmenty.
+
+    Args:
+        settings: Ustawienia, od których zależy wynik (silnik, model, zadanie, język, podpowiedź, silnik
+            wybrany przez tryb automatyczny) - inne ustawienia przy kolejnym przebiegu oznaczają pełną transkrypcję
+
+    Returns:
+        bool: True jeśli zapisano
+    """
+    if not NUMPY_INSTALLED or not result.get("segments"):
+        return False
+    try:
+        with _open_audio(audio_file_path) as stream:
+            fingerprint = fingerprint_audio(stream)
+    except (RuntimeError, OSError) as e:
+        logger.info(f"Nie można zapisać odcisku audio dla transkrypcji przyrostowej: {e}")
+        return False
+    segments = [{key: segment[key] for key in ("start", "end", "text") if key in segment} for segment in result["segments"]]
+    record = {"source": os.path.abspath(audio_file_path), "settings": settings, "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "language": result.get("language"), "segments": segments, **fingerprint}
+    try:
+        os.makedirs(TRANSCRIPT_INDEX_DIR, exist_ok=True)
+        path = _record_path(audio_file_path)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Nie można zapisać transkrypcji do ponownego użycia: {e}")
+        return False
+    _prune_records()
+    return True
+
+
+def _prune_records() -> None:
+    entries = sorted((entry for entry in os.scandir(TRANSCRIPT_INDEX_DIR) if entry.name.endswith(".json")),
+                     key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:-MAX_RECORDS]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _find_shift(record: Dict[str, Any], pcm) -> Optional[Tuple[int, int]]:
+    """
+    Szuka bloku starego nagrania w nowym. Zwraca (indeks_bloku, przesunięcie_w_próbkach), gdzie
+    przesunięcie to liczba próbek usuniętych z początku (0 - początek bez zmian).
+    """
+    hashes = record["block_hashes"]
+    if hashes and len(pcm) >= BLOCK_SAMPLES and _block_hash(pcm[:BLOCK_SAMPLES]) == hashes[0]:
+        return 0, 0
+    for index in range(1, min(len(hashes), MAX_TRIM_SEARCH_BLOCKS)):
+        probe = np.frombuffer(base64.b64decode(record["probes"][index]), dtype="<i2")
+        if not probe.any():
+            continue  # cisza pasuje wszędzie - sonda nic nie powie
+        # Blok może się teraz zaczynać najwcześniej na początku nagrania, a najpóźniej tam, gdzie był
+        window_end = min(index * BLOCK_SAMPLES, PROBE_SEARCH_BLOCKS * BLOCK_SAMPLES, len(pcm) - BLOCK_SAMPLES)
+        if window_end < 0:
+            break
+        candidates = np.flatnonzero(pcm[:window_end + 1] == probe[0])
+        for offset in range(1, len(probe)):
+            if not len(candidates):
+                break
+            candidates = candidates[pcm[candidates + offset] == probe[offset]]
+        for candidate in candidates[:MAX_PROBE_CANDIDATES]:
+            if _block_hash(pcm[candidate:candidate + BLOCK_SAMPLES]) == hashes[index]:
+                return index, index * BLOCK_SAMPLES - int(candidate)
+    return None
+
+
+def plan_update(record: Dict[str, Any], stream: AudioStream) -> Optional[Dict[str, Any]]:
+    """
+    Porównuje nowe nagranie z zapisanym i wyznacza, co trzeba zdekodować.
+
+    Returns:
+        Optional[Dict[str, Any]]: None, gdy nie da się bezpiecznie użyć starej transkrypcji; inaczej
+            'kept' (stare segmenty z czasami w nowym nagraniu), 'regions' (lista (początek_s, koniec_s)
+            do zdekodowania) i 'duration'
+    """
+    pcm = stream.read_pcm()
+    found = _find_shift(record, pcm)
+    if found is None:
+        return None
+    first_block, shift = found
+    hashes = record["block_hashes"]
+
+    # Zgodny obszar: kolejne bloki starego nagrania, które leżą w nowym pod tym samym przesunięciem
+    last_block = first_block
+    while last_block < len(hashes):
+        start = last_block * BLOCK_SAMPLES - shift
+        if start + BLOCK_SAMPLES > len(pcm) or _block_hash(pcm[start:start + BLOCK_SAMPLES]) != hashes[last_block]:
+            break
+        last_block += 1
+    verified_end = last_block * BLOCK_SAMPLES
+    if last_block == len(hashes):
+        tail_start = verified_end - shift
+        tail_end = record["num_samples"] - shift
+        if tail_end <= len(pcm) and _block_hash(pcm[tail_start:tail_end]) == record["tail_hash"]:
+            verified_end = record["num_samples"]
+
+    shift_seconds = shift / SAMPLE_RATE
+    duration = len(pcm) / SAMPLE_RATE
+    verified_start_s = first_block * BLOCK_SAMPLES / SAMPLE_RATE
+    verified_end_s = verified_end / SAMPLE_RATE
+    # Przed zgodnym obszarem jest inne audio (zmieniony początek) albo początek obcięto w środku segmentu
+    start_changed = shift > 0 or first_block > 0
+    # Zgodny obszar sięga końca i nowego, i starego nagrania - nic nie dopisano, nie obcięto ani nie zmieniono na końcu
+    end_changed = verified_end - shift < len(pcm) or verified_end < record["num_samples"]
+    # Segment przy granicy zmiany mógł zostać ucięty w pół zdania; na niezmienionym końcu nagrania - nie
+    end_margin = SPLICE_MARGIN_SECONDS if end_changed else 0.0
+    kept = [{**segment, "start": segment["start"] - shift_seconds, "end": segment["end"] - shift_seconds}
+            for segment in record["segments"]
+            if segment["start"] >= verified_start_s and segment["end"] <= verified_end_s - end_margin]
+    if not kept:
+        return None
+    reused = sum(segment["end"] - segment["start"] for segment in kept)
+    if duration and reused / duration < MIN_REUSED_FRACTION and (start_changed or end_changed):
+        return None
+
+    # Na niezmienionym brzegu audio przed pierwszym / za ostatnim segmentem to cisza, już raz zdekodowana
+    regions = []
+    if start_changed and kept[0]["start"] > MIN_REGION_SECONDS:
+        regions.append((0.0, kept[0]["start"]))
+    if end_changed and duration - kept[-1]["end"] > MIN_REGION_SECONDS:
+        regions.append((kept[-1]["end"], duration))
+    return {"kept": kept, "regions": regions, "duration": duration, "shift": shift_seconds}
+
+
+def _write_region(stream: AudioStream, start: float, end: float, output_dir: str) -> str:
+    path = os.path.join(output_dir, f"region_{start:.2f}_{end:.2f}.wav")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(np.ascontiguousarray(stream.read_pcm(int(start * SAMPLE_RATE), int((end - start) * SAMPLE_RATE))).tobytes())
+    return path
+
+
+def transcribe_incremental(engine, audio_file_path: str, language: Optional[str], task: str,
+                           options: Dict[str, Any], settings: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Transkrypcja przyrostowa: po dopisaniu nagrania lub obcięciu jego początku dekodowane są tylko
+    zmienione fragmenty, a wynik jest wklejany w zapisaną transkrypcję.
+
+    Działa z każdym silnikiem (fragmenty są przekazywane jako krótkie pliki WAV), więc koszt zależy
+    od długości zmiany, a nie całego nagrania.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik, komunikat_błędu); (None, None), gdy
+            zapisanej transkrypcji nie da się użyć i trzeba transkrybować całość. Wynik ma dodatkowo
+            klucz 'incremental' ({'decoded_seconds', 'total_seconds'}).
+    """
+    if not NUMPY_INSTALLED:
+        return None, None
+    record = load_record(audio_file_path)
+    if record is None or record.get("settings") != settings:
+        return None, None
+    try:
+        stream = _open_audio(audio_file_path)
+    except (RuntimeError, OSError) as e:
+        logger.info(f"Transkrypcja przyrostowa niedostępna: {e}")
+        return None, None
+    with stream, tempfile.TemporaryDirectory(prefix="dictaitor_regions_") as temp_dir:
+        plan = plan_update(record, stream)
+        if plan is None:
+            logger.info("Nagranie zmieniło się zbyt mocno - pełna transkrypcja.")
+            return None, None
+        logger.info(f"Transkrypcja przyrostowa: zachowano {len(plan['kept'])} segmentów, do zdekodowania "
+                    f"{', '.join(f'{start:.1f}-{end:.1f} s' for start, end in plan['regions']) or 'nic'}")
+        region_options = {key: value for key, value in options.items() if key != "segment_callback"}
+        head, tail = [], []
+        for start, end in plan["regions"]:
+            region_path = _write_region(stream, start, end, temp_dir)
+            if start > 0:
+                # Końcówka zachowanego tekstu jako kontekst - jak przy zwykłym dekodowaniu okno po oknie
+                context = "".join(segment["text"] for segment in plan["kept"])[-CONTEXT_PROMPT_CHARS:].strip()
+                prompt = options.get("initial_prompt")
+                region_options["initial_prompt"] = f"{prompt} {context}" if prompt else context
+            else:
+                region_options["initial_prompt"] = options.get("initial_prompt")
+            result, error_msg = engine.transcribe_segments(region_path, language=language, task=task, **region_options)
+            if error_msg:
+                return None, error_msg
+            segments = [{**segment, "start": segment["start"] + start, "end": min(segment["end"] + start, end)}
+                        for segment in result.get("segments", [])]
+            if not segments and result.get("text", "").strip():
+                segments = [{"start": start, "end": end, "text": " " + result["text"].strip()}]
+            (head if start == 0 else tail).extend(segments)
+
+    segments = [{**segment, "id": index} for index, segment in enumerate(head + plan["kept"] + tail)]
+    decoded_seconds = sum(end - start for start, end in plan["regions"])
+    logger.info(f"Transkrypcja przyrostowa zakończona: zdekodowano {decoded_seconds:.1f} s z {plan['duration']:.1f} s nagrania.")
+    return {
+        "text": "".join(segment["text"] for segment in segments).strip(),
+        "segments": segments,
+        "language": record.get("language") or language,
+        "duration": plan["duration"],
+        "incremental": {"decoded_seconds": decoded_seconds, "total_seconds": plan["duration"]},
+    }, None
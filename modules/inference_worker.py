@@ -0,0 +1,492 @@
+# X:\Aplikacje\dictaitor\modules\inference_worker.py
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import subprocess
+import multiprocessing
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from modules.audio_stream import SAMPLE_RATE, find_wav_data_chunk, is_native_wav, probe_duration, should_stream
+from modules.jobs import CancellationToken, JobCancelledError
+from modules.feature_cache import get_feature_cache, is_feature_cache_enabled, set_feature_cache_enabled
+from modules.resource_governor import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, lower_process_priority
+
+logger = logging.getLogger(__name__)
+
+try:
+    from multiprocessing import shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+# Proces, który padł szybciej niż po tylu sekundach, nie jest wznawiany od razu (ochrona przed pętlą restartów);
+# zostanie uruchomiony ponownie przy następnym zadaniu
+MIN_UPTIME_FOR_AUTO_RESTART = 10.0
+# Co ile sekund wątek czekający na wynik sprawdza anulowanie zadania
+CANCEL_POLL_INTERVAL = 0.2
+SHUTDOWN_TIMEOUT = 3.0
+# Ile ostatnio użytych modeli proces roboczy trzyma w pamięci (jak local_stt.MAX_RESIDENT_MODELS)
+RESIDENT_MODELS_TRACKED = 2
+# Zadania, po których model Whispera (model, precyzja) zostaje w pamięci procesu roboczego
+RESIDENT_MODEL_JOB_KINDS = ("transcribe", "repair", "benchmark_decoding", "autotune")
+
+
+# ### Strona procesu roboczego ###
+
+def _attach_shared_memory(name: str):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: proces uruchomiony przez spawn dzieli tracker zasobów z procesem GUI, który
+        # zarejestrował segment przy tworzeniu - wyrejestrowanie tutaj zdjęłoby jego wpis (KeyError przy unlink)
+        return shared_memory.SharedMemory(name=name)
+
+
+def _read_shared_audio(name: str, num_samples: int):
+    """Kopiuje audio int16 z pamięci współdzielonej do tablicy float32 procesu roboczego."""
+    import numpy as np
+    shm = _attach_shared_memory(name)
+    try:
+        samples = np.frombuffer(shm.buf, dtype="<i2", count=num_samples)
+        audio = samples.astype(np.float32) / 32768.0
+        del samples  # widok na bufor musi zniknąć przed zamknięciem segmentu
+        return audio
+    finally:
+        shm.close()
+
+
+def _run_job(kind: str, payload: Dict[str, Any], token: CancellationToken, send: Callable, job_id: int):
+    from modules import local_stt
+    set_feature_cache_enabled(payload.pop("feature_cache", True))
+    callbacks = {}
+    if payload.pop("stream_segments", False):
+        callbacks["segment_callback"] = lambda segment: send(("segment", job_id, segment))
+    if payload.pop("report_progress", False):
+        callbacks["progress_callback"] = lambda info: send(("progress", job_id, info))
+
+    if kind == "transcribe":
+        shared_audio = payload.pop("shared_audio", None)
+        audio = _read_shared_audio(*shared_audio) if shared_audio else None
+        return local_stt.transcribe_audio_local_segments(audio=audio, cancel_token=token, **callbacks, **payload)
+    if kind == "repair":
+        callbacks.pop("segment_callback", None)
+        return local_stt.repair_segments_local(cancel_token=token, **callbacks, **payload)
+    if kind == "translate":
+        # Modele tłumaczenia zostają w pamięci procesu roboczego między zadaniami, tak jak modele Whispera
+        from modules import text_translation
+        callbacks.pop("segment_callback", None)
+        return text_translation.translate_result(cancel_token=token, **callbacks, **payload)
+    if kind == "transcribe_faster":
+        from modules.faster_whisper_engine import transcribe_audio_faster_whisper
+        return transcribe_audio_faster_whisper(cancel_token=token, **callbacks, **payload)
+    if kind == "benchmark_precision":
+        # Pomiary w procesie, który potem transkrybuje - obciążenie GUI nie zaburza wyników, a model zostaje w pamięci
+        return local_stt.benchmark_precision_modes(**payload)
+    if kind == "benchmark_decoding":
+        return local_stt.benchmark_decoding_presets(**payload)
+    if kind == "autotune":
+        from modules.cpu_tuning import autotune_threads
+        result = autotune_threads(**payload)
+        return result, None if result else "Nie udało się dostroić liczby wątków. Szczegóły w logu procesu roboczego."
+    return None, f"Nieznany rodzaj zadania procesu roboczego: {kind}"
+
+
+def _worker_main(command_conn, result_conn, background: bool = False, initializer: Optional[Callable] = None,
+                 initargs: tuple = ()) -> None:
+    """Pętla procesu roboczego: zadania wykonywane po kolei, polecenia (anulowanie, pauza) odbierane w osobnym wątku."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [worker] %(name)s - %(levelname)s - %(message)s')
+    if background:
+        lower_process_priority()
+    if initializer is not None:
+        initializer(*initargs)
+    jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+    tokens: Dict[int, CancellationToken] = {}
+    send_lock = threading.Lock()
+
+    def send(message) -> None:
+        with send_lock:
+            result_conn.send(message)
+
+    def listen() -> None:
+        while True:
+            try:
+                message = command_conn.recv()
+            except (EOFError, OSError):
+                # Proces GUI zniknął - kończymy pracę
+                message = ("shutdown",)
+            if message[0] == "job":
+                tokens[message[1]] = CancellationToken()
+                jobs.put(message)
+            elif message[0] == "cancel":
+                token = tokens.get(message[1])
+                if token is not None:
+                    token.cancel(message[2])
+            elif message[0] in ("pause", "resume"):
+                # Zadanie zatrzyma się (lub ruszy dalej) na najbliższej granicy segmentu
+                token = tokens.get(message[1])
+                if token is not None:
+                    token.pause() if message[0] == "pause" else token.resume()
+            elif message[0] == "shutdown":
+                for token in list(tokens.values()):
+                    token.cancel("Zamykanie procesu roboczego.")
+                jobs.put(None)
+                return
+
+    threading.Thread(target=listen, daemon=True, name="WorkerCommands").start()
+    while True:
+        message = jobs.get()
+        if message is None:
+            break
+        _, job_id, kind, payload = message
+        token = tokens[job_id]
+        try:
+            # Zadanie anulowane jeszcze w kolejce nie dołącza do pamięci współdzielonej ani nie ładuje modelu
+            token.raise_if_cancelled()
+            start = time.perf_counter()
+            result, error_msg = _run_job(kind, payload, token, send, job_id)
+            if isinstance(result, dict):
+                # Czas samego zadania, bez czekania w kolejce i przygotowania audio po stronie GUI (pomiar RTF w auto_engine)
+                result["worker_seconds"] = time.perf_counter() - start
+            send(("result", job_id, result, error_msg))
+        except JobCancelledError as e:
+            send(("cancelled", job_id, str(e)))
+        except Exception as e:
+            logger.exception("Nieobsłużony błąd zadania w procesie roboczym")
+            send(("result", job_id, None, f"Błąd procesu roboczego: {e}"))
+        finally:
+            tokens.pop(job_id, None)
+
+
+# ### Strona procesu GUI ###
+
+def load_audio_to_shared_memory(audio_file_path: str) -> Optional[Tuple[Any, int]]:
+    """
+    Umieszcza audio 16 kHz mono int16 w segmencie pamięci współdzielonej.
+
+    Natywne pliki WAV są kopiowane wprost z dysku, inne formaty dekoduje FFmpeg (w osobnym procesie),
+    a jego wyjście jest czytane bezpośrednio do segmentu. Wątek GUI nie dekoduje więc audio w Pythonie.
+
+    Returns:
+        Optional[Tuple[SharedMemory, int]]: (segment, liczba_próbek) lub None, jeśli audio trzeba
+            wczytać w procesie roboczym (brak FFmpeg, nieznana długość)
+    """
+    if not SHARED_MEMORY_AVAILABLE:
+        return None
+    data_chunk = find_wav_data_chunk(audio_file_path) if is_native_wav(audio_file_path) else None
+    if data_chunk is not None:
+        offset, size = data_chunk
+        if size < 2:
+            return None
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        with open(audio_file_path, "rb") as f:
+            f.seek(offset)
+            f.readinto(shm.buf[:size])
+        return shm, size // 2
+
+    duration = probe_duration(audio_file_path)
+    if not duration:
+        return None
+    # Zapas na niedokładność długości podawanej przez kontener
+    capacity = int((duration + 1.0) * SAMPLE_RATE) * 2
+    shm = shared_memory.SharedMemory(create=True, size=capacity)
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", audio_file_path,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        written = 0
+        with process.stdout:
+            while written < capacity:
+                count = process.stdout.readinto(shm.buf[written:capacity])
+                if not count:
+                    break
+                written += count
+        if process.poll() is None:
+            # FFmpeg wciąż działa (np. wyjście dłuższe niż zapowiadany czas trwania) - nadmiar pomijamy
+            process.kill()
+        process.wait()
+    except OSError as e:
+        logger.warning(f"Nie można zdekodować audio przez FFmpeg ({e}) - plik wczyta proces roboczy.")
+        shm.close()
+        shm.unlink()
+        return None
+    if written < 2:
+        shm.close()
+        shm.unlink()
+        return None
+    return shm, written // 2
+
+
+class _PendingJob:
+    def __init__(self, process, segment_callback: Optional[Callable], progress_callback: Optional[Callable],
+                 shared_audio=None) -> None:
+        self.process = process
+        self.segment_callback = segment_callback
+        self.progress_callback = progress_callback
+        self.shared_audio = shared_audio
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error_msg: Optional[str] = None
+        self.cancel_reason: Optional[str] = None
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def finish(self, result=None, error_msg: Optional[str] = None, cancel_reason: Optional[str] = None) -> bool:
+        """Zapisuje odpowiedź procesu roboczego. Zwraca True, jeśli nikt już na nią nie czeka (zadanie można zapomnieć)."""
+        with self._lock:
+            self.result, self.error_msg, self.cancel_reason = result, error_msg, cancel_reason
+            self.done.set()
+            abandoned = self.abandoned
+        if abandoned:
+            self.release()
+        return abandoned
+
+    def abandon(self) -> bool:
+        """
+        Wywołujący przestaje czekać (np. anulował zadanie). Zwraca True, jeśli proces roboczy już odpowiedział;
+        inaczej zasoby zadania zwolni dopiero finish() - proces może jeszcze dołączać do pamięci współdzielonej.
+        """
+        with self._lock:
+            if self.done.is_set():
+                return True
+            self.abandoned = True
+            self.segment_callback = self.progress_callback = None
+            return False
+
+    def release(self) -> None:
+        if self.shared_audio is not None:
+            self.shared_audio.close()
+            self.shared_audio.unlink()
+            self.shared_audio = None
+
+
+class InferenceWorker:
+    """
+    Długo działający proces roboczy dla lokalnego Whispera.
+
+    Modele, dekodowanie audio i pętla dekodowania działają poza procesem GUI, więc nie blokują GIL
+    okna aplikacji. Audio trafia do procesu przez pamięć współdzieloną, segmenty i postęp wracają
+    potokiem w trakcie pracy. Awaria procesu (np. brak pamięci przy dużym modelu) kończy bieżące
+    zadanie komunikatem błędu, a proces jest uruchamiany ponownie.
+
+    Zadania w tle (background=True) mają osobny proces o obniżonym priorytecie - dzięki temu
+    nie blokują kolejki zadań interaktywnych.
+
+    initializer(*initargs) jest wywoływany w procesie roboczym przed pierwszym zadaniem (jak w
+    multiprocessing.Pool) - np. test długotrwały podmienia tam wagi modelu i katalogi danych.
+    """
+
+    def __init__(self, background: bool = False, initializer: Optional[Callable] = None, initargs: tuple = ()) -> None:
+        self.background = background
+        self.initializer = initializer
+        self.initargs = initargs
+        self._lock = threading.Lock()
+        self._process = None
+        self._command_conn = None
+        self._started_at = 0.0
+        self._closing = False
+        self._jobs: Dict[int, _PendingJob] = {}
+        self._job_ids = itertools.count(1)
+        # Modele, które proces roboczy ma już załadowane (model, precyzja) - wg ostatnich zadań
+        self._resident_models: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            # spawn: proces nie dziedziczy stanu Tk ani wątków GUI (fork byłby niebezpieczny)
+            context = multiprocessing.get_context("spawn")
+            command_recv, command_send = context.Pipe(duplex=False)
+            result_recv, result_send = context.Pipe(duplex=False)
+            process = context.Process(target=_worker_main, args=(command_recv, result_send, self.background,
+                                                                 self.initializer, self.initargs), daemon=True,
+                                      name="DictAItorBackground" if self.background else "DictAItorInference")
+            process.start()
+            # Rodzic zamyka końce potoków procesu roboczego, żeby jego śmierć była widoczna jako EOF
+            command_recv.close()
+            result_send.close()
+            self._process, self._command_conn, self._started_at = process, command_send, time.monotonic()
+            self._closing = False
+            threading.Thread(target=self._read_results, args=(result_recv, process), daemon=True, name="WorkerResults").start()
+            logger.info(f"Uruchomiono proces roboczy transkrypcji (PID {process.pid})")
+
+    def _send(self, message) -> bool:
+        with self._lock:
+            if self._command_conn is None:
+                return False
+            try:
+                self._command_conn.send(message)
+                return True
+            except (OSError, ValueError) as e:
+                logger.warning(f"Nie można wysłać polecenia do procesu roboczego: {e}")
+                return False
+
+    def _read_results(self, conn, process) -> None:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind, job_id = message[0], message[1]
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                if kind == "segment" and job.segment_callback is not None:
+                    job.segment_callback(message[2])
+                elif kind == "progress" and job.progress_callback is not None:
+                    job.progress_callback(message[2])
+                elif kind == "result":
+                    if job.finish(result=message[2], error_msg=message[3]):
+                        self._jobs.pop(job_id, None)
+                elif kind == "cancelled":
+                    if job.finish(cancel_reason=message[2]):
+                        self._jobs.pop(job_id, None)
+            except Exception as e:
+                logger.warning(f"Błąd obsługi wiadomości procesu roboczego ({kind}): {e}")
+        conn.close()
+        self._on_process_exit(process)
+
+    def _on_process_exit(self, process) -> None:
+        process.join(timeout=1.0)
+        with self._lock:
+            is_current = self._process is process
+            if is_current:
+                self._process, self._command_conn = None, None
+                self._resident_models.clear()
+            closing = self._closing
+        for job_id, job in list(self._jobs.items()):
+            if job.process is process and not job.done.is_set():
+                if job.finish(error_msg=f"Proces roboczy transkrypcji zakończył się nieoczekiwanie (kod wyjścia {process.exitcode}). "
+                                        "Spróbuj ponownie lub wybierz mniejszy model."):
+                    self._jobs.pop(job_id, None)
+        if closing or not is_current:
+            return
+        logger.error(f"Proces roboczy transkrypcji uległ awarii (kod wyjścia {process.exitcode})")
+        if time.monotonic() - self._started_at >= MIN_UPTIME_FOR_AUTO_RESTART:
+            self._ensure_started()
+
+    def run(self, kind: str, segment_callback: Optional[Callable] = None, progress_callback: Optional[Callable] = None,
+            cancel_token: Optional[CancellationToken] = None, **payload: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Wykonuje zadanie w procesie roboczym i czeka na wynik (wywoływać z wątku roboczego, nie z GUI).
+
+        Args:
+            kind: "transcribe" (local_stt.transcribe_audio_local_segments), "repair" (local_stt.repair_segments_local),
+                "transcribe_faster" (faster_whisper_engine.transcribe_audio_faster_whisper),
+                "translate" (text_translation.translate_result), "benchmark_precision" (local_stt.benchmark_precision_modes),
+                "benchmark_decoding" (local_stt.benchmark_decoding_presets) lub "autotune" (cpu_tuning.autotune_threads)
+            segment_callback: Otrzymuje segmenty w miarę dekodowania
+            progress_callback: Otrzymuje postęp (słownik z progress.ProgressReporter)
+            cancel_token: Token anulowania; anulowanie i wstrzymanie są przekazywane do procesu roboczego
+            **payload: Argumenty funkcji local_stt (bez funkcji zwrotnych)
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik, komunikat_błędu)
+
+        Raises:
+            JobCancelledError: Jeśli zadanie zostało anulowane lub przekroczyło limit czasu
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        self._ensure_started()
+
+        shared_audio = None
+        if kind == "transcribe" and payload.get("streaming") is not True and os.path.exists(payload["audio_file_path"]):
+            # Długie nagrania proces roboczy czyta sam z pliku mapowanego w pamięci (tryb strumieniowy)
+            # Audio z pamięci podręcznej cech proces roboczy wczyta sam - dekodowanie tutaj byłoby zbędne
+            feature_cache = get_feature_cache()
+            cached = feature_cache is not None and feature_cache.audio_path(payload["audio_file_path"]) is not None
+            if not cached and (payload.get("streaming") is False or not should_stream(payload["audio_file_path"])):
+                shared_audio = load_audio_to_shared_memory(payload["audio_file_path"])
+        if shared_audio is not None:
+            payload["shared_audio"] = (shared_audio[0].name, shared_audio[1])
+        payload["stream_segments"] = segment_callback is not None
+        payload["feature_cache"] = is_feature_cache_enabled()
+        payload["report_progress"] = progress_callback is not None
+
+        job_id = next(self._job_ids)
+        job = _PendingJob(self._process, segment_callback, progress_callback, shared_audio[0] if shared_audio else None)
+        self._jobs[job_id] = job
+        paused = False
+        sent = False
+        try:
+            sent = self._send(("job", job_id, kind, payload))
+            if not sent:
+                return None, "Proces roboczy transkrypcji jest niedostępny."
+            while not job.done.wait(CANCEL_POLL_INTERVAL):
+                if cancel_token is None:
+                    continue
+                if cancel_token.cancelled:
+                    self._send(("cancel", job_id, cancel_token.reason))
+                    cancel_token.raise_if_cancelled()
+                if cancel_token.paused != paused:
+                    paused = cancel_token.paused
+                    self._send(("pause" if paused else "resume", job_id))
+            if job.cancel_reason is not None:
+                raise JobCancelledError(job.cancel_reason)
+            if job.error_msg is None and kind in RESIDENT_MODEL_JOB_KINDS and payload.get("model_name"):
+                self._mark_resident(payload["model_name"], payload.get("precision", "fp32"))
+            return job.result, job.error_msg
+        finally:
+            # Zadanie anulowane, zanim proces roboczy odpowiedział, zostaje na liście do jego odpowiedzi -
+            # pamięć współdzielona nie może zniknąć, gdy proces właśnie do niej dołącza
+            if not sent or job.abandon():
+                self._jobs.pop(job_id, None)
+                job.release()
+
+    def _mark_resident(self, model_name: str, precision: str) -> None:
+        with self._lock:
+            self._resident_models[(model_name, precision)] = None
+            self._resident_models.move_to_end((model_name, precision))
+            while len(self._resident_models) > RESIDENT_MODELS_TRACKED:
+                self._resident_models.popitem(last=False)
+
+    def is_resident(self, model_name: str, precision: str = "fp32") -> bool:
+        """Czy model jest już załadowany w procesie roboczym (kolejne zadanie nie zapłaci za ładowanie)."""
+        with self._lock:
+            return (model_name, precision) in self._resident_models
+
+    @property
+    def pid(self) -> Optional[int]:
+        """PID działającego procesu roboczego (None, jeśli jeszcze nie uruchomiony lub zakończony)."""
+        with self._lock:
+            process = self._process
+        return process.pid if process is not None and process.is_alive() else None
+
+    @property
+    def queue_depth(self) -> int:
+        """Liczba zadań wysłanych do procesu roboczego i jeszcze niezakończonych (wykonywane są po kolei)."""
+        return len(self._jobs)
+
+    def shutdown(self) -> None:
+        """Zamyka proces roboczy (przy wyjściu z aplikacji); niezakończone zadania są anulowane."""
+        with self._lock:
+            process, self._closing = self._process, True
+        if process is None:
+            return
+        self._send(("shutdown",))
+        process.join(timeout=SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            logger.warning("Proces roboczy nie zakończył się w czasie - wymuszam zamknięcie.")
+            process.terminate()
+
+
+_workers: Dict[str, InferenceWorker] = {}
+_worker_lock = threading.Lock()
+
+
+def get_inference_worker(priority: str = PRIORITY_INTERACTIVE) -> InferenceWorker:
+    """Zwraca współdzieloną instancję procesu roboczego dla danego priorytetu (uruchamianego przy pierwszym zadaniu)."""
+    with _worker_lock:
+        if priority not in _workers:
+            _workers[priority] = InferenceWorker(background=priority == PRIORITY_BACKGROUND)
+        return _workers[priority]
+
+
+def shutdown_inference_worker() -> None:
+    for worker in list(_workers.values()):
+        worker.shutdown()
@@ -0,0 +1,147 @@
+# X:\Aplikacje\dictaitor\modules\jobs.py
+import time
+import threading
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Co ile sekund wstrzymane zadanie sprawdza, czy nie zostało anulowane
+PAUSE_POLL_INTERVAL = 0.2
+
+
+class JobCancelledError(Exception):
+    """Zadanie transkrypcji zostało anulowane przez użytkownika."""
+
+
+class JobTimeoutError(JobCancelledError):
+    """Zadanie transkrypcji przekroczyło limit czasu."""
+
+
+class CancellationToken:
+    """
+    Współdzielony znacznik anulowania zadania (anulowanie kooperacyjne).
+
+    Wątek roboczy sprawdza go w bezpiecznych miejscach (granice segmentów, przed wysłaniem
+    fragmentu do API) przez `raise_if_cancelled()`. Opcjonalny limit czasu działa tak samo:
+    po jego upływie token zachowuje się jak anulowany. W tych samych miejscach zadanie
+    wstrzymane przez `pause()` czeka na `resume()` - czas wstrzymania nie liczy się do limitu.
+    """
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._pause_callbacks: List[Callable[[bool], None]] = []
+        self._running = threading.Event()
+        self._running.set()
+        self._paused_at: Optional[float] = None
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.timeout = timeout
+        self.reason: Optional[str] = None
+        self.timed_out = False
+
+    def cancel(self, reason: str = "Anulowano przez użytkownika.") -> None:
+        """Anuluje zadanie i wywołuje zarejestrowane funkcje przerywające (np. zamknięcie połączenia)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            self._running.set()  # wstrzymane zadanie ma od razu zobaczyć anulowanie
+            callbacks, self._callbacks = self._callbacks, []
+        logger.info(f"Anulowanie zadania: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Błąd podczas przerywania zadania: {e}")
+
+    @property
+    def cancelled(self) -> bool:
+        if (not self._event.is_set() and self.deadline is not None and self._paused_at is None
+                and time.monotonic() >= self.deadline):
+            self.timed_out = True
+            self.cancel(f"Przekroczono limit czasu zadania ({self.timeout / 60:.0f} min).")
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Sekundy do upływu limitu czasu (None, jeśli zadanie nie ma limitu)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Rzuca JobCancelledError (lub JobTimeoutError), jeśli zadanie zostało anulowane.
+        Jeśli zadanie jest wstrzymane, najpierw czeka na wznowienie.
+        """
+        if not self._running.is_set():
+            logger.info("Zadanie wstrzymane - czeka na wznowienie")
+            while not self._running.wait(PAUSE_POLL_INTERVAL):
+                if self._event.is_set():
+                    break
+        if self.cancelled:
+            raise (JobTimeoutError if self.timed_out else JobCancelledError)(self.reason)
+
+    def pause(self) -> None:
+        """Wstrzymuje zadanie na najbliższym sprawdzeniu tokenu (granicy segmentu)."""
+        with self._lock:
+            if self._event.is_set() or not self._running.is_set():
+                return
+            self._paused_at = time.monotonic()
+            self._running.clear()
+            callbacks = list(self._pause_callbacks)
+        self._notify_pause(callbacks, True)
+
+    def resume(self) -> None:
+        with self._lock:
+            if self._paused_at is None:
+                return
+            if self.deadline is not None:
+                self.deadline += time.monotonic() - self._paused_at
+            self._paused_at = None
+            self._running.set()
+            callbacks = list(self._pause_callbacks)
+        self._notify_pause(callbacks, False)
+
+    @staticmethod
+    def _notify_pause(callbacks: List[Callable[[bool], None]], paused: bool) -> None:
+        for callback in callbacks:
+            try:
+                callback(paused)
+            except Exception as e:
+                logger.warning(f"Błąd podczas przekazywania wstrzymania zadania: {e}")
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Rejestruje funkcję wywoływaną przy anulowaniu (od razu, jeśli token jest już anulowany)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def add_pause_callback(self, callback: Callable[[bool], None]) -> None:
+        """
+        Rejestruje funkcję wywoływaną z True przy wstrzymaniu i z False przy wznowieniu
+        (od razu z True, jeśli token jest już wstrzymany) - np. do przekazania pauzy tokenom podzadań.
+        """
+        with self._lock:
+            self._pause_callbacks.append(callback)
+            paused = not self._running.is_set()
+        if paused:
+            self._notify_pause([callback], True)
+
+    def remove_pause_callback(self, callback: Callable[[bool], None]) -> None:
+        with self._lock:
+            if callback in self._pause_callbacks:
+                self._pause_callbacks.remove(callback)
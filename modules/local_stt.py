@@ -1,21 +1,51 @@
 # X:\Aplikacje\dictaitor\modules\local_stt.py
+import gc
 import os
+import time
 import logging
-from typing import Optional, Tuple, List
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, List, Dict, Any, Callable
+
+from modules.audio_stream import STREAMING_AVAILABLE, AudioStream, StreamingFeatureSource, should_stream
+from modules.cpu_tuning import apply_thread_settings, resolve_thread_settings
+from modules.jobs import JobCancelledError
+from modules.progress import ProgressReporter
+from modules.segment_repair import find_suspect_segments, group_spans, is_improvement, join_segment_text, splice_segments
+from modules.weight_cache import load_mmap_model
+from modules.whisper_decoding import ArrayFeatureSource, CachedFeatureSource, decode_features, decode_features_multi
+from modules.feature_cache import get_feature_cache
+from modules.decoding_presets import (DECODING_PRESETS, REFERENCE_PRESET, benchmark_key, describe_settings,
+                                      normalize_settings, whisper_decoding_arguments)
 
 logger = logging.getLogger(__name__)
 
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_CACHE_DIR = os.path.join(APP_DIR, "models_cache")
+QUANTIZED_CACHE_DIR = os.path.join(MODELS_CACHE_DIR, "quantized")
+
 # Dostępne modele Whisper (od najmniejszego/najszybszego do największego/najdokładniejszego)
 # Dodano model 'turbo', który jest szybszy niż 'large' i bardzo dokładny
 AVAILABLE_WHISPER_MODELS = ["tiny", "base", "small", "medium", "large", "large-v2", "large-v3", "turbo"]
 
-# Globalna zmienna do przechowywania załadowanego modelu, aby nie ładować go wielokrotnie
-_loaded_model = None
-_current_model_name = None
+# Tryby precyzji obliczeń na CPU: pełna (fp32) oraz dynamiczna kwantyzacja warstw liniowych do int8
+PRECISION_MODES = ["fp32", "int8"]
+DEFAULT_PRECISION = "fp32"
+
+# Załadowane modele (klucz: (nazwa, precyzja)), aby nie ładować ich wielokrotnie.
+# Trzymamy dwa, żeby mały model szkicu i docelowy model nie wypierały się nawzajem.
+MAX_RESIDENT_MODELS = 2
+_loaded_models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_inference_lock = threading.Lock()
+
+# Ponowne dekodowanie podejrzanych fragmentów: beam search zamiast dekodowania zachłannego
+REPAIR_DECODE_OPTIONS = {"beam_size": 5, "best_of": 5}
+AUDIO_SAMPLE_RATE = 16000
 
 # Sprawdź czy Whisper jest dostępny i które modele są zainstalowane
 try:
     import whisper
+    import torch
     
     # Sprawdź czy model turbo jest dostępny w zainstalowanej wersji
     try:
@@ -33,20 +63,69 @@ except ImportError as e:
     WHISPER_INSTALLED = False
     logger.warning(f"Biblioteka Whisper nie jest zainstalowana. Lokalna transkrypcja nie będzie dostępna. Błąd: {str(e)}")
 
-def load_whisper_model(model_name: str = "base"):
+def _quantized_cache_path(model_name: str) -> str:
+    """Zwraca ścieżkę pliku z zapisanym modelem int8 (zależną od wersji PyTorch, bo format nie jest przenośny)."""
+    torch_version = torch.__version__.split("+")[0]
+    return os.path.join(QUANTIZED_CACHE_DIR, f"{model_name}-int8-torch{torch_version}.pt")
+
+def quantize_model_int8(model):
+    """
+    Stosuje dynamiczną kwantyzację int8 do wszystkich warstw liniowych modelu Whisper.
+
+    Whisper używa własnej podklasy nn.Linear, której PyTorch nie rozpoznaje przy kwantyzacji,
+    dlatego przed konwersją warstwy są sprowadzane do zwykłego nn.Linear (w fp32 działają identycznie).
+    """
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_quantized_model(model_name: str):
+    """
+    Ładuje model int8 z cache na dysku, a jeśli go nie ma - kwantyzuje model fp32 i zapisuje wynik.
+    """
+    cache_path = _quantized_cache_path(model_name)
+    if os.path.exists(cache_path):
+        try:
+            logger.info(f"Ładowanie skwantyzowanego modelu z cache: {cache_path}")
+            return torch.load(cache_path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            logger.warning(f"Nie można wczytać skwantyzowanego modelu z cache ({e}). Kwantyzuję ponownie.")
+
+    logger.info(f"Kwantyzacja int8 modelu '{model_name}' (jednorazowo)...")
+    start = time.perf_counter()
+    model = quantize_model_int8(whisper.load_model(model_name, device="cpu"))
+    logger.info(f"Kwantyzacja zakończona w {time.perf_counter() - start:.1f} s")
+    try:
+        os.makedirs(QUANTIZED_CACHE_DIR, exist_ok=True)
+        torch.save(model, cache_path)
+        logger.info(f"Skwantyzowany model zapisany w cache: {cache_path}")
+    except Exception as e:
+        logger.warning(f"Nie udało się zapisać skwantyzowanego modelu w cache: {e}")
+    return model
+
+def load_whisper_model(model_name: str = "base", precision: str = DEFAULT_PRECISION):
     """
     Ładuje określony model Whisper.
-    Ponowne wywołanie z tą samą nazwą modelu nie będzie go ładować ponownie.
+    Ponowne wywołanie z tą samą nazwą modelu i precyzją nie będzie go ładować ponownie.
+
+    Args:
+        model_name (str): Nazwa modelu Whisper.
+        precision (str): "fp32" (pełna precyzja) lub "int8" (dynamiczna kwantyzacja na CPU).
     """
-    global _loaded_model, _current_model_name
-    
     if not WHISPER_INSTALLED:
         logger.error("Próba załadowania modelu Whisper, ale biblioteka nie jest zainstalowana")
         return None
+
+    if precision not in PRECISION_MODES:
+        logger.warning(f"Nieznany tryb precyzji: {precision}. Używam '{DEFAULT_PRECISION}'.")
+        precision = DEFAULT_PRECISION
         
-    if _loaded_model is not None and _current_model_name == model_name:
-        logger.info(f"Model Whisper '{model_name}' jest już załadowany.")
-        return _loaded_model
+    model_key = (model_name, precision)
+    if model_key in _loaded_models:
+        logger.info(f"Model Whisper '{model_name}' ({precision}) jest już załadowany.")
+        _loaded_models.move_to_end(model_key)
+        return _loaded_models[model_key]
     
     if model_name not in AVAILABLE_WHISPER_MODELS:
         logger.error(f"Nieznany model Whisper: {model_name}. Dostępne: {AVAILABLE_WHISPER_MODELS}")
@@ -58,19 +137,31 @@ def load_whisper_model(model_name: str = "base"):
             # W przeciwnym razie użyj "base" jako bezpiecznej opcji
             model_name = "base" 
             logger.warning(f"Używam domyślnego modelu Whisper: '{model_name}'")
+        return load_whisper_model(model_name, precision=precision)
 
     try:
-        logger.info(f"Ładowanie modelu Whisper: '{model_name}'... To może chwilę potrwać przy pierwszym uruchomieniu.")
+        logger.info(f"Ładowanie modelu Whisper: '{model_name}' ({precision})... To może chwilę potrwać przy pierwszym uruchomieniu.")
+        # Zwolnij najdawniej używany model przed załadowaniem nowego, żeby nie trzymać zbyt wielu w pamięci
+        while len(_loaded_models) >= MAX_RESIDENT_MODELS:
+            evicted_key, _ = _loaded_models.popitem(last=False)
+            logger.info(f"Zwolniono model Whisper '{evicted_key[0]}' ({evicted_key[1]}) z pamięci.")
+        model = None
         # Modele są pobierane automatycznie przy pierwszym użyciu i cache'owane
         # Domyślny katalog cache: ~/.cache/whisper
-        _loaded_model = whisper.load_model(model_name)
-        _current_model_name = model_name
-        logger.info(f"Model Whisper '{model_name}' załadowany pomyślnie.")
-        return _loaded_model
+        if precision == "int8":
+            # Kwantyzacja dynamiczna działa tylko na CPU
+            model = _load_quantized_model(model_name)
+        else:
+            # Na CPU wagi są mapowane z pliku safetensors (szybki start, współdzielona pamięć między procesami)
+            if not torch.cuda.is_available():
+                model = load_mmap_model(model_name)
+            if model is None:
+                model = whisper.load_model(model_name)
+        _loaded_models[model_key] = model
+        logger.info(f"Model Whisper '{model_name}' ({precision}) załadowany pomyślnie.")
+        return model
     except Exception as e:
-        logger.error(f"Nie udało się załadować modelu Whisper '{model_name}': {e}")
-        _loaded_model = None # Zresetuj w przypadku błędu
-        _current_model_name = None
+        logger.error(f"Nie udało się załadować modelu Whisper '{model_name}' ({precision}): {e}")
         return None
 
 def get_available_models() -> List[str]:
@@ -111,10 +202,86 @@ def normalize_path(path: str) -> str:
     logger.info(f"Plik zweryfikowany - istnieje: {normalized_path}")
     return normalized_path
 
-def transcribe_audio_local(audio_file_path: str, model_name: str = "turbo", language: Optional[str] = None, task: str = "transcribe") -> Tuple[Optional[str], Optional[str]]:
+def load_audio_array(audio_file_path: str):
+    """
+    Wczytuje plik audio jako tablicę float32 16 kHz mono.
+
+    Preferuje librosa (jeśli jest zainstalowana), w przeciwnym razie używa loadera Whisper (FFmpeg).
+    """
+    # Spróbuj alternatywne podejście z wczytywaniem przez librosa, jeśli jest dostępne
+    try:
+        import librosa
+        logger.info("Wczytywanie pliku audio przez librosa")
+        audio, sr = librosa.load(audio_file_path, sr=16000, mono=True)
+        return audio
+    except ImportError:
+        # Jeśli nie ma librosa, użyj standardowej metody
+        logger.info("Użycie standardowej metody wczytywania audio")
+    except Exception as e:
+        # W przypadku błędu wczytywania przez librosa, użyj standardowej metody
+        logger.warning(f"Błąd wczytywania przez librosa: {e}, próbuję standardową metodę")
+    return whisper.load_audio(audio_file_path)
+
+def _cached_feature_source(normalized_path: str, n_mels: int, audio, feature_cache):
+    """
+    Źródło cech dla całego pliku w pamięci, z pominięciem dekodowania i spektrogramu, jeśli ten
+    plik był już transkrybowany (inne zadanie, język lub model o tej samej liczbie pasm mel).
+    """
+    if feature_cache is None:
+        return ArrayFeatureSource(audio if audio is not None else load_audio_array(normalized_path), n_mels)
+    mel = feature_cache.get_mel(normalized_path, n_mels)
+    if mel is not None:
+        return CachedFeatureSource(mel)
+    if audio is None:
+        audio = feature_cache.get_audio(normalized_path)
+    if audio is None:
+        audio = load_audio_array(normalized_path)
+    feature_cache.put_audio(normalized_path, audio)
+    source = ArrayFeatureSource(audio, n_mels)
+    mel = feature_cache.put_mel(normalized_path, n_mels, source.mel)
+    # Pierwszy przebieg też korzysta z zapisanej (float16) wersji - wyniki kolejnych przebiegów są identyczne
+    return CachedFeatureSource(mel) if mel is not None else source
+
+def transcribe_audio_local(audio_file_path: str, model_name: str = "turbo", language: Optional[str] = None, task: str = "transcribe", precision: str = DEFAULT_PRECISION, thread_settings: Optional[Dict[str, Any]] = None,
+                           progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           streaming: Optional[bool] = None, decoding: Optional[Dict[str, Any]] = None,
+                           initial_prompt: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
     """
     Przeprowadza transkrypcję lub tłumaczenie pliku audio przy użyciu lokalnego modelu Whisper.
 
+    Args:
+        audio_file_path (str): Ścieżka do pliku audio.
+        model_name (str): Nazwa modelu Whisper do użycia (np. "tiny", "base", "turbo").
+        language (Optional[str]): Kod języka (np. "en", "pl") do transkrypcji.
+        task (str): Rodzaj zadania: "transcribe" (domyślnie) lub "translate".
+        precision (str): Precyzja obliczeń: "fp32" lub "int8".
+        thread_settings (Optional[Dict[str, Any]]): Ustawienia wątków i powinowactwa CPU (patrz cpu_tuning).
+        progress_callback (Optional[Callable]): Otrzymuje postęp (procent, RTF, ETA) - patrz progress.ProgressReporter.
+        streaming (Optional[bool]): Dekodowanie strumieniowe ze stałym zużyciem pamięci (None = automatycznie dla długich plików).
+        decoding (Optional[Dict[str, Any]]): Ustawienia dekodowania (patrz decoding_presets; None = preset domyślny).
+        initial_prompt (Optional[str]): Podpowiedź dla modelu, np. terminy ze słownika poprawek.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (wynik_tekstowy, błąd_wiadomość)
+    """
+    result, error_msg = transcribe_audio_local_segments(audio_file_path, model_name=model_name, language=language, task=task, precision=precision, thread_settings=thread_settings,
+                                                        progress_callback=progress_callback, streaming=streaming, decoding=decoding,
+                                                        initial_prompt=initial_prompt)
+    if error_msg:
+        return None, error_msg
+    return result["text"], None
+
+def transcribe_audio_local_segments(audio_file_path: str, model_name: str = "turbo", language: Optional[str] = None, task: str = "transcribe", precision: str = DEFAULT_PRECISION, thread_settings: Optional[Dict[str, Any]] = None,
+                                    segment_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                    cancel_token=None, streaming: Optional[bool] = None,
+                                    audio=None, additional_outputs: Optional[List[Dict[str, Optional[str]]]] = None,
+                                    decoding: Optional[Dict[str, Any]] = None,
+                                    initial_prompt: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Przeprowadza transkrypcję lub tłumaczenie pliku audio przy użyciu lokalnego modelu Whisper
+    i zwraca pełny wynik wraz z segmentami.
+
     Args:
         audio_file_path (str): Ścieżka do pliku audio.
         model_name (str): Nazwa modelu Whisper do użycia (np. "tiny", "base", "turbo").
@@ -123,9 +290,36 @@ def transcribe_audio_local(audio_file_path: str, model_name: str = "turbo", lang
                                  Dla zadania 'translate', ten parametr jest ignorowany przez Whisper,
                                  ale może być logowany.
         task (str): Rodzaj zadania: "transcribe" (domyślnie) lub "translate".
+        precision (str): Precyzja obliczeń: "fp32" lub "int8" (szybsza na CPU, nieco mniej dokładna).
+        thread_settings (Optional[Dict[str, Any]]): Ustawienia wątków intra-op/inter-op i powinowactwa CPU.
+                                 Wartość "auto" oznacza wynik strojenia dla tej maszyny i modelu.
+                                 None pozostawia ustawienia PyTorch bez zmian.
+        segment_callback (Optional[Callable]): Wywoływana z każdym segmentem zaraz po jego zdekodowaniu
+                                 (z wątku transkrypcji).
+        progress_callback (Optional[Callable]): Otrzymuje postęp liczony z przetworzonych okien audio
+                                 (słownik z 'fraction', 'rtf', 'eta'...; patrz progress.ProgressReporter).
+        cancel_token (Optional[CancellationToken]): Token anulowania sprawdzany na granicach okien dekodowania.
+        streaming (Optional[bool]): True - audio czytane oknami z pliku mapowanego w pamięci, spektrogram
+                                 liczony per okno (pamięć niezależna od długości nagrania); False - cały plik
+                                 w pamięci; None - automatycznie (strumieniowo dla nagrań dłuższych niż 20 min).
+        audio (Optional[np.ndarray]): Już zdekodowane audio (float32, 16 kHz mono), np. przekazane przez
+                                 pamięć współdzieloną z procesu GUI; plik nie jest wtedy ponownie wczytywany.
+        additional_outputs (Optional[List[Dict]]): Dodatkowe wyjścia ({'task', 'language'}), np. tłumaczenie
+                                 obok transkrypcji. Koder działa raz na okno, a każde wyjście kosztuje tylko
+                                 czas dekodera.
+        decoding (Optional[Dict[str, Any]]): Ustawienia dekodowania - beam_size, best_of, temperature_fallback,
+                                 condition_on_previous_text, no_speech_threshold (patrz decoding_presets).
+                                 Brakujące wartości pochodzą z presetu domyślnego (jak whisper.transcribe).
+        initial_prompt (Optional[str]): Podpowiedź (np. terminy ze słownika poprawek) - poprzedza kontekst
+                                 w każdym oknie, więc działa na całym nagraniu, a nie tylko na pierwszych 30 s.
 
     Returns:
-        Tuple[Optional[str], Optional[str]]: (wynik_tekstowy, błąd_wiadomość)
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik, błąd_wiadomość), gdzie wynik zawiera
+            klucze 'text', 'segments' (lista słowników z 'start', 'end', 'text') i 'language', a przy
+            additional_outputs także 'additional_outputs' (wyniki w tej samej kolejności, z kluczem 'task').
+
+    Raises:
+        JobCancelledError: Jeśli zadanie zostało anulowane lub przekroczyło limit czasu.
     """
     if not WHISPER_INSTALLED:
         return None, "Biblioteka Whisper nie jest zainstalowana. Zainstaluj używając: pip install openai-whisper"
@@ -138,50 +332,308 @@ def transcribe_audio_local(audio_file_path: str, model_name: str = "turbo", lang
         logger.info(f"Ścieżka znormalizowana: {normalized_path}")
         logger.info(f"Rozmiar pliku: {os.path.getsize(normalized_path) / 1024:.2f} KB")
         
-        model = load_whisper_model(model_name)
+        model = load_whisper_model(model_name, precision=precision)
         if model is None:
-            return None, f"Nie udało się załadować modelu Whisper '{model_name}'."
+            return None, f"Nie udało się załadować modelu Whisper '{model_name}' ({precision})."
+
+        if thread_settings is not None:
+            apply_thread_settings(**resolve_thread_settings(thread_settings, model_name, precision))
 
         log_action = "tłumaczenia" if task == "translate" else "transkrypcji"
-        logger.info(f"Rozpoczynanie lokalnej {log_action} pliku: {normalized_path} (model: {model_name}, język: {language or 'auto'}, zadanie: {task})")
+        decoding_settings = normalize_settings(decoding)
+        logger.info(f"Rozpoczynanie lokalnej {log_action} pliku: {normalized_path} (model: {model_name}, precyzja: {precision}, język: {language or 'auto'}, zadanie: {task})")
+        logger.info(f"Dekodowanie: {describe_settings(decoding_settings)}")
         
-        # Opcje transkrypcji/tłumaczenia
-        transcribe_options = {"fp16": False, "task": task} # Dodano task
-        if language and task == "transcribe": # Język jest relevantny tylko dla transkrypcji
-            transcribe_options["language"] = language
+        # Język jest relevantny tylko dla transkrypcji
+        decode_language = language if language and task == "transcribe" else None
         
         # Sprawdź jeszcze raz przed przekazaniem do Whisper
         if not os.path.exists(normalized_path):
             raise FileNotFoundError(f"Plik zniknął przed transkrypcją: {normalized_path}")
             
-        # Spróbuj alternatywne podejście z wczytywaniem przez librosa, jeśli jest dostępne
+        if audio is None and streaming is None:
+            streaming = should_stream(normalized_path)
+        feature_cache = get_feature_cache()
+        stream = None
+        if audio is None and streaming and STREAMING_AVAILABLE:
+            try:
+                # Audio zdekodowane przy wcześniejszym przebiegu jest mapowane bez ponownego uruchamiania FFmpeg
+                stream = AudioStream((feature_cache.audio_path(normalized_path) if feature_cache else None) or normalized_path)
+                logger.info("Dekodowanie strumieniowe: audio czytane oknami 30 s z pliku mapowanego w pamięci")
+            except RuntimeError as e:
+                logger.warning(f"Dekodowanie strumieniowe niedostępne ({e}) - wczytuję cały plik.")
+        if stream is not None:
+            source = StreamingFeatureSource(stream, model.dims.n_mels)
+        else:
+            source = _cached_feature_source(normalized_path, model.dims.n_mels, audio, feature_cache)
+        reporter = ProgressReporter(progress_callback) if progress_callback is not None else None
         try:
-            import librosa
-            logger.info("Wczytywanie pliku audio przez librosa")
-            audio, sr = librosa.load(normalized_path, sr=16000, mono=True)
-            # Użyj metody transcribe na tablicy audio
-            result = model.transcribe(audio, **transcribe_options)
-        except ImportError:
-            # Jeśli nie ma librosa, użyj standardowej metody
-            logger.info("Użycie standardowej metody wczytywania audio")
-            result = model.transcribe(normalized_path, **transcribe_options)
-        except Exception as e:
-            # W przypadku błędu wczytywania przez librosa, użyj standardowej metody
-            logger.warning(f"Błąd wczytywania przez librosa: {e}, próbuję standardową metodę")
-            result = model.transcribe(normalized_path, **transcribe_options)
-        
-        transcription = result["text"]
+            # Dekodowanie modyfikuje model (hooki cache KV), więc zadania korzystające z tego samego modelu
+            # muszą iść po kolei; anulowane zadanie zwalnia blokadę na najbliższej granicy okna
+            outputs = [{"task": task, "language": decode_language}]
+            for output in additional_outputs or []:
+                output_task = output.get("task", "transcribe")
+                outputs.append({"task": output_task, "language": output.get("language") if output_task == "transcribe" else None})
+            with _inference_lock:
+                results = decode_features_multi(model, source, outputs, **whisper_decoding_arguments(decoding_settings),
+                                                initial_prompt=initial_prompt, carry_initial_prompt=True,
+                                                segment_callback=segment_callback,
+                                                progress_callback=reporter.update if reporter else None, cancel_token=cancel_token)
+            result = results[0]
+        finally:
+            if stream is not None:
+                stream.close()
+        if reporter:
+            reporter.finish()
         
         detected_lang = result.get("language", "nie wykryto")
         log_action_done = "Lokalne tłumaczenie" if task == "translate" else "Lokalna transkrypcja"
         logger.info(f"{log_action_done} zakończona. Wykryty język: {detected_lang}.")
-        return transcription.strip(), None
+        final_result = {
+            "text": result["text"].strip(),
+            "segments": result.get("segments", []),
+            "language": result.get("language"),
+        }
+        if additional_outputs:
+            final_result["additional_outputs"] = [{**extra, "text": extra["text"].strip()} for extra in results[1:]]
+            logger.info(f"Dodatkowe wyjścia ({len(results) - 1}) zdekodowane z tych samych cech kodera.")
+        return final_result, None
         
     except FileNotFoundError as e:
         error_msg = f"Nie można znaleźć pliku audio: {e}"
         logger.error(error_msg)
         return None, error_msg
+    except JobCancelledError as e:
+        logger.info(f"Lokalna transkrypcja przerwana: {e}")
+        # Audio i spektrogram przerwanego zadania nie powinny czekać na kolejne zadanie
+        gc.collect()
+        raise
     except Exception as e:
         error_msg = f"Błąd podczas lokalnej {log_action} pliku {audio_file_path}: {e}"
         logger.error(error_msg)
-        return None, error_msg
\ No newline at end of file
+        return None, error_msg
+
+def repair_segments_local(audio_file_path: str, segments: List[Dict[str, Any]], model_name: str = "turbo", language: Optional[str] = None, task: str = "transcribe", precision: str = DEFAULT_PRECISION, thread_settings: Optional[Dict[str, Any]] = None,
+                          progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          cancel_token=None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Dekoduje ponownie tylko podejrzane segmenty transkrypcji (pętle powtórzeń, tekst na ciszy,
+    niska pewność) i wstawia poprawione fragmenty w miejsce oryginalnych.
+
+    Fragmenty są dekodowane bez kontekstu poprzedniego tekstu (główne źródło pętli) i z beam search;
+    można też wskazać mocniejszy model niż użyty w pierwszym przebiegu. Nowy wynik zastępuje
+    stary tylko wtedy, gdy ma mniej podejrzanych segmentów.
+
+    Args:
+        audio_file_path (str): Ścieżka do pliku audio, z którego pochodzą segmenty.
+        segments (List[Dict[str, Any]]): Segmenty z pierwszego przebiegu (dowolnego silnika).
+        model_name (str): Model Whisper użyty do ponownego dekodowania.
+        language (Optional[str]): Kod języka (najlepiej wykryty w pierwszym przebiegu).
+        task (str): "transcribe" lub "translate".
+        precision (str): Precyzja obliczeń: "fp32" lub "int8".
+        thread_settings (Optional[Dict[str, Any]]): Ustawienia wątków i powinowactwa CPU.
+        progress_callback (Optional[Callable]): Otrzymuje postęp liczony z sekund poprawianych fragmentów.
+        cancel_token (Optional[CancellationToken]): Token anulowania.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik, błąd_wiadomość); wynik zawiera 'text',
+            'segments', 'language', 'repaired' (liczba poprawionych fragmentów) i 'suspect_spans'.
+    """
+    if not WHISPER_INSTALLED:
+        return None, "Biblioteka Whisper nie jest zainstalowana. Zainstaluj używając: pip install openai-whisper"
+
+    suspects = find_suspect_segments(segments)
+    if not suspects:
+        return {"text": join_segment_text(segments), "segments": segments, "language": language, "repaired": 0, "suspect_spans": 0}, None
+
+    try:
+        normalized_path = normalize_path(audio_file_path)
+        model = load_whisper_model(model_name, precision=precision)
+        if model is None:
+            return None, f"Nie udało się załadować modelu Whisper '{model_name}' ({precision})."
+        if thread_settings is not None:
+            apply_thread_settings(**resolve_thread_settings(thread_settings, model_name, precision))
+
+        # Fragmenty czytamy z pliku mapowanego w pamięci - nie trzeba ładować całego nagrania
+        feature_cache = get_feature_cache()
+        cached_audio_path = feature_cache.audio_path(normalized_path) if feature_cache else None
+        stream = AudioStream(cached_audio_path or normalized_path) if STREAMING_AVAILABLE else None
+        if stream is not None:
+            duration, read_clip = stream.duration, stream.read_seconds
+        else:
+            audio = load_audio_array(normalized_path)
+            duration = len(audio) / AUDIO_SAMPLE_RATE
+            read_clip = lambda start, end: audio[int(start * AUDIO_SAMPLE_RATE):int(end * AUDIO_SAMPLE_RATE)]
+        spans = group_spans(segments, suspects, duration=duration)
+        total_seconds = sum(end - start for _, _, start, end in spans)
+        logger.info(f"Ponowne dekodowanie {len(spans)} podejrzanych fragmentów ({total_seconds:.1f} s audio, model: {model_name})")
+        reporter = ProgressReporter(progress_callback, total_seconds=total_seconds) if progress_callback is not None else None
+        decode_language = language if language and task == "transcribe" else None
+
+        replacements = []
+        processed_seconds = 0.0
+        try:
+            with _inference_lock:
+                for first, last, start, end in spans:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    clip = read_clip(start, end)
+                    new_segments = []
+                    if len(clip) > 0:
+                        redecoded = decode_features(model, ArrayFeatureSource(clip, model.dims.n_mels), language=decode_language, task=task,
+                                                    condition_on_previous_text=False, decode_options=REPAIR_DECODE_OPTIONS, cancel_token=cancel_token)
+                        new_segments = [{**segment, "start": segment["start"] + start, "end": segment["end"] + start}
+                                        for segment in redecoded["segments"]]
+                    if is_improvement(segments[first:last + 1], new_segments):
+                        replacements.append((first, last, new_segments))
+                    else:
+                        logger.info(f"Fragment {start:.1f}-{end:.1f} s: nowy wynik nie jest lepszy, zostawiam oryginał.")
+                    processed_seconds += end - start
+                    if reporter:
+                        reporter.update(processed_seconds)
+        finally:
+            if stream is not None:
+                stream.close()
+        if reporter:
+            reporter.finish()
+
+        repaired_segments = splice_segments(segments, replacements)
+        logger.info(f"Poprawiono {len(replacements)} z {len(spans)} podejrzanych fragmentów.")
+        return {
+            "text": join_segment_text(repaired_segments),
+            "segments": repaired_segments,
+            "language": language,
+            "repaired": len(replacements),
+            "suspect_spans": len(spans),
+        }, None
+
+    except FileNotFoundError as e:
+        error_msg = f"Nie można znaleźć pliku audio: {e}"
+        logger.error(error_msg)
+        return None, error_msg
+    except JobCancelledError as e:
+        logger.info(f"Poprawianie fragmentów przerwane: {e}")
+        gc.collect()
+        raise
+    except Exception as e:
+        error_msg = f"Błąd podczas poprawiania fragmentów pliku {audio_file_path}: {e}"
+        logger.error(error_msg)
+        return None, error_msg
+
+def benchmark_precision_modes(reference_clip: str, model_name: str = "turbo", language: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Porównuje szybkość i dokładność trybów precyzji na klipie referencyjnym.
+
+    Wynik fp32 służy jako wzorzec, względem którego liczony jest WER pozostałych trybów.
+    Wyniki są zapisywane w config/benchmarks.json (sekcja "precision", klucz = nazwa modelu).
+
+    Args:
+        reference_clip (str): Ścieżka do klipu referencyjnego.
+        model_name (str): Nazwa modelu Whisper.
+        language (Optional[str]): Opcjonalny kod języka nagrania.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wyniki_per_tryb, błąd_wiadomość)
+    """
+    from modules.benchmark import get_audio_duration, measure_transcription, save_benchmark_result, word_error_rate
+
+    if not WHISPER_INSTALLED:
+        return None, "Biblioteka Whisper nie jest zainstalowana. Zainstaluj używając: pip install openai-whisper"
+
+    duration = get_audio_duration(reference_clip)
+    if not duration:
+        return None, f"Nie można ustalić długości klipu referencyjnego: {reference_clip}"
+
+    results = {}
+    for precision in PRECISION_MODES:
+        load_start = time.perf_counter()
+        if load_whisper_model(model_name, precision=precision) is None:
+            return None, f"Nie udało się załadować modelu '{model_name}' ({precision})."
+        load_time = time.perf_counter() - load_start
+
+        measurement = measure_transcription(
+            lambda: transcribe_audio_local(reference_clip, model_name=model_name, language=language, precision=precision),
+            duration)
+        if measurement["error"]:
+            return None, measurement["error"]
+        measurement["load_time"] = load_time
+        results[precision] = measurement
+        logger.info(f"Benchmark {model_name}/{precision}: RTF {measurement['rtf']:.3f} (czas {measurement['elapsed']:.1f} s, ładowanie {load_time:.1f} s)")
+
+    reference_text = results[DEFAULT_PRECISION]["text"]
+    for precision, measurement in results.items():
+        measurement["wer"] = word_error_rate(reference_text, measurement["text"])
+        measurement["speedup"] = results[DEFAULT_PRECISION]["elapsed"] / measurement["elapsed"] if measurement["elapsed"] else None
+
+    save_benchmark_result("precision", model_name, {
+        "clip": os.path.basename(reference_clip),
+        "clip_duration": duration,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "modes": {p: {k: v for k, v in m.items() if k != "text"} for p, m in results.items()},
+    })
+    return results, None
+
+
+def benchmark_decoding_presets(reference_clip: str, model_name: str = "turbo", precision: str = DEFAULT_PRECISION,
+                               language: Optional[str] = None,
+                               custom: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Mierzy RTF presetów dekodowania (i ustawień własnych, jeśli podano) na klipie referencyjnym.
+
+    Tekst presetu "accurate" służy jako wzorzec, względem którego liczony jest WER pozostałych.
+    Wyniki są zapisywane w config/benchmarks.json (sekcja "decoding_presets", klucz = model/precyzja).
+
+    Args:
+        reference_clip (str): Ścieżka do klipu referencyjnego.
+        model_name (str): Nazwa modelu Whisper.
+        precision (str): Precyzja obliczeń ("fp32" lub "int8").
+        language (Optional[str]): Opcjonalny kod języka nagrania.
+        custom (Optional[Dict[str, Any]]): Własne ustawienia dekodowania użytkownika.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wyniki_per_preset, błąd_wiadomość)
+    """
+    from modules.benchmark import get_audio_duration, measure_transcription, save_benchmark_result, word_error_rate
+
+    if not WHISPER_INSTALLED:
+        return None, "Biblioteka Whisper nie jest zainstalowana. Zainstaluj używając: pip install openai-whisper"
+
+    duration = get_audio_duration(reference_clip)
+    if not duration:
+        return None, f"Nie można ustalić długości klipu referencyjnego: {reference_clip}"
+    # Model ładujemy przed pomiarami - czas ładowania nie może obciążyć pierwszego presetu
+    model = load_whisper_model(model_name, precision=precision)
+    if model is None:
+        return None, f"Nie udało się załadować modelu '{model_name}' ({precision})."
+    feature_cache = get_feature_cache()
+    if feature_cache is not None:
+        # Z tego samego powodu audio i spektrogram trafiają do pamięci podręcznej cech przed pomiarami -
+        # dekodowanie FFmpeg i liczenie cech obciążyłyby tylko pierwszy preset
+        _cached_feature_source(normalize_path(reference_clip), model.dims.n_mels, None, feature_cache)
+
+    presets = dict(DECODING_PRESETS)
+    if custom:
+        presets["custom"] = custom
+    results = {}
+    for preset, settings in presets.items():
+        measurement = measure_transcription(
+            lambda: transcribe_audio_local(reference_clip, model_name=model_name, language=language, precision=precision,
+                                           decoding=settings),
+            duration)
+        if measurement["error"]:
+            return None, measurement["error"]
+        measurement["settings"] = normalize_settings(settings)
+        results[preset] = measurement
+        logger.info(f"Benchmark presetu '{preset}' ({model_name}/{precision}): RTF {measurement['rtf']:.3f} (czas {measurement['elapsed']:.1f} s)")
+
+    reference_text = results[REFERENCE_PRESET]["text"]
+    for measurement in results.values():
+        measurement["wer"] = word_error_rate(reference_text, measurement["text"])
+
+    save_benchmark_result("decoding_presets", benchmark_key(model_name, precision), {
+        "clip": os.path.basename(reference_clip),
+        "clip_duration": duration,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "presets": {p: {k: v for k, v in m.items() if k != "text"} for p, m in results.items()},
+    })
+    return results, None
@@ -0,0 +1,129 @@
+# X:\Aplikacje\dictaitor\modules\multipart_stream.py
+import os
+import time
+import uuid
+import logging
+import mimetypes
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.jobs import JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+# Rozmiar bloku czytanego z pliku - pamięć wysyłki nie zależy od rozmiaru nagrania
+DEFAULT_BLOCK_SIZE = 64 * 1024
+# Minimalny odstęp między powiadomieniami o postępie wysyłania (s)
+PROGRESS_MIN_INTERVAL = 0.5
+
+
+def _quote(value: str) -> str:
+    """Nazwy pól i plików w nagłówkach części - cudzysłów i znaki nowej linii są niedozwolone."""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", " ").replace("\n", " ")
+
+
+class MultipartFileStream:
+    """
+    Ciało żądania multipart/form-data z polami formularza i jednym plikiem, czytane blokami.
+
+    `requests` dostaje ten obiekt jako `data=` i wysyła go kawałkami (zna długość z __len__),
+    więc w pamięci jest naraz najwyżej jeden blok pliku - w przeciwieństwie do `files=`, które
+    buduje całe ciało żądania w pamięci. Każdy odczyt aktualizuje postęp i przepustowość wysyłania,
+    a anulowanie zadania przerywa wysyłkę na najbliższym bloku.
+    """
+
+    def __init__(self, fields: Dict[str, Any], file_field: str, file_path: str,
+                 file_content_type: Optional[str] = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_token=None) -> None:
+        self.boundary = uuid.uuid4().hex
+        self.block_size = block_size
+        self.progress_callback = progress_callback
+        self.cancel_token = cancel_token
+        file_content_type = file_content_type or mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+
+        preamble = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for name, value in fields.items())
+        preamble += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+                     f'filename="{_quote(os.path.basename(file_path))}"\r\nContent-Type: {file_content_type}\r\n\r\n').encode("utf-8")
+        epilogue = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self._file = open(file_path, "rb")
+        self.file_size = os.fstat(self._file.fileno()).st_size
+        # Części ciała po kolei: nagłówki pól, plik (czytany blokami), zakończenie
+        self._parts: List[Any] = [preamble, self._file, epilogue]
+        self._part_index = 0
+        self._part_offset = 0
+        self.total = len(preamble) + self.file_size + len(epilogue)
+        self.sent = 0
+        self._start: Optional[float] = None
+        self._last_report = 0.0
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        # requests liczy Content-Length jako len() - tell(), tak jak dla zwykłego pliku
+        return self.total
+
+    def tell(self) -> int:
+        return self.sent
+
+    def read(self, size: int = -1) -> bytes:
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        if self._start is None:
+            self._start = time.perf_counter()
+        size = self.block_size if size is None or size < 0 else min(size, self.block_size)
+        chunk = b""
+        while not chunk and self._part_index < len(self._parts):
+            part = self._parts[self._part_index]
+            if isinstance(part, bytes):
+                chunk = part[self._part_offset:self._part_offset + size]
+                self._part_offset += len(chunk)
+                if self._part_offset >= len(part):
+                    self._part_index, self._part_offset = self._part_index + 1, 0
+            else:
+                chunk = part.read(size)
+                if not chunk:
+                    self._part_index += 1
+        self.sent += len(chunk)
+        self._report(force=self.sent >= self.total)
+        return chunk
+
+    def progress(self) -> Dict[str, Any]:
+        """Postęp wysyłania: bajty wysłane i całość, ułamek, czas, przepustowość (B/s) i ETA (s)."""
+        elapsed = time.perf_counter() - self._start if self._start is not None else 0.0
+        throughput = self.sent / elapsed if elapsed > 0 else None
+        return {
+            "sent": self.sent,
+            "total": self.total,
+            "fraction": self.sent / self.total if self.total else 1.0,
+            "elapsed": elapsed,
+            "throughput": throughput,
+            "eta": (self.total - self.sent) / throughput if throughput else None,
+        }
+
+    def _report(self, force: bool = False) -> None:
+        if self.progress_callback is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_report < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_report = now
+        try:
+            self.progress_callback(self.progress())
+        except JobCancelledError:
+            raise
+        except Exception as e:
+            # Błąd w interfejsie nie może przerwać wysyłki
+            logger.warning(f"Błąd funkcji zwrotnej postępu wysyłania: {e}")
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "MultipartFileStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,319 @@
+# X:\Aplikacje\dictaitor\modules\multitrack_recorder.py
+import os
+import re
+import time
+import wave
+import array
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.jobs import JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyaudio
+    PYAUDIO_INSTALLED = True
+except ImportError:
+    PYAUDIO_INSTALLED = False
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDINGS_DIR = os.path.join(APP_DIR, "recordings")
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHUNK_SIZE = 1024
+# Ile ścieżek transkrybujemy jednocześnie (silnik lokalny i tak wykonuje zadania po kolei w procesie roboczym)
+MAX_PARALLEL_TRACKS = 4
+# Kolejne segmenty tego samego mówcy oddalone o mniej niż tyle sekund łączymy w jedną wypowiedź
+TURN_MERGE_GAP = 1.5
+
+
+class SyntheticInputStream:
+    """
+    Sztuczne wejście audio o interfejsie strumienia PyAudio (read/stop_stream/close).
+
+    Zwraca zadane próbki int16 (osobna lista na kanał, przeplatane jak w prawdziwym urządzeniu),
+    a po ich końcu ciszę. Przy realtime=True tempo odczytu odpowiada prawdziwemu urządzeniu
+    (przyspieszonemu `speed` razy), więc nagrywanie kilku takich wejść da się sprawdzić bez sprzętu.
+    """
+
+    def __init__(self, channel_samples: List[List[int]], rate: int = SAMPLE_RATE, realtime: bool = True,
+                 speed: float = 1.0) -> None:
+        self.channel_samples = channel_samples
+        self.channels = len(channel_samples)
+        self.rate = rate
+        self.realtime = realtime
+        self.speed = speed
+        self.position = 0
+        self._active = True
+        self._started = time.perf_counter()
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        if self.realtime:
+            due = self._started + (self.position + num_frames) / (self.rate * self.speed)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        chunk = array.array("h", bytes(num_frames * self.channels * SAMPLE_WIDTH))
+        for channel, samples in enumerate(self.channel_samples):
+            part = samples[self.position:self.position + num_frames]
+            chunk[channel:len(part) * self.channels:self.channels] = array.array("h", part)
+        self.position += num_frames
+        return chunk.tobytes()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def stop_stream(self) -> None:
+        self._active = False
+
+    def close(self) -> None:
+        self._active = False
+
+
+def list_input_devices() -> List[Dict[str, Any]]:
+    """Lista urządzeń wejściowych: [{'index', 'name', 'channels'}] (pusta bez PyAudio)."""
+    if not PYAUDIO_INSTALLED:
+        return []
+    audio_interface = pyaudio.PyAudio()
+    try:
+        devices = []
+        for index in range(audio_interface.get_device_count()):
+            info = audio_interface.get_device_info_by_index(index)
+            if info.get("maxInputChannels", 0) > 0:
+                devices.append({"index": index, "name": info.get("name", f"Urządzenie {index}"),
+                                "channels": int(info["maxInputChannels"])})
+        return devices
+    finally:
+        audio_interface.terminate()
+
+
+def _safe_label(label: str) -> str:
+    return re.sub(r"[^\w-]+", "_", label).strip("_") or "sciezka"
+
+
+class MultiTrackRecorder:
+    """
+    Jednoczesne nagrywanie z kilku urządzeń wejściowych lub kanałów, ścieżka na mówcę.
+
+    Ścieżka to słownik {'label': nazwa mówcy, 'device': indeks urządzenia (None = domyślne),
+    'channel': numer kanału urządzenia}. Każde urządzenie jest czytane we własnym wątku, a moment
+    pierwszego bloku danych wyznacza jego początek - ścieżki urządzeń, które wystartowały później,
+    są na początku dopełniane ciszą, więc czasy segmentów z różnych ścieżek są porównywalne.
+    Dryf zegarów między osobnymi urządzeniami nie jest korygowany.
+    """
+
+    def __init__(self, tracks: List[Dict[str, Any]], filename_prefix: str = "meeting", rate: int = SAMPLE_RATE,
+                 chunk_size: int = CHUNK_SIZE, stream_factory: Optional[Callable[[Optional[int], int, int, int], Any]] = None,
+                 output_dir: str = RECORDINGS_DIR) -> None:
+        if not tracks:
+            raise ValueError("Nagrywanie wielościeżkowe wymaga co najmniej jednej ścieżki.")
+        self.tracks = tracks
+        self.filename_prefix = filename_prefix
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.output_dir = output_dir
+        self.stream_factory = stream_factory or self._open_pyaudio_stream
+        self.is_recording = False
+
+        # Urządzenie -> liczba kanałów, które trzeba z niego czytać
+        self.devices: Dict[Optional[int], int] = {}
+        for track in tracks:
+            device = track.get("device")
+            self.devices[device] = max(self.devices.get(device, 0), track.get("channel", 0) + 1)
+        self._audio_interface = None
+        self._streams: Dict[Optional[int], Any] = {}
+        self._frames: Dict[Optional[int], List[bytes]] = {}
+        self._start_times: Dict[Optional[int], float] = {}
+        self._threads: List[threading.Thread] = []
+
+    def _open_pyaudio_stream(self, device: Optional[int], channels: int, rate: int, chunk_size: int):
+        if self._audio_interface is None:
+            self._audio_interface = pyaudio.PyAudio()
+        return self._audio_interface.open(format=pyaudio.paInt16, channels=channels, rate=rate, input=True,
+                                          input_device_index=device, frames_per_buffer=chunk_size)
+
+    def start_recording(self) -> bool:
+        if self.is_recording:
+            logger.warning("Próba rozpoczęcia nagrywania wielościeżkowego, gdy już jest aktywne.")
+            return False
+        try:
+            for device, channels in self.devices.items():
+                self._streams[device] = self.stream_factory(device, channels, self.rate, self.chunk_size)
+        except Exception as e:
+            logger.error(f"Nie można otworzyć strumienia audio urządzenia {device}: {e}")
+            self._close_streams()
+            return False
+
+        self.is_recording = True
+        self._frames = {device: [] for device in self.devices}
+        self._start_times = {}
+        self._threads = [threading.Thread(target=self._capture_loop, args=(device,), daemon=True, name=f"Capture-{device}")
+                         for device in self.devices]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Rozpoczęto nagrywanie wielościeżkowe: {len(self.tracks)} ścieżek z {len(self.devices)} urządzeń")
+        return True
+
+    def _capture_loop(self, device: Optional[int]) -> None:
+        stream = self._streams[device]
+        while self.is_recording:
+            try:
+                data = stream.read(self.chunk_size, exception_on_overflow=False)
+            except Exception as e:
+                # Odłączenie jednego mikrofonu nie przerywa pozostałych ścieżek
+                logger.error(f"Błąd odczytu z urządzenia {device}: {e}")
+                break
+            if device not in self._start_times:
+                # Blok dotarł po zebraniu chunk_size próbek - początek nagrania jest o tyle wcześniej
+                self._start_times[device] = time.perf_counter() - self.chunk_size / self.rate
+            self._frames[device].append(data)
+
+    def _close_streams(self) -> None:
+        for stream in self._streams.values():
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception as e:
+                logger.error(f"Błąd podczas zamykania strumienia: {e}")
+        self._streams = {}
+        if self._audio_interface is not None:
+            self._audio_interface.terminate()
+            self._audio_interface = None
+
+    def stop_recording(self) -> Optional[Dict[str, str]]:
+        """Kończy nagrywanie i zapisuje ścieżki. Zwraca {etykieta: ścieżka_pliku} lub None przy błędzie."""
+        if not self.is_recording:
+            logger.warning("Próba zatrzymania nagrywania wielościeżkowego, gdy nie jest aktywne.")
+            return None
+        self.is_recording = False
+        for thread in self._threads:
+            thread.join(timeout=2)
+            if thread.is_alive():
+                logger.warning(f"Wątek {thread.name} nie zakończył się w oczekiwanym czasie.")
+        self._close_streams()
+        if not self._start_times:
+            logger.warning("Brak klatek audio do zapisania.")
+            return None
+        return self._save_tracks()
+
+    def _save_tracks(self) -> Optional[Dict[str, str]]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        earliest = min(self._start_times.values())
+        track_files = {}
+        for index, track in enumerate(self.tracks, start=1):
+            device, channel = track.get("device"), track.get("channel", 0)
+            channels = self.devices[device]
+            samples = array.array("h", b"".join(self._frames[device]))[channel::channels]
+            lead_in = int(round((self._start_times.get(device, earliest) - earliest) * self.rate))
+            # Numer ścieżki w nazwie - różne etykiety (np. "Jan K." i "Jan K?") mogą dać ten sam bezpieczny tekst
+            path = os.path.join(self.output_dir, f"{self.filename_prefix}_{timestamp}_{index}_{_safe_label(track['label'])}.wav")
+            try:
+                with wave.open(path, "wb") as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(SAMPLE_WIDTH)
+                    wf.setframerate(self.rate)
+                    wf.writeframes(bytes(lead_in * SAMPLE_WIDTH) + samples.tobytes())
+            except (OSError, wave.Error) as e:
+                logger.error(f"Błąd podczas zapisywania ścieżki {track['label']} do {path}: {e}")
+                return None
+            track_files[track["label"]] = path
+            logger.info(f"Ścieżka '{track['label']}' zapisana jako {path} ({(lead_in + len(samples)) / self.rate:.2f} s)")
+        return track_files
+
+    def is_active(self) -> bool:
+        return self.is_recording
+
+
+def transcribe_tracks(engine, track_files: Dict[str, str], language: Optional[str] = None, task: str = "transcribe",
+                      options: Optional[Dict[str, Any]] = None,
+                      max_parallel: int = MAX_PARALLEL_TRACKS) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Transkrybuje ścieżki równolegle i składa je w jedną, uporządkowaną w czasie rozmowę.
+
+    Args:
+        engine: Silnik z stt_engines (każda ścieżka to osobne zadanie silnika)
+        track_files: {etykieta_mówcy: ścieżka_pliku}
+        language: Opcjonalny kod języka
+        task: "transcribe" lub "translate"
+        options: Opcje silnika; progress_callback otrzymuje średni postęp wszystkich ścieżek,
+            segment_callback nie jest używany (segmenty różnych ścieżek przychodzą poza kolejnością)
+        max_parallel: Ile ścieżek jednocześnie
+
+    Raises:
+        JobCancelledError: Jeśli zadanie zostało anulowane
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik z kluczami 'text', 'segments' -
+            segmenty z kluczem 'speaker', 'tracks' - wyniki ścieżek, komunikat_błędu)
+    """
+    options = {key: value for key, value in (options or {}).items() if key != "segment_callback"}
+    progress_callback = options.pop("progress_callback", None)
+    fractions = {label: 0.0 for label in track_files}
+    progress_lock = threading.Lock()
+
+    def track_progress(label: str, info: Dict[str, Any]) -> None:
+        if progress_callback is None or info.get("fraction") is None:
+            return
+        with progress_lock:
+            fractions[label] = info["fraction"]
+            fraction = sum(fractions.values()) / len(fractions)
+        progress_callback({"fraction": fraction, "rtf": info.get("rtf"), "eta": None})
+
+    def run(label: str, path: str):
+        return engine.transcribe_segments(path, language=language, task=task,
+                                          progress_callback=lambda info: track_progress(label, info), **options)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(track_files))), thread_name_prefix="Track") as executor:
+        futures = {label: executor.submit(run, label, path) for label, path in track_files.items()}
+        results, errors = {}, []
+        for label, future in futures.items():
+            try:
+                result, error_msg = future.result()
+            except JobCancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Nieobsłużony błąd transkrypcji ścieżki {label}")
+                result, error_msg = None, str(e)
+            if error_msg:
+                errors.append(f"{label}: {error_msg}")
+            else:
+                results[label] = result
+    if not results:
+        return None, "\n".join(errors) or "Brak ścieżek do transkrypcji."
+    for error in errors:
+        logger.warning(f"Ścieżka pominięta w transkrypcji rozmowy - {error}")
+
+    segments = merge_speaker_segments(results)
+    return {"text": format_speaker_transcript(segments), "segments": segments, "tracks": results,
+            "language": next(iter(results.values())).get("language")}, None
+
+
+def merge_speaker_segments(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Segmenty wszystkich ścieżek z etykietą mówcy ('speaker'), w kolejności czasu rozpoczęcia."""
+    merged = [{**segment, "speaker": label} for label, result in results.items() for segment in result.get("segments", [])]
+    merged.sort(key=lambda segment: (segment.get("start", 0.0), segment.get("end", 0.0)))
+    return merged
+
+
+def format_speaker_transcript(segments: List[Dict[str, Any]], merge_gap: float = TURN_MERGE_GAP) -> str:
+    """Zapis rozmowy: kolejne segmenty tego samego mówcy łączone w wypowiedź ze znacznikiem czasu."""
+    turns: List[List[Any]] = []  # [mówca, początek, koniec, teksty]
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        if turns and turns[-1][0] == segment["speaker"] and segment["start"] - turns[-1][2] <= merge_gap:
+            turns[-1][2] = max(turns[-1][2], segment["end"])
+            turns[-1][3].append(text)
+        else:
+            turns.append([segment["speaker"], segment["start"], segment["end"], [text]])
+    lines = []
+    for speaker, start, _, texts in turns:
+        seconds = int(start)
+        lines.append(f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}] {speaker}: {' '.join(texts)}")
+    return "\n".join(lines)
@@ -2,8 +2,17 @@
 import requests
 import os
 import json
+import wave
 import logging
-from typing import Optional, Tuple
+import tempfile
+import threading
+from typing import Optional, Tuple, Dict, Any, List, Callable
+
+from modules.jobs import JobCancelledError
+from modules.progress import ProgressReporter
+from modules.rate_limiter import get_rate_limiter, record_usage
+from modules.audio_stream import probe_duration
+from modules.multipart_stream import MultipartFileStream
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +20,18 @@ class OpenAIWhisperClient:
     """Klient do komunikacji z API OpenAI Whisper dla transkrypcji audio."""
     
     API_URL = "https://api.openai.com/v1/audio/transcriptions"
+    TRANSLATION_API_URL = "https://api.openai.com/v1/audio/translations"
+    
+    # Limit rozmiaru pliku w API (25 MB); większe nagrania WAV są dzielone na fragmenty
+    MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+    CHUNK_SECONDS = 600
+    # Końcówka tekstu poprzedniego fragmentu przekazywana jako podpowiedź dla kolejnego
+    CHUNK_PROMPT_CHARS = 200
+    REQUEST_TIMEOUT = 60
+    # Co ile sekund wątek oczekujący na odpowiedź sprawdza, czy zadanie nie zostało anulowane
+    CANCEL_POLL_INTERVAL = 0.2
+    # Ile razy ponawiamy żądanie odrzucone przez limit tempa (429), zanim zgłosimy błąd
+    MAX_RATE_LIMIT_RETRIES = 5
     
     def __init__(self, api_key: Optional[str] = None):
         """
@@ -21,6 +42,8 @@ class OpenAIWhisperClient:
         """
         self.api_key = api_key
         self.debug_mode = False
+        # Przepustowość ostatniej wysyłki (B/s) - do oszacowania czasu kolejnych
+        self.last_upload_throughput: Optional[float] = None
     
     def update_api_key(self, api_key: str) -> bool:
         """
@@ -37,17 +60,52 @@ class OpenAIWhisperClient:
             return True
         return False
     
-    def transcribe_audio(self, audio_file_path: str, language: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    def _post_cancellable(self, cancel_token, **kwargs) -> requests.Response:
         """
-        Wykonuje transkrypcję pliku audio przy użyciu API OpenAI Whisper.
+        Wysyła żądanie POST tak, aby anulowanie zadania nie czekało na odpowiedź serwera.
+        
+        Żądanie jest wykonywane w osobnym wątku; po anulowaniu metoda od razu rzuca
+        JobCancelledError, a porzucone połączenie kończy się samo po upływie limitu czasu.
+        """
+        if cancel_token is None:
+            return requests.post(**kwargs)
+        outcome: Dict[str, Any] = {}
+        def send():
+            try:
+                outcome["response"] = requests.post(**kwargs)
+            except Exception as e:
+                outcome["error"] = e
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        while sender.is_alive():
+            sender.join(self.CANCEL_POLL_INTERVAL)
+            cancel_token.raise_if_cancelled()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["response"]
+    
+    def _send_audio_request(self, api_url: str, audio_file_path: str, data: Dict[str, Any], error_context: str = "",
+                            cancel_token=None, upload_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[Optional[requests.Response], Optional[str]]:
+        """
+        Wysyła plik audio do wskazanego endpointu API Whisper.
         
         Args:
+            api_url: Adres endpointu (transkrypcja lub tłumaczenie)
             audio_file_path: Ścieżka do pliku audio
-            language: Opcjonalny kod języka (np. "pl", "en")
+            data: Pola formularza (model, response_format, language...)
+            error_context: Dopisek do komunikatów błędów (np. " (tłumaczenie)")
+            cancel_token: Opcjonalny jobs.CancellationToken (anulowanie i limit czasu zadania)
+            upload_callback: Opcjonalna funkcja otrzymująca postęp wysyłania (multipart_stream.MultipartFileStream.progress)
             
         Returns:
-            Tuple[Optional[str], Optional[str]]: (transkrypcja, komunikat_błędu)
+            Tuple[Optional[requests.Response], Optional[str]]: (odpowiedź, komunikat_błędu)
+            
+        Raises:
+            JobCancelledError: Jeśli zadanie zostało anulowane przed wysłaniem lub w trakcie oczekiwania
         """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        
         if not self.api_key:
             logger.error("Brak klucza API OpenAI")
             return None, "Brak klucza API OpenAI. Ustaw klucz API w konfiguracji."
@@ -58,7 +116,7 @@ class OpenAIWhisperClient:
             
         if self.debug_mode:
             file_size_mb = os.path.getsize(audio_file_path) / (1024 * 1024)
-            logger.info(f"Informacje o pliku audio:")
+            logger.info(f"Informacje o pliku audio{error_context}:")
             logger.info(f"- Ścieżka: {audio_file_path}")
             logger.info(f"- Rozmiar: {file_size_mb:.2f} MB")
         
@@ -67,37 +125,40 @@ class OpenAIWhisperClient:
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            # Przygotowanie danych formularza
-            data = {
-                "model": "whisper-1",  # OpenAI ma tylko jeden model Whisper dostępny przez API
-                "response_format": "text"
-            }
-            
-            # Dodaj język, jeśli został określony
-            if language:
-                data["language"] = language
-            
-            # Otwórz plik audio do przesłania
-            files = {
-                "file": (os.path.basename(audio_file_path), open(audio_file_path, "rb"))
-            }
-            
             if self.debug_mode:
-                logger.info(f"Wysyłanie żądania transkrypcji do API Whisper...")
-                logger.info(f"URL API: {self.API_URL}")
+                logger.info(f"Wysyłanie żądania do API Whisper{error_context}...")
+                logger.info(f"URL API: {api_url}")
                 logger.info(f"Parametry: {data}")
             
-            # Wyślij żądanie
-            response = requests.post(
-                self.API_URL,
-                headers=headers,
-                data=data,
-                files=files,
-                timeout=60
-            )
-            
-            # Zamknij plik
-            files["file"][1].close()
+            # Wysyłki przechodzą przez wspólny harmonogram - równoległe zadania nie przekraczają limitu tempa API
+            limiter = get_rate_limiter()
+            for attempt in range(self.MAX_RATE_LIMIT_RETRIES + 1):
+                with limiter.slot(job_key=cancel_token, cancel_token=cancel_token):
+                    # Limit czasu żądania nie może wykraczać poza limit czasu całego zadania
+                    timeout = self.REQUEST_TIMEOUT
+                    if cancel_token is not None and cancel_token.remaining() is not None:
+                        timeout = max(1.0, min(timeout, cancel_token.remaining()))
+                    
+                    # Ciało multipart jest czytane z pliku blokami - duże nagranie nie jest kopiowane do pamięci
+                    with MultipartFileStream(data, "file", audio_file_path, progress_callback=upload_callback,
+                                             cancel_token=cancel_token) as body:
+                        response = self._post_cancellable(
+                            cancel_token,
+                            url=api_url,
+                            headers={**headers, "Content-Type": body.content_type},
+                            data=body,
+                            timeout=timeout
+                        )
+                        upload = body.progress()
+                    if upload["throughput"]:
+                        self.last_upload_throughput = upload["throughput"]
+                        logger.info(f"Wysłano {upload['total'] / (1024 * 1024):.2f} MB{error_context} w {upload['elapsed']:.1f} s "
+                                    f"({upload['throughput'] / (1024 * 1024):.2f} MB/s)")
+                retry_after = limiter.record_response(response.status_code, response.headers)
+                if retry_after is None or self._is_quota_exhausted(response) or attempt == self.MAX_RATE_LIMIT_RETRIES:
+                    break
+                # Ponowienie czeka w harmonogramie na koniec przerwy wyznaczonej przez Retry-After
+                logger.info(f"Limit tempa API{error_context} - ponowienie {attempt + 1}/{self.MAX_RATE_LIMIT_RETRIES} za {retry_after:.1f} s")
             
             if self.debug_mode:
                 logger.info(f"Status odpowiedzi: {response.status_code}")
@@ -108,23 +169,11 @@ class OpenAIWhisperClient:
             
             # Sprawdź, czy żądanie się powiodło
             response.raise_for_status()
-            
-            # Transkrypcja może być zwrócona jako tekst lub JSON, w zależności od response_format
-            content_type = response.headers.get("Content-Type", "")
-            
-            if "application/json" in content_type:
-                result = response.json()
-                if "text" in result:
-                    return result["text"], None
-                else:
-                    logger.warning(f"Nieoczekiwany format odpowiedzi JSON: {json.dumps(result)}")
-                    return json.dumps(result), None
-            else:
-                # Zwróć bezpośrednio tekst
-                return response.text, None
+            record_usage(self.api_key, self._audio_seconds(response, audio_file_path))
+            return response, None
                 
         except requests.exceptions.RequestException as e:
-            error_message = f"Błąd komunikacji z API OpenAI Whisper: {str(e)}"
+            error_message = f"Błąd komunikacji z API OpenAI Whisper{error_context}: {str(e)}"
             logger.error(error_message)
             
             # Spróbuj wyodrębnić więcej informacji o błędzie z odpowiedzi
@@ -133,17 +182,79 @@ class OpenAIWhisperClient:
                     error_data = e.response.json()
                     if 'error' in error_data:
                         error_detail = error_data['error'].get('message', str(e))
-                        error_message = f"Błąd API OpenAI: {error_detail}"
+                        error_message = f"Błąd API OpenAI{error_context}: {error_detail}"
                 except:
                     if hasattr(e, 'response') and hasattr(e.response, 'text'):
-                        error_message = f"Błąd API ({e.response.status_code}): {e.response.text}"
+                        error_message = f"Błąd API ({e.response.status_code}){error_context}: {e.response.text}"
             
             return None, error_message
             
+        except JobCancelledError:
+            logger.info(f"Wysyłanie audio do API przerwane{error_context}")
+            raise
         except Exception as e:
-            error_message = f"Nieoczekiwany błąd podczas transkrypcji: {str(e)}"
+            error_message = f"Nieoczekiwany błąd podczas wysyłania audio{error_context}: {str(e)}"
             logger.error(error_message)
             return None, error_message
+
+    @staticmethod
+    def _is_quota_exhausted(response: requests.Response) -> bool:
+        """Odpowiedź 429 z powodu wyczerpanego limitu konta (a nie tempa) - ponawianie nic nie da."""
+        try:
+            return response.json().get("error", {}).get("code") == "insufficient_quota"
+        except (ValueError, AttributeError):
+            return False
+    
+    @staticmethod
+    def _audio_seconds(response: requests.Response, audio_file_path: str) -> Optional[float]:
+        """Długość wysłanego audio do dziennika zużycia (z odpowiedzi verbose_json lub z pliku)."""
+        if "application/json" in response.headers.get("Content-Type", ""):
+            try:
+                duration = response.json().get("duration")
+                if duration is not None:
+                    return float(duration)
+            except (ValueError, AttributeError, TypeError):
+                pass
+        return probe_duration(audio_file_path)
+    
+    def _extract_text(self, response: requests.Response) -> str:
+        """Wyciąga tekst z odpowiedzi API (zwykły tekst lub JSON, w zależności od response_format)."""
+        content_type = response.headers.get("Content-Type", "")
+        
+        if "application/json" in content_type:
+            result = response.json()
+            if "text" in result:
+                return result["text"]
+            logger.warning(f"Nieoczekiwany format odpowiedzi JSON: {json.dumps(result)}")
+            return json.dumps(result)
+        # Zwróć bezpośrednio tekst
+        return response.text
+    
+    def transcribe_audio(self, audio_file_path: str, language: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Wykonuje transkrypcję pliku audio przy użyciu API OpenAI Whisper.
+        
+        Args:
+            audio_file_path: Ścieżka do pliku audio
+            language: Opcjonalny kod języka (np. "pl", "en")
+            
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (transkrypcja, komunikat_błędu)
+        """
+        # Przygotowanie danych formularza
+        data = {
+            "model": "whisper-1",  # OpenAI ma tylko jeden model Whisper dostępny przez API
+            "response_format": "text"
+        }
+        
+        # Dodaj język, jeśli został określony
+        if language:
+            data["language"] = language
+        
+        response, error_message = self._send_audio_request(self.API_URL, audio_file_path, data)
+        if error_message:
+            return None, error_message
+        return self._extract_text(response), None
             
     def translate_audio_to_english(self, audio_file_path: str) -> Tuple[Optional[str], Optional[str]]:
         """
@@ -155,95 +266,166 @@ class OpenAIWhisperClient:
         Returns:
             Tuple[Optional[str], Optional[str]]: (przetłumaczony_tekst, komunikat_błędu)
         """
-        if not self.api_key:
-            logger.error("Brak klucza API OpenAI")
-            return None, "Brak klucza API OpenAI. Ustaw klucz API w konfiguracji."
+        data = {
+            "model": "whisper-1",
+            "response_format": "text" 
+        }
         
-        if not os.path.exists(audio_file_path):
-            logger.error(f"Plik audio nie istnieje: {audio_file_path}")
-            return None, f"Plik audio nie istnieje: {os.path.basename(audio_file_path)}"
-            
-        if self.debug_mode:
-            file_size_mb = os.path.getsize(audio_file_path) / (1024 * 1024)
-            logger.info(f"Informacje o pliku audio (tłumaczenie):")
-            logger.info(f"- Ścieżka: {audio_file_path}")
-            logger.info(f"- Rozmiar: {file_size_mb:.2f} MB")
-        
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            # Przygotowanie danych formularza
-            data = {
-                "model": "whisper-1",  # OpenAI ma tylko jeden model Whisper dostępny przez API
-                "response_format": "text" 
-            }
-            
-            # Otwórz plik audio do przesłania
-            files = {
-                "file": (os.path.basename(audio_file_path), open(audio_file_path, "rb"))
-            }
-            
-            translation_api_url = "https://api.openai.com/v1/audio/translations"
+        response, error_message = self._send_audio_request(self.TRANSLATION_API_URL, audio_file_path, data, error_context=" (tłumaczenie)")
+        if error_message:
+            return None, error_message
+        return self._extract_text(response), None
 
-            if self.debug_mode:
-                logger.info(f"Wysyłanie żądania tłumaczenia do API Whisper...")
-                logger.info(f"URL API: {translation_api_url}")
-                logger.info(f"Parametry: {data}")
-            
-            # Wyślij żądanie
-            response = requests.post(
-                translation_api_url,
-                headers=headers,
-                data=data,
-                files=files,
-                timeout=60 
-            )
-            
-            # Zamknij plik
-            files["file"][1].close()
-            
-            if self.debug_mode:
-                logger.info(f"Status odpowiedzi: {response.status_code}")
-                try:
-                    logger.info(f"Nagłówki odpowiedzi: {dict(response.headers)}")
-                except:
-                    pass
-            
-            # Sprawdź, czy żądanie się powiodło
-            response.raise_for_status()
-            
-            content_type = response.headers.get("Content-Type", "")
-            
-            if "application/json" in content_type:
-                result = response.json()
-                if "text" in result:
-                    return result["text"], None
-                else:
-                    logger.warning(f"Nieoczekiwany format odpowiedzi JSON: {json.dumps(result)}")
-                    return json.dumps(result), None
-            else:
-                # Zwróć bezpośrednio tekst
-                return response.text, None
-                
-        except requests.exceptions.RequestException as e:
-            error_message = f"Błąd komunikacji z API OpenAI Whisper (tłumaczenie): {str(e)}"
-            logger.error(error_message)
-            
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_data = e.response.json()
-                    if 'error' in error_data:
-                        error_detail = error_data['error'].get('message', str(e))
-                        error_message = f"Błąd API OpenAI (tłumaczenie): {error_detail}"
-                except:
-                    if hasattr(e, 'response') and hasattr(e.response, 'text'):
-                        error_message = f"Błąd API ({e.response.status_code}) (tłumaczenie): {e.response.text}"
+    def transcribe_audio_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                                  progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                  cancel_token=None, prompt: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Wykonuje transkrypcję lub tłumaczenie i zwraca wynik z segmentami (response_format=verbose_json).
+        
+        Args:
+            audio_file_path: Ścieżka do pliku audio
+            language: Opcjonalny kod języka (ignorowany przy tłumaczeniu)
+            task: "transcribe" lub "translate"
+            progress_callback: Opcjonalna funkcja otrzymująca postęp (w trakcie wysyłania z kluczem 'upload_rate',
+                potem po każdym fragmencie dużego pliku)
+            cancel_token: Opcjonalny jobs.CancellationToken; anulowanie przerywa oczekiwanie na odpowiedź
+                i pomija niewysłane fragmenty (rzuca JobCancelledError)
+            prompt: Opcjonalna podpowiedź dla modelu (np. terminy ze słownika poprawek); przy dzieleniu
+                na fragmenty poprzedza końcówkę tekstu poprzedniego fragmentu
             
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik z kluczami 'text', 'segments', 'language', komunikat_błędu)
+        """
+        data = {
+            "model": "whisper-1",
+            "response_format": "verbose_json"
+        }
+        if task == "translate":
+            api_url, error_context = self.TRANSLATION_API_URL, " (tłumaczenie)"
+        else:
+            api_url, error_context = self.API_URL, ""
+            if language:
+                data["language"] = language
+        if prompt:
+            data["prompt"] = prompt
+        
+        reporter = ProgressReporter(progress_callback) if progress_callback is not None else None
+        
+        if os.path.exists(audio_file_path) and os.path.getsize(audio_file_path) > self.MAX_UPLOAD_BYTES:
+            if audio_file_path.lower().endswith(".wav"):
+                return self._transcribe_wav_in_chunks(api_url, audio_file_path, data, error_context, reporter, cancel_token)
+            logger.warning(f"Plik przekracza limit API ({self.MAX_UPLOAD_BYTES // (1024 * 1024)} MB), a dzielenie jest obsługiwane tylko dla WAV - wysyłam w całości.")
+        
+        upload_callback = self._upload_progress(progress_callback) if progress_callback is not None else None
+        response, error_message = self._send_audio_request(api_url, audio_file_path, data, error_context=error_context,
+                                                           cancel_token=cancel_token, upload_callback=upload_callback)
+        if error_message:
             return None, error_message
+        result = self._parse_verbose_result(response, language)
+        if reporter and result.get("duration"):
+            reporter.update(result["duration"], result["duration"], force=True)
+        return result, None
+    
+    @staticmethod
+    def _upload_progress(progress_callback: Callable[[Dict[str, Any]], None], sent_before: int = 0,
+                         total_bytes: Optional[int] = None) -> Callable[[Dict[str, Any]], None]:
+        """
+        Przelicza postęp wysyłania jednego żądania na postęp całej wysyłki (także wielu fragmentów).
+        
+        Słownik ma te same klucze co u progress.ProgressReporter (RTF nie ma sensu przy wysyłaniu)
+        oraz 'upload_rate' - przepustowość w B/s, po którym GUI rozpoznaje etap wysyłania.
+        """
+        def report(upload: Dict[str, Any]) -> None:
+            total = total_bytes or upload["total"]
+            sent = sent_before + upload["sent"]
+            rate = upload["throughput"]
+            progress_callback({
+                "processed": sent,
+                "total": total,
+                "fraction": min(1.0, sent / total) if total else None,
+                "elapsed": upload["elapsed"],
+                "rtf": None,
+                "eta": (total - sent) / rate if rate else None,
+                "upload_rate": rate,
+            })
+        return report
+    
+    def _parse_verbose_result(self, response: requests.Response, language: Optional[str]) -> Dict[str, Any]:
+        """Zamienia odpowiedź verbose_json na wynik z kluczami 'text', 'segments', 'language' (i 'duration', jeśli API ją podało)."""
+        try:
+            result = response.json()
+        except ValueError:
+            return {"text": response.text.strip(), "segments": [], "language": language}
+        # Metryki jakości (jeśli API je podało) pozwalają później wskazać podejrzane segmenty
+        segments = [{"start": seg.get("start", 0.0), "end": seg.get("end", 0.0), "text": seg.get("text", ""),
+                     **{key: seg[key] for key in ("avg_logprob", "compression_ratio", "no_speech_prob") if key in seg}}
+                    for seg in result.get("segments", [])]
+        return {"text": result.get("text", "").strip(), "segments": segments, "language": result.get("language"),
+                "duration": result.get("duration")}
+    
+    def _split_wav(self, audio_file_path: str, output_dir: str) -> List[Tuple[str, float, float]]:
+        """
+        Dzieli plik WAV na fragmenty mieszczące się w limicie API.
+        
+        Returns:
+            List[Tuple[str, float, float]]: Lista (ścieżka_fragmentu, początek_s, długość_s)
+        """
+        chunks = []
+        with wave.open(audio_file_path, "rb") as source:
+            params = source.getparams()
+            frame_size = params.sampwidth * params.nchannels
+            # Fragment musi zmieścić się w limicie także dla nagrań stereo / 44,1 kHz (z zapasem na nagłówek)
+            max_seconds = self.MAX_UPLOAD_BYTES * 0.95 / (frame_size * params.framerate)
+            frames_per_chunk = int(min(self.CHUNK_SECONDS, max_seconds) * params.framerate)
+            offset_frames = 0
+            while True:
+                frames = source.readframes(frames_per_chunk)
+                if not frames:
+                    break
+                frame_count = len(frames) // frame_size
+                chunk_path = os.path.join(output_dir, f"chunk_{len(chunks):03d}.wav")
+                with wave.open(chunk_path, "wb") as chunk:
+                    chunk.setparams(params)
+                    chunk.writeframes(frames)
+                chunks.append((chunk_path, offset_frames / params.framerate, frame_count / params.framerate))
+                offset_frames += frame_count
+        return chunks
+    
+    def _transcribe_wav_in_chunks(self, api_url: str, audio_file_path: str, data: Dict[str, Any], error_context: str,
+                                  reporter: Optional[ProgressReporter], cancel_token=None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Wysyła duży plik WAV fragmentami i skleja wyniki, przesuwając znaczniki czasu segmentów."""
+        with tempfile.TemporaryDirectory(prefix="dictaitor_chunks_") as temp_dir:
+            try:
+                chunks = self._split_wav(audio_file_path, temp_dir)
+            except (wave.Error, EOFError, OSError) as e:
+                return None, f"Nie można podzielić pliku audio na fragmenty{error_context}: {e}"
             
-        except Exception as e:
-            error_message = f"Nieoczekiwany błąd podczas tłumaczenia: {str(e)}"
-            logger.error(error_message)
-            return None, error_message
\ No newline at end of file
+            total_seconds = sum(duration for _, _, duration in chunks)
+            total_bytes = sum(os.path.getsize(chunk_path) for chunk_path, _, _ in chunks)
+            logger.info(f"Plik przekracza limit API - wysyłanie w {len(chunks)} fragmentach{error_context}.")
+            texts, segments, language = [], [], None
+            sent_bytes = 0
+            for index, (chunk_path, offset, duration) in enumerate(chunks):
+                chunk_data = dict(data)
+                if texts:
+                    tail = texts[-1][-self.CHUNK_PROMPT_CHARS:]
+                    chunk_data["prompt"] = f"{data['prompt']} {tail}" if data.get("prompt") else tail
+                upload_callback = (self._upload_progress(reporter.callback, sent_bytes, total_bytes)
+                                   if reporter else None)
+                response, error_message = self._send_audio_request(api_url, chunk_path, chunk_data,
+                                                                   error_context=f"{error_context} (fragment {index + 1}/{len(chunks)})",
+                                                                   cancel_token=cancel_token, upload_callback=upload_callback)
+                sent_bytes += os.path.getsize(chunk_path)
+                if error_message:
+                    return None, error_message
+                result = self._parse_verbose_result(response, data.get("language"))
+                texts.append(result["text"])
+                language = language or result["language"]
+                for segment in result["segments"]:
+                    segments.append({**segment, "start": segment["start"] + offset, "end": segment["end"] + offset})
+                if reporter:
+                    # Postęp liczony z ukończonych fragmentów
+                    reporter.update(offset + duration, total_seconds, force=True)
+        
+        return {"text": " ".join(text for text in texts if text), "segments": segments, "language": language,
+                "duration": total_seconds}, None
@@ -0,0 +1,75 @@
+# X:\Aplikacje\dictaitor\modules\progress.py
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Minimalny odstęp między powiadomieniami - częstsze nie są czytelne, a obciążają wątek GUI
+DEFAULT_MIN_INTERVAL = 0.5
+
+
+class ProgressReporter:
+    """
+    Przelicza postęp transkrypcji (sekundy audio przetworzone z całości) na procent, RTF i ETA.
+
+    Silniki wywołują `update()` po każdym zdekodowanym oknie lub fragmencie; powiadomienia są
+    dławione do jednego na `min_interval` sekund, więc koszt po stronie inferencji jest pomijalny.
+    Funkcja zwrotna dostaje słownik z kluczami 'processed', 'total', 'fraction', 'elapsed',
+    'rtf' i 'eta' (sekundy, None gdy jeszcze nieznane).
+    """
+
+    def __init__(self, callback: Callable[[Dict[str, Any]], None], total_seconds: Optional[float] = None,
+                 min_interval: float = DEFAULT_MIN_INTERVAL) -> None:
+        self.callback = callback
+        self.total_seconds = total_seconds
+        self.min_interval = min_interval
+        self._start = time.perf_counter()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, processed_seconds: float, total_seconds: Optional[float] = None, force: bool = False) -> None:
+        """Zgłasza liczbę przetworzonych sekund audio (i opcjonalnie aktualną długość całości)."""
+        now = time.perf_counter()
+        with self._lock:
+            if total_seconds:
+                self.total_seconds = total_seconds
+            if not force and now - self._last_report < self.min_interval:
+                return
+            self._last_report = now
+        info = self._build_info(processed_seconds, now - self._start)
+        try:
+            self.callback(info)
+        except Exception as e:
+            # Błąd w interfejsie nie może przerwać transkrypcji
+            logger.warning(f"Błąd funkcji zwrotnej postępu: {e}")
+
+    def finish(self) -> None:
+        """Zgłasza 100% niezależnie od dławienia."""
+        if self.total_seconds:
+            self.update(self.total_seconds, force=True)
+
+    def _build_info(self, processed: float, elapsed: float) -> Dict[str, Any]:
+        total = self.total_seconds
+        if total:
+            processed = min(processed, total)
+        rtf = elapsed / processed if processed > 0 else None
+        return {
+            "processed": processed,
+            "total": total,
+            "fraction": processed / total if total else None,
+            "elapsed": elapsed,
+            "rtf": rtf,
+            "eta": (total - processed) * rtf if total and rtf is not None else None,
+        }
+
+
+def format_duration(seconds: float) -> str:
+    """Zapisuje czas w czytelnej formie, np. '1 min 05 s' lub '42 s'."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+    if seconds >= 60:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds} s"
@@ -0,0 +1,254 @@
+# X:\Aplikacje\dictaitor\modules\rate_limiter.py
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from modules.config_manager import CONFIG_DIR, ensure_config_dir_exists
+
+logger = logging.getLogger(__name__)
+
+# Dziennik zużycia API (minuty audio na klucz i dzień) - osobny plik, jak wyniki benchmarków
+USAGE_FILE_PATH = os.path.join(CONFIG_DIR, "api_usage.json")
+
+# Wartości początkowe do czasu, aż API poda własne limity w nagłówkach odpowiedzi
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_MAX_CONCURRENT_UPLOADS = 3
+# Po odpowiedzi 429 tempo jest zmniejszane o połowę, a po każdym sukcesie odbudowywane o tyle żądań/min
+RATE_DECREASE_FACTOR = 0.5
+RATE_RECOVERY_STEP = 1.0
+MIN_REQUESTS_PER_MINUTE = 1.0
+# Przerwa po 429, gdy serwer nie podał Retry-After ani czasu odnowienia limitu (s)
+DEFAULT_RETRY_AFTER = 5.0
+WAIT_POLL_INTERVAL = 0.2
+# Jak długo pamiętamy, kiedy zadanie było ostatnio obsłużone (s)
+FAIRNESS_MEMORY_SECONDS = 600
+
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Zamienia czas odnowienia limitu z nagłówków OpenAI (np. "1s", "6m0s", "20ms") na sekundy."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiRateLimiter:
+    """
+    Harmonogram wysyłek do API: wiadro żetonów na żądania na minutę i limit równoległych wysyłek.
+
+    Tempo dopasowuje się do limitów podawanych w nagłówkach x-ratelimit-* i do odpowiedzi 429
+    (spowolnienie o połowę i przerwa do Retry-After, potem stopniowy powrót). Oczekujący są
+    obsługiwani sprawiedliwie: pierwszeństwo ma zadanie obsłużone najdawniej, więc długie
+    nagranie dzielone na fragmenty nie blokuje krótkiej notatki zleconej w międzyczasie.
+
+    `clock` (domyślnie time.monotonic) wyznacza uzupełnianie żetonów i przerwy po 429 - testy
+    podstawiają własny zegar zamiast czekać.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_concurrent: int = DEFAULT_MAX_CONCURRENT_UPLOADS,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.limit_rpm = float(requests_per_minute)
+        self.rate_rpm = float(requests_per_minute)
+        self.max_concurrent = max_concurrent
+        self.tokens = float(requests_per_minute)
+        self.active_uploads = 0
+        self.paused_until = 0.0
+        self.rate_limited_count = 0
+
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._last_refill = clock()
+        self._last_served: Dict[Any, float] = {}
+        self._waiting: List[tuple] = []  # (klucz_zadania, numer_zgłoszenia)
+        self._ticket_counter = itertools.count()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.rate_rpm, self.tokens + (now - self._last_refill) * self.rate_rpm / 60.0)
+        self._last_refill = now
+
+    def _next_in_line(self) -> Optional[tuple]:
+        if not self._waiting:
+            return None
+        return min(self._waiting, key=lambda waiter: (self._last_served.get(waiter[0], 0.0), waiter[1]))
+
+    def _wait_time(self, now: float) -> float:
+        """Ile najwcześniej trzeba czekać na wolny żeton (bez uwzględnienia kolejki i limitu równoległości)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) * 60.0 / self.rate_rpm
+
+    @contextmanager
+    def slot(self, job_key: Any = None, cancel_token=None) -> Iterator[None]:
+        """
+        Czeka na pozwolenie wysłania jednego żądania i zajmuje miejsce wysyłki na czas bloku `with`.
+
+        Args:
+            job_key: Identyfikator zadania dla sprawiedliwej kolejki (np. token anulowania)
+            cancel_token: Opcjonalny jobs.CancellationToken - anulowanie przerywa oczekiwanie
+
+        Raises:
+            JobCancelledError: Jeśli zadanie zostało anulowane w trakcie oczekiwania
+        """
+        waiter = (job_key, next(self._ticket_counter))
+        with self._condition:
+            self._waiting.append(waiter)
+            try:
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    now = self._clock()
+                    self._refill(now)
+                    delay = self._wait_time(now)
+                    if delay <= 0 and self.active_uploads < self.max_concurrent and self._next_in_line() == waiter:
+                        break
+                    self._condition.wait(min(max(delay, 0.01), WAIT_POLL_INTERVAL) if delay > 0 else WAIT_POLL_INTERVAL)
+            finally:
+                self._waiting.remove(waiter)
+                self._condition.notify_all()
+            self.tokens -= 1.0
+            self.active_uploads += 1
+            self._last_served[job_key] = now
+            # Zadania zakończone dawno temu nie wpływają już na kolejność - nie trzymamy ich w nieskończoność
+            for stale_key in [key for key, served in self._last_served.items() if now - served > FAIRNESS_MEMORY_SECONDS]:
+                del self._last_served[stale_key]
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active_uploads -= 1
+                self._condition.notify_all()
+
+    def record_response(self, status_code: int, headers) -> Optional[float]:
+        """
+        Aktualizuje tempo na podstawie odpowiedzi API.
+
+        Returns:
+            Optional[float]: Dla odpowiedzi 429 - liczba sekund przerwy przed ponowieniem; inaczej None
+        """
+        limit = _header_int(headers, "x-ratelimit-limit-requests")
+        remaining = _header_int(headers, "x-ratelimit-remaining-requests")
+        reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+        with self._condition:
+            if limit:
+                if limit != self.limit_rpm:
+                    logger.info(f"Limit API z nagłówków: {limit} żądań/min")
+                self.limit_rpm = float(limit)
+            if status_code == 429:
+                self.rate_limited_count += 1
+                retry_after = parse_reset_duration(headers.get("retry-after")) or reset or DEFAULT_RETRY_AFTER
+                self.rate_rpm = max(MIN_REQUESTS_PER_MINUTE, self.rate_rpm * RATE_DECREASE_FACTOR)
+                self.tokens = min(self.tokens, 0.0)
+                self.paused_until = max(self.paused_until, self._clock() + retry_after)
+                logger.warning(f"API zwróciło 429 - przerwa {retry_after:.1f} s, tempo obniżone do {self.rate_rpm:.0f} żądań/min")
+                self._condition.notify_all()
+                return retry_after
+            self.rate_rpm = min(self.limit_rpm, self.rate_rpm + RATE_RECOVERY_STEP)
+            if remaining is not None:
+                # Serwer wie lepiej, ile żądań zostało w bieżącym oknie (np. gdy klucz ma też inny klient)
+                self.tokens = min(self.tokens, float(remaining))
+                if remaining == 0 and reset:
+                    self.paused_until = max(self.paused_until, self._clock() + reset)
+            self._condition.notify_all()
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"limit_rpm": self.limit_rpm, "rate_rpm": self.rate_rpm, "tokens": self.tokens,
+                    "active_uploads": self.active_uploads, "waiting": len(self._waiting),
+                    "rate_limited_count": self.rate_limited_count,
+                    "paused_for": max(0.0, self.paused_until - self._clock())}
+
+
+_rate_limiter: Optional[ApiRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> ApiRateLimiter:
+    """Zwraca wspólny harmonogram dla wszystkich klientów w procesie (limity dotyczą klucza, nie klienta)."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = ApiRateLimiter()
+        return _rate_limiter
+
+
+_usage_lock = threading.Lock()
+
+
+def api_key_id(api_key: str) -> str:
+    """Skrót klucza API - w dzienniku nie zapisujemy samego klucza."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def load_usage() -> Dict[str, Any]:
+    """Wczytuje dziennik zużycia API (pusty słownik, jeśli go nie ma)."""
+    if not os.path.exists(USAGE_FILE_PATH):
+        return {}
+    try:
+        with open(USAGE_FILE_PATH, "r") as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        logger.error(f"Błąd podczas wczytywania dziennika zużycia API z {USAGE_FILE_PATH}: {e}")
+        return {}
+
+
+def record_usage(api_key: str, audio_seconds: Optional[float]) -> bool:
+    """
+    Dopisuje do dziennika jedno wysłane żądanie i jego długość audio (dla bieżącego dnia).
+
+    Returns:
+        bool: True jeśli zapisano pomyślnie
+    """
+    with _usage_lock:
+        try:
+            ensure_config_dir_exists()
+        except OSError:
+            return False
+        usage = load_usage()
+        day = usage.setdefault(api_key_id(api_key), {}).setdefault(date.today().isoformat(), {"minutes": 0.0, "requests": 0})
+        day["minutes"] = round(day["minutes"] + (audio_seconds or 0.0) / 60.0, 3)
+        day["requests"] += 1
+        # Zapis przez plik tymczasowy - przerwany zapis nie może zniszczyć dziennika
+        temp_path = USAGE_FILE_PATH + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(usage, f, indent=4)
+            os.replace(temp_path, USAGE_FILE_PATH)
+            return True
+        except IOError as e:
+            logger.error(f"Błąd podczas zapisywania dziennika zużycia API do {USAGE_FILE_PATH}: {e}")
+            return False
+
+
+def get_usage(api_key: str, day: Optional[str] = None) -> Dict[str, Any]:
+    """Zwraca zużycie klucza w danym dniu (domyślnie dzisiaj): {'minutes': ..., 'requests': ...}."""
+    day = day or date.today().isoformat()
+    return load_usage().get(api_key_id(api_key), {}).get(day, {"minutes": 0.0, "requests": 0})
@@ -0,0 +1,196 @@
+# X:\Aplikacje\dictaitor\modules\resource_governor.py
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from modules.jobs import CancellationToken
+from modules.benchmark import get_benchmark_result, save_benchmark_result
+from modules.cpu_tuning import PSUTIL_INSTALLED, get_machine_id, get_physical_core_count, resolve_thread_settings
+
+logger = logging.getLogger(__name__)
+
+if PSUTIL_INSTALLED:
+    import psutil
+
+# Zadania interaktywne (dyktowanie, wybrany plik) i zadania w tle (transkrypcja wielu plików)
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+# Zadania w tle dostają taką część wątków intra-op zadania interaktywnego
+BACKGROUND_THREAD_FRACTION = 0.5
+# Podniesienie "nice" procesu zadań w tle na systemach POSIX (Windows: klasa BELOW_NORMAL)
+BACKGROUND_NICE_INCREMENT = 10
+# Ile ostatnich pomiarów opóźnienia trzymamy dla każdego wariantu (z / bez zadań w tle, z / bez regulatora)
+MAX_LATENCY_SAMPLES = 200
+
+
+def lower_process_priority() -> bool:
+    """
+    Obniża priorytet bieżącego procesu (proces roboczy zadań w tle).
+
+    Na POSIX zwykły użytkownik nie może potem przywrócić priorytetu - dlatego zadania w tle mają
+    osobny proces roboczy, a proces zadań interaktywnych zostaje z normalnym priorytetem.
+    """
+    try:
+        if os.name == "nt":
+            if not PSUTIL_INSTALLED:
+                logger.warning("Obniżenie priorytetu procesu wymaga biblioteki psutil na tym systemie.")
+                return False
+            psutil.Process().nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(BACKGROUND_NICE_INCREMENT)
+    except Exception as e:
+        logger.warning(f"Nie można obniżyć priorytetu procesu zadań w tle: {e}")
+        return False
+    logger.info("Obniżono priorytet procesu zadań w tle")
+    return True
+
+
+def background_thread_settings(thread_settings: Optional[Dict[str, Any]], model_name: str, precision: str) -> Dict[str, Any]:
+    """Ustawienia wątków dla zadania w tle: część wątków intra-op, które dostałoby zadanie interaktywne."""
+    resolved = resolve_thread_settings(thread_settings, model_name, precision)
+    full = resolved["intra_op_threads"] or get_physical_core_count()
+    return {**(thread_settings or {}), "intra_op_threads": max(1, int(full * BACKGROUND_THREAD_FRACTION))}
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+class ResourceGovernor:
+    """
+    Podział CPU między dyktowanie a długie zadania w tle dla lokalnego silnika.
+
+    Zadania w tle działają w osobnym procesie roboczym o obniżonym priorytecie i z mniejszą liczbą
+    wątków. Gdy rusza zadanie interaktywne, zadania w tle są wstrzymywane na najbliższej granicy
+    segmentu (przez CancellationToken.pause) i wznawiane, gdy ostatnie zadanie interaktywne się
+    skończy. Wyłączony regulator zostawia dotychczasowe zachowanie: jedna kolejka, pełne zasoby.
+
+    Każde zadanie interaktywne zapisuje swoje opóźnienie (czas do wyniku) z informacją, czy w tle
+    coś działało i czy regulator był włączony - raport porównuje te warianty.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._interactive_count = 0
+        self._background_tokens: List[CancellationToken] = []
+        self._samples: Dict[str, List[List[float]]] = defaultdict(list)
+        stored = get_benchmark_result("governor", get_machine_id())
+        for variant, samples in (stored or {}).get("latency", {}).items():
+            self._samples[variant] = samples[-MAX_LATENCY_SAMPLES:]
+
+    def set_enabled(self, enabled: bool) -> None:
+        with self._lock:
+            self.enabled = enabled
+            if not enabled:
+                for token in self._background_tokens:
+                    token.resume()
+            elif self._interactive_count:
+                for token in self._background_tokens:
+                    token.pause()
+
+    @property
+    def background_active(self) -> bool:
+        with self._lock:
+            return bool(self._background_tokens)
+
+    @property
+    def background_priority(self) -> str:
+        """Proces roboczy dla zadań w tle - przy wyłączonym regulatorze ten sam, co dla zadań interaktywnych."""
+        return PRIORITY_BACKGROUND if self.enabled else PRIORITY_INTERACTIVE
+
+    def background_options(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Opcje silnika dla zadania w tle (osobny proces roboczy, mniej wątków) - bez zmian, gdy regulator jest wyłączony."""
+        if not self.enabled:
+            return options
+        thread_settings = background_thread_settings(options.get("thread_settings"), options.get("model_name") or "turbo",
+                                                     options.get("precision") or "fp32")
+        return {**options, "priority": PRIORITY_BACKGROUND, "thread_settings": thread_settings}
+
+    @contextmanager
+    def background(self, token: CancellationToken) -> Iterator[None]:
+        """Zadanie w tle: jest wstrzymywane na czas zadań interaktywnych."""
+        with self._lock:
+            self._background_tokens.append(token)
+            if self.enabled and self._interactive_count:
+                token.pause()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._background_tokens.remove(token)
+            token.resume()
+
+    @contextmanager
+    def interactive(self) -> Iterator[Dict[str, Any]]:
+        """
+        Zadanie interaktywne: na czas jego trwania zadania w tle są wstrzymane (przy włączonym regulatorze).
+
+        Czas do wyniku trafia do statystyk, chyba że zadanie zakończy się wyjątkiem (np. anulowaniem).
+        Zwracany słownik przyjmuje 'audio_seconds' - długość nagrania, z której liczony jest RTF.
+        """
+        measurement: Dict[str, Any] = {}
+        with self._lock:
+            self._interactive_count += 1
+            governed = self.enabled
+            contended = bool(self._background_tokens)
+            if governed:
+                for token in self._background_tokens:
+                    if not token.paused:
+                        token.pause()
+                        logger.info("Zadanie w tle wstrzymane na czas zadania interaktywnego")
+        start = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            with self._lock:
+                self._interactive_count -= 1
+                if not self._interactive_count:
+                    for token in self._background_tokens:
+                        token.resume()
+        # Wyjątek (anulowanie, limit czasu) przerywa blok przed tym miejscem - takie zadanie nie jest pomiarem
+        self._record(time.perf_counter() - start, measurement.get("audio_seconds"), governed, contended)
+
+    def _record(self, latency: float, audio_seconds: Optional[float], governed: bool, contended: bool) -> None:
+        variant = f"{'governed' if governed else 'ungoverned'}/{'contended' if contended else 'idle'}"
+        with self._lock:
+            samples = self._samples[variant]
+            samples.append([round(latency, 3), round(audio_seconds, 3) if audio_seconds else None])
+            del samples[:-MAX_LATENCY_SAMPLES]
+            snapshot = {key: list(value) for key, value in self._samples.items()}
+        logger.info(f"Opóźnienie zadania interaktywnego: {latency:.2f} s ({variant})")
+        save_benchmark_result("governor", get_machine_id(), {"latency": snapshot})
+
+    def get_report(self) -> str:
+        """Porównanie opóźnień zadań interaktywnych: bez zadań w tle oraz z zadaniami w tle z regulatorem i bez niego."""
+        labels = [("ungoverned/idle", "Bez zadań w tle"),
+                  ("governed/contended", "Zadania w tle, regulator włączony"),
+                  ("ungoverned/contended", "Zadania w tle, regulator wyłączony")]
+        with self._lock:
+            samples = {key: list(value) for key, value in self._samples.items()}
+            # Bez zadań w tle regulator nic nie robi - oba warianty to ten sam pomiar odniesienia
+            samples["ungoverned/idle"] = samples.get("ungoverned/idle", []) + samples.get("governed/idle", [])
+            lines = [f"Regulator zasobów: {'włączony' if self.enabled else 'wyłączony'}, "
+                     f"zadania w tle: {len(self._background_tokens)}, interaktywne: {self._interactive_count}", "",
+                     "Opóźnienie zadań interaktywnych (czas do wyniku):"]
+        for variant, label in labels:
+            variant_samples = samples.get(variant, [])
+            if not variant_samples:
+                lines.append(f"  {label}: brak pomiarów")
+                continue
+            latencies = [latency for latency, _ in variant_samples]
+            line = (f"  {label}: {len(latencies)} zadań, mediana {_percentile(latencies, 50):.2f} s, "
+                    f"p90 {_percentile(latencies, 90):.2f} s")
+            ratios = [latency / audio for latency, audio in variant_samples if audio]
+            if ratios:
+                line += f", mediana RTF {_percentile(ratios, 50):.2f}"
+            lines.append(line)
+        lines += ["", f"Zadania w tle: niższy priorytet procesu, {BACKGROUND_THREAD_FRACTION:.0%} wątków, "
+                      "pauza na granicy segmentu, gdy rusza dyktowanie."]
+        return "\n".join(lines)
@@ -0,0 +1,121 @@
+# X:\Aplikacje\dictaitor\modules\segment_repair.py
+import zlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Progi oznaczania segmentów jako podejrzanych (pierwsze trzy - jak w whisper.transcribe)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+REPETITION_RATIO_THRESHOLD = 0.5
+# N-gramy słów używane do wykrywania pętli powtórzeń
+REPETITION_NGRAM = 3
+# Margines dodawany wokół podejrzanego fragmentu przy ponownym dekodowaniu (s)
+SPAN_PADDING = 0.3
+
+
+def repetition_ratio(text: str, ngram: int = REPETITION_NGRAM) -> float:
+    """
+    Zwraca udział powtórzonych n-gramów słów w tekście (0 - brak powtórzeń, blisko 1 - pętla).
+
+    Krótkie teksty (mniej niż dwa pełne n-gramy) zawsze dają 0.
+    """
+    words = text.lower().split()
+    if len(words) < ngram * 2:
+        return 0.0
+    ngrams = [tuple(words[i:i + ngram]) for i in range(len(words) - ngram + 1)]
+    return 1.0 - len(set(ngrams)) / len(ngrams)
+
+
+def compression_ratio(text: str) -> float:
+    """Współczynnik kompresji zlib - ta sama miara, której Whisper używa do wykrywania powtórzeń."""
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def segment_issues(segment: Dict[str, Any]) -> List[str]:
+    """
+    Zwraca listę powodów, dla których segment wygląda na halucynację lub niepewny wynik.
+
+    Brakujące metryki (np. z silników, które ich nie podają) są pomijane; współczynnik
+    kompresji jest wtedy liczony z tekstu.
+    """
+    text = segment.get("text", "")
+    issues = []
+    ratio = segment.get("compression_ratio")
+    if ratio is None:
+        ratio = compression_ratio(text)
+    if ratio > COMPRESSION_RATIO_THRESHOLD:
+        issues.append("kompresja")
+    if repetition_ratio(text) > REPETITION_RATIO_THRESHOLD:
+        issues.append("powtórzenia")
+    avg_logprob = segment.get("avg_logprob")
+    no_speech_prob = segment.get("no_speech_prob")
+    if avg_logprob is not None and avg_logprob < LOGPROB_THRESHOLD:
+        # Niska pewność przy wysokim prawdopodobieństwie ciszy to typowy tekst "wymyślony" na ciszy
+        issues.append("cisza" if no_speech_prob is not None and no_speech_prob > NO_SPEECH_THRESHOLD else "niska pewność")
+    return issues
+
+
+def find_suspect_segments(segments: List[Dict[str, Any]]) -> List[int]:
+    """Zwraca indeksy segmentów oznaczonych przez segment_issues."""
+    return [index for index, segment in enumerate(segments) if segment_issues(segment)]
+
+
+def group_spans(segments: List[Dict[str, Any]], suspect_indices: List[int],
+                duration: Optional[float] = None) -> List[Tuple[int, int, float, float]]:
+    """
+    Łączy sąsiadujące podejrzane segmenty we fragmenty audio do ponownego dekodowania.
+
+    Margines SPAN_PADDING nie wchodzi na sąsiednie poprawne segmenty.
+
+    Returns:
+        List[Tuple[int, int, float, float]]: (pierwszy_indeks, ostatni_indeks, początek_s, koniec_s)
+    """
+    spans = []
+    for index in sorted(suspect_indices):
+        if spans and spans[-1][1] == index - 1:
+            spans[-1][1] = index
+        else:
+            spans.append([index, index])
+
+    result = []
+    for first, last in spans:
+        lower_bound = segments[first - 1]["end"] if first > 0 else 0.0
+        upper_bound = segments[last + 1]["start"] if last + 1 < len(segments) else duration
+        start = max(lower_bound, segments[first]["start"] - SPAN_PADDING)
+        end = segments[last]["end"] + SPAN_PADDING
+        if upper_bound is not None:
+            end = min(end, upper_bound)
+        result.append((first, last, start, max(end, start)))
+    return result
+
+
+def splice_segments(segments: List[Dict[str, Any]],
+                    replacements: List[Tuple[int, int, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Wstawia nowe segmenty w miejsce zakresów (pierwszy_indeks, ostatni_indeks) i numeruje wynik od nowa.
+
+    Args:
+        segments: Oryginalna lista segmentów
+        replacements: Lista (pierwszy_indeks, ostatni_indeks, nowe_segmenty); zakresy nie mogą się nakładać
+    """
+    spliced = []
+    position = 0
+    for first, last, new_segments in sorted(replacements, key=lambda item: item[0]):
+        spliced.extend(segments[position:first])
+        spliced.extend(new_segments)
+        position = last + 1
+    spliced.extend(segments[position:])
+    return [{**segment, "id": index} for index, segment in enumerate(spliced)]
+
+
+def is_improvement(old_segments: List[Dict[str, Any]], new_segments: List[Dict[str, Any]]) -> bool:
+    """Nowy wynik jest lepszy, jeśli ma mniej podejrzanych segmentów (pusty wynik na ciszy też się liczy)."""
+    return len(find_suspect_segments(new_segments)) < len(find_suspect_segments(old_segments))
+
+
+def join_segment_text(segments: List[Dict[str, Any]]) -> str:
+    return "".join(segment.get("text", "") for segment in segments).strip()
@@ -0,0 +1,453 @@
+# X:\Aplikacje\dictaitor\modules\soak_harness.py
+#
+# Test długotrwały bez okna i bez sprzętu: tysiące cykli nagranie -> transkrypcja, jak w DictAItorApp.
+# Lokalne silniki pracują w procesie roboczym (pamięć współdzielona, potoki), więc mierzone są oba procesy.
+# Uruchomienie: python -m modules.soak_harness --cycles 2000 --engines local,openai
+import os
+import sys
+import json
+import math
+import time
+import types
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from modules.multitrack_recorder import SyntheticInputStream
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    PSUTIL_INSTALLED = True
+except ImportError:
+    PSUTIL_INSTALLED = False
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOAK_REPORT_PATH = os.path.join(APP_DIR, "logs", "soak_report.json")
+
+DEFAULT_CYCLES = 1000
+DEFAULT_RECORD_SECONDS = 5.0
+# Ile razy szybciej niż w rzeczywistości sztuczny mikrofon "nagrywa"
+DEFAULT_CAPTURE_SPEED = 50.0
+DEFAULT_SAMPLE_EVERY = 50
+# Balast w miejsce wag sztucznego modelu - przeładowania bez zwalniania pamięci są wtedy widoczne w RSS
+DEFAULT_FAKE_MODEL_MB = 64
+MOCK_API_TEXT = "To jest odpowiedź testowego serwera API."
+# Wzrost RSS na 1000 cykli, powyżej którego raport zgłasza podejrzenie wycieku
+RSS_LEAK_THRESHOLD_MB = 20.0
+
+
+# ### Sztuczny PyAudio ###
+
+def install_fake_pyaudio(record_seconds: float = DEFAULT_RECORD_SECONDS, speed: float = DEFAULT_CAPTURE_SPEED,
+                         rate: int = 16000) -> types.ModuleType:
+    """
+    Podmienia moduł pyaudio na sztuczny: urządzenie wejściowe zwraca ton 440 Hz o długości
+    record_seconds, a potem ciszę. Licznik `live_interfaces` pokazuje, ile obiektów PyAudio
+    nie zostało zamkniętych przez terminate().
+    """
+    tone = [int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(record_seconds * rate))]
+    fake = types.ModuleType("pyaudio")
+    fake.paInt16 = 8
+    fake.live_interfaces = 0
+    fake.opened_streams = 0
+
+    class PyAudio:
+        def __init__(self) -> None:
+            fake.live_interfaces += 1
+            self._terminated = False
+
+        def open(self, format=None, channels: int = 1, rate: int = rate, input: bool = True,
+                 frames_per_buffer: int = 1024, **kwargs: Any) -> SyntheticInputStream:
+            fake.opened_streams += 1
+            return SyntheticInputStream([tone] * channels, rate=rate, speed=speed)
+
+        def terminate(self) -> None:
+            if not self._terminated:
+                self._terminated = True
+                fake.live_interfaces -= 1
+
+        def get_device_count(self) -> int:
+            return 1
+
+        def get_device_info_by_index(self, index: int) -> Dict[str, Any]:
+            return {"name": "Sztuczny mikrofon", "maxInputChannels": 2}
+
+    fake.PyAudio = PyAudio
+    sys.modules["pyaudio"] = fake
+    from modules import audio_recorder
+    audio_recorder.pyaudio = fake
+    return fake
+
+
+# ### Sztuczny model Whisper ###
+
+class FakeWhisperModel:
+    """
+    Model o interfejsie używanym przez whisper_decoding (embed_audio, detect_language, decode),
+    zwracający stały tekst bez liczenia sieci. Działa na prawdziwym tokenizerze Whisper, więc
+    pętla dekodowania, segmenty i pamięć podręczna modeli w local_stt działają jak zwykle.
+    """
+
+    def __init__(self, name: str, weight_mb: int = DEFAULT_FAKE_MODEL_MB) -> None:
+        import torch
+        self.name = name
+        self.weights = bytearray(weight_mb * 1024 * 1024)
+        # Wymiary jak w prawdziwych modelach Whisper - czyta je pętla dekodowania (n_text_ctx: limit podpowiedzi)
+        self.dims = SimpleNamespace(n_mels=128 if name in ("large-v3", "turbo") else 80, n_audio_ctx=1500, n_audio_state=8,
+                                    n_text_ctx=448)
+        self.is_multilingual = True
+        self.num_languages = 100 if self.dims.n_mels == 128 else 99
+        self.device = torch.device("cpu")
+
+    def embed_audio(self, mel):
+        import torch
+        return torch.zeros(mel.shape[0], self.dims.n_audio_ctx, self.dims.n_audio_state)
+
+    def detect_language(self, audio_features):
+        return None, {"pl": 0.9, "en": 0.1}
+
+    def decode(self, audio_features, options):
+        from modules.whisper_decoding import _get_tokenizer
+        tokenizer = _get_tokenizer(self, options.language, options.task)
+        tokens = [tokenizer.timestamp_begin] + tokenizer.encode(" Próba nagrania.") + [tokenizer.timestamp_begin + 250]
+        return SimpleNamespace(tokens=tokens, temperature=options.temperature, avg_logprob=-0.2,
+                               compression_ratio=1.1, no_speech_prob=0.01)
+
+
+def install_fake_whisper(weight_mb: int = DEFAULT_FAKE_MODEL_MB) -> bool:
+    """Podmienia ładowanie wag w local_stt na FakeWhisperModel (reszta ścieżki bez zmian). False bez torch/whisper."""
+    from modules import local_stt
+    if not local_stt.WHISPER_INSTALLED:
+        return False
+    loader = lambda model_name, *args, **kwargs: FakeWhisperModel(model_name, weight_mb)
+    local_stt.load_mmap_model = loader
+    local_stt._load_quantized_model = loader
+    local_stt.whisper.load_model = loader
+    return True
+
+
+def isolate_app_state(work_dir: str) -> None:
+    """Kieruje wyniki pomiarów, dziennik zużycia API i pamięć podręczną cech do katalogu testu (bez nagrań - patrz run)."""
+    from modules import benchmark, feature_cache, rate_limiter
+    benchmark.BENCHMARKS_FILE_PATH = os.path.join(work_dir, "benchmarks.json")
+    rate_limiter.USAGE_FILE_PATH = os.path.join(work_dir, "api_usage.json")
+    # Tempo ograniczane przez harmonogram mierzyłoby limiter zamiast wycieków
+    rate_limiter._rate_limiter = rate_limiter.ApiRateLimiter(requests_per_minute=100000, max_concurrent=8)
+    feature_cache._feature_cache = feature_cache.FeatureCache(cache_dir=os.path.join(work_dir, "features"))
+
+
+def prepare_soak_worker(work_dir: str, fake_model_mb: int) -> None:
+    """Inicjalizacja procesu roboczego: te same katalogi tymczasowe i ten sam sztuczny model co w procesie testu."""
+    # Dziennik każdego zadania z tysięcy cykli zagłuszyłby raport
+    logging.getLogger().setLevel(logging.WARNING)
+    isolate_app_state(work_dir)
+    install_fake_whisper(fake_model_mb)
+
+
+# ### Testowy serwer API ###
+
+class MockOpenAIServer:
+    """
+    Lokalny serwer HTTP odpowiadający jak endpointy audio API OpenAI (verbose_json, nagłówki limitów).
+
+    Co `rate_limit_every` żądanie zwraca 429 z krótkim Retry-After, żeby ścieżka ponowień też była ćwiczona.
+    """
+
+    def __init__(self, latency: float = 0.02, rate_limit_every: int = 0, duration: float = DEFAULT_RECORD_SECONDS) -> None:
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.duration = duration
+        self.request_count = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.request_count += 1
+                time.sleep(server.latency)
+                if server.rate_limit_every and server.request_count % server.rate_limit_every == 0:
+                    self._reply(429, {"error": {"message": "Rate limit", "code": "rate_limit_exceeded"}}, {"retry-after": "0.05"})
+                    return
+                self._reply(200, {"text": MOCK_API_TEXT, "language": "polish", "duration": server.duration,
+                                  "segments": [{"start": 0.0, "end": server.duration, "text": MOCK_API_TEXT}]},
+                            {"x-ratelimit-limit-requests": "100000", "x-ratelimit-remaining-requests": "99999"})
+
+            def _reply(self, status: int, body: Dict[str, Any], headers: Dict[str, str]) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1/audio"
+
+    def start(self) -> None:
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="MockOpenAI").start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# ### Pomiary ###
+
+def process_stats(pid: Optional[int] = None) -> Dict[str, Optional[float]]:
+    """
+    RSS (MB), liczba wątków i otwartych uchwytów plików procesu (None, jeśli niedostępne).
+
+    Bez pid - bieżący proces, a wątki to wątki Pythona; dla innego procesu (np. roboczego) liczone są
+    wszystkie wątki systemowe, także pule obliczeń PyTorch.
+    """
+    rss_mb = handles = threads = None
+    proc_dir = f"/proc/{pid or 'self'}"
+    try:
+        if PSUTIL_INSTALLED:
+            process = psutil.Process(pid)
+            rss_mb = process.memory_info().rss / (1024 * 1024)
+            handles = process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+            threads = process.num_threads()
+        elif os.path.exists(f"{proc_dir}/statm"):
+            with open(f"{proc_dir}/statm") as f:
+                rss_mb = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+            handles = len(os.listdir(f"{proc_dir}/fd"))
+            with open(f"{proc_dir}/status") as f:
+                threads = next((int(line.split()[1]) for line in f if line.startswith("Threads:")), None)
+    except (OSError, ValueError) as e:
+        # Proces mógł się właśnie zakończyć (np. restart procesu roboczego po awarii)
+        logger.warning(f"Nie można odczytać statystyk procesu {pid or os.getpid()}: {e}")
+    if pid is None:
+        threads = threading.active_count()
+    return {"rss_mb": rss_mb, "threads": threads, "handles": handles}
+
+
+def slope_per_1000(points: List[tuple]) -> Optional[float]:
+    """Nachylenie prostej najmniejszych kwadratów (zmiana na 1000 cykli) dla punktów (cykl, wartość)."""
+    points = [(x, y) for x, y in points if y is not None]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    if not denominator:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator * 1000
+
+
+class SoakHarness:
+    """
+    Powtarza cykl aplikacji - AudioRecorder.start_recording/stop_recording, transkrypcja przez
+    silnik z rejestru (auto_engine.run_measured, jak w DictAItorApp), usunięcie nagrania - i co
+    `sample_every` cykli zapisuje RSS, wątki, uchwyty plików, niezamknięte obiekty PyAudio i czasy cykli.
+
+    Lokalne silniki idą domyślną ścieżką aplikacji: proces roboczy, audio w pamięci współdzielonej,
+    segmenty przez potok. RSS, wątki i uchwyty procesu roboczego są mierzone osobno (klucze worker_*).
+
+    Pliki konfiguracji, dziennik zużycia API, pamięć podręczna cech i nagrania trafiają do katalogu
+    tymczasowego (w obu procesach), więc test nie zmienia danych użytkownika.
+    """
+
+    def __init__(self, engines: List[str], cycles: int = DEFAULT_CYCLES, record_seconds: float = DEFAULT_RECORD_SECONDS,
+                 capture_speed: float = DEFAULT_CAPTURE_SPEED, sample_every: int = DEFAULT_SAMPLE_EVERY,
+                 models: Optional[List[str]] = None, fake_model_mb: int = DEFAULT_FAKE_MODEL_MB,
+                 api_latency: float = 0.02, rate_limit_every: int = 0) -> None:
+        self.engine_names = engines
+        self.cycles = cycles
+        self.record_seconds = record_seconds
+        self.capture_speed = capture_speed
+        self.sample_every = sample_every
+        self.models = models or ["base"]
+        self.fake_model_mb = fake_model_mb
+        self.api_latency = api_latency
+        self.rate_limit_every = rate_limit_every
+        self.samples: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self.skipped: Dict[str, str] = {}
+        self._worker = None
+
+    def _create_engines(self, mock_server: MockOpenAIServer) -> Dict[str, Any]:
+        from modules.stt_engines import create_engine
+        engines = {}
+        for name in self.engine_names:
+            engine = create_engine(name)
+            if engine is None or not engine.is_available():
+                self.skipped[name] = "silnik niedostępny"
+                continue
+            if name == "local" and not install_fake_whisper(self.fake_model_mb):
+                self.skipped[name] = "brak torch/openai-whisper"
+                continue
+            engine.configure(api_key="sk-soak-test")
+            client = getattr(engine, "client", None)
+            if client is not None:
+                client.API_URL = f"{mock_server.url}/transcriptions"
+                client.TRANSLATION_API_URL = f"{mock_server.url}/translations"
+                client.debug_mode = False
+            engines[name] = engine
+        return engines
+
+    def run(self) -> Dict[str, Any]:
+        # Sztuczny pyaudio musi być na miejscu, zanim audio_recorder zostanie zaimportowany
+        fake_pyaudio = install_fake_pyaudio(self.record_seconds, self.capture_speed)
+        from modules import audio_recorder
+        from modules.audio_recorder import AudioRecorder
+        from modules import inference_worker
+        from modules.auto_engine import run_measured
+        from modules.jobs import CancellationToken
+        from modules.resource_governor import PRIORITY_INTERACTIVE
+
+        work_dir = tempfile.mkdtemp(prefix="dictaitor_soak_")
+        audio_recorder.RECORDINGS_DIR = os.path.join(work_dir, "recordings")
+        isolate_app_state(work_dir)
+        # Własny proces roboczy (uruchamiany przy pierwszym zadaniu) zamiast współdzielonego - ze sztucznym modelem
+        self._worker = inference_worker.InferenceWorker(initializer=prepare_soak_worker, initargs=(work_dir, self.fake_model_mb))
+        with inference_worker._worker_lock:
+            previous_worker = inference_worker._workers.get(PRIORITY_INTERACTIVE)
+            inference_worker._workers[PRIORITY_INTERACTIVE] = self._worker
+        mock_server = MockOpenAIServer(latency=self.api_latency, rate_limit_every=self.rate_limit_every, duration=self.record_seconds)
+        mock_server.start()
+        try:
+            engines = self._create_engines(mock_server)
+            if not engines:
+                return self._report(fake_pyaudio, mock_server, time.perf_counter())
+            # Jeden rejestrator na całą sesję - tak jak w oknie aplikacji
+            recorder = AudioRecorder()
+            window_latencies: List[float] = []
+            started = time.perf_counter()
+            self._sample(0, fake_pyaudio, window_latencies)
+            for cycle in range(1, self.cycles + 1):
+                engine_name = self.engine_names[cycle % len(self.engine_names)]
+                engine = engines.get(engine_name) or next(iter(engines.values()))
+                cycle_start = time.perf_counter()
+                if not recorder.start_recording():
+                    self.errors.append(f"cykl {cycle}: nie można rozpocząć nagrywania")
+                    continue
+                time.sleep(self.record_seconds / self.capture_speed)
+                path = recorder.stop_recording()
+                if path is None:
+                    self.errors.append(f"cykl {cycle}: nie zapisano nagrania")
+                    continue
+                options = {"model_name": self.models[cycle % len(self.models)], "precision": "fp32",
+                           "cancel_token": CancellationToken()}
+                result, error_msg = run_measured(engine, path, None, "transcribe", options)
+                if error_msg or not result:
+                    self.errors.append(f"cykl {cycle} ({engine.name}): {error_msg}")
+                os.remove(path)
+                window_latencies.append(time.perf_counter() - cycle_start)
+                if cycle % self.sample_every == 0 or cycle == self.cycles:
+                    self._sample(cycle, fake_pyaudio, window_latencies)
+                    window_latencies = []
+            return self._report(fake_pyaudio, mock_server, started)
+        finally:
+            mock_server.stop()
+            self._worker.shutdown()
+            with inference_worker._worker_lock:
+                if previous_worker is None:
+                    inference_worker._workers.pop(PRIORITY_INTERACTIVE, None)
+                else:
+                    inference_worker._workers[PRIORITY_INTERACTIVE] = previous_worker
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _sample(self, cycle: int, fake_pyaudio: types.ModuleType, latencies: List[float]) -> None:
+        worker_pid = self._worker.pid if self._worker is not None else None
+        # Przed pierwszym lokalnym zadaniem procesu roboczego jeszcze nie ma - wartości worker_* są wtedy puste
+        worker = process_stats(worker_pid) if worker_pid else {"rss_mb": None, "threads": None, "handles": None}
+        sample = {"cycle": cycle, **process_stats(), **{f"worker_{key}": value for key, value in worker.items()},
+                  "worker_pid": worker_pid, "live_pyaudio": fake_pyaudio.live_interfaces,
+                  "latency_ms": sum(latencies) / len(latencies) * 1000 if latencies else None}
+        self.samples.append(sample)
+        logger.info(f"Cykl {cycle}: RSS {sample['rss_mb'] or 0:.1f} MB (roboczy {sample['worker_rss_mb'] or 0:.1f} MB), "
+                    f"wątki {sample['threads']}, uchwyty {sample['handles']} (roboczy {sample['worker_handles']}), "
+                    f"PyAudio {sample['live_pyaudio']}, czas cyklu {sample['latency_ms'] or 0:.0f} ms")
+
+    def _report(self, fake_pyaudio: types.ModuleType, mock_server: MockOpenAIServer, started: float) -> Dict[str, Any]:
+        # Pierwsze pomiary obejmują rozgrzewkę (ładowanie modelu, pierwsze alokacje) - trend liczymy bez nich
+        steady = self.samples[len(self.samples) // 5:] if len(self.samples) >= 5 else self.samples
+        trends = {key: slope_per_1000([(sample["cycle"], sample[key]) for sample in steady])
+                  for key in ("rss_mb", "threads", "handles", "worker_rss_mb", "worker_threads", "worker_handles", "latency_ms")}
+        warnings = []
+        for prefix, process_label in (("", ""), ("worker_", " procesu roboczego")):
+            rss_trend = trends[f"{prefix}rss_mb"]
+            if rss_trend is not None and rss_trend > RSS_LEAK_THRESHOLD_MB:
+                warnings.append(f"RSS{process_label} rośnie o {rss_trend:.1f} MB na 1000 cykli")
+            for key, label in (("threads", "wątków"), ("handles", "uchwytów plików")):
+                trend = trends[f"{prefix}{key}"]
+                if trend is not None and trend >= 1.0:
+                    warnings.append(f"Liczba {label}{process_label} rośnie o {trend:.1f} na 1000 cykli")
+        worker_pids = {sample["worker_pid"] for sample in self.samples if sample["worker_pid"]}
+        if len(worker_pids) > 1:
+            # Restart po awarii zeruje RSS procesu roboczego - jego trend nie jest wtedy wiarygodny
+            warnings.append(f"Proces roboczy uruchamiano {len(worker_pids)} razy (awarie w trakcie testu)")
+        if fake_pyaudio.live_interfaces:
+            warnings.append(f"{fake_pyaudio.live_interfaces} obiektów PyAudio bez terminate()")
+        report = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "cycles": self.cycles, "engines": self.engine_names,
+                  "models": self.models, "elapsed": time.perf_counter() - started, "skipped": self.skipped,
+                  "api_requests": mock_server.request_count, "pyaudio_streams": fake_pyaudio.opened_streams,
+                  "errors": self.errors[:50], "error_count": len(self.errors), "trends_per_1000": trends,
+                  "warnings": warnings, "samples": self.samples}
+        try:
+            os.makedirs(os.path.dirname(SOAK_REPORT_PATH), exist_ok=True)
+            with open(SOAK_REPORT_PATH, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=4, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Nie można zapisać raportu testu długotrwałego: {e}")
+        return report
+
+
+def format_soak_report(report: Dict[str, Any]) -> str:
+    lines = [f"Cykli: {report['cycles']} ({', '.join(report['engines'])}), czas {report['elapsed']:.0f} s, "
+             f"żądań do testowego API: {report['api_requests']}, błędów: {report['error_count']}"]
+    for name, reason in report["skipped"].items():
+        lines.append(f"Pominięto silnik {name}: {reason}")
+    if report["samples"]:
+        first, last = report["samples"][0], report["samples"][-1]
+        for key, label, unit in (("rss_mb", "RSS", " MB"), ("threads", "Wątki", ""), ("handles", "Uchwyty plików", ""),
+                                 ("worker_rss_mb", "RSS procesu roboczego", " MB"), ("worker_threads", "Wątki procesu roboczego", ""),
+                                 ("worker_handles", "Uchwyty procesu roboczego", ""), ("latency_ms", "Czas cyklu", " ms")):
+            trend = report["trends_per_1000"].get(key)
+            start_value = next((sample[key] for sample in report["samples"] if sample[key] is not None), None)
+            values = f"{start_value:.1f}{unit} -> {last[key]:.1f}{unit}" if start_value is not None and last[key] is not None else "niedostępne"
+            lines.append(f"{label}: {values}" + (f" (trend {trend:+.2f}{unit} / 1000 cykli)" if trend is not None else ""))
+    lines += [f"UWAGA: {warning}" for warning in report["warnings"]] or ["Brak oznak wycieków."]
+    lines.append(f"Pełny raport: {SOAK_REPORT_PATH}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test długotrwały DictAItor ze sztucznym mikrofonem, modelem i API.")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES)
+    parser.add_argument("--engines", default="local,openai", help="Silniki z rejestru, używane na zmianę")
+    parser.add_argument("--models", default="base", help="Modele lokalne używane na zmianę (np. tiny,base,small)")
+    parser.add_argument("--record-seconds", type=float, default=DEFAULT_RECORD_SECONDS)
+    parser.add_argument("--speed", type=float, default=DEFAULT_CAPTURE_SPEED, help="Przyspieszenie sztucznego mikrofonu")
+    parser.add_argument("--sample-every", type=int, default=DEFAULT_SAMPLE_EVERY)
+    parser.add_argument("--fake-model-mb", type=int, default=DEFAULT_FAKE_MODEL_MB)
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Co które żądanie API odpowiada 429 (0 = nigdy)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    harness = SoakHarness(engines=[name.strip() for name in args.engines.split(",") if name.strip()], cycles=args.cycles,
+                          record_seconds=args.record_seconds, capture_speed=args.speed, sample_every=args.sample_every,
+                          models=[name.strip() for name in args.models.split(",") if name.strip()],
+                          fake_model_mb=args.fake_model_mb, api_latency=args.api_latency, rate_limit_every=args.rate_limit_every)
+    report = harness.run()
+    print(format_soak_report(report))
+    return 1 if report["warnings"] or report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
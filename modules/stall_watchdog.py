@@ -0,0 +1,168 @@
+# X:\Aplikacje\dictaitor\modules\stall_watchdog.py
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGS_DIR = os.path.join(APP_DIR, "logs")
+STALL_LOG_PATH = os.path.join(LOGS_DIR, "gui_stalls.log")
+
+# Co ile ms pętla zdarzeń Tk ma wykonać "tyknięcie" i od jakiego opóźnienia uznajemy to za zacięcie
+TICK_INTERVAL_MS = 100
+STALL_THRESHOLD_MS = 200
+# Górne granice przedziałów histogramu opóźnień (ms); ostatni przedział jest otwarty
+HISTOGRAM_BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000]
+MAX_RECENT_STALLS = 50
+# Co ile sekund raport (histogram i najczęstsze przyczyny) trafia do dziennika zacięć; ostatni - przy stop()
+REPORT_INTERVAL_S = 15 * 60
+
+
+class StallWatchdog:
+    """
+    Wykrywa zacięcia pętli zdarzeń Tk i wskazuje kod, który je powoduje.
+
+    Pętla zdarzeń co TICK_INTERVAL_MS wykonuje zaplanowane przez root.after "tyknięcie"; różnica
+    między planowanym a rzeczywistym czasem wykonania to opóźnienie pętli. Wątek nadzorcy sprawdza,
+    czy tyknięcie nie spóźnia się ponad próg - jeśli tak, zapisuje stos wątku głównego w chwili
+    zacięcia (po jego zakończeniu nie byłoby już czego oglądać). Co REPORT_INTERVAL_S i przy
+    zatrzymaniu raport z get_report() jest dopisywany do dziennika zacięć.
+    """
+
+    def __init__(self, root, interval_ms: int = TICK_INTERVAL_MS, threshold_ms: int = STALL_THRESHOLD_MS,
+                 log_path: str = STALL_LOG_PATH, report_interval_s: float = REPORT_INTERVAL_S) -> None:
+        self.root = root
+        self.log_path = log_path
+        self.interval = interval_ms / 1000.0
+        self.threshold = threshold_ms / 1000.0
+        self.report_interval = report_interval_s
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.call_sites: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # miejsce -> [liczba, suma_ms]
+        self.recent_stalls: List[Tuple[float, float, str]] = []
+        self.tick_count = 0
+        self.max_lag_ms = 0.0
+
+        self._lock = threading.Lock()
+        self._main_thread_id = threading.main_thread().ident
+        self._expected_tick = 0.0
+        self._captured_stack: Optional[List[traceback.FrameSummary]] = None
+        self._after_id = None
+        self._running = False
+        self._stall_logger = self._create_stall_logger(log_path)
+
+    @staticmethod
+    def _create_stall_logger(log_path: str) -> logging.Logger:
+        stall_logger = logging.getLogger("DictAItorStalls")
+        if not stall_logger.handlers:
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                handler = logging.FileHandler(log_path, encoding="utf-8")
+                handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+                stall_logger.addHandler(handler)
+            except OSError as e:
+                logger.warning(f"Nie można otworzyć dziennika zacięć {log_path}: {e}")
+        stall_logger.setLevel(logging.INFO)
+        return stall_logger
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._expected_tick = time.perf_counter() + self.interval
+        self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+        threading.Thread(target=self._monitor, daemon=True, name="StallWatchdog").start()
+        logger.info(f"Detektor zacięć GUI uruchomiony (próg {self.threshold * 1000:.0f} ms)")
+
+    def stop(self) -> None:
+        was_running, self._running = self._running, False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if was_running:
+            self.log_report("podsumowanie sesji")
+
+    def log_report(self, reason: str) -> None:
+        """Dopisuje bieżący raport do dziennika zacięć (trafia też do dziennika aplikacji)."""
+        self._stall_logger.info(f"Raport zacięć GUI ({reason}):\n{self.get_report()}")
+
+    def _tick(self) -> None:
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected_tick)
+        with self._lock:
+            stack, self._captured_stack = self._captured_stack, None
+            self._expected_tick = now + self.interval
+        self._record(lag, stack)
+        if self._running:
+            self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+
+    def _monitor(self) -> None:
+        # Sprawdzamy kilka razy w obrębie progu, żeby złapać stos w trakcie zacięcia
+        poll_interval = self.threshold / 4
+        next_report = time.monotonic() + self.report_interval
+        while self._running:
+            time.sleep(poll_interval)
+            if time.monotonic() >= next_report and self._running:
+                next_report += self.report_interval
+                self.log_report("okresowy")
+            with self._lock:
+                overdue = time.perf_counter() - self._expected_tick
+                if overdue < self.threshold or self._captured_stack is not None:
+                    continue
+                frame = sys._current_frames().get(self._main_thread_id)
+                if frame is not None:
+                    self._captured_stack = traceback.extract_stack(frame)
+
+    def _record(self, lag: float, stack: Optional[List[traceback.FrameSummary]]) -> None:
+        lag_ms = lag * 1000
+        self.tick_count += 1
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        bucket = next((index for index, limit in enumerate(HISTOGRAM_BUCKETS_MS) if lag_ms <= limit), len(HISTOGRAM_BUCKETS_MS))
+        self.histogram[bucket] += 1
+        if lag < self.threshold:
+            return
+
+        call_site = self._call_site(stack)
+        site_stats = self.call_sites[call_site]
+        site_stats[0] += 1
+        site_stats[1] += lag_ms
+        self.recent_stalls.append((time.time(), lag_ms, call_site))
+        del self.recent_stalls[:-MAX_RECENT_STALLS]
+        stack_text = "".join(traceback.format_list(stack)) if stack else "    (stos niedostępny)\n"
+        self._stall_logger.info(f"Zacięcie GUI {lag_ms:.0f} ms w {call_site}\n{stack_text}")
+
+    @staticmethod
+    def _call_site(stack: Optional[List[traceback.FrameSummary]]) -> str:
+        """Najgłębsza ramka z kodu aplikacji (nie z bibliotek ani Tk) - tam zwykle leży przyczyna."""
+        if not stack:
+            return "nieznane"
+        app_frames = [frame for frame in stack if os.path.abspath(frame.filename).startswith(APP_DIR)
+                      and not frame.filename.endswith("stall_watchdog.py")]
+        frame = app_frames[-1] if app_frames else stack[-1]
+        return f"{os.path.relpath(frame.filename, APP_DIR) if app_frames else os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+
+    def get_report(self, top: int = 10) -> str:
+        """Zwraca czytelny raport: histogram opóźnień i miejsca w kodzie najczęściej powodujące zacięcia."""
+        lines = [f"Pomiarów pętli zdarzeń: {self.tick_count}, maksymalne opóźnienie: {self.max_lag_ms:.0f} ms", "",
+                 "Histogram opóźnień:"]
+        lower = 0
+        for limit, count in zip(HISTOGRAM_BUCKETS_MS + [None], self.histogram):
+            label = f"{lower}-{limit} ms" if limit is not None else f"> {lower} ms"
+            lines.append(f"  {label:>14}: {count}")
+            lower = limit
+        lines += ["", f"Najczęstsze przyczyny zacięć (> {self.threshold * 1000:.0f} ms):"]
+        ranked = sorted(self.call_sites.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        if not ranked:
+            lines.append("  brak zarejestrowanych zacięć")
+        for call_site, (count, total_ms) in ranked:
+            lines.append(f"  {call_site}: {count}x, łącznie {total_ms:.0f} ms, średnio {total_ms / count:.0f} ms")
+        lines += ["", f"Pełne stosy: {self.log_path}"]
+        return "\n".join(lines)
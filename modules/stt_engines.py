@@ -0,0 +1,248 @@
+# X:\Aplikacje\dictaitor\modules\stt_engines.py
+import abc
+import importlib
+import logging
+import pkgutil
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# Rejestr silników: nazwa (zapisywana w konfiguracji) -> klasa silnika
+_ENGINE_REGISTRY: Dict[str, Type["STTEngine"]] = {}
+_engines_discovered = False
+
+# Moduły w pakiecie 'modules' o nazwach kończących się na ten sufiks są ładowane automatycznie
+ENGINE_MODULE_SUFFIX = "_engine"
+
+
+class STTEngine(abc.ABC):
+    """
+    Wspólny interfejs silników rozpoznawania mowy.
+
+    Nowy silnik to podklasa z własnymi atrybutami `name`, `display_name` i metodą
+    `transcribe_segments`, oznaczona dekoratorem @register_engine i umieszczona w pliku
+    modules/<nazwa>_engine.py - aplikacja wykryje ją bez zmian w main_app.py.
+    """
+
+    name = ""
+    display_name = ""
+    action_label = "Transkrybuj"
+    supports_models = False
+    default_model: Optional[str] = None
+    # Kolejność wyświetlania w interfejsie (mniejsze wartości wyżej)
+    order = 100
+    # Silnik, który sam nie transkrybuje, tylko przekazuje zadania innym silnikom (np. tryb automatyczny)
+    routes_jobs = False
+    # Silnik dekoduje dodatkowe wyjścia (opcja additional_outputs) razem z głównym, przy jednym przebiegu kodera
+    supports_multi_output = False
+
+    def is_available(self) -> bool:
+        """Czy silnik może być użyty (zainstalowane biblioteki, klucz API itp.)."""
+        return True
+
+    def configure(self, **settings: Any) -> None:
+        """Przekazuje silnikowi ustawienia aplikacji (np. api_key). Nieznane klucze są ignorowane."""
+        pass
+
+    def get_models(self) -> List[str]:
+        """Lista modeli, spośród których użytkownik może wybierać (pusta, jeśli silnik nie ma wyboru)."""
+        return []
+
+    @abc.abstractmethod
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Transkrybuje lub tłumaczy plik audio.
+
+        Args:
+            audio_file_path: Ścieżka do pliku audio
+            language: Opcjonalny kod języka nagrania
+            task: "transcribe" lub "translate" (na angielski)
+            **options: Opcje specyficzne dla silnika (np. model_name, precision). Opcja
+                segment_callback, jeśli silnik ją obsługuje, otrzymuje segmenty w miarę dekodowania,
+                a progress_callback - postęp (procent, RTF, ETA) w postaci słownika z progress.ProgressReporter.
+                Opcja cancel_token (jobs.CancellationToken) pozwala przerwać zadanie - silnik rzuca
+                wtedy JobCancelledError zamiast zwracać komunikat błędu.
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik z kluczami 'text', 'segments',
+                'language', komunikat_błędu)
+        """
+
+    def transcribe_multi(self, audio_file_path: str, outputs: List[Dict[str, Optional[str]]],
+                         **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Kilka wyjść jednego nagrania (np. transkrypcja i tłumaczenie na angielski).
+
+        Silniki z supports_multi_output liczą je w jednym zadaniu; pozostałe - osobnym przebiegiem
+        na każde wyjście. Segmenty w trakcie dekodowania (segment_callback) dotyczą tylko pierwszego wyjścia.
+
+        Args:
+            audio_file_path: Ścieżka do pliku audio
+            outputs: Lista wyjść {'task': "transcribe"/"translate", 'language': kod lub None}; pierwsze jest główne
+            **options: Jak w transcribe_segments
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik pierwszego wyjścia z kluczem
+                'additional_outputs' - lista wyników pozostałych, komunikat_błędu)
+        """
+        primary, extra = outputs[0], outputs[1:]
+        if self.supports_multi_output:
+            return self.transcribe_segments(audio_file_path, language=primary.get("language"), task=primary.get("task", "transcribe"),
+                                            additional_outputs=extra, **options)
+        result, error_msg = self.transcribe_segments(audio_file_path, language=primary.get("language"),
+                                                     task=primary.get("task", "transcribe"), **options)
+        if error_msg:
+            return None, error_msg
+        extra_options = {key: value for key, value in options.items() if key != "segment_callback"}
+        additional = []
+        for output in extra:
+            extra_result, error_msg = self.transcribe_segments(audio_file_path, language=output.get("language"),
+                                                               task=output.get("task", "transcribe"), **extra_options)
+            if error_msg:
+                return None, error_msg
+            additional.append({**extra_result, "task": output.get("task", "transcribe")})
+        return {**result, "additional_outputs": additional}, None
+
+    def transcribe(self, audio_file_path: str, language: Optional[str] = None,
+                   **options: Any) -> Tuple[Optional[str], Optional[str]]:
+        """Transkrypcja w języku nagrania. Zwraca (tekst, komunikat_błędu)."""
+        result, error_msg = self.transcribe_segments(audio_file_path, language=language, task="transcribe", **options)
+        return (None, error_msg) if error_msg else (result["text"], None)
+
+    def translate(self, audio_file_path: str, **options: Any) -> Tuple[Optional[str], Optional[str]]:
+        """Tłumaczenie mowy na język angielski. Zwraca (tekst, komunikat_błędu)."""
+        result, error_msg = self.transcribe_segments(audio_file_path, task="translate", **options)
+        return (None, error_msg) if error_msg else (result["text"], None)
+
+
+def register_engine(engine_cls: Type[STTEngine]) -> Type[STTEngine]:
+    """Dekorator rejestrujący klasę silnika pod jej nazwą."""
+    if not engine_cls.name:
+        raise ValueError(f"Silnik {engine_cls.__name__} nie ma ustawionej nazwy (atrybut 'name')")
+    if engine_cls.name in _ENGINE_REGISTRY and _ENGINE_REGISTRY[engine_cls.name] is not engine_cls:
+        logger.warning(f"Silnik '{engine_cls.name}' jest już zarejestrowany - zostanie nadpisany przez {engine_cls.__name__}")
+    _ENGINE_REGISTRY[engine_cls.name] = engine_cls
+    return engine_cls
+
+
+def discover_engines() -> None:
+    """Importuje wszystkie moduły modules/*_engine.py, aby zarejestrowały swoje silniki."""
+    global _engines_discovered
+    if _engines_discovered:
+        return
+    _engines_discovered = True
+
+    import modules
+    for module_info in pkgutil.iter_modules(modules.__path__):
+        if not module_info.name.endswith(ENGINE_MODULE_SUFFIX):
+            continue
+        try:
+            importlib.import_module(f"modules.{module_info.name}")
+            logger.info(f"Załadowano moduł silnika: {module_info.name}")
+        except Exception as e:
+            logger.warning(f"Nie można załadować modułu silnika {module_info.name}: {e}")
+
+
+def get_registered_engines() -> List[Type[STTEngine]]:
+    """Zwraca klasy wszystkich zarejestrowanych silników w kolejności wyświetlania."""
+    discover_engines()
+    return sorted(_ENGINE_REGISTRY.values(), key=lambda cls: (cls.order, cls.display_name))
+
+
+def create_engine(name: str) -> Optional[STTEngine]:
+    """Tworzy instancję silnika o podanej nazwie (None, jeśli taki silnik nie istnieje)."""
+    discover_engines()
+    engine_cls = _ENGINE_REGISTRY.get(name)
+    if engine_cls is None:
+        logger.error(f"Nieznany silnik transkrypcji: {name}")
+        return None
+    return engine_cls()
+
+
+@register_engine
+class LocalWhisperEngine(STTEngine):
+    """Lokalny Whisper (openai-whisper, PyTorch)."""
+
+    name = "local"
+    display_name = "Lokalna (Whisper)"
+    action_label = "Transkrybuj Lokalnie"
+    supports_models = True
+    default_model = "turbo"
+    order = 10
+    # Inferencja w procesie roboczym (modules/inference_worker.py); opcja in_process=True wymusza bieżący proces
+    out_of_process = True
+    supports_multi_output = True
+
+    def is_available(self) -> bool:
+        try:
+            from modules import local_stt
+        except ImportError:
+            return False
+        return local_stt.WHISPER_INSTALLED
+
+    def get_models(self) -> List[str]:
+        from modules import local_stt
+        return local_stt.get_available_models() or local_stt.AVAILABLE_WHISPER_MODELS
+
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        from modules.local_stt import DEFAULT_PRECISION, transcribe_audio_local_segments
+        arguments = {
+            "audio_file_path": audio_file_path,
+            "model_name": options.get("model_name") or self.default_model,
+            "language": language,
+            "task": task,
+            "precision": options.get("precision", DEFAULT_PRECISION),
+            "thread_settings": options.get("thread_settings"),
+            "streaming": options.get("streaming"),
+            "additional_outputs": options.get("additional_outputs"),
+            "decoding": options.get("decoding"),
+            "initial_prompt": options.get("initial_prompt"),
+        }
+        callbacks = {
+            "segment_callback": options.get("segment_callback"),
+            "progress_callback": options.get("progress_callback"),
+            "cancel_token": options.get("cancel_token"),
+        }
+        if options.get("in_process", not self.out_of_process):
+            return transcribe_audio_local_segments(**arguments, **callbacks)
+        # Domyślnie w osobnym procesie: inferencja nie blokuje GIL okna, a awaria modelu nie zamyka aplikacji
+        from modules.inference_worker import get_inference_worker
+        from modules.resource_governor import PRIORITY_INTERACTIVE
+        return get_inference_worker(options.get("priority", PRIORITY_INTERACTIVE)).run("transcribe", **callbacks, **arguments)
+
+
+@register_engine
+class OpenAIEngine(STTEngine):
+    """Whisper w chmurze przez API OpenAI."""
+
+    name = "openai"
+    display_name = "Online (OpenAI API)"
+    action_label = "Transkrybuj przez OpenAI"
+    order = 50
+
+    def __init__(self) -> None:
+        self.client = None
+        try:
+            from modules.openai_whisper_client import OpenAIWhisperClient
+            self.client = OpenAIWhisperClient()
+            self.client.debug_mode = True
+        except ImportError as e:
+            logger.warning(f"Klient OpenAI Whisper jest niedostępny: {e}")
+
+    def is_available(self) -> bool:
+        return self.client is not None
+
+    def configure(self, **settings: Any) -> None:
+        if self.client is not None and settings.get("api_key"):
+            self.client.update_api_key(settings["api_key"])
+
+    def transcribe_segments(self, audio_file_path: str, language: Optional[str] = None, task: str = "transcribe",
+                            **options: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        if self.client is None:
+            return None, "Klient OpenAI Whisper jest niedostępny (brak biblioteki requests)."
+        return self.client.transcribe_audio_segments(audio_file_path, language=language, task=task,
+                                                     progress_callback=options.get("progress_callback"),
+                                                     cancel_token=options.get("cancel_token"),
+                                                     prompt=options.get("initial_prompt"))
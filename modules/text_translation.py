@@ -0,0 +1,340 @@
+# X:\Aplikacje\dictaitor\modules\text_translation.py
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from transformers import MarianMTModel, MarianTokenizer
+    TRANSFORMERS_INSTALLED = True
+except ImportError:
+    TRANSFORMERS_INSTALLED = False
+    logger.info("Biblioteka transformers nie jest zainstalowana - tłumaczenie tekstu jest niedostępne.")
+
+try:
+    import ctranslate2
+    CTRANSLATE2_INSTALLED = True
+except ImportError:
+    CTRANSLATE2_INSTALLED = False
+
+TRANSLATION_AVAILABLE = TRANSFORMERS_INSTALLED
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MT_MODELS_DIR = os.path.join(APP_DIR, "models_cache", "mt")
+TRANSLATION_CACHE_PATH = os.path.join(APP_DIR, "models_cache", "translations.sqlite3")
+
+# Modele MarianMT (OPUS-MT) próbowane po kolei dla pary języków; bez bezpośredniej pary tłumaczymy przez angielski
+MODEL_NAME_PATTERNS = ["Helsinki-NLP/opus-mt-{source}-{target}", "Helsinki-NLP/opus-mt-tc-big-{source}-{target}"]
+PIVOT_LANGUAGE = "en"
+# Ile modeli tłumaczenia trzymamy w pamięci między zadaniami (jak local_stt.MAX_RESIDENT_MODELS)
+MAX_RESIDENT_TRANSLATORS = 2
+BATCH_SIZE = 16
+BEAM_SIZE = 4
+# Segmenty Whispera są łączone w zdania; dłuższe fragmenty bez kropki są dzielone na tej długości
+MAX_SENTENCE_CHARS = 400
+SENTENCE_END = re.compile(r"[.!?…。！？]['\")\]]*$")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+# API OpenAI podaje język nazwą ("german"), Whisper lokalny - kodem; bez pakietu whisper wystarczą języki z interfejsu
+LANGUAGE_NAME_CODES = {"english": "en", "polish": "pl", "german": "de", "french": "fr", "spanish": "es", "italian": "it", "russian": "ru"}
+# Najwięcej tylu przetłumaczonych zdań w pamięci podręcznej - najdawniej używane są usuwane
+MAX_CACHE_ENTRIES = 200_000
+
+
+class TranslationCache:
+    """
+    Trwała pamięć podręczna przetłumaczonych zdań (SQLite), kluczowana modelem i tekstem źródłowym.
+
+    Powtarzające się zdania (zwroty grzecznościowe, formułki, ponownie transkrybowane nagranie)
+    nie trafiają do modelu drugi raz - także po ponownym uruchomieniu aplikacji.
+    """
+
+    def __init__(self, path: str = TRANSLATION_CACHE_PATH, max_entries: int = MAX_CACHE_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            connection.execute("CREATE TABLE IF NOT EXISTS translations (model TEXT NOT NULL, source TEXT NOT NULL, "
+                               "target TEXT NOT NULL, used REAL NOT NULL, PRIMARY KEY (model, source))")
+            self._initialized = True
+        return connection
+
+    def get_many(self, model: str, sources: List[str]) -> Dict[str, str]:
+        """Znane tłumaczenia podanych zdań (brakujące są pomijane)."""
+        found: Dict[str, str] = {}
+        if not sources:
+            return found
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                connection = self._connect()
+                try:
+                    # SQLite ogranicza liczbę parametrów zapytania - pytamy porcjami
+                    for start in range(0, len(sources), 500):
+                        chunk = sources[start:start + 500]
+                        placeholders = ",".join("?" * len(chunk))
+                        rows = connection.execute(f"SELECT source, target FROM translations WHERE model = ? AND source IN ({placeholders})",
+                                                  [model, *chunk]).fetchall()
+                        found.update(rows)
+                    if found:
+                        connection.executemany("UPDATE translations SET used = ? WHERE model = ? AND source = ?",
+                                               [(time.time(), model, source) for source in found])
+                        connection.commit()
+                finally:
+                    connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Nie można odczytać pamięci podręcznej tłumaczeń: {e}")
+        return found
+
+    def put_many(self, model: str, translations: Dict[str, str]) -> None:
+        if not translations:
+            return
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                connection = self._connect()
+                try:
+                    now = time.time()
+                    connection.executemany("INSERT OR REPLACE INTO translations (model, source, target, used) VALUES (?, ?, ?, ?)",
+                                           [(model, source, target, now) for source, target in translations.items()])
+                    count = connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                    if count > self.max_entries:
+                        connection.execute("DELETE FROM translations WHERE rowid IN "
+                                           "(SELECT rowid FROM translations ORDER BY used LIMIT ?)", (count - self.max_entries,))
+                    connection.commit()
+                finally:
+                    connection.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Nie można zapisać pamięci podręcznej tłumaczeń: {e}")
+
+
+class MarianTranslator:
+    """
+    Model MarianMT na CPU: przez CTranslate2 (int8, zwykle kilka razy szybciej), jeśli jest
+    zainstalowany, a w przeciwnym razie przez transformers/PyTorch. Model CTranslate2 jest
+    przygotowywany raz i zapisywany w models_cache/mt.
+    """
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+        self.tokenizer = MarianTokenizer.from_pretrained(model_name)
+        self._translator = None
+        self._model = None
+        if CTRANSLATE2_INSTALLED:
+            self._translator = self._load_ctranslate2(model_name)
+        if self._translator is None:
+            self._model = MarianMTModel.from_pretrained(model_name)
+            self._model.eval()
+        self.backend = "ctranslate2" if self._translator is not None else "transformers"
+
+    @staticmethod
+    def _load_ctranslate2(model_name: str):
+        model_dir = os.path.join(MT_MODELS_DIR, model_name.replace("/", "--") + "-ct2-int8")
+        try:
+            if not os.path.exists(os.path.join(model_dir, "model.bin")):
+                logger.info(f"Konwersja modelu tłumaczenia {model_name} do formatu CTranslate2 (jednorazowo)...")
+                ctranslate2.converters.TransformersConverter(model_name).convert(model_dir, quantization="int8", force=True)
+            return ctranslate2.Translator(model_dir, device="cpu", compute_type="int8")
+        except Exception as e:
+            logger.warning(f"Nie można użyć CTranslate2 dla {model_name} ({e}) - tłumaczenie przez transformers.")
+            return None
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        if self._translator is not None:
+            tokens = [self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text)) for text in texts]
+            results = self._translator.translate_batch(tokens, beam_size=BEAM_SIZE, max_batch_size=BATCH_SIZE)
+            return [self.tokenizer.decode(self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+                    for result in results]
+        import torch
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            generated = self._model.generate(**inputs, num_beams=BEAM_SIZE)
+        return self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+
+_translators: "OrderedDict[str, MarianTranslator]" = OrderedDict()
+# Modele, których nie udało się pobrać (np. para języków bez modelu) - nie próbujemy ich ponownie w tym procesie
+_missing_models: set = set()
+_translators_lock = threading.Lock()
+_cache: Optional[TranslationCache] = None
+
+
+def _get_cache() -> TranslationCache:
+    global _cache
+    if _cache is None:
+        _cache = TranslationCache()
+    return _cache
+
+
+def _get_translator(source_language: str, target_language: str) -> Optional[MarianTranslator]:
+    """Model dla pary języków - załadowany wcześniej zostaje w pamięci między zadaniami."""
+    with _translators_lock:
+        for pattern in MODEL_NAME_PATTERNS:
+            model_name = pattern.format(source=source_language, target=target_language)
+            if model_name in _translators:
+                _translators.move_to_end(model_name)
+                return _translators[model_name]
+            if model_name in _missing_models:
+                continue
+            start = time.perf_counter()
+            try:
+                translator = MarianTranslator(model_name)
+            except (OSError, ValueError) as e:
+                logger.info(f"Model tłumaczenia {model_name} jest niedostępny: {e}")
+                _missing_models.add(model_name)
+                continue
+            logger.info(f"Załadowano model tłumaczenia {model_name} ({translator.backend}) w {time.perf_counter() - start:.1f} s")
+            _translators[model_name] = translator
+            while len(_translators) > MAX_RESIDENT_TRANSLATORS:
+                evicted, _ = _translators.popitem(last=False)
+                logger.info(f"Zwolniono model tłumaczenia {evicted}")
+            return translator
+    return None
+
+
+def _translation_route(source_language: str, target_language: str) -> Optional[List[MarianTranslator]]:
+    """Modele do przejścia od języka źródłowego do docelowego (bezpośrednio lub przez angielski)."""
+    direct = _get_translator(source_language, target_language)
+    if direct is not None:
+        return [direct]
+    if PIVOT_LANGUAGE in (source_language, target_language):
+        return None
+    first = _get_translator(source_language, PIVOT_LANGUAGE)
+    second = _get_translator(PIVOT_LANGUAGE, target_language) if first is not None else None
+    return [first, second] if second is not None else None
+
+
+def _translate_with_cache(translator: MarianTranslator, texts: List[str], stats: Dict[str, int], cancel_token=None,
+                          progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[str]:
+    cache = _get_cache()
+    unique = list(dict.fromkeys(texts))
+    known = cache.get_many(translator.model_name, unique)
+    missing = [text for text in unique if text not in known]
+    # Zdania z pamięci podręcznej i powtórzenia w tym samym tekście nie trafiają do modelu
+    stats["cached"] += len(texts) - len(missing)
+    # Zdania o podobnej długości w jednej partii - mniej dopełnienia w wsadzie
+    missing.sort(key=len)
+    for start in range(0, len(missing), BATCH_SIZE):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        batch = missing[start:start + BATCH_SIZE]
+        translated = dict(zip(batch, translator.translate_batch(batch)))
+        cache.put_many(translator.model_name, translated)
+        known.update(translated)
+        if progress_callback is not None:
+            progress_callback({"fraction": min(1.0, (start + len(batch)) / len(missing))})
+    stats["translated"] += len(missing)
+    return [known[text] for text in texts]
+
+
+def translate_texts(texts: List[str], source_language: str, target_language: str, cancel_token=None,
+                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[Optional[List[str]], Optional[str], Dict[str, Any]]:
+    """
+    Tłumaczy listę zdań wsadowo, z trwałą pamięcią podręczną.
+
+    Returns:
+        Tuple[Optional[List[str]], Optional[str], Dict[str, Any]]: (tłumaczenia w tej samej kolejności,
+            komunikat_błędu, statystyki: modele, liczba zdań z pamięci podręcznej i przetłumaczonych)
+    """
+    stats: Dict[str, Any] = {"cached": 0, "translated": 0, "models": []}
+    if not TRANSLATION_AVAILABLE:
+        return None, "Tłumaczenie tekstu wymaga bibliotek transformers i sentencepiece (pip install transformers sentencepiece).", stats
+    route = _translation_route(source_language, target_language)
+    if route is None:
+        return None, f"Brak modelu tłumaczenia {source_language} → {target_language} (OPUS-MT).", stats
+    stats["models"] = [translator.model_name for translator in route]
+    for translator in route:
+        # Przy tłumaczeniu przez angielski liczy się trafienie w pamięci podręcznej ostatniego etapu
+        stats["cached"] = 0
+        texts = _translate_with_cache(translator, texts, stats, cancel_token, progress_callback)
+    return texts, None, stats
+
+
+def language_code(language: Optional[str]) -> Optional[str]:
+    """Kod języka (np. "de") z kodu lub nazwy zwracanej przez silnik."""
+    if not language or len(language) <= 3:
+        return language.lower() if language else None
+    name = language.lower()
+    try:
+        from whisper.tokenizer import TO_LANGUAGE_CODE
+        return TO_LANGUAGE_CODE.get(name) or LANGUAGE_NAME_CODES.get(name)
+    except ImportError:
+        return LANGUAGE_NAME_CODES.get(name)
+
+
+def _sentence_groups(segments: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Łączy kolejne segmenty w zdania (do kropki, zmiany mówcy lub limitu długości)."""
+    groups: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    length = 0
+    for segment in segments:
+        text = segment.get("text", "").strip()
+        if not text:
+            continue
+        if current and (current[-1].get("speaker") != segment.get("speaker") or length + len(text) > MAX_SENTENCE_CHARS):
+            groups.append(current)
+            current, length = [], 0
+        current.append(segment)
+        length += len(text) + 1
+        if SENTENCE_END.search(text):
+            groups.append(current)
+            current, length = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def translate_result(result: Dict[str, Any], target_language: str, source_language: Optional[str] = None, cancel_token=None,
+                     progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Tłumaczy wynik transkrypcji na język docelowy zdanie po zdaniu.
+
+    Segmenty są łączone w zdania, a każde zdanie staje się jednym segmentem wyniku (czas od początku
+    pierwszego do końca ostatniego segmentu zdania). Wynik bez segmentów jest dzielony na zdania po
+    interpunkcji. Tekst już w języku docelowym jest zwracany bez zmian.
+
+    Args:
+        source_language: Język nagrania; domyślnie język wykryty przez silnik (result['language'])
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: (wynik z kluczem 'translation' - statystyki, komunikat_błędu)
+    """
+    source_language = language_code(source_language or result.get("language"))
+    if not source_language:
+        return None, "Nie znamy języka nagrania - wskaż go w polu języka, aby przetłumaczyć tekst."
+    if source_language == target_language:
+        return result, None
+
+    start = time.perf_counter()
+    groups = _sentence_groups(result.get("segments") or [])
+    if groups:
+        sources = [" ".join(segment["text"].strip() for segment in group) for group in groups]
+    else:
+        sources = [sentence for sentence in SENTENCE_SPLIT.split(result.get("text", "").strip()) if sentence]
+    if not sources:
+        return result, None
+    translations, error_msg, stats = translate_texts(sources, source_language, target_language, cancel_token, progress_callback)
+    if error_msg:
+        return None, error_msg
+
+    translated = {**result, "language": target_language, "text": " ".join(translations)}
+    if groups:
+        # Miary pewności Whispera (avg_logprob itp.) nie dotyczą tłumaczenia - zostają tylko czasy i mówca
+        translated["segments"] = [{**{key: group[0][key] for key in ("start", "speaker") if key in group[0]},
+                                   "end": group[-1].get("end"), "text": " " + text}
+                                  for group, text in zip(groups, translations)]
+    elapsed = time.perf_counter() - start
+    translated["translation"] = {"source": source_language, "target": target_language, "sentences": len(sources),
+                                 "cached": stats["cached"], "models": stats["models"], "seconds": round(elapsed, 2)}
+    logger.info(f"Tłumaczenie {source_language} → {target_language}: {len(sources)} zdań "
+                f"({stats['cached']} z pamięci podręcznej) w {elapsed:.1f} s")
+    return translated, None
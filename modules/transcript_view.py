@@ -0,0 +1,102 @@
+# X:\Aplikacje\dictaitor\modules\transcript_view.py
+import logging
+import tkinter.font as tkfont
+from typing import List, Tuple
+
+import customtkinter as ctk
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualTranscriptView(ctk.CTkFrame):
+    """
+    Podgląd bardzo długich transkrypcji.
+
+    Przechowuje wszystkie linie w pamięci, ale w polu tekstowym renderuje tylko te, które mieszczą
+    się w oknie. Koszt przewijania i dopisywania nie zależy więc od długości transkrypcji.
+    """
+
+    SCROLL_STEP_LINES = 3
+
+    def __init__(self, master, font: Tuple[str, int] = ("Arial", 12), **kwargs) -> None:
+        super().__init__(master, **kwargs)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self._lines: List[str] = []
+        self._first_line = 0
+        self._render_pending = False
+        self._line_height = max(1, tkfont.Font(family=font[0], size=font[1]).metrics("linespace"))
+
+        self._textbox = ctk.CTkTextbox(self, wrap="word", font=font, activate_scrollbars=False, state="disabled")
+        self._textbox.grid(row=0, column=0, sticky="nsew")
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self._textbox.bind("<Configure>", lambda event: self._schedule_render())
+        # Windows/macOS przekazują delta, X11 - osobne przyciski 4/5
+        self._textbox.bind("<MouseWheel>", self._on_mouse_wheel)
+        self._textbox.bind("<Button-4>", lambda event: self._scroll_by(-self.SCROLL_STEP_LINES))
+        self._textbox.bind("<Button-5>", lambda event: self._scroll_by(self.SCROLL_STEP_LINES))
+
+    def set_lines(self, lines: List[str]) -> None:
+        """Zastępuje całą zawartość i przewija na początek."""
+        self._lines = list(lines)
+        self._first_line = 0
+        self._schedule_render()
+
+    def append_lines(self, lines: List[str]) -> None:
+        """Dopisuje linie; jeśli widok był przewinięty na koniec, podąża za nowym tekstem."""
+        at_bottom = self._first_line + self._visible_line_count() >= len(self._lines)
+        self._lines.extend(lines)
+        if at_bottom:
+            self._first_line = max(0, len(self._lines) - self._visible_line_count())
+        self._schedule_render()
+
+    def clear(self) -> None:
+        self.set_lines([])
+
+    def get_text(self) -> str:
+        return "\n".join(self._lines)
+
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    def _visible_line_count(self) -> int:
+        return max(1, self._textbox.winfo_height() // self._line_height + 1)
+
+    def _schedule_render(self) -> None:
+        # Kilka zmian w jednej iteracji pętli zdarzeń daje jedno renderowanie
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _render(self) -> None:
+        self._render_pending = False
+        visible = self._visible_line_count()
+        self._first_line = max(0, min(self._first_line, len(self._lines) - visible))
+        last_line = min(len(self._lines), self._first_line + visible)
+
+        self._textbox.configure(state="normal")
+        self._textbox.delete("1.0", "end")
+        self._textbox.insert("1.0", "\n".join(self._lines[self._first_line:last_line]))
+        self._textbox.configure(state="disabled")
+
+        total = max(1, len(self._lines))
+        self._scrollbar.set(self._first_line / total, last_line / total if self._lines else 1.0)
+
+    def _scroll_by(self, lines: int) -> None:
+        self._first_line = max(0, self._first_line + lines)
+        self._schedule_render()
+
+    def _on_mouse_wheel(self, event) -> str:
+        self._scroll_by(-self.SCROLL_STEP_LINES if event.delta > 0 else self.SCROLL_STEP_LINES)
+        return "break"
+
+    def _on_scrollbar(self, action: str, value: str, unit: str = "") -> None:
+        if action == "moveto":
+            self._first_line = int(float(value) * len(self._lines))
+        elif action == "scroll":
+            step = self._visible_line_count() if unit == "pages" else 1
+            self._first_line = max(0, self._first_line + int(value) * step)
+        self._schedule_render()
@@ -0,0 +1,257 @@
+# X:\Aplikacje\dictaitor\modules\vocabulary.py
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.config_manager import CONFIG_DIR, ensure_config_dir_exists
+
+logger = logging.getLogger(__name__)
+
+# Słownik poprawek prowadzony przez użytkownika - zwykły plik tekstowy, jedna reguła w wierszu
+VOCABULARY_FILE_PATH = os.path.join(CONFIG_DIR, "vocabulary.txt")
+RULE_SEPARATORS = ("=>", "->")
+ALTERNATIVES_SEPARATOR = "|"
+COMMENT_PREFIX = "#"
+# Whisper bierze pod uwagę tylko ostatnie ~220 tokenów podpowiedzi; zostawiamy miejsce na kontekst poprzedniego tekstu
+PROMPT_MAX_CHARS = 400
+
+VOCABULARY_TEMPLATE = """# Słownik poprawek DictAItor - jedna reguła w wierszu, wiersze z # są pomijane.
+#
+#   pie torch => PyTorch            zamiana (wielkość liter we wzorcu nie ma znaczenia)
+#   kubernetis | kuber netis => Kubernetes   kilka błędnych wariantów jednego terminu
+#   DictAItor                       sama poprawna forma: poprawia wielkość liter
+#
+# Poprawne formy trafiają też do podpowiedzi (initial_prompt) dla Whispera.
+"""
+
+
+def _lower_aligned(text: str) -> str:
+    """Małe litery znak po znaku - wynik ma tę samą długość co tekst, więc pozycje dopasowań się zgadzają."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # Rzadkie znaki (np. "İ") zmieniają długość po lower() - zostawiamy je bez zmian
+    return "".join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def parse_vocabulary(text: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Zamienia treść pliku słownika na listę reguł (wzorzec, zamiana).
+
+    Returns:
+        Tuple[List[Tuple[str, str]], List[str]]: (reguły, ostrzeżenia o pominiętych wierszach)
+    """
+    rules: Dict[str, Tuple[str, str]] = {}
+    warnings = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith(COMMENT_PREFIX):
+            continue
+        separator = next((sep for sep in RULE_SEPARATORS if sep in line), None)
+        if separator:
+            patterns_part, replacement = (part.strip() for part in line.split(separator, 1))
+            patterns = [pattern.strip() for pattern in patterns_part.split(ALTERNATIVES_SEPARATOR)]
+        else:
+            # Sama poprawna forma - poprawka wielkości liter
+            replacement, patterns = line, [line]
+        if not replacement or not any(patterns):
+            warnings.append(f"wiersz {line_number}: brak wzorca lub zamiany")
+            continue
+        for pattern in filter(None, patterns):
+            key = _lower_aligned(pattern)
+            if key in rules and rules[key][1] != replacement:
+                warnings.append(f"wiersz {line_number}: '{pattern}' zdefiniowano ponownie - obowiązuje ostatnia reguła")
+            rules[key] = (pattern, replacement)
+    return list(rules.values()), warnings
+
+
+class Vocabulary:
+    """
+    Słownik poprawek stosowany do gotowego tekstu jednym przebiegiem automatu Aho-Corasick.
+
+    Wszystkie wzorce (nawet tysiące) są wkompilowane w jeden automat, więc koszt zależy od długości
+    tekstu, a nie od liczby reguł. Dopasowanie nie rozróżnia wielkości liter i obejmuje tylko całe
+    słowa; z nakładających się dopasowań wygrywa najwcześniejsze, a przy tym samym początku najdłuższe.
+    """
+
+    def __init__(self, rules: List[Tuple[str, str]]) -> None:
+        self.rules = rules
+        self._patterns = [_lower_aligned(pattern) for pattern, _ in rules]
+        self._replacements = [replacement for _, replacement in rules]
+        self._build_automaton()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _build_automaton(self) -> None:
+        # Stany: przejścia (znak -> stan), wskaźnik porażki i dopasowania kończące się w stanie
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for index, pattern in enumerate(self._patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Wskaźniki porażki wyznaczane wszerz; stan dziedziczy dopasowania swojego stanu porażki
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _find_matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """Dopasowania całych słów: lista (początek, koniec, indeks_reguły), bez nakładania się."""
+        lowered = _lower_aligned(text)
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self._patterns
+        best_at_start: Dict[int, Tuple[int, int]] = {}
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            end = position + 1
+            for index in output[state]:
+                start = end - len(patterns[index])
+                # Granice słów sprawdzamy tylko tam, gdzie wzorzec zaczyna/kończy się literą lub cyfrą
+                if start > 0 and _is_word_char(patterns[index][0]) and _is_word_char(lowered[start - 1]):
+                    continue
+                if end < len(lowered) and _is_word_char(patterns[index][-1]) and _is_word_char(lowered[end]):
+                    continue
+                current = best_at_start.get(start)
+                if current is None or end > current[0]:
+                    best_at_start[start] = (end, index)
+
+        matches = []
+        covered_until = 0
+        for start in sorted(best_at_start):
+            if start < covered_until:
+                continue
+            end, index = best_at_start[start]
+            matches.append((start, end, index))
+            covered_until = end
+        return matches
+
+    def replace(self, text: str) -> Tuple[str, int]:
+        """
+        Stosuje reguły do tekstu.
+
+        Returns:
+            Tuple[str, int]: (poprawiony_tekst, liczba_zmienionych_miejsc)
+        """
+        if not self.rules or not text:
+            return text, 0
+        parts = []
+        last = 0
+        changed = 0
+        for start, end, index in self._find_matches(text):
+            replacement = self._replacements[index]
+            if text[start:end] != replacement:
+                changed += 1
+            parts.append(text[last:start])
+            parts.append(replacement)
+            last = end
+        parts.append(text[last:])
+        return "".join(parts), changed
+
+    def apply_to_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Poprawia tekst, segmenty i dodatkowe wyjścia wyniku transkrypcji (zwraca nowy słownik)."""
+        start = time.perf_counter()
+        text, changed = self.replace(result.get("text") or "")
+        corrected = {**result, "text": text}
+        if result.get("segments"):
+            corrected["segments"] = [{**segment, "text": self.replace(segment.get("text", ""))[0]} for segment in result["segments"]]
+        if result.get("additional_outputs"):
+            corrected["additional_outputs"] = [{**extra, "text": self.replace(extra.get("text", ""))[0]}
+                                               for extra in result["additional_outputs"]]
+        if changed:
+            logger.info(f"Słownik poprawek: {changed} zmian w {len(text)} znakach ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return corrected
+
+    def prompt(self, max_chars: int = PROMPT_MAX_CHARS) -> Optional[str]:
+        """Poprawne formy terminów (w kolejności z pliku) jako podpowiedź dla Whispera, lub None dla pustego słownika."""
+        terms = []
+        length = 0
+        for replacement in dict.fromkeys(self._replacements):
+            if length + len(replacement) + 2 > max_chars:
+                break
+            terms.append(replacement)
+            length += len(replacement) + 2
+        return ", ".join(terms) + "." if terms else None
+
+
+_vocabulary: Optional[Vocabulary] = None
+_vocabulary_mtime: Optional[float] = None
+_vocabulary_lock = threading.Lock()
+
+
+def load_vocabulary_text() -> str:
+    """Treść pliku słownika (szablon z przykładami, jeśli pliku jeszcze nie ma)."""
+    if not os.path.exists(VOCABULARY_FILE_PATH):
+        return VOCABULARY_TEMPLATE
+    try:
+        with open(VOCABULARY_FILE_PATH, "r", encoding="utf-8") as f:
+            return f.read()
+    except (IOError, UnicodeDecodeError) as e:
+        logger.error(f"Błąd podczas wczytywania słownika poprawek z {VOCABULARY_FILE_PATH}: {e}")
+        return ""
+
+
+def save_vocabulary_text(text: str) -> Tuple[bool, List[str]]:
+    """
+    Zapisuje treść słownika.
+
+    Returns:
+        Tuple[bool, List[str]]: (czy zapisano, ostrzeżenia o pominiętych wierszach)
+    """
+    _, warnings = parse_vocabulary(text)
+    try:
+        ensure_config_dir_exists()
+        with open(VOCABULARY_FILE_PATH, "w", encoding="utf-8") as f:
+            f.write(text)
+        return True, warnings
+    except IOError as e:
+        logger.error(f"Błąd podczas zapisywania słownika poprawek do {VOCABULARY_FILE_PATH}: {e}")
+        return False, warnings
+
+
+def get_vocabulary() -> Vocabulary:
+    """Zwraca słownik z pliku; automat jest budowany ponownie tylko po zmianie pliku."""
+    global _vocabulary, _vocabulary_mtime
+    with _vocabulary_lock:
+        try:
+            mtime = os.path.getmtime(VOCABULARY_FILE_PATH)
+        except OSError:
+            mtime = None
+        if _vocabulary is None or mtime != _vocabulary_mtime:
+            start = time.perf_counter()
+            rules, warnings = parse_vocabulary(load_vocabulary_text() if mtime is not None else "")
+            for warning in warnings:
+                logger.warning(f"Słownik poprawek, {warning}")
+            _vocabulary = Vocabulary(rules)
+            _vocabulary_mtime = mtime
+            if rules:
+                logger.info(f"Słownik poprawek: {len(rules)} reguł skompilowanych w {(time.perf_counter() - start) * 1000:.0f} ms")
+        return _vocabulary
@@ -0,0 +1,152 @@
+# X:\Aplikacje\dictaitor\modules\weight_cache.py
+import os
+import json
+import time
+import logging
+from typing import Optional
+
+from modules.benchmark import get_benchmark_result, save_benchmark_result
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEIGHTS_CACHE_DIR = os.path.join(APP_DIR, "models_cache", "safetensors")
+
+try:
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+    from safetensors.torch import load_file, save_file
+    WEIGHT_CACHE_AVAILABLE = True
+except ImportError as e:
+    WEIGHT_CACHE_AVAILABLE = False
+    logger.info(f"Cache wag safetensors jest niedostępny (brak biblioteki: {e}). Modele będą ładowane standardowo.")
+
+
+def _cache_path(model_name: str) -> str:
+    return os.path.join(WEIGHTS_CACHE_DIR, f"{model_name}.safetensors")
+
+
+def convert_model(model, model_name: str) -> Optional[str]:
+    """
+    Zapisuje wagi załadowanego modelu Whisper do pliku safetensors.
+
+    Wagi są zapisywane w fp32 i jako ciągłe bloki, dzięki czemu przy ładowaniu można je
+    bezpośrednio zmapować z pliku do pamięci - bez kopiowania i rzutowania typów.
+
+    Args:
+        model: Model Whisper załadowany na CPU
+        model_name: Nazwa modelu (np. "turbo")
+
+    Returns:
+        Optional[str]: Ścieżka do pliku safetensors lub None przy błędzie
+    """
+    if not WEIGHT_CACHE_AVAILABLE:
+        return None
+
+    cache_path = _cache_path(model_name)
+    try:
+        logger.info(f"Konwersja modelu '{model_name}' do formatu safetensors (jednorazowo)...")
+        start = time.perf_counter()
+        state_dict = {name: tensor.detach().float().contiguous() for name, tensor in model.state_dict().items()}
+        metadata = {"dims": json.dumps(vars(model.dims))}
+        alignment_heads = whisper._ALIGNMENT_HEADS.get(model_name)
+        if alignment_heads:
+            metadata["alignment_heads"] = alignment_heads.decode("ascii")
+
+        os.makedirs(WEIGHTS_CACHE_DIR, exist_ok=True)
+        # Zapis do pliku tymczasowego, żeby przerwana konwersja nie zostawiła uszkodzonego cache
+        temp_path = cache_path + ".tmp"
+        save_file(state_dict, temp_path, metadata=metadata)
+        os.replace(temp_path, cache_path)
+        logger.info(f"Model '{model_name}' skonwertowany w {time.perf_counter() - start:.1f} s: {cache_path}")
+        return cache_path
+    except Exception as e:
+        logger.error(f"Nie udało się skonwertować modelu '{model_name}': {e}")
+        return None
+
+
+def _read_metadata(cache_path: str) -> dict:
+    from safetensors import safe_open
+    with safe_open(cache_path, framework="pt") as f:
+        return f.metadata() or {}
+
+
+def load_mmap_model(model_name: str):
+    """
+    Ładuje model Whisper z pliku safetensors mapowanego do pamięci.
+
+    Przy pierwszym wywołaniu model jest ładowany standardowo (whisper.load_model, czas jest
+    mierzony dla porównania) i zapisywany do cache. Kolejne ładowania korzystają z mmap:
+    wagi nie są kopiowane, a kilka procesów na jednej maszynie współdzieli te same strony
+    pamięci podręcznej systemu.
+
+    Args:
+        model_name: Nazwa modelu Whisper
+
+    Returns:
+        Model Whisper na CPU lub None, jeśli cache nie może być użyty
+    """
+    if not WEIGHT_CACHE_AVAILABLE:
+        return None
+
+    cache_path = _cache_path(model_name)
+    if not os.path.exists(cache_path):
+        # Pierwsze ładowanie: standardowa ścieżka (pomiar "przed"), a potem zapis cache na kolejne uruchomienia
+        pickle_start = time.perf_counter()
+        model = whisper.load_model(model_name, device="cpu")
+        elapsed = time.perf_counter() - pickle_start
+        _record_load_time(model_name, "pickle", elapsed)
+        logger.info(f"Model '{model_name}' załadowany standardowo (pickle) w {elapsed:.2f} s")
+        convert_model(model, model_name)
+        return model
+
+    try:
+        start = time.perf_counter()
+        metadata = _read_metadata(cache_path)
+        dims = ModelDimensions(**json.loads(metadata["dims"]))
+        state_dict = load_file(cache_path, device="cpu")
+
+        try:
+            # Szkielet modelu bez alokacji wag; load_state_dict(assign=True) podpina zmapowane tensory
+            with torch.device("meta"):
+                model = Whisper(dims)
+            model.load_state_dict(state_dict, assign=True)
+            _materialize_buffers(model, dims)
+        except (TypeError, AttributeError, RuntimeError) as e:
+            # Starszy PyTorch (< 2.1): zwykłe ładowanie z kopiowaniem, wciąż bez unpicklingu
+            logger.info(f"Ładowanie bez kopiowania niedostępne ({e}) - kopiuję wagi z pliku safetensors.")
+            model = Whisper(dims)
+            model.load_state_dict(state_dict)
+
+        if "alignment_heads" in metadata:
+            model.set_alignment_heads(metadata["alignment_heads"].encode("ascii"))
+        model.eval()
+        elapsed = time.perf_counter() - start
+        _record_load_time(model_name, "mmap", elapsed)
+        logger.info(f"Model '{model_name}' załadowany z cache safetensors (mmap) w {elapsed:.2f} s")
+        return model
+    except Exception as e:
+        logger.error(f"Nie udało się załadować modelu '{model_name}' z cache safetensors: {e}")
+        return None
+
+
+def _materialize_buffers(model, dims) -> None:
+    """Odtwarza bufory, których nie ma w state_dict (persistent=False) i które zostały na urządzeniu 'meta'."""
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(float("-inf")).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+    # Domyślne głowice alignmentu (jak w Whisper.__init__); nadpisywane przez set_alignment_heads
+    all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    all_heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+
+
+def _record_load_time(model_name: str, method: str, seconds: float) -> None:
+    result = get_benchmark_result("load_time", model_name) or {}
+    result[method] = seconds
+    save_benchmark_result("load_time", model_name, result)
+
+
+def get_load_times(model_name: str) -> Optional[dict]:
+    """Zwraca zmierzone czasy ładowania modelu: {'pickle': s, 'mmap': s} (lub None)."""
+    return get_benchmark_result("load_time", model_name)
@@ -0,0 +1,381 @@
+# X:\Aplikacje\dictaitor\modules\whisper_decoding.py
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+    from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim
+    from whisper.decoding import DecodingOptions
+    from whisper.tokenizer import get_tokenizer
+    WHISPER_DECODING_AVAILABLE = True
+except ImportError:
+    WHISPER_DECODING_AVAILABLE = False
+
+# Domyślny harmonogram temperatur i progi - te same, których używa whisper.transcribe
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+DEFAULT_COMPRESSION_RATIO_THRESHOLD = 2.4
+DEFAULT_LOGPROB_THRESHOLD = -1.0
+DEFAULT_NO_SPEECH_THRESHOLD = 0.6
+
+
+class ArrayFeatureSource:
+    """
+    Źródło cech dla pętli dekodowania: cały plik audio w pamięci, spektrogram liczony raz
+    (dokładnie tak, jak robi to whisper.transcribe).
+    """
+
+    def __init__(self, audio, n_mels: int) -> None:
+        self.mel = log_mel_spectrogram(audio, n_mels, padding=N_SAMPLES)
+        # Dopełnienie N_SAMPLES zerami nie jest częścią nagrania
+        self.total_frames = self.mel.shape[-1] - N_FRAMES
+
+    def mel_window(self, seek: int):
+        """Zwraca spektrogram okna 30 s zaczynającego się od ramki `seek` (n_mels x N_FRAMES)."""
+        return pad_or_trim(self.mel[:, seek:seek + N_FRAMES], N_FRAMES)
+
+
+class CachedFeatureSource:
+    """
+    Źródło cech z gotowego spektrogramu (np. mapowanego z pamięci podręcznej feature_cache).
+
+    Spektrogram ma układ jak w ArrayFeatureSource (z dopełnieniem N_SAMPLES); do pamięci
+    trafia tylko bieżące okno, przeliczane na float32.
+    """
+
+    def __init__(self, mel) -> None:
+        self.mel = mel
+        self.total_frames = mel.shape[-1] - N_FRAMES
+
+    def mel_window(self, seek: int):
+        window = torch.from_numpy(self.mel[:, seek:seek + N_FRAMES].astype("float32"))
+        return pad_or_trim(window, N_FRAMES)
+
+
+def _get_tokenizer(model, language: Optional[str], task: str):
+    try:
+        return get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=language, task=task)
+    except (TypeError, AttributeError):
+        # Starsze wersje Whisper nie znają parametru num_languages
+        return get_tokenizer(model.is_multilingual, language=language, task=task)
+
+
+def _decode_with_fallback(model, audio_features, options: Dict[str, Any], temperatures: Tuple[float, ...],
+                          compression_ratio_threshold: Optional[float], logprob_threshold: Optional[float],
+                          no_speech_threshold: Optional[float]):
+    """Dekoduje okno (cechy z kodera), podnosząc temperaturę, dopóki wynik wygląda na pętlę powtórzeń lub śmieci."""
+    result = None
+    for temperature in temperatures:
+        kwargs = dict(options)
+        if temperature > 0:
+            # Przy próbkowaniu beam search nie ma sensu - używamy best_of
+            kwargs.pop("beam_size", None)
+            kwargs.pop("patience", None)
+        else:
+            kwargs.pop("best_of", None)
+        result = model.decode(audio_features, DecodingOptions(**kwargs, temperature=temperature))
+
+        needs_fallback = False
+        if compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold:
+            needs_fallback = True  # zbyt powtarzalny tekst
+        if logprob_threshold is not None and result.avg_logprob < logprob_threshold:
+            needs_fallback = True  # zbyt niska pewność
+        if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+            needs_fallback = False  # cisza - nie ma czego poprawiać
+        if not needs_fallback:
+            break
+    return result
+
+
+class _OutputDecoder:
+    """
+    Stan dekodowania jednego wyjścia (zadanie + język): podpowiedź z poprzedniego tekstu, segmenty
+    i segmenty bieżącego okna czekające na zatwierdzenie przez wspólny harmonogram okien.
+    """
+
+    def __init__(self, model, language: Optional[str], task: str, initial_prompt: Optional[str],
+                 condition_on_previous_text: bool, decode_options: Optional[Dict[str, Any]],
+                 segment_callback: Optional[Callable[[Dict[str, Any]], None]],
+                 carry_initial_prompt: bool = False) -> None:
+        self.language = language
+        self.task = task
+        self.tokenizer = _get_tokenizer(model, language, task)
+        self.options = {"task": task, "language": language, "fp16": False}
+        self.options.update(decode_options or {})
+        self.condition_on_previous_text = condition_on_previous_text
+        self.segment_callback = segment_callback
+        self.all_tokens: List[int] = []
+        self.segments: List[Dict[str, Any]] = []
+        self.prompt_reset_since = 0
+        self.initial_tokens: List[int] = []
+        # Dekoder przyjmuje najwyżej tyle tokenów podpowiedzi (nadmiar obcina od początku)
+        self.max_prompt_tokens = model.dims.n_text_ctx // 2 - 1
+        if initial_prompt:
+            prompt_tokens = self.tokenizer.encode(" " + initial_prompt.strip())
+            if carry_initial_prompt:
+                # Podpowiedź (np. słownictwo) poprzedza kontekst w każdym oknie, a nie tylko w pierwszym
+                self.initial_tokens = prompt_tokens[-self.max_prompt_tokens:]
+            else:
+                self.all_tokens.extend(prompt_tokens)
+        self._pending: List[Dict[str, Any]] = []
+        self._temperature = 0.0
+        self._no_speech = False
+
+    def _make_segment(self, seek: int, start: float, end: float, tokens: List[int], result) -> None:
+        text_tokens = [token for token in tokens if token < self.tokenizer.eot]
+        segment = {
+            "seek": seek,
+            "start": start,
+            "end": end,
+            "text": self.tokenizer.decode(text_tokens),
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+        if start == end or not segment["text"].strip():
+            return
+        self._pending.append(segment)
+
+    def decode_window(self, model, audio_features, seek: int, segment_size: int, time_offset: float,
+                      time_precision: float, input_stride: int, temperatures: Tuple[float, ...],
+                      compression_ratio_threshold: Optional[float], logprob_threshold: Optional[float],
+                      no_speech_threshold: Optional[float]) -> int:
+        """Dekoduje okno i zwraca proponowaną pozycję następnego okna (w ramkach); segmenty czekają na commit()."""
+        tokenizer = self.tokenizer
+        self._pending = []
+        self._no_speech = False
+        context = self.all_tokens[self.prompt_reset_since:]
+        if self.initial_tokens:
+            room = self.max_prompt_tokens - len(self.initial_tokens)
+            context = self.initial_tokens + (context[-room:] if room > 0 else [])
+        self.options["prompt"] = context
+        result = _decode_with_fallback(model, audio_features, self.options, temperatures,
+                                       compression_ratio_threshold, logprob_threshold, no_speech_threshold)
+        self._temperature = result.temperature
+        tokens = torch.tensor(result.tokens)
+
+        if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+            if logprob_threshold is None or result.avg_logprob < logprob_threshold:
+                # Okno bez mowy - pomijamy je w całości (jak whisper.transcribe, bez zmiany kontekstu)
+                self._no_speech = True
+                return seek + segment_size
+
+        timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+        single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+        consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+        consecutive.add_(1)
+
+        if len(consecutive) > 0:
+            # Kilka segmentów ograniczonych parami znaczników czasu
+            slices = consecutive.tolist()
+            if single_timestamp_ending:
+                slices.append(len(tokens))
+            last_slice = 0
+            for current_slice in slices:
+                sliced_tokens = tokens[last_slice:current_slice]
+                start_pos = sliced_tokens[0].item() - tokenizer.timestamp_begin
+                end_pos = sliced_tokens[-1].item() - tokenizer.timestamp_begin
+                self._make_segment(seek, time_offset + start_pos * time_precision, time_offset + end_pos * time_precision,
+                                   sliced_tokens.tolist(), result)
+                last_slice = current_slice
+            if single_timestamp_ending:
+                return seek + segment_size
+            # Ostatni segment jest niedokończony - następne okno zaczyna się od jego początku
+            last_timestamp_pos = tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+            return seek + last_timestamp_pos * input_stride
+
+        duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        timestamps = tokens[timestamp_tokens.nonzero().flatten()]
+        if len(timestamps) > 0 and timestamps[-1].item() != tokenizer.timestamp_begin:
+            duration = (timestamps[-1].item() - tokenizer.timestamp_begin) * time_precision
+        self._make_segment(seek, time_offset, time_offset + duration, tokens.tolist(), result)
+        return seek + segment_size
+
+    def straddling(self, boundary: float) -> List[Dict[str, Any]]:
+        """Segmenty bieżącego okna, które zaczynają się przed granicą, a kończą za nią."""
+        return [segment for segment in self._pending if segment["start"] < boundary < segment["end"]]
+
+    def commit(self, boundary: float) -> None:
+        """Zatwierdza segmenty zaczynające się przed granicą następnego okna; pozostałe zostaną zdekodowane ponownie."""
+        for segment in self._pending:
+            if segment["start"] >= boundary:
+                continue
+            segment["id"] = len(self.segments)
+            self.segments.append(segment)
+            self.all_tokens.extend(segment["tokens"])
+            if self.segment_callback is not None:
+                self.segment_callback(segment)
+        self._pending = []
+        if self._no_speech:
+            return
+        if not self.condition_on_previous_text or self._temperature > 0.5:
+            # Po nieudanym dekodowaniu nie przenosimy kontekstu, żeby nie utrwalać błędów
+            self.prompt_reset_since = len(self.all_tokens)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "text": "".join(segment["text"] for segment in self.segments),
+            "segments": self.segments,
+            "language": self.language,
+            "task": self.task,
+        }
+
+
+def _encode_window(model, mel_segment):
+    """Uruchamia koder dla jednego okna; wynik przyjmują zarówno model.decode, jak i model.detect_language."""
+    with torch.no_grad():
+        return model.embed_audio(mel_segment.unsqueeze(0))[0]
+
+
+def decode_features(model, source, language: Optional[str] = None, task: str = "transcribe",
+                    initial_prompt: Optional[str] = None,
+                    carry_initial_prompt: bool = False,
+                    temperatures: Tuple[float, ...] = DEFAULT_TEMPERATURES,
+                    compression_ratio_threshold: Optional[float] = DEFAULT_COMPRESSION_RATIO_THRESHOLD,
+                    logprob_threshold: Optional[float] = DEFAULT_LOGPROB_THRESHOLD,
+                    no_speech_threshold: Optional[float] = DEFAULT_NO_SPEECH_THRESHOLD,
+                    condition_on_previous_text: bool = True,
+                    decode_options: Optional[Dict[str, Any]] = None,
+                    segment_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    progress_callback: Optional[Callable[[float, float], None]] = None,
+                    cancel_token=None) -> Dict[str, Any]:
+    """
+    Pętla dekodowania Whisper okno po oknie (odpowiednik whisper.transcribe).
+
+    W odróżnieniu od whisper.transcribe każdy zdekodowany segment jest od razu przekazywany
+    do `segment_callback`, więc interfejs może wyświetlać tekst w trakcie pracy modelu.
+
+    Args:
+        model: Załadowany model Whisper
+        source: Źródło cech z atrybutem `total_frames` i metodą `mel_window(seek)`
+        language: Kod języka lub None (wykrywany z pierwszego okna)
+        task: "transcribe" lub "translate"
+        initial_prompt: Tekst podpowiedzi (np. słownictwo dziedzinowe) dla pierwszego okna
+        carry_initial_prompt: Czy podpowiedź ma poprzedzać kontekst w każdym oknie (nie tylko w pierwszym)
+        temperatures: Harmonogram temperatur dla ponownego dekodowania nieudanych okien
+        compression_ratio_threshold: Próg współczynnika kompresji (pętle powtórzeń)
+        logprob_threshold: Próg średniego log-prawdopodobieństwa
+        no_speech_threshold: Próg prawdopodobieństwa ciszy
+        condition_on_previous_text: Czy poprzedni tekst jest podpowiedzią dla kolejnego okna
+        decode_options: Dodatkowe opcje DecodingOptions (beam_size, best_of, patience...)
+        segment_callback: Funkcja wywoływana dla każdego nowego segmentu
+        progress_callback: Funkcja wywoływana przed każdym oknem z (sekundy_przetworzone, sekundy_całości)
+        cancel_token: Opcjonalny jobs.CancellationToken sprawdzany przed każdym oknem
+
+    Raises:
+        JobCancelledError: Jeśli zadanie zostało anulowane lub przekroczyło limit czasu
+
+    Returns:
+        Dict[str, Any]: Wynik w formacie whisper.transcribe ('text', 'segments', 'language')
+    """
+    return decode_features_multi(model, source, [{"task": task, "language": language}], initial_prompt=initial_prompt,
+                                 carry_initial_prompt=carry_initial_prompt,
+                                 temperatures=temperatures, compression_ratio_threshold=compression_ratio_threshold,
+                                 logprob_threshold=logprob_threshold, no_speech_threshold=no_speech_threshold,
+                                 condition_on_previous_text=condition_on_previous_text, decode_options=decode_options,
+                                 segment_callback=segment_callback, progress_callback=progress_callback,
+                                 cancel_token=cancel_token)[0]
+
+
+def decode_features_multi(model, source, outputs: List[Dict[str, Optional[str]]],
+                          initial_prompt: Optional[str] = None,
+                          carry_initial_prompt: bool = False,
+                          temperatures: Tuple[float, ...] = DEFAULT_TEMPERATURES,
+                          compression_ratio_threshold: Optional[float] = DEFAULT_COMPRESSION_RATIO_THRESHOLD,
+                          logprob_threshold: Optional[float] = DEFAULT_LOGPROB_THRESHOLD,
+                          no_speech_threshold: Optional[float] = DEFAULT_NO_SPEECH_THRESHOLD,
+                          condition_on_previous_text: bool = True,
+                          decode_options: Optional[Dict[str, Any]] = None,
+                          segment_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          progress_callback: Optional[Callable[[float, float], None]] = None,
+                          cancel_token=None) -> List[Dict[str, Any]]:
+    """
+    Dekoduje kilka wyjść (np. transkrypcję i tłumaczenie) przy jednym przebiegu kodera na okno.
+
+    Koder - najdroższa część modelu - działa raz dla każdego okna 30 s, a dekoder każdego wyjścia
+    (i każda próba z wyższą temperaturą) korzysta z tych samych cech audio. Okna są wspólne:
+    następne zaczyna się tam, gdzie najwcześniej skończyło się któreś z wyjść, cofnięte tak, żeby
+    żaden zatwierdzony segment nie przecinał granicy; segmenty za granicą są dekodowane w kolejnym oknie.
+    Jeśli cofnięcie nie dałoby postępu (segment przecinający granicę zaczyna się na początku okna),
+    granica przesuwa się za koniec przecinających segmentów - tekst nigdy nie jest dekodowany dwukrotnie.
+    Przy jednym wyjściu wynik jest taki sam jak w whisper.transcribe.
+
+    Args:
+        outputs: Lista wyjść {'task': "transcribe"/"translate", 'language': kod lub None (wykrywany raz)}
+        segment_callback: Otrzymuje segmenty pierwszego wyjścia w miarę dekodowania
+        Pozostałe argumenty jak w decode_features.
+
+    Returns:
+        List[Dict[str, Any]]: Wyniki w kolejności `outputs` (klucze 'text', 'segments', 'language', 'task')
+    """
+    dtype = torch.float32
+    input_stride = N_FRAMES // model.dims.n_audio_ctx
+    time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+
+    first_features = None
+    detected_language = None
+    if any(output.get("language") is None for output in outputs):
+        if model.is_multilingual:
+            first_features = _encode_window(model, source.mel_window(0).to(model.device).to(dtype))
+            _, probs = model.detect_language(first_features)
+            detected_language = max(probs, key=probs.get)
+            logger.info(f"Wykryty język: {detected_language}")
+        else:
+            detected_language = "en"
+
+    decoders = [_OutputDecoder(model, output.get("language") or detected_language, output.get("task", "transcribe"),
+                               initial_prompt, condition_on_previous_text, decode_options,
+                               segment_callback if index == 0 else None, carry_initial_prompt)
+                for index, output in enumerate(outputs)]
+
+    seek = 0
+    total_frames = source.total_frames
+    total_seconds = float(total_frames * HOP_LENGTH / SAMPLE_RATE)
+    while seek < total_frames:
+        if cancel_token is not None:
+            # Granica okna to bezpieczny punkt przerwania - stan modelu nie jest w połowie aktualizacji
+            cancel_token.raise_if_cancelled()
+        time_offset = float(seek * HOP_LENGTH / SAMPLE_RATE)
+        if progress_callback is not None:
+            progress_callback(time_offset, total_seconds)
+        segment_size = min(N_FRAMES, total_frames - seek)
+        if seek == 0 and first_features is not None:
+            audio_features = first_features
+        else:
+            audio_features = _encode_window(model, source.mel_window(seek).to(model.device).to(dtype))
+
+        next_seek = min(decoder.decode_window(model, audio_features, seek, segment_size, time_offset, time_precision,
+                                              input_stride, temperatures, compression_ratio_threshold,
+                                              logprob_threshold, no_speech_threshold)
+                        for decoder in decoders)
+        # Granica nie może przeciąć segmentu innego wyjścia - cofamy ją do jego początku
+        forward = False
+        while len(decoders) > 1:
+            boundary = next_seek * HOP_LENGTH / SAMPLE_RATE
+            straddling = [segment for decoder in decoders for segment in decoder.straddling(boundary)]
+            if not straddling:
+                break
+            pulled_back = int(round(min(segment["start"] for segment in straddling) * SAMPLE_RATE / HOP_LENGTH))
+            if not forward and pulled_back > seek:
+                next_seek = pulled_back
+                continue
+            # Cofnięcie nie dałoby postępu - przesuwamy granicę (już tylko do przodu) za koniec przecinających
+            # segmentów, żeby żadne wyjście nie zdekodowało ich fragmentu ponownie w następnym oknie
+            forward = True
+            pushed = min(seek + segment_size,
+                         max(math.ceil(segment["end"] * SAMPLE_RATE / HOP_LENGTH) for segment in straddling))
+            if pushed <= next_seek:
+                break
+            next_seek = pushed
+        boundary = next_seek * HOP_LENGTH / SAMPLE_RATE
+        for decoder in decoders:
+            decoder.commit(boundary)
+        seek = next_seek
+
+    if progress_callback is not None:
+        progress_callback(total_seconds, total_seconds)
+    return [decoder.result() for decoder in decoders]
@@ -0,0 +1,6 @@
+# X:\Aplikacje\dictaitor\tests\conftest.py
+import os
+import sys
+
+# Testy importują moduły aplikacji tak jak main_app.py (from modules...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
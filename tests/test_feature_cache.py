@@ -0,0 +1,123 @@
+# X:\Aplikacje\dictaitor\tests\test_feature_cache.py
+import os
+import itertools
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from modules import feature_cache
+from modules.feature_cache import FeatureCache
+
+# Sekunda audio 16 kHz int16 w pliku WAV: 32000 bajtów próbek + 44 bajty nagłówka
+ENTRY_BYTES = 32044
+
+
+@pytest.fixture(autouse=True)
+def ordered_clock(monkeypatch):
+    # Kolejność LRU nie może zależeć od rozdzielczości zegara systemowego - każde użycie dostaje nowy czas
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(feature_cache.time, "time", lambda: float(next(ticks)))
+
+
+def _source(tmp_path, name: str, content: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def _cache(tmp_path, max_bytes: int) -> FeatureCache:
+    return FeatureCache(cache_dir=str(tmp_path / "cache"), max_bytes=max_bytes)
+
+
+def _audio(value: float = 0.25):
+    return np.full(16000, value, dtype=np.float32)
+
+
+def test_least_recently_used_entry_is_evicted_over_byte_budget(tmp_path):
+    cache = _cache(tmp_path, max_bytes=2 * ENTRY_BYTES)
+    first, second, third = (_source(tmp_path, f"{name}.mp3", name.encode()) for name in ("a", "b", "c"))
+    cache.put_audio(first, _audio())
+    cache.put_audio(second, _audio())
+    # Odczyt odświeża wpis - najdawniej używany jest teraz drugi plik
+    assert cache.get_audio(first) is not None
+    cache.put_audio(third, _audio())
+
+    assert cache.audio_path(second) is None
+    assert cache.audio_path(first) is not None
+    assert cache.audio_path(third) is not None
+    assert not os.path.exists(os.path.join(cache.cache_dir, cache.key_for(second)))
+    assert cache.get_size() == 2 * ENTRY_BYTES
+
+
+def test_entry_larger_than_budget_is_kept_and_older_ones_go(tmp_path):
+    cache = _cache(tmp_path, max_bytes=ENTRY_BYTES // 2)
+    first, second = _source(tmp_path, "a.mp3", b"a"), _source(tmp_path, "b.mp3", b"b")
+    cache.put_audio(first, _audio())
+    cache.put_audio(second, _audio())
+
+    assert cache.audio_path(first) is None
+    assert cache.audio_path(second) is not None
+    assert cache.get_size() == ENTRY_BYTES
+
+
+def test_mel_files_count_towards_the_budget(tmp_path):
+    cache = _cache(tmp_path, max_bytes=2 * ENTRY_BYTES)
+    first, second = _source(tmp_path, "a.mp3", b"a"), _source(tmp_path, "b.mp3", b"b")
+    cache.put_audio(first, _audio())
+    cache.put_mel(first, 80, np.zeros((80, 300), dtype=np.float32))
+    cache.put_audio(second, _audio())
+
+    # Wpis z audio i spektrogramem (80 x 300 x 2 B) razem z drugim przekracza limit
+    assert cache.get_mel(first, 80) is None
+    assert cache.audio_path(second) is not None
+
+
+def test_changed_file_gets_a_new_key_and_misses_the_cache(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 * ENTRY_BYTES)
+    path = _source(tmp_path, "note.mp3", b"first take")
+    original_key = cache.key_for(path)
+    cache.put_audio(path, _audio())
+
+    # Nagranie nadpisane inną zawartością (i innym czasem modyfikacji) to nowy wpis
+    _source(tmp_path, "note.mp3", b"second take, longer")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.key_for(path) != original_key
+    assert cache.audio_path(path) is None
+
+
+def test_same_size_rewrite_is_detected_by_modification_time(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 * ENTRY_BYTES)
+    path = _source(tmp_path, "note.mp3", b"AAAA")
+    original_key = cache.key_for(path)
+    cache.put_audio(path, _audio())
+
+    _source(tmp_path, "note.mp3", b"BBBB")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.key_for(path) != original_key
+
+
+def test_touched_file_with_same_content_keeps_its_entry(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 * ENTRY_BYTES)
+    path = _source(tmp_path, "note.mp3", b"same content")
+    cache.put_audio(path, _audio())
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    # Klucz to skrót zawartości - ten sam plik pod inną nazwą również trafia w wpis
+    assert cache.audio_path(path) is not None
+    assert cache.audio_path(_source(tmp_path, "copy.mp3", b"same content")) is not None
+
+
+def test_unchanged_file_is_not_rehashed_by_a_new_process(tmp_path, monkeypatch):
+    path = _source(tmp_path, "note.mp3", b"recorded once")
+    _cache(tmp_path, max_bytes=10 * ENTRY_BYTES).put_audio(path, _audio())
+
+    def fail(path):
+        raise AssertionError("plik nie powinien być ponownie haszowany")
+
+    # Nowa instancja (np. proces roboczy) rozpoznaje plik po ścieżce, rozmiarze i czasie modyfikacji z indeksu
+    monkeypatch.setattr(feature_cache, "file_hash", fail)
+    assert _cache(tmp_path, max_bytes=10 * ENTRY_BYTES).audio_path(path) is not None
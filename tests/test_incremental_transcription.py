@@ -0,0 +1,158 @@
+# X:\Aplikacje\dictaitor\tests\test_incremental_transcription.py
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from modules import incremental_transcription
+from modules.audio_stream import SAMPLE_RATE, AudioStream
+from modules.incremental_transcription import BLOCK_SAMPLES, fingerprint_audio, plan_update
+
+DURATION = 60
+# Segmenty co 2 s, każdy kończy się 0.1 s przed następnym - część z nich przecina granice edycji
+SEGMENT_STEP = 2.0
+SEGMENT_LENGTH = 1.9
+
+
+def _noise(seconds: float, seed: int):
+    # Szum zamiast ciszy - sondy i skróty bloków muszą się różnić
+    return np.random.RandomState(seed).randint(-8000, 8000, size=int(seconds * SAMPLE_RATE)).astype("<i2")
+
+
+def _write_wav(path, samples) -> str:
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def original():
+    return _noise(DURATION, seed=1)
+
+
+@pytest.fixture
+def record(tmp_path, original):
+    with AudioStream(_write_wav(tmp_path / "original.wav", original)) as stream:
+        fingerprint = fingerprint_audio(stream)
+    segments = [{"start": index * SEGMENT_STEP, "end": index * SEGMENT_STEP + SEGMENT_LENGTH, "text": f" zdanie {index}"}
+                for index in range(int(DURATION / SEGMENT_STEP))]
+    return {"segments": segments, **fingerprint}
+
+
+def _plan(tmp_path, record, samples):
+    with AudioStream(_write_wav(tmp_path / "edited.wav", samples)) as stream:
+        return plan_update(record, stream)
+
+
+def _seconds(seconds: float) -> int:
+    return int(seconds * SAMPLE_RATE)
+
+
+def _covered(plan, start: float, end: float) -> bool:
+    """Czy przedział nowego nagrania jest pokryty zachowanymi segmentami lub fragmentami do zdekodowania."""
+    spans = sorted([(segment["start"], segment["end"]) for segment in plan["kept"]] + list(plan["regions"]))
+    position = start
+    for span_start, span_end in spans:
+        # Przerwy między segmentami (0.1 s) to cisza - już raz zdekodowana
+        if span_start > position + SEGMENT_STEP - SEGMENT_LENGTH + 1e-6:
+            return False
+        position = max(position, span_end)
+    return position >= end - (SEGMENT_STEP - SEGMENT_LENGTH) - 1e-6
+
+
+def test_fingerprint_is_read_in_chunks(tmp_path, original, monkeypatch):
+    monkeypatch.setattr(incremental_transcription, "FINGERPRINT_READ_BLOCKS", 7)
+    samples = np.concatenate([original, _noise(0.3, seed=2)])
+    with AudioStream(_write_wav(tmp_path / "chunks.wav", samples)) as stream:
+        reads = []
+        read_pcm = stream.read_pcm
+        stream.read_pcm = lambda start=0, count=None: reads.append(count) or read_pcm(start, count)
+        fingerprint = fingerprint_audio(stream)
+
+    # Żaden odczyt (poza niepełnym blokiem końcowym) nie obejmuje więcej niż porcja bloków
+    assert None not in reads[:-1] and max(reads[:-1]) == 7 * BLOCK_SAMPLES
+    assert fingerprint["num_samples"] == len(samples)
+    assert len(fingerprint["block_hashes"]) == len(fingerprint["probes"]) == DURATION
+    # Te same skróty co dla całego nagrania naraz
+    assert fingerprint["block_hashes"][-1] == incremental_transcription._block_hash(original[-BLOCK_SAMPLES:])
+    assert fingerprint["tail_hash"] == incremental_transcription._block_hash(samples[DURATION * SAMPLE_RATE:])
+
+
+def test_unchanged_recording_needs_no_decoding(tmp_path, record, original):
+    plan = _plan(tmp_path, record, original)
+
+    assert plan["regions"] == []
+    assert plan["kept"] == record["segments"]
+    assert plan["shift"] == 0.0
+
+
+def test_appended_audio_decodes_only_the_new_end(tmp_path, record, original):
+    plan = _plan(tmp_path, record, np.concatenate([original, _noise(15, seed=3)]))
+
+    assert plan["duration"] == DURATION + 15
+    # Ostatni segment przy granicy mógł być ucięty w pół zdania - jest dekodowany ponownie
+    assert plan["kept"][-1]["end"] <= DURATION - 1.0
+    assert plan["regions"] == [(plan["kept"][-1]["end"], DURATION + 15)]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_trimmed_start_shifts_kept_segments(tmp_path, record, original):
+    plan = _plan(tmp_path, record, original[_seconds(5.5):])
+
+    assert plan["shift"] == 5.5
+    assert plan["duration"] == DURATION - 5.5
+    # Segment przecięty w 5.5 s (4.0-5.9) jest dekodowany ponownie od początku nowego nagrania
+    first = plan["kept"][0]
+    assert (first["text"], first["start"], first["end"]) == (" zdanie 3", pytest.approx(0.5), pytest.approx(0.5 + SEGMENT_LENGTH))
+    assert plan["regions"] == [(0.0, 0.5)]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_edit_at_start_decodes_the_changed_beginning(tmp_path, record, original):
+    edited = original.copy()
+    edited[:_seconds(3)] = _noise(3, seed=4)
+    plan = _plan(tmp_path, record, edited)
+
+    assert plan["shift"] == 0.0
+    assert all(segment["start"] >= 3.0 for segment in plan["kept"])
+    assert plan["regions"] == [(0.0, plan["kept"][0]["start"])]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_edit_in_the_middle_decodes_from_the_edit_on(tmp_path, record, original):
+    edited = original.copy()
+    edited[_seconds(30):_seconds(32)] = _noise(2, seed=5)
+    plan = _plan(tmp_path, record, edited)
+
+    # Zachowane jest tylko to, co przed zmianą; wszystko od niej (z marginesem) jest dekodowane od nowa
+    assert plan["kept"][-1]["end"] <= 30.0 - 1.0
+    assert plan["regions"] == [(plan["kept"][-1]["end"], DURATION)]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_edit_at_end_decodes_the_changed_end(tmp_path, record, original):
+    edited = original.copy()
+    edited[-_seconds(3):] = _noise(3, seed=6)
+    plan = _plan(tmp_path, record, edited)
+
+    assert plan["kept"][-1]["end"] <= DURATION - 3 - 1.0
+    assert plan["regions"] == [(plan["kept"][-1]["end"], DURATION)]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_shortened_end_redecodes_the_segment_cut_in_half(tmp_path, record, original):
+    plan = _plan(tmp_path, record, original[:_seconds(49)])
+
+    assert plan["duration"] == 49.0
+    # Segment 48.0-49.9 został przecięty - jego początek trzeba zdekodować ponownie
+    assert plan["kept"][-1]["end"] <= 48.0
+    assert plan["regions"] == [(plan["kept"][-1]["end"], 49.0)]
+    assert _covered(plan, 0.0, plan["duration"])
+
+
+def test_unrelated_recording_is_not_reused(tmp_path, record):
+    assert _plan(tmp_path, record, _noise(DURATION, seed=7)) is None
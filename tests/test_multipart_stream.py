@@ -0,0 +1,123 @@
+# X:\Aplikacje\dictaitor\tests\test_multipart_stream.py
+import os
+import mimetypes
+from email import policy
+from email.parser import BytesParser
+
+import pytest
+
+from modules.jobs import CancellationToken, JobCancelledError
+from modules.multipart_stream import MultipartFileStream
+
+FIELDS = {"model": "whisper-1", "response_format": "verbose_json", "temperature": 0.0, "language": "pl",
+          "prompt": 'Słownik: "DictAItor", CTranslate2'}
+BLOCK_SIZE = 1024
+
+
+def _audio_file(tmp_path, size: int, name: str = "nagranie 1.wav") -> str:
+    path = tmp_path / name
+    path.write_bytes(bytes(index % 251 for index in range(size)))
+    return str(path)
+
+
+def _buffered_multipart(fields, file_field: str, file_path: str, content_type: str, boundary: str) -> bytes:
+    """Całe ciało naraz, w układzie `files=` z requests (urllib3.encode_multipart_formdata)."""
+    body = b""
+    for name, value in fields.items():
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+    with open(file_path, "rb") as f:
+        content = f.read()
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+             f'filename="{os.path.basename(file_path)}"\r\nContent-Type: {content_type}\r\n\r\n').encode("utf-8")
+    return body + content + f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+def _read_all(stream: MultipartFileStream, size: int = -1) -> bytes:
+    chunks = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+# Rozmiary pliku: pusty, mniejszy od bloku, wielokrotność bloku, niepełny ostatni blok
+@pytest.mark.parametrize("file_size", [0, 100, 4 * BLOCK_SIZE, 4 * BLOCK_SIZE + 17])
+@pytest.mark.parametrize("read_size", [-1, 1, 7, BLOCK_SIZE, 10 * BLOCK_SIZE])
+def test_streamed_body_matches_buffered_encoding(tmp_path, file_size, read_size):
+    path = _audio_file(tmp_path, file_size)
+    with MultipartFileStream(FIELDS, "file", path, block_size=BLOCK_SIZE) as stream:
+        body = _read_all(stream, read_size)
+
+    assert body == _buffered_multipart(FIELDS, "file", path, mimetypes.guess_type(path)[0], stream.boundary)
+
+
+def test_streamed_body_matches_urllib3_encoding(tmp_path):
+    filepost = pytest.importorskip("urllib3.filepost")
+    path = _audio_file(tmp_path, 3 * BLOCK_SIZE + 5)
+    with MultipartFileStream(FIELDS, "file", path, file_content_type="audio/wav", block_size=BLOCK_SIZE) as stream:
+        body = _read_all(stream)
+
+    with open(path, "rb") as f:
+        file_part = (os.path.basename(path), f.read(), "audio/wav")
+    expected, content_type = filepost.encode_multipart_formdata(
+        [(name, str(value)) for name, value in FIELDS.items()] + [("file", file_part)], boundary=stream.boundary)
+    assert body == expected
+    assert stream.content_type == content_type
+
+
+def test_streamed_body_parses_back_to_fields_and_file(tmp_path):
+    path = _audio_file(tmp_path, 2 * BLOCK_SIZE + 3)
+    with MultipartFileStream(FIELDS, "file", path, block_size=BLOCK_SIZE) as stream:
+        body = _read_all(stream, 500)
+
+    message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {stream.content_type}\r\n\r\n".encode("ascii") + body)
+    parts = list(message.iter_parts())
+    assert [part.get_param("name", header="content-disposition") for part in parts] == list(FIELDS) + ["file"]
+    # Pola formularza są w UTF-8 (RFC 7578), bez parametru charset
+    assert [part.get_payload(decode=True).decode("utf-8") for part in parts[:-1]] == [str(value) for value in FIELDS.values()]
+    assert parts[-1].get_filename() == os.path.basename(path)
+    with open(path, "rb") as f:
+        assert parts[-1].get_payload(decode=True) == f.read()
+
+
+@pytest.mark.parametrize("read_size", [-1, 3, BLOCK_SIZE - 1, BLOCK_SIZE + 1])
+def test_len_and_tell_match_bytes_read(tmp_path, read_size):
+    path = _audio_file(tmp_path, 5 * BLOCK_SIZE + 123)
+    with MultipartFileStream(FIELDS, "file", path, block_size=BLOCK_SIZE) as stream:
+        declared = len(stream)
+        assert stream.tell() == 0
+        read = 0
+        while True:
+            chunk = stream.read(read_size)
+            if not chunk:
+                break
+            # Blok nigdy nie jest większy niż zamówiono ani niż block_size
+            assert len(chunk) <= (BLOCK_SIZE if read_size < 0 else min(read_size, BLOCK_SIZE))
+            read += len(chunk)
+            assert stream.tell() == read
+        # Odczyt po końcu nic nie dodaje
+        assert stream.read(read_size) == b""
+        assert stream.tell() == read == declared
+        assert len(stream) - stream.tell() == 0
+
+
+def test_progress_reports_the_full_body(tmp_path):
+    path = _audio_file(tmp_path, 3 * BLOCK_SIZE)
+    reports = []
+    with MultipartFileStream(FIELDS, "file", path, block_size=BLOCK_SIZE, progress_callback=reports.append) as stream:
+        _read_all(stream)
+
+    assert reports[-1]["sent"] == reports[-1]["total"] == len(stream)
+    assert reports[-1]["fraction"] == 1.0
+
+
+def test_cancelled_token_stops_the_upload(tmp_path):
+    path = _audio_file(tmp_path, 3 * BLOCK_SIZE)
+    token = CancellationToken()
+    with MultipartFileStream(FIELDS, "file", path, block_size=BLOCK_SIZE, cancel_token=token) as stream:
+        stream.read()
+        token.cancel("test")
+        with pytest.raises(JobCancelledError):
+            stream.read()
+        assert stream.tell() < len(stream)
@@ -0,0 +1,108 @@
+# X:\Aplikacje\dictaitor\tests\test_multitrack_recorder.py
+import time
+import wave
+import array
+
+from modules.multitrack_recorder import (MultiTrackRecorder, SyntheticInputStream, format_speaker_transcript,
+                                         merge_speaker_segments)
+
+RATE = 16000
+CHUNK = 256
+# Dopuszczalny błąd wyrównania ścieżek: kilka bloków odczytu plus opóźnienia wątków
+SYNC_TOLERANCE = 0.05
+
+
+class DelayedInputStream(SyntheticInputStream):
+    """Wejście, które zaczyna oddawać dane dopiero po `delay` s (urządzenie uruchomione później)."""
+
+    def __init__(self, channel_samples, delay: float, **kwargs) -> None:
+        super().__init__(channel_samples, **kwargs)
+        self.delay = delay
+        self._waiting = True
+
+    def read(self, num_frames: int, exception_on_overflow: bool = False) -> bytes:
+        if self._waiting:
+            time.sleep(self.delay)
+            self._started = time.perf_counter()
+            self._waiting = False
+        return super().read(num_frames, exception_on_overflow)
+
+
+def _impulse(duration: float, at: float) -> list:
+    samples = [0] * int(duration * RATE)
+    start = int(at * RATE)
+    samples[start:start + 160] = [12000] * 160
+    return samples
+
+
+def _read_track(path: str) -> array.array:
+    with wave.open(path, "rb") as wf:
+        assert (wf.getnchannels(), wf.getframerate()) == (1, RATE)
+        return array.array("h", wf.readframes(wf.getnframes()))
+
+
+def _impulse_time(samples: array.array) -> float:
+    return next(index for index, value in enumerate(samples) if value > 6000) / RATE
+
+
+def _record(tracks, streams, seconds: float, output_dir) -> dict:
+    recorder = MultiTrackRecorder(tracks, rate=RATE, chunk_size=CHUNK, output_dir=str(output_dir),
+                                  stream_factory=lambda device, channels, rate, chunk_size: streams[device])
+    assert recorder.start_recording()
+    time.sleep(seconds)
+    return recorder.stop_recording()
+
+
+def test_later_device_is_aligned_with_lead_in_silence(tmp_path):
+    # Ten sam dźwięk (w chwili 0.6 s) słyszą oba mikrofony; drugi startuje 0.3 s później
+    streams = {0: SyntheticInputStream([_impulse(2.0, 0.6)], rate=RATE),
+               1: DelayedInputStream([_impulse(2.0, 0.3)], delay=0.3, rate=RATE)}
+    track_files = _record([{"label": "Anna", "device": 0}, {"label": "Jan", "device": 1}], streams, 1.0, tmp_path)
+
+    anna, jan = _read_track(track_files["Anna"]), _read_track(track_files["Jan"])
+    assert abs(_impulse_time(anna) - 0.6) < SYNC_TOLERANCE
+    assert abs(_impulse_time(jan) - _impulse_time(anna)) < SYNC_TOLERANCE
+
+
+def test_channels_of_one_device_are_split_into_tracks(tmp_path):
+    streams = {None: SyntheticInputStream([_impulse(1.0, 0.1), _impulse(1.0, 0.4)], rate=RATE, speed=10)}
+    tracks = [{"label": "Lewy", "device": None, "channel": 0}, {"label": "Prawy", "device": None, "channel": 1}]
+    track_files = _record(tracks, streams, 0.2, tmp_path)
+
+    assert _impulse_time(_read_track(track_files["Lewy"])) == 0.1
+    assert _impulse_time(_read_track(track_files["Prawy"])) == 0.4
+
+
+def test_labels_with_the_same_safe_name_get_separate_files(tmp_path):
+    streams = {None: SyntheticInputStream([[1000] * RATE, [-1000] * RATE], rate=RATE, speed=10)}
+    tracks = [{"label": "Jan K.", "device": None, "channel": 0}, {"label": "Jan K?", "device": None, "channel": 1}]
+    track_files = _record(tracks, streams, 0.2, tmp_path)
+
+    assert track_files["Jan K."] != track_files["Jan K?"]
+    assert _read_track(track_files["Jan K."])[0] == 1000
+    assert _read_track(track_files["Jan K?"])[0] == -1000
+
+
+def test_merge_speaker_segments_orders_by_start_time():
+    results = {
+        "Anna": {"segments": [{"start": 0.0, "end": 2.0, "text": " Dzień dobry."},
+                              {"start": 5.0, "end": 6.0, "text": " Dziękuję."}]},
+        "Jan": {"segments": [{"start": 2.5, "end": 4.5, "text": " Witam."}]},
+    }
+    merged = merge_speaker_segments(results)
+
+    assert [(segment["speaker"], segment["start"]) for segment in merged] == [("Anna", 0.0), ("Jan", 2.5), ("Anna", 5.0)]
+
+
+def test_format_speaker_transcript_merges_close_turns_of_one_speaker():
+    segments = [
+        {"speaker": "Anna", "start": 0.0, "end": 2.0, "text": " Dzień dobry."},
+        {"speaker": "Anna", "start": 3.0, "end": 4.0, "text": " Zaczynamy?"},
+        {"speaker": "Jan", "start": 4.5, "end": 6.0, "text": " Tak."},
+        {"speaker": "Jan", "start": 6.5, "end": 7.0, "text": "   "},
+        {"speaker": "Anna", "start": 3725.0, "end": 3727.0, "text": " Koniec."},
+    ]
+
+    assert format_speaker_transcript(segments) == ("[00:00:00] Anna: Dzień dobry. Zaczynamy?\n"
+                                                   "[00:00:04] Jan: Tak.\n"
+                                                   "[01:02:05] Anna: Koniec.")
@@ -0,0 +1,187 @@
+# X:\Aplikacje\dictaitor\tests\test_rate_limiter.py
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+from modules.jobs import CancellationToken, JobCancelledError
+from modules.rate_limiter import DEFAULT_RETRY_AFTER, ApiRateLimiter, parse_reset_duration
+
+# Czas (rzeczywisty), po którym uznajemy, że oczekujący nie dostał miejsca; kilka cykli WAIT_POLL_INTERVAL
+BLOCKED_WAIT = 0.5
+ACQUIRE_TIMEOUT = 3.0
+
+
+class FakeClock:
+    """Zegar monotoniczny przesuwany ręcznie - uzupełnianie żetonów i przerwy po 429 bez czekania."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _slot_in_thread(limiter: ApiRateLimiter, **kwargs):
+    """Zajmuje miejsce w osobnym wątku; zwraca (zajęte, zwolnij) - zdarzenia do sterowania z testu."""
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold() -> None:
+        with limiter.slot(**kwargs):
+            acquired.set()
+            release.wait(ACQUIRE_TIMEOUT)
+
+    threading.Thread(target=hold, daemon=True).start()
+    return acquired, release
+
+
+def _drain(limiter: ApiRateLimiter, count: int) -> None:
+    for _ in range(count):
+        with limiter.slot():
+            pass
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("6m0s") == 360.0
+    assert parse_reset_duration("1s") == 1.0
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("2.5") == 2.5
+    assert parse_reset_duration("") is None
+    assert parse_reset_duration("wkrótce") is None
+
+
+def test_tokens_refill_at_the_configured_rate():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=60, max_concurrent=10, clock=clock)
+    _drain(limiter, 60)
+    assert limiter.status()["tokens"] == pytest.approx(0.0)
+
+    acquired, release = _slot_in_thread(limiter)
+    assert not acquired.wait(BLOCKED_WAIT)
+    # 60 żądań/min = jeden żeton na sekundę
+    clock.advance(0.5)
+    assert not acquired.wait(BLOCKED_WAIT)
+    clock.advance(0.5)
+    assert acquired.wait(ACQUIRE_TIMEOUT)
+    release.set()
+
+
+def test_refill_is_capped_at_one_minute_of_requests():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=30, max_concurrent=10, clock=clock)
+    _drain(limiter, 30)
+    clock.advance(3600)
+    _drain(limiter, 1)
+
+    assert limiter.status()["tokens"] == pytest.approx(29.0)
+
+
+def test_slot_limits_concurrent_uploads():
+    limiter = ApiRateLimiter(requests_per_minute=600, max_concurrent=2, clock=FakeClock())
+    with ExitStack() as held:
+        held.enter_context(limiter.slot(job_key="a"))
+        held.enter_context(limiter.slot(job_key="a"))
+        assert limiter.status()["active_uploads"] == 2
+
+        acquired, release = _slot_in_thread(limiter, job_key="b")
+        assert not acquired.wait(BLOCKED_WAIT)
+        assert limiter.status()["waiting"] == 1
+    # Zwolnienie miejsc budzi oczekującego
+    assert acquired.wait(ACQUIRE_TIMEOUT)
+    assert limiter.status()["active_uploads"] == 1
+    release.set()
+
+
+def test_waiting_job_served_least_recently_goes_first():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=600, max_concurrent=1, clock=clock)
+    with limiter.slot(job_key="long"):
+        long_acquired, long_release = _slot_in_thread(limiter, job_key="long")
+        assert not long_acquired.wait(BLOCKED_WAIT)
+        short_acquired, short_release = _slot_in_thread(limiter, job_key="short")
+        assert not short_acquired.wait(BLOCKED_WAIT)
+    # Krótka notatka nie była jeszcze obsłużona - wyprzedza kolejny fragment długiego nagrania
+    assert short_acquired.wait(ACQUIRE_TIMEOUT)
+    assert not long_acquired.is_set()
+    short_release.set()
+    assert long_acquired.wait(ACQUIRE_TIMEOUT)
+    long_release.set()
+
+
+def test_cancelled_job_stops_waiting():
+    limiter = ApiRateLimiter(requests_per_minute=600, max_concurrent=1, clock=FakeClock())
+    token = CancellationToken()
+    errors = []
+
+    def wait_for_slot() -> None:
+        try:
+            with limiter.slot(cancel_token=token):
+                pass
+        except JobCancelledError as e:
+            errors.append(e)
+
+    with limiter.slot():
+        waiter = threading.Thread(target=wait_for_slot, daemon=True)
+        waiter.start()
+        token.cancel("test")
+        waiter.join(ACQUIRE_TIMEOUT)
+
+    assert len(errors) == 1
+    assert limiter.status()["waiting"] == 0
+
+
+def test_429_pauses_until_retry_after_and_halves_the_rate():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=60, max_concurrent=10, clock=clock)
+
+    assert limiter.record_response(429, {"retry-after": "2"}) == 2.0
+    status = limiter.status()
+    assert (status["rate_rpm"], status["tokens"], status["paused_for"]) == (30.0, 0.0, 2.0)
+    assert status["rate_limited_count"] == 1
+
+    acquired, release = _slot_in_thread(limiter)
+    clock.advance(1.5)
+    assert not acquired.wait(BLOCKED_WAIT)
+    # Po przerwie tempo 30 żądań/min zdążyło odbudować dokładnie jeden żeton
+    clock.advance(0.5)
+    assert acquired.wait(ACQUIRE_TIMEOUT)
+    release.set()
+
+
+def test_429_without_retry_after_uses_reset_header_or_default():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=60, clock=clock)
+
+    assert limiter.record_response(429, {"x-ratelimit-reset-requests": "3s"}) == 3.0
+    assert limiter.record_response(429, {}) == DEFAULT_RETRY_AFTER
+    # Kolejne 429 nie schodzą poniżej minimum i nie skracają trwającej przerwy
+    for _ in range(10):
+        limiter.record_response(429, {"retry-after": "0.1"})
+    assert limiter.status()["rate_rpm"] == 1.0
+    assert limiter.status()["paused_for"] == DEFAULT_RETRY_AFTER
+
+
+def test_rate_recovers_after_successes_up_to_the_header_limit():
+    limiter = ApiRateLimiter(requests_per_minute=10, clock=FakeClock())
+    limiter.record_response(429, {"retry-after": "1"})
+    assert limiter.status()["rate_rpm"] == 5.0
+
+    for _ in range(3):
+        assert limiter.record_response(200, {}) is None
+    assert limiter.status()["rate_rpm"] == 8.0
+    for _ in range(10):
+        limiter.record_response(200, {"x-ratelimit-limit-requests": "12"})
+    assert limiter.status()["limit_rpm"] == 12.0
+    assert limiter.status()["rate_rpm"] == 12.0
+
+
+def test_zero_remaining_requests_pauses_until_reset():
+    clock = FakeClock()
+    limiter = ApiRateLimiter(requests_per_minute=60, clock=clock)
+    limiter.record_response(200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "4s"})
+
+    status = limiter.status()
+    assert (status["tokens"], status["paused_for"]) == (0.0, 4.0)
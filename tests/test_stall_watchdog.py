@@ -0,0 +1,55 @@
+# X:\Aplikacje\dictaitor\tests\test_stall_watchdog.py
+import time
+import logging
+
+import pytest
+
+from modules.stall_watchdog import StallWatchdog
+
+
+class FakeRoot:
+    """Pętla zdarzeń bez Tk: zaplanowane wywołania nie są wykonywane, wystarczy ich rejestracja."""
+
+    def after(self, delay_ms, callback):
+        return object()
+
+    def after_cancel(self, after_id):
+        pass
+
+
+@pytest.fixture
+def stall_log(tmp_path):
+    log_path = tmp_path / "gui_stalls.log"
+    yield log_path
+    # Dziennik zacięć jest wspólnym loggerem - uchwyt do pliku testu nie może przejść do kolejnych testów
+    stall_logger = logging.getLogger("DictAItorStalls")
+    for handler in list(stall_logger.handlers):
+        stall_logger.removeHandler(handler)
+        handler.close()
+
+
+def test_stop_logs_histogram_and_call_sites(stall_log):
+    watchdog = StallWatchdog(FakeRoot(), threshold_ms=200, log_path=str(stall_log))
+    watchdog.start()
+    watchdog._record(0.03, None)
+    watchdog._record(0.35, None)
+    watchdog.stop()
+
+    text = stall_log.read_text(encoding="utf-8")
+    assert "Raport zacięć GUI (podsumowanie sesji)" in text
+    assert "Histogram opóźnień:" in text
+    assert "nieznane: 1x" in text
+    # Ponowne zatrzymanie nie dopisuje drugiego podsumowania
+    watchdog.stop()
+    assert stall_log.read_text(encoding="utf-8").count("podsumowanie sesji") == 1
+
+
+def test_report_is_logged_periodically_while_running(stall_log):
+    watchdog = StallWatchdog(FakeRoot(), threshold_ms=40, log_path=str(stall_log), report_interval_s=0.05)
+    watchdog.start()
+    # Tyknięcia nie są wykonywane - żeby nadzorca nie zgłaszał zacięć, oczekiwane tyknięcie jest daleko w przyszłości
+    watchdog._expected_tick = time.perf_counter() + 3600
+    time.sleep(0.3)
+    watchdog.stop()
+
+    assert stall_log.read_text(encoding="utf-8").count("Raport zacięć GUI (okresowy)") >= 2